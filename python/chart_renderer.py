@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chart Renderer
+--------------
+Génération de graphiques (barres, courbes, secteurs) à partir des données Excel.
+Utilisé par excel_processor.py (option --charts).
+
+- Rendu matplotlib sans affichage (backend Agg) dans un pool de processus :
+  l'analyse continue pendant le rendu
+- Données préparées dans le processus appelant (regroupement, tableau croisé,
+  sous-échantillonnage LTTB des longues séries) : seuls quelques milliers de
+  points sont transmis au pool
+- Cache des images PNG/SVG par (empreinte du fichier, feuille, spécification),
+  avec éviction des entrées les moins récemment utilisées
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from time_series import FREQUENCIES, DateParser, find_date_columns, normalize_frequency
+
+CHART_TYPES = ('bar', 'line', 'pie')
+IMAGE_FORMATS = ('png', 'svg')
+CHART_AGGREGATIONS = ('sum', 'mean', 'count', 'min', 'max', 'median')
+
+# Nombre maximal de points par série d'une courbe (sous-échantillonnage LTTB au-delà)
+MAX_LINE_POINTS = 2000
+
+# Nombre maximal de catégories affichées (les suivantes sont regroupées)
+MAX_BAR_CATEGORIES = 20
+MAX_PIE_CATEGORIES = 8
+OTHER_CATEGORY = "Autres"
+
+# Taille par défaut des images, en pixels
+DEFAULT_WIDTH = 960
+DEFAULT_HEIGHT = 540
+DEFAULT_DPI = 96
+
+# Cache des images rendues
+CHART_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'abia_chart_cache')
+CHART_CACHE_MAX_ENTRIES = 200
+CHART_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Empreintes de contenu déjà calculées : (chemin, taille, date de modification) -> empreinte
+_file_digests = {}
+
+
+def matplotlib_available():
+    """Le rendu nécessite matplotlib (optionnel)."""
+    try:
+        import matplotlib  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def file_digest(file_path):
+    """
+    Empreinte du contenu d'un fichier (BLAKE2b), mémorisée tant que le fichier ne change pas.
+
+    Args:
+        file_path (str): Chemin du fichier
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_digests:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        _file_digests[memo_key] = digest.hexdigest()
+    return _file_digests[memo_key]
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Sous-échantillonnage Largest-Triangle-Three-Buckets : conserve la forme visuelle
+    d'une série (pics et creux) avec `threshold` points.
+
+    Args:
+        x (ndarray): Abscisses croissantes (float)
+        y (ndarray): Ordonnées (float, sans NaN)
+        threshold (int): Nombre de points conservés
+
+    Returns:
+        ndarray: Indices des points conservés, dans l'ordre
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    # Points intérieurs répartis en threshold - 2 seaux ; moyennes de chaque seau précalculées
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    x_means = np.add.reduceat(x[1:count - 1], edges[:-1] - 1) / sizes
+    y_means = np.add.reduceat(y[1:count - 1], edges[:-1] - 1) / sizes
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket < threshold - 3:
+            next_x, next_y = x_means[bucket + 1], y_means[bucket + 1]
+        else:
+            next_x, next_y = x[count - 1], y[count - 1]
+        px, py = x[previous], y[previous]
+        # Aire (au facteur 1/2 près) du triangle point précédent / candidat / moyenne du seau suivant
+        areas = np.abs((px - next_x) * (y[start:end] - py) - (px - x[start:end]) * (next_y - py))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def normalize_spec(spec):
+    """
+    Valide une spécification de graphique et complète les valeurs par défaut.
+
+    Args:
+        spec (dict): {"type", "x", "y", "agg", "freq", "pivot", "title", "format", "width", "height", "dpi",
+                      "max_points", "top"}
+
+    Returns:
+        dict: Spécification complète
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("La spécification d'un graphique doit être un objet JSON")
+    chart_type = spec.get("type", "bar")
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"Type de graphique inconnu: {chart_type} (valeurs possibles: {', '.join(CHART_TYPES)})")
+    image_format = spec.get("format", "png")
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Format d'image inconnu: {image_format} (valeurs possibles: png, svg)")
+    agg = spec.get("agg", "sum")
+    if agg not in CHART_AGGREGATIONS:
+        raise ValueError(f"Agrégation inconnue: {agg}")
+    if not spec.get("pivot") and not spec.get("x") and not spec.get("y"):
+        raise ValueError("La spécification doit indiquer 'x', 'y' ou 'pivot'")
+
+    y = spec.get("y")
+    normalized = dict(spec)
+    normalized.update({
+        "type": chart_type,
+        "format": image_format,
+        "agg": agg,
+        "y": [y] if isinstance(y, str) else list(y or []),
+        "freq": normalize_frequency(spec["freq"]) if spec.get("freq") else None,
+        "width": int(spec.get("width", DEFAULT_WIDTH)),
+        "height": int(spec.get("height", DEFAULT_HEIGHT)),
+        "dpi": int(spec.get("dpi", DEFAULT_DPI)),
+        "max_points": int(spec.get("max_points", MAX_LINE_POINTS)),
+        "top": int(spec.get("top", MAX_PIE_CATEGORIES if chart_type == 'pie' else MAX_BAR_CATEGORIES)),
+    })
+    return normalized
+
+
+def _numeric_axis(values):
+    """Abscisses numériques d'une courbe (dates converties en nanosecondes)."""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.astype('datetime64[ns]').astype('int64').to_numpy(dtype=float), True
+    return values.to_numpy(dtype=float), False
+
+
+def _limit_categories(table, top, agg):
+    """Conserve les `top` premières catégories et regroupe les suivantes."""
+    if len(table) <= top:
+        return table
+    head, tail = table.iloc[:top - 1], table.iloc[top - 1:]
+    if agg in ('sum', 'count'):
+        other = tail.sum()
+    else:
+        return table.iloc[:top]  # Une moyenne ou un extremum ne se regroupe pas
+    other.name = OTHER_CATEGORY
+    return pd.concat([head, other.to_frame().T])
+
+
+def prepare_chart_data(df, spec):
+    """
+    Prépare les points d'un graphique (regroupement, tableau croisé ou sous-échantillonnage).
+
+    Args:
+        df (DataFrame): Données sources (feuille entière)
+        spec (dict): Spécification normalisée (voir normalize_spec)
+
+    Returns:
+        dict: {"labels" ou "series" par nom {x, y}, "source_points", "points", "x_is_date"}
+    """
+    chart_type = spec["type"]
+    x = spec.get("x")
+
+    if spec.get("pivot"):
+        # Tableau croisé : premières colonnes = libellés, suivantes = séries
+        from excel_processor import pivot_dataframe  # Import différé : excel_processor importe ce module
+        pivot = spec["pivot"]
+        result = pivot_dataframe(df, rows=pivot.get("rows"), columns=pivot.get("columns"),
+                                 values=pivot.get("values"), aggfunc=pivot.get("aggfunc", "sum"),
+                                 filters=pivot.get("filters"))
+        table = pd.DataFrame(result["data"], columns=result["headers"])
+        label_columns = result["rows"]
+        labels = table[label_columns].astype(str).agg(" / ".join, axis=1) if label_columns else table.index.astype(str)
+        table = table.drop(columns=label_columns).apply(pd.to_numeric, errors='coerce')
+        table.index = list(labels)
+        if chart_type != 'line':
+            table = table.sort_values(table.columns[0], ascending=False)
+        table = _limit_categories(table, spec["top"], spec["agg"])
+        return {"labels": [str(label) for label in table.index],
+                "series": {str(column): table[column].to_numpy(dtype=float) for column in table.columns},
+                "source_points": len(df), "points": len(table), "x_is_date": False}
+
+    missing = [column for column in ([x] if x else []) + spec["y"] if column not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes introuvables: {', '.join(map(str, missing))}")
+    y_columns = spec["y"] or [column for column in df.columns if column != x
+                              and pd.api.types.is_numeric_dtype(df[column].dtype)
+                              and not pd.api.types.is_bool_dtype(df[column].dtype)][:1]
+    x_values = df[x] if x else pd.Series(np.arange(len(df)), index=df.index)
+
+    if spec.get("freq") and x:
+        # Regroupement par période (jour, semaine, mois, trimestre)
+        dates = DateParser().parse(df[x], x)
+        if dates is None:
+            raise ValueError(f"La colonne '{x}' ne contient pas de dates reconnues")
+        x_values = dates.dt.to_period(FREQUENCIES[spec["freq"]])
+
+    numeric_x = (pd.api.types.is_numeric_dtype(x_values.dtype) or pd.api.types.is_datetime64_any_dtype(x_values.dtype)) \
+        and not pd.api.types.is_bool_dtype(x_values.dtype)
+    if chart_type == 'line' and numeric_x and not spec.get("freq"):
+        # Courbe sur les lignes brutes : tri par abscisse puis sous-échantillonnage de chaque série
+        x_axis, is_date = _numeric_axis(x_values)
+        order = np.argsort(x_axis, kind='stable')
+        series = {}
+        points = 0
+        for column in y_columns:
+            y_axis = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)[order]
+            sorted_x = x_axis[order]
+            valid = np.isfinite(y_axis) & np.isfinite(sorted_x)
+            sorted_x, y_axis = sorted_x[valid], y_axis[valid]
+            kept = lttb_indices(sorted_x, y_axis, spec["max_points"])
+            series[str(column)] = {"x": sorted_x[kept], "y": y_axis[kept]}
+            points = max(points, len(kept))
+        return {"series": series, "source_points": len(df), "points": points, "x_is_date": is_date}
+
+    # Barres, secteurs et courbes par catégorie ou période : regroupement
+    if not y_columns or spec["agg"] == 'count':
+        table = x_values.groupby(x_values, sort=False, observed=True).size().to_frame("count")
+    else:
+        frame = df[y_columns].apply(pd.to_numeric, errors='coerce')
+        table = frame.groupby(x_values.to_numpy(), sort=False).agg(spec["agg"])
+    if chart_type == 'line' or spec.get("freq") or numeric_x:
+        table = table.sort_index()
+    else:
+        table = table.sort_values(table.columns[0], ascending=False)
+    if chart_type != 'line':
+        table = _limit_categories(table, spec["top"], spec["agg"])
+    return {"labels": [str(label) for label in table.index],
+            "series": {str(column): table[column].to_numpy(dtype=float) for column in table.columns},
+            "source_points": len(df), "points": len(table), "x_is_date": False}
+
+
+def _render_job(chart, spec, output_path):
+    """
+    Dessine un graphique et l'enregistre (exécuté dans un processus du pool).
+
+    Returns:
+        dict: Chemin, taille et durée du rendu
+    """
+    started = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(spec["width"] / spec["dpi"], spec["height"] / spec["dpi"]), dpi=spec["dpi"])
+    try:
+        series = chart["series"]
+        if spec["type"] == 'pie':
+            name, values = next(iter(series.items()))
+            values = np.nan_to_num(values)
+            ax.pie(values, labels=chart["labels"], autopct='%1.1f%%', startangle=90, counterclock=False)
+            ax.axis('equal')
+        elif "labels" in chart:
+            positions = np.arange(len(chart["labels"]))
+            if spec["type"] == 'line':
+                for name, values in series.items():
+                    ax.plot(positions, values, marker='o' if len(positions) <= 50 else None, label=name)
+            else:
+                width = 0.8 / max(len(series), 1)
+                for position, (name, values) in enumerate(series.items()):
+                    ax.bar(positions + (position - (len(series) - 1) / 2) * width, values, width, label=name)
+            step = max(1, len(positions) // 30)
+            ax.set_xticks(positions[::step])
+            ax.set_xticklabels(chart["labels"][::step], rotation=45 if len(positions) > 6 else 0, ha='right'
+                               if len(positions) > 6 else 'center')
+        else:
+            for name, points in series.items():
+                x = points["x"].astype('datetime64[ns]') if chart["x_is_date"] else points["x"]
+                ax.plot(x, points["y"], linewidth=1, label=name)
+            if chart["x_is_date"]:
+                fig.autofmt_xdate()
+
+        if spec["type"] != 'pie':
+            if len(series) > 1:
+                ax.legend()
+            ax.grid(True, alpha=0.3)
+            if spec.get("x"):
+                ax.set_xlabel(str(spec["x"]))
+            if len(series) == 1:
+                ax.set_ylabel(next(iter(series)))
+        if spec.get("title"):
+            ax.set_title(spec["title"])
+        fig.tight_layout()
+
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        fig.savefig(tmp_path, format=spec["format"])
+        os.replace(tmp_path, output_path)
+    finally:
+        plt.close(fig)
+    return {"path": output_path, "bytes": os.path.getsize(output_path),
+            "render_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def _cache_key(source_digest, sheet_index, spec):
+    """Clé de cache d'une image : empreinte des données + feuille + spécification."""
+    payload = json.dumps({"source": source_digest, "sheet": sheet_index, "spec": spec}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _evict_cache(cache_dir):
+    """Supprime les images les moins récemment utilisées au-delà des limites du cache."""
+    try:
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+                   if name.endswith(IMAGE_FORMATS)]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        total = 0
+        for position, entry in enumerate(entries):
+            total += os.path.getsize(entry)
+            if position >= CHART_CACHE_MAX_ENTRIES or total > CHART_CACHE_MAX_BYTES:
+                os.remove(entry)
+    except OSError as e:
+        print(f"Impossible de nettoyer le cache des graphiques: {str(e)}", file=sys.stderr)
+
+
+def _finish(future, result):
+    """Complète un résultat de rendu une fois le travail du pool terminé."""
+    outcome = Future()
+    def done(job):
+        # Le champ interne _started ne doit jamais figurer dans le résultat, même en cas d'échec
+        started = result.pop("_started")
+        try:
+            rendered = job.result()
+        except Exception as e:
+            outcome.set_result(dict(result, error=f"Erreur lors du rendu du graphique: {str(e)}"))
+            return
+        result.update(rendered)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        outcome.set_result(result)
+        _evict_cache(os.path.dirname(rendered["path"]))
+    future.add_done_callback(done)
+    return outcome
+
+
+class ChartRenderer:
+    """
+    Service de rendu de graphiques : préparation locale, rendu dans un pool de processus, cache d'images.
+
+    Avec max_workers=0, le rendu a lieu dans le processus appelant.
+    """
+
+    def __init__(self, max_workers=None, use_cache=True, cache_dir=CHART_CACHE_DIR):
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers if max_workers is not None else min(2, os.cpu_count() or 1)
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None and self.max_workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _output_path(self, spec, source_digest, sheet_index):
+        return os.path.join(self.cache_dir, f"{_cache_key(source_digest, sheet_index, spec)}.{spec['format']}")
+
+    def _cached_result(self, spec, output_path, started):
+        """Résultat tiré du cache d'images, ou None si l'image n'a pas encore été rendue."""
+        if not self.use_cache or not os.path.exists(output_path):
+            return None
+        os.utime(output_path)  # Marquer l'entrée comme récemment utilisée
+        return {"type": spec["type"], "title": spec.get("title"), "format": spec["format"], "cached": True,
+                "path": output_path, "bytes": os.path.getsize(output_path),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    def lookup(self, spec, file_path, sheet_index=0):
+        """
+        Cherche un graphique dans le cache sans lire les données du fichier.
+
+        Args:
+            spec (dict): Spécification du graphique (voir normalize_spec)
+            file_path (str): Fichier d'origine des données
+            sheet_index (int|str): Feuille d'origine
+
+        Returns:
+            Future: Résultat du cache (voir submit), ou None s'il faut lire les données et rendre le graphique
+        """
+        started = time.perf_counter()
+        try:
+            spec = normalize_spec(spec)
+            cached = self._cached_result(spec, self._output_path(spec, file_digest(file_path), sheet_index), started)
+        except Exception:
+            return None  # Spécification invalide : l'erreur sera signalée par submit
+        if cached is None:
+            return None
+        outcome = Future()
+        outcome.set_result(cached)
+        return outcome
+
+    def submit(self, df, spec, file_path=None, sheet_index=0):
+        """
+        Prépare un graphique et lance son rendu sans attendre la fin.
+
+        Args:
+            df (DataFrame): Données sources
+            spec (dict): Spécification du graphique (voir normalize_spec)
+            file_path (str): Fichier d'origine des données (clé de cache par empreinte du contenu)
+            sheet_index (int|str): Feuille d'origine
+
+        Returns:
+            Future: Résultat {"type", "title", "format", "path", "cached", "points", "source_points", "elapsed_ms"}
+                    ou {"error"}
+        """
+        started = time.perf_counter()
+        outcome = Future()
+        try:
+            if not matplotlib_available():
+                raise RuntimeError("matplotlib n'est pas installé (pip install matplotlib)")
+            spec = normalize_spec(spec)
+            result = {"type": spec["type"], "title": spec.get("title"), "format": spec["format"], "cached": False}
+
+            source = file_digest(file_path) if file_path else \
+                format(int(pd.util.hash_pandas_object(df, index=True).sum()), 'x')
+            output_path = self._output_path(spec, source, sheet_index)
+            cached = self._cached_result(spec, output_path, started)
+            if cached is not None:
+                outcome.set_result(cached)
+                return outcome
+
+            chart = prepare_chart_data(df, spec)
+            result.update({"points": chart["points"], "source_points": chart["source_points"],
+                           "prepare_ms": round((time.perf_counter() - started) * 1000, 1), "_started": started})
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except Exception as e:
+            outcome.set_result({"spec": spec, "error": str(e)})
+            return outcome
+
+        executor = self._executor()
+        if executor is None:
+            job = Future()
+            try:
+                job.set_result(_render_job(chart, spec, output_path))
+            except Exception as e:
+                job.set_exception(e)
+        else:
+            job = executor.submit(_render_job, chart, spec, output_path)
+        return _finish(job, result)
+
+    def render(self, df, specs, file_path=None, sheet_index=0):
+        """
+        Rend plusieurs graphiques en parallèle et attend les résultats.
+
+        Returns:
+            list: Un résultat par spécification, dans l'ordre
+        """
+        futures = [self.submit(df, spec, file_path, sheet_index) for spec in specs]
+        return [future.result() for future in futures]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def suggest_charts(df, limit=3):
+    """
+    Propose des graphiques adaptés aux colonnes d'un DataFrame (graphiques automatiques).
+
+    Args:
+        df (DataFrame): Données
+        limit (int): Nombre maximal de graphiques
+
+    Returns:
+        list: Spécifications de graphiques
+    """
+    numeric = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column].dtype)
+               and not pd.api.types.is_bool_dtype(df[column].dtype)]
+    categories = [column for column in df.columns if column not in numeric
+                  and not pd.api.types.is_datetime64_any_dtype(df[column].dtype)
+                  and 1 < df[column].nunique() <= 50]
+    specs = []
+    dates = find_date_columns(df.head(1000))
+    if dates and numeric:
+        specs.append({"type": "line", "x": dates[0], "y": numeric[0], "freq": "M", "agg": "sum",
+                      "title": f"{numeric[0]} par mois"})
+    if categories and numeric:
+        specs.append({"type": "bar", "x": categories[0], "y": numeric[0], "agg": "sum",
+                      "title": f"{numeric[0]} par {categories[0]}"})
+    small = [column for column in categories if df[column].nunique() <= MAX_PIE_CATEGORIES]
+    if small:
+        specs.append({"type": "pie", "x": small[0], "agg": "count", "title": f"Répartition par {small[0]}"})
+    return specs[:limit]
+
+
+def benchmark_charts(points=1000000, repeat=3):
+    """
+    Mesure la préparation et le rendu d'une courbe de `points` points (sans cache).
+
+    Returns:
+        dict: Durées médianes (ms) de préparation, de rendu et totale
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"t": np.arange(points, dtype=float), "valeur": rng.standard_normal(points).cumsum()})
+    spec = normalize_spec({"type": "line", "x": "t", "y": "valeur"})
+    prepare, render = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(repeat):
+            started = time.perf_counter()
+            chart = prepare_chart_data(df, spec)
+            prepared = time.perf_counter()
+            _render_job(chart, spec, os.path.join(directory, f"bench_{run}.png"))
+            prepare.append((prepared - started) * 1000)
+            render.append((time.perf_counter() - prepared) * 1000)
+    return {
+        "points": points,
+        "rendered_points": chart["points"],
+        "prepare_ms": round(float(np.median(prepare)), 1),
+        "render_ms": round(float(np.median(render)), 1),
+        "total_ms": round(float(np.median(np.add(prepare, render))), 1),
+    }
+
+
+def load_chart_specs(argument, df):
+    """Spécifications depuis un JSON, un fichier (@chemin) ou 'auto'."""
+    if argument in (None, "auto"):
+        return suggest_charts(df)
+    if argument.startswith("@"):
+        with open(argument[1:], 'r', encoding='utf-8') as f:
+            specs = json.load(f)
+    else:
+        specs = json.loads(argument)
+    return specs if isinstance(specs, list) else [specs]
+
+
+if __name__ == "__main__":
+    from excel_engines import read_sheet
+    from json_output import dumps
+
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        print(dumps(benchmark_charts(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)))
+        sys.exit(0)
+
+    if len(sys.argv) < 2:
+        print("Usage: python chart_renderer.py <file_path> [auto|spec_json|@spec_file] [sheet_index] [--no-cache]\n"
+              "       python chart_renderer.py benchmark [points]", file=sys.stderr)
+        sys.exit(1)
+
+    use_cache = "--no-cache" not in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--no-cache"]
+    try:
+        sheet_index = int(args[2]) if len(args) > 2 else 0
+        frame, _ = read_sheet(args[0], sheet_index)
+        chart_specs = load_chart_specs(args[1] if len(args) > 1 else None, frame)
+        with ChartRenderer(use_cache=use_cache) as renderer:
+            print(dumps({"charts": renderer.render(frame, chart_specs, args[0], sheet_index)}))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CSV Ingest
+----------
+Lecture des fichiers CSV pour les scripts Excel de l'application ABIA.
+
+- Détection de l'encodage (BOM, UTF-8, Windows-1252) et du dialecte (séparateur,
+  guillemets, séparateur décimal) sur un court préfixe du fichier, mise en cache
+  par fichier (chemin, taille, date de modification)
+- Lecture multi-thread via pyarrow lorsqu'il est installé, sinon moteur C de pandas
+- Projection de colonnes (usecols) et types imposés (dtype)
+- Itération par blocs pour les fichiers plus volumineux que la mémoire
+"""
+
+import csv
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Taille du préfixe analysé pour détecter l'encodage et le dialecte
+SNIFF_BYTES = 64 * 1024
+
+# Séparateurs reconnus (le point-virgule est la norme des exports Excel français)
+DELIMITERS = (',', ';', '\t', '|')
+
+# Encodages essayés dans l'ordre lorsque le fichier n'a pas de BOM
+FALLBACK_ENCODINGS = ('utf-8', 'cp1252', 'latin-1')
+
+_BOMS = (
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+)
+
+DIALECT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'abia_csv_dialects')
+DIALECT_CACHE_MAX_ENTRIES = 500
+_dialect_memory_cache = {}
+
+# Nom de feuille attribué aux fichiers CSV par les scripts Excel
+CSV_SHEET_NAME = "CSV Data"
+
+# Taille de bloc par défaut de l'itération (lignes)
+DEFAULT_CHUNK_ROWS = 100000
+
+_DECIMAL_COMMA_RE = re.compile(r'(?<![\d.,])-?\d+,\d+(?![\d.,])')
+_DECIMAL_POINT_RE = re.compile(r'(?<![\d.,])-?\d+\.\d+(?![\d.,])')
+
+# Valeurs converties en nombres par le lecteur pyarrow (colonnes sans type imposé)
+_INTEGER_PATTERN = r'^\s*[-+]?\d+\s*$'
+_FLOAT_PATTERN = r'^\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s*$'
+
+
+def pyarrow_available():
+    """Indique si le lecteur CSV multi-thread de pyarrow est utilisable."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _detect_encoding(prefix):
+    """Détermine l'encodage d'un préfixe d'octets."""
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            prefix.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # Un caractère multi-octets peut être coupé par la limite du préfixe
+            if encoding == 'utf-8' and e.start >= len(prefix) - 3 and e.reason == 'unexpected end of data':
+                return encoding
+    return 'latin-1'
+
+
+def _detect_dialect(text):
+    """Détermine séparateur, guillemets et séparateur décimal d'un extrait de texte."""
+    lines = [line for line in text.splitlines()[:200] if line.strip()]
+    # La dernière ligne peut être tronquée par la limite du préfixe
+    sample = "\n".join(lines[:-1] if len(lines) > 2 else lines)
+
+    delimiter = ','
+    quotechar = '"'
+    try:
+        sniffed = csv.Sniffer().sniff(sample, delimiters=''.join(DELIMITERS))
+        delimiter = sniffed.delimiter
+        quotechar = sniffed.quotechar or '"'
+    except csv.Error:
+        # Repli : séparateur le plus fréquent de façon régulière sur les premières lignes
+        counts = {d: [line.count(d) for line in lines[:20]] for d in DELIMITERS}
+        regular = {d: min(c) for d, c in counts.items() if c and min(c) > 0}
+        if regular:
+            delimiter = max(regular, key=regular.get)
+
+    decimal = '.'
+    if delimiter != ',':
+        fields = [field for line in lines[1:] for field in line.split(delimiter)]
+        comma = sum(1 for field in fields if _DECIMAL_COMMA_RE.fullmatch(field.strip().strip(quotechar)))
+        point = sum(1 for field in fields if _DECIMAL_POINT_RE.fullmatch(field.strip().strip(quotechar)))
+        if comma > point:
+            decimal = ','
+    return {"delimiter": delimiter, "quotechar": quotechar, "decimal": decimal}
+
+
+def sniff_bytes(prefix):
+    """
+    Détecte l'encodage et le dialecte d'un début de fichier CSV.
+
+    Args:
+        prefix (bytes): Premiers octets du fichier
+
+    Returns:
+        dict: {"encoding", "delimiter", "quotechar", "decimal"}
+    """
+    encoding = _detect_encoding(prefix)
+    text = prefix.decode(encoding, errors='replace')
+    dialect = _detect_dialect(text.lstrip('\ufeff'))
+    dialect["encoding"] = encoding
+    return dialect
+
+
+def _dialect_cache_key(file_path):
+    """Clé de cache : chemin absolu, taille et date de modification du fichier."""
+    stat = os.stat(file_path)
+    raw = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _read_dialect_cache(key):
+    """Lit un dialecte en cache (mémoire puis disque)."""
+    if key in _dialect_memory_cache:
+        return _dialect_memory_cache[key]
+    try:
+        with open(os.path.join(DIALECT_CACHE_DIR, f"{key}.json"), 'r', encoding='utf-8') as f:
+            dialect = json.load(f)
+        _dialect_memory_cache[key] = dialect
+        return dialect
+    except (OSError, ValueError):
+        return None
+
+
+def _write_dialect_cache(key, dialect):
+    """Enregistre un dialecte en cache et évince les entrées les plus anciennes."""
+    _dialect_memory_cache[key] = dialect
+    try:
+        os.makedirs(DIALECT_CACHE_DIR, exist_ok=True)
+        tmp_file = os.path.join(DIALECT_CACHE_DIR, f"{key}.json.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(dialect, f)
+        os.replace(tmp_file, os.path.join(DIALECT_CACHE_DIR, f"{key}.json"))
+
+        entries = [os.path.join(DIALECT_CACHE_DIR, name) for name in os.listdir(DIALECT_CACHE_DIR) if name.endswith('.json')]
+        if len(entries) > DIALECT_CACHE_MAX_ENTRIES:
+            entries.sort(key=os.path.getmtime)
+            for old_entry in entries[:len(entries) - DIALECT_CACHE_MAX_ENTRIES]:
+                os.remove(old_entry)
+    except OSError as e:
+        print(f"Impossible d'écrire le cache du dialecte CSV: {str(e)}", file=sys.stderr)
+
+
+def sniff_csv(source, use_cache=True):
+    """
+    Détecte l'encodage et le dialecte d'un fichier CSV à partir de son préfixe.
+
+    Args:
+        source (str|file): Chemin du fichier ou flux binaire (non mis en cache)
+        use_cache (bool): Utiliser le cache par fichier
+
+    Returns:
+        dict: {"encoding", "delimiter", "quotechar", "decimal"}
+    """
+    if hasattr(source, 'read'):
+        position = source.tell()
+        prefix = source.read(SNIFF_BYTES)
+        source.seek(position)
+        return sniff_bytes(prefix)
+
+    key = _dialect_cache_key(source) if use_cache else None
+    if key:
+        cached = _read_dialect_cache(key)
+        if cached is not None:
+            return cached
+    with open(source, 'rb') as f:
+        dialect = sniff_bytes(f.read(SNIFF_BYTES))
+    if key:
+        _write_dialect_cache(key, dialect)
+    return dialect
+
+
+def _select_parser(nrows, dialect, engine):
+    """Choisit le moteur pandas : pyarrow (multi-thread) si les options le permettent."""
+    if engine:
+        return engine
+    # pyarrow ne gère ni nrows ni la virgule décimale
+    if pyarrow_available() and nrows is None and dialect["decimal"] == '.' and not dialect["encoding"].startswith('utf-16'):
+        return 'pyarrow'
+    return 'c'
+
+
+def read_csv(source, nrows=None, usecols=None, dtype=None, dialect=None, engine=None, **kwargs):
+    """
+    Lit un fichier CSV avec l'encodage et le dialecte détectés.
+
+    Args:
+        source (str|file): Chemin du fichier ou flux binaire
+        nrows (int): Nombre maximal de lignes (None pour toutes)
+        usecols (list): Colonnes à charger (None pour toutes)
+        dtype (dict|str): Types imposés par colonne
+        dialect (dict): Dialecte déjà détecté (voir sniff_csv)
+        engine (str): Moteur pandas imposé ('pyarrow', 'c' ou 'python')
+        **kwargs: Options supplémentaires transmises à pandas.read_csv
+
+    Returns:
+        DataFrame: Données lues
+    """
+    dialect = dialect or sniff_csv(source)
+    parser = _select_parser(nrows, dialect, engine)
+    options = {
+        "sep": dialect["delimiter"],
+        "quotechar": dialect["quotechar"],
+        "encoding": dialect["encoding"],
+        "usecols": usecols,
+        "dtype": dtype,
+        "engine": parser,
+    }
+    if parser != 'pyarrow':
+        options["decimal"] = dialect["decimal"]
+        options["nrows"] = nrows
+        if dialect["encoding"] == 'latin-1':
+            options["encoding_errors"] = 'replace'
+    options.update(kwargs)
+    return pd.read_csv(source, **options)
+
+
+def _csv_header(file_path, dialect):
+    """Noms des colonnes (première ligne) d'un fichier CSV."""
+    with open(file_path, 'r', encoding=dialect["encoding"], errors='replace', newline='') as f:
+        return next(csv.reader(f, delimiter=dialect["delimiter"], quotechar=dialect["quotechar"]), [])
+
+
+def _arrow_type(dtype):
+    """Type pyarrow correspondant à un type pandas/numpy (texte à défaut d'équivalent direct)."""
+    import numpy as np
+    import pyarrow as pa
+
+    try:
+        numpy_dtype = np.dtype(dtype)
+        if numpy_dtype.kind not in ('O', 'U', 'S'):
+            return pa.from_numpy_dtype(numpy_dtype)
+    except (TypeError, pa.ArrowNotImplementedError):
+        pass
+    return pa.string()
+
+
+def _infer_numeric(batch, columns):
+    """
+    Convertit en nombres (entiers sinon flottants) les colonnes texte qui s'y prêtent,
+    bloc par bloc comme le lecteur par blocs de pandas.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = []
+    for name, array in zip(batch.schema.names, batch.columns):
+        if name in columns:
+            # Vérification par expression régulière : un cast qui échoue coûte bien plus cher
+            for pattern, target in ((_INTEGER_PATTERN, pa.int64()), (_FLOAT_PATTERN, pa.float64())):
+                if pc.all(pc.match_substring_regex(array, pattern)).as_py() is not False:
+                    try:
+                        array = pc.cast(array, target)
+                        break
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                        pass
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def _iter_pyarrow_batches(file_path, dialect, usecols, dtype, chunk_rows):
+    """
+    Itère sur les blocs d'un CSV avec le lecteur en flux de pyarrow.
+
+    Ce lecteur fige le type de chaque colonne sur le premier bloc : une valeur non
+    conforme plus loin (« N/A » dans une colonne de montants, code devenu
+    alphanumérique) interromprait la lecture. Les types imposés (dtype) sont donc
+    transmis à pyarrow, les autres colonnes lues comme texte puis converties en
+    nombres bloc par bloc lorsque c'est possible.
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    columns = [column for column in _csv_header(file_path, dialect) if not usecols or column in usecols]
+    if isinstance(dtype, dict):
+        imposed = {column: dtype[column] for column in columns if column in dtype}
+    else:
+        imposed = {column: dtype for column in columns} if dtype else {}
+    column_types = {column: _arrow_type(imposed[column]) if column in imposed else pa.string() for column in columns}
+    inferred = {column for column in columns if column not in imposed}
+
+    # Taille de bloc estimée à partir d'une longueur de ligne de 100 octets
+    read_options = pa_csv.ReadOptions(encoding=dialect["encoding"].replace('-sig', ''),
+                                      block_size=max(1 << 20, chunk_rows * 100))
+    parse_options = pa_csv.ParseOptions(delimiter=dialect["delimiter"], quote_char=dialect["quotechar"])
+    convert_options = pa_csv.ConvertOptions(include_columns=list(usecols) if usecols else None,
+                                            column_types=column_types, strings_can_be_null=True)
+    with pa_csv.open_csv(file_path, read_options=read_options, parse_options=parse_options,
+                         convert_options=convert_options) as reader:
+        for batch in reader:
+            df = _infer_numeric(batch, inferred).to_pandas()
+            yield df.astype(imposed) if imposed else df
+
+
+def iter_csv_chunks(file_path, chunk_rows=DEFAULT_CHUNK_ROWS, usecols=None, dtype=None, dialect=None, engine=None):
+    """
+    Parcourt un fichier CSV par blocs, sans le charger entièrement en mémoire.
+
+    Args:
+        file_path (str): Chemin du fichier
+        chunk_rows (int): Nombre de lignes par bloc (approximatif avec pyarrow)
+        usecols (list): Colonnes à charger (None pour toutes)
+        dtype (dict|str): Types imposés par colonne
+        dialect (dict): Dialecte déjà détecté (voir sniff_csv)
+        engine (str): Moteur imposé ('pyarrow' ou 'c')
+
+    Yields:
+        DataFrame: Blocs successifs
+    """
+    dialect = dialect or sniff_csv(file_path)
+    parser = _select_parser(None, dialect, engine)
+    if parser == 'pyarrow':
+        batches = _iter_pyarrow_batches(file_path, dialect, usecols, dtype, chunk_rows)
+        try:
+            first = next(batches, None)
+        except Exception as e:
+            # Échec avant tout bloc émis (en-tête, encodage) : repli sur le moteur C de pandas
+            print(f"Lecture pyarrow de '{file_path}' impossible ({str(e)}), repli sur le moteur C",
+                  file=sys.stderr)
+            parser = 'c'
+        else:
+            if first is not None:
+                yield first
+                yield from batches
+            return
+    with read_csv(file_path, usecols=usecols, dtype=dtype, dialect=dialect, engine=parser,
+                  chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def _generate_csv(path, rows, delimiter=';', decimal=','):
+    """Génère un CSV de test au format d'export comptable (séparateur et décimale français)."""
+    labels = ("Ventes", "Achats", "Banque", "Caisse")
+    with open(path, 'w', encoding='cp1252', newline='') as f:
+        f.write(delimiter.join(("Date", "Journal", "Libellé", "Débit", "Crédit")) + "\n")
+        for r in range(rows):
+            amount = f"{(r * 7.31) % 10000:.2f}".replace('.', decimal)
+            f.write(delimiter.join((f"2024-{r % 12 + 1:02d}-{r % 28 + 1:02d}", labels[r % 4],
+                                    f"Écriture {r}", amount, "0")) + "\n")
+
+
+def benchmark_csv(rows=1000000, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Compare la lecture naïve, la lecture avec détection et l'itération par blocs.
+
+    Args:
+        rows (int): Nombre de lignes du fichier généré
+        chunk_rows (int): Taille des blocs pour l'itération
+
+    Returns:
+        list: Résultats {"mode", "seconds", "rows_per_sec"}
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="abia_csv_bench_") as tmp_dir:
+        path = os.path.join(tmp_dir, "ledger.csv")
+        _generate_csv(path, rows)
+
+        def measure(mode, func):
+            started = time.perf_counter()
+            count = func()
+            elapsed = time.perf_counter() - started
+            results.append({"mode": mode, "rows": count, "seconds": round(elapsed, 4),
+                            "rows_per_sec": int(count / elapsed) if elapsed > 0 else None})
+
+        measure("read_csv", lambda: len(read_csv(path)))
+        measure("read_csv_usecols", lambda: len(read_csv(path, usecols=["Journal", "Débit"])))
+        measure("iter_csv_chunks", lambda: sum(len(chunk) for chunk in iter_csv_chunks(path, chunk_rows)))
+    return results
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('sniff', 'read', 'benchmark'):
+        print("Usage: python csv_ingest.py sniff <file_path> | read <file_path> [nrows] | benchmark [rows]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'benchmark':
+        row_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+        for entry in benchmark_csv(row_count):
+            print(f"{entry['mode']:18} {entry['rows']:>9} lignes  {entry['seconds']:>8.4f} s  "
+                  f"{entry['rows_per_sec'] or 0:>10} lignes/s")
+        sys.exit(0)
+
+    try:
+        path = sys.argv[2]
+        if command == 'sniff':
+            print(dumps(dict(sniff_csv(path), pyarrow=pyarrow_available())))
+        else:
+            limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+            df = read_csv(path, nrows=limit)
+            print(dumps({"columns": [str(c) for c in df.columns], "data": df}))
+    except (IndexError, OSError, ValueError) as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
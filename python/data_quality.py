@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Data Quality
+------------
+Contrôle qualité local et vectorisé d'une feuille, en mémoire ou par blocs.
+Utilisé par excel_processor.py pour les recommandations du rapport structuré.
+
+- Valeurs extrêmes : méthode IQR (hors [Q1 - k·IQR ; Q3 + k·IQR]) et z-score
+- Lignes en double (empreinte par ligne)
+- Colonnes aux types mélangés (nombres et textes, dates et textes...)
+- Valeurs manquantes : par colonne, lignes vides et motifs de cellules vides
+- Colonnes constantes ou entièrement vides
+
+Les lignes signalées sont des numéros de ligne de la feuille (en-tête en ligne 1).
+"""
+
+import math
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from excel_engines import iter_sheet_chunks
+from sampling import ColumnAggregator
+
+# Coefficient de la méthode IQR et seuil du z-score
+IQR_FACTOR = 1.5
+ZSCORE_THRESHOLD = 3.0
+
+# Nombre maximal de lignes listées par anomalie (les effectifs restent exacts)
+MAX_REPORTED_ROWS = 100
+
+# Nombre maximal de motifs de valeurs manquantes rapportés
+MAX_MISSING_PATTERNS = 10
+
+# Valeurs conservées par colonne numérique pour les quartiles : en deçà, les
+# quartiles sont exacts et les valeurs extrêmes sont repérées sans relire la feuille
+QUANTILE_SAMPLE_SIZE = 200000
+
+DEFAULT_CHUNK_ROWS = 50000
+
+# Décalage entre la position d'une ligne de données et son numéro dans la feuille
+FIRST_DATA_ROW = 2
+
+# Libellés des types de valeurs (colonnes aux types mélangés)
+_INFERRED_KINDS = {
+    'string': 'texte',
+    'bytes': 'texte',
+    'integer': 'nombre',
+    'floating': 'nombre',
+    'mixed-integer-float': 'nombre',
+    'decimal': 'nombre',
+    'boolean': 'booléen',
+    'datetime': 'date',
+    'datetime64': 'date',
+    'date': 'date',
+    'time': 'heure',
+    'timedelta': 'durée',
+    'timedelta64': 'durée',
+}
+
+
+def _value_kind(value):
+    """Libellé du type d'une valeur Python."""
+    if isinstance(value, (bool, np.bool_)):
+        return 'booléen'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return 'nombre'
+    if isinstance(value, str):
+        return 'texte'
+    if isinstance(value, (pd.Timestamp, np.datetime64)) or hasattr(value, 'isoformat'):
+        return 'date'
+    return type(value).__name__
+
+
+def _column_kinds(values):
+    """
+    Compte les types des valeurs non nulles d'un bloc de colonne.
+
+    Returns:
+        tuple: (Counter {type: effectif}, libellé du type s'il est unique sinon Series des types par ligne)
+    """
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        kind = 'booléen'
+    elif pd.api.types.is_numeric_dtype(dtype):
+        kind = 'nombre'
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        kind = 'date'
+    elif not pd.api.types.is_object_dtype(dtype):
+        kind = 'texte'
+    else:
+        # Colonne objet : type unique détecté sans boucle Python dans la plupart des cas
+        kind = _INFERRED_KINDS.get(pd.api.types.infer_dtype(values, skipna=True))
+    if kind is not None:
+        return Counter({kind: len(values)}), kind
+    kinds = values.map(_value_kind)
+    return Counter(kinds.value_counts().to_dict()), kinds
+
+
+def _numeric_values(series, kinds):
+    """Valeurs numériques d'un bloc de colonne (None si la colonne n'en contient pas)."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return None
+    if pd.api.types.is_numeric_dtype(dtype):
+        return series.to_numpy(dtype=float, na_value=np.nan)
+    if isinstance(kinds, str):
+        # Colonne objet ne contenant que des nombres
+        return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float) if kinds == 'nombre' else None
+    if (kinds == 'nombre').any():
+        # Type mélangé : seules les cellules réellement numériques sont retenues
+        return pd.to_numeric(series.where(kinds == 'nombre'), errors='coerce').to_numpy(dtype=float)
+    return None
+
+
+def _limited(rows, limit):
+    """Liste de numéros de ligne bornée, avec indicateur de troncature."""
+    return {"rows": [int(row) for row in rows[:limit]], "truncated": len(rows) > limit}
+
+
+class _ValueReservoir:
+    """
+    Réservoir de valeurs numériques et de leurs positions (algorithme R vectorisé).
+    Tant que moins de `size` valeurs ont été vues, il les contient toutes.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        # Capacité augmentée au fil des ajouts : les petites colonnes restent petites
+        self.values = np.empty(0, dtype=float)
+        self.positions = np.empty(0, dtype=np.int64)
+
+    @property
+    def complete(self):
+        """Vrai si toutes les valeurs vues sont conservées."""
+        return self.seen <= self.size
+
+    def add(self, values, positions):
+        count = len(values)
+        if count == 0:
+            return
+        needed = min(self.size, self.seen + count)
+        if needed > len(self.values):
+            capacity = min(self.size, max(needed, 2 * len(self.values)))
+            self.values = np.resize(self.values, capacity)
+            self.positions = np.resize(self.positions, capacity)
+        ranks = np.arange(self.seen, self.seen + count)
+        slots = np.where(ranks < self.size, ranks, self.rng.integers(0, ranks + 1))
+        selected = slots < self.size
+        # Affectation dans l'ordre : le dernier remplacement d'un emplacement l'emporte
+        self.values[slots[selected]] = values[selected]
+        self.positions[slots[selected]] = positions[selected]
+        self.seen += count
+
+    def content(self):
+        kept = min(self.seen, self.size)
+        return self.values[:kept], self.positions[:kept]
+
+
+class _ColumnQuality:
+    """Indicateurs d'une colonne accumulés bloc par bloc."""
+
+    def __init__(self, quantile_sample, rng, max_rows):
+        self.max_rows = max_rows
+        self.nulls = 0
+        self.kinds = Counter()
+        self.kind_rows = {}  # type -> premières positions des lignes de ce type
+        self.first_value = None
+        self.varies = False
+        self.moments = ColumnAggregator()
+        self.reservoir = _ValueReservoir(quantile_sample, rng)
+
+    def update(self, series, offset):
+        null_mask = series.isna().to_numpy()
+        self.nulls += int(null_mask.sum())
+        values = series[~null_mask]
+        if len(values) == 0:
+            return
+        positions = offset + np.flatnonzero(~null_mask)
+
+        chunk_kinds, kinds = _column_kinds(values)
+        self.kinds.update(chunk_kinds)
+        if isinstance(kinds, str):
+            if len(self.kind_rows.setdefault(kinds, [])) < self.max_rows:
+                self.kind_rows[kinds].extend(positions[:self.max_rows].tolist())
+        else:
+            for kind, index in kinds.groupby(kinds.to_numpy(), sort=False).indices.items():
+                if len(self.kind_rows.setdefault(kind, [])) < self.max_rows:
+                    self.kind_rows[kind].extend(positions[index[:self.max_rows]].tolist())
+
+        if not self.varies:
+            # Colonne constante tant qu'une seule valeur distincte a été vue
+            distinct = values.drop_duplicates()
+            if self.first_value is None:
+                self.first_value = distinct.iloc[0]
+            self.varies = len(distinct) > 1 or str(distinct.iloc[0]) != str(self.first_value)
+
+        numeric = _numeric_values(values, kinds)
+        if numeric is not None:
+            finite = np.isfinite(numeric)
+            numeric, numeric_positions = numeric[finite], positions[finite]
+            if len(numeric):
+                self.moments.update(pd.Series(numeric))
+                self.reservoir.add(numeric, numeric_positions)
+
+
+class _MissingPatterns:
+    """Motifs de cellules vides (combinaisons de colonnes vides sur une même ligne)."""
+
+    def __init__(self, columns, max_rows):
+        self.columns = columns
+        self.max_rows = max_rows
+        self.counts = Counter()
+        self.rows_with_missing = 0
+        self.empty_rows = []
+        self.empty_count = 0
+
+    def update(self, chunk, offset):
+        mask = chunk.isna().to_numpy()
+        with_missing = mask.any(axis=1)
+        self.rows_with_missing += int(with_missing.sum())
+        if not with_missing.any():
+            return
+        empty = np.flatnonzero(mask.all(axis=1))
+        self.empty_count += len(empty)
+        if len(self.empty_rows) < self.max_rows:
+            self.empty_rows.extend((offset + empty[:self.max_rows]).tolist())
+
+        # Une empreinte par motif, puis un effectif par empreinte
+        partial = mask[with_missing]
+        codes = pd.util.hash_pandas_object(pd.DataFrame(partial), index=False).to_numpy()
+        unique_codes, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        for row, count in zip(first, counts):
+            pattern = tuple(self.columns[j] for j in np.flatnonzero(partial[row]))
+            self.counts[pattern] += int(count)
+
+
+def _outlier_bounds(column, iqr_factor):
+    """Bornes IQR et z-score d'une colonne numérique (None si non applicable)."""
+    moments = column.moments
+    if moments.numeric_count < 3:
+        return None
+    values, _ = column.reservoir.content()
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    std = math.sqrt(moments.m2 / (moments.numeric_count - 1))
+    return {
+        # Un écart interquartile nul signalerait toute valeur différente de la médiane
+        "iqr": (q1 - iqr_factor * iqr, q3 + iqr_factor * iqr, float(q1), float(q3)) if iqr > 0 else None,
+        "zscore": (moments.mean, std) if std > 0 else None,
+    }
+
+
+def _flag_outliers(values, positions, bounds, z_threshold):
+    """Positions des valeurs extrêmes d'un bloc selon chaque méthode."""
+    flagged = {}
+    if bounds["iqr"] is not None:
+        lower, upper = bounds["iqr"][:2]
+        outside = (values < lower) | (values > upper)
+        flagged["iqr"] = (positions[outside], values[outside])
+    if bounds["zscore"] is not None:
+        mean, std = bounds["zscore"]
+        outside = np.abs(values - mean) / std > z_threshold
+        flagged["zscore"] = (positions[outside], values[outside])
+    return flagged
+
+
+def scan_chunks(chunk_source, iqr_factor=IQR_FACTOR, z_threshold=ZSCORE_THRESHOLD, max_rows=MAX_REPORTED_ROWS,
+                quantile_sample=QUANTILE_SAMPLE_SIZE, first_row=FIRST_DATA_ROW, seed=0, row_numbers=None):
+    """
+    Contrôle la qualité d'une feuille lue par blocs, en mémoire bornée.
+
+    Une seule passe suffit lorsque chaque colonne numérique compte au plus
+    `quantile_sample` valeurs ; au-delà, les quartiles sont estimés sur un
+    réservoir et une seconde passe repère les valeurs extrêmes.
+
+    Args:
+        chunk_source (callable): Fonction sans argument renvoyant un itérable de blocs (DataFrames)
+        iqr_factor (float): Coefficient k de la méthode IQR
+        z_threshold (float): Seuil du z-score
+        max_rows (int): Nombre maximal de lignes listées par anomalie
+        quantile_sample (int): Taille du réservoir de valeurs par colonne numérique
+        first_row (int): Numéro de ligne de la première ligne de données
+        seed (int): Graine du générateur aléatoire (réservoirs)
+        row_numbers (list): Numéro dans la feuille de chaque ligne lue, lorsque les lignes
+            ne sont pas consécutives (échantillon) ; sinon position + first_row
+
+    Returns:
+        dict: Rapport qualité (doublons, valeurs manquantes, types mélangés, colonnes constantes, valeurs extrêmes)
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    if row_numbers is not None:
+        row_numbers = np.asarray(row_numbers, dtype=np.int64)
+
+    def sheet_rows(positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        return positions + first_row if row_numbers is None else row_numbers[positions]
+
+    columns = None
+    quality = {}
+    patterns = None
+    row_hashes = []
+    offset = 0
+
+    for chunk in chunk_source():
+        if columns is None:
+            columns = [str(column) for column in chunk.columns]
+            quality = {column: _ColumnQuality(quantile_sample, rng, max_rows) for column in columns}
+            patterns = _MissingPatterns(columns, max_rows)
+        for position, column in enumerate(columns):
+            quality[column].update(chunk.iloc[:, position], offset)
+        patterns.update(chunk, offset)
+        row_hashes.append(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        offset += len(chunk)
+
+    columns = columns or []
+    rows_total = offset
+    report = {"rows": rows_total, "columns": len(columns)}
+
+    # Doublons : lignes identiques à une ligne précédente
+    hashes = pd.Series(np.concatenate(row_hashes) if row_hashes else np.empty(0, dtype=np.uint64))
+    duplicated = np.flatnonzero(hashes.duplicated(keep='first').to_numpy())
+    report["duplicates"] = {"count": len(duplicated), **_limited(sheet_rows(duplicated), max_rows)}
+
+    # Valeurs manquantes
+    missing_columns = {
+        column: {"count": quality[column].nulls, "ratio": round(quality[column].nulls / rows_total, 4)}
+        for column in columns if quality[column].nulls
+    }
+    report["missing"] = {
+        "cells": sum(entry["count"] for entry in missing_columns.values()),
+        "rows_with_missing": patterns.rows_with_missing if patterns else 0,
+        "columns": missing_columns,
+        "empty_rows": {"count": patterns.empty_count if patterns else 0,
+                       **_limited(sheet_rows(patterns.empty_rows if patterns else []), max_rows)},
+        "patterns": [{"columns": list(pattern), "count": count}
+                     for pattern, count in (patterns.counts.most_common(MAX_MISSING_PATTERNS) if patterns else [])],
+    }
+
+    # Types mélangés : lignes des types minoritaires
+    mixed = {}
+    for column in columns:
+        kinds = quality[column].kinds
+        if len(kinds) > 1:
+            majority = kinds.most_common(1)[0][0]
+            minority_rows = sorted(row for kind, rows in quality[column].kind_rows.items()
+                                   if kind != majority for row in rows)
+            mixed[column] = {"types": dict(kinds.most_common()), "majority": majority,
+                             **_limited(sheet_rows(minority_rows), max_rows)}
+    report["mixed_types"] = mixed
+
+    # Colonnes constantes ou vides
+    constant = {}
+    if rows_total > 1:
+        for column in columns:
+            entry = quality[column]
+            if entry.nulls == rows_total:
+                constant[column] = {"value": None, "empty": True}
+            elif not entry.varies:
+                constant[column] = {"value": entry.first_value, "empty": False,
+                                    "null_count": entry.nulls}
+    report["constant_columns"] = constant
+
+    # Valeurs extrêmes
+    bounds = {column: _outlier_bounds(quality[column], iqr_factor) for column in columns
+              if column not in constant}
+    bounds = {column: value for column, value in bounds.items() if value and (value["iqr"] or value["zscore"])}
+    flagged = {column: {"iqr": [[], []], "zscore": [[], []]} for column in bounds}
+    complete = all(quality[column].reservoir.complete for column in bounds)
+    if complete:
+        for column, column_bounds in bounds.items():
+            values, positions = quality[column].reservoir.content()
+            for method, (found, found_values) in _flag_outliers(values, positions, column_bounds, z_threshold).items():
+                flagged[column][method] = [found, found_values]
+    elif bounds:
+        # Seconde passe : bornes connues, repérage bloc par bloc
+        offset = 0
+        for chunk in chunk_source():
+            for column, column_bounds in bounds.items():
+                series = chunk.iloc[:, columns.index(column)]
+                values = _numeric_values(series, _column_kinds(series)[1])
+                if values is None:
+                    continue
+                positions = offset + np.arange(len(series))
+                finite = np.isfinite(values)
+                for method, (found, found_values) in _flag_outliers(values[finite], positions[finite],
+                                                                    column_bounds, z_threshold).items():
+                    flagged[column][method][0] = np.concatenate([flagged[column][method][0], found])
+                    flagged[column][method][1] = np.concatenate([flagged[column][method][1], found_values])
+            offset += len(chunk)
+
+    outliers = {}
+    for column, column_bounds in bounds.items():
+        entry = {}
+        for method in ("iqr", "zscore"):
+            found, found_values = (np.asarray(part) for part in flagged[column][method])
+            if column_bounds[method] is None or len(found) == 0:
+                continue
+            order = np.argsort(found, kind='stable')
+            found, found_values = found[order].astype(np.int64), found_values[order]
+            details = {"count": len(found), **_limited(sheet_rows(found), max_rows),
+                       "min": float(found_values.min()), "max": float(found_values.max())}
+            if method == "iqr":
+                lower, upper, q1, q3 = column_bounds["iqr"]
+                details.update({"lower": float(lower), "upper": float(upper), "q1": q1, "q3": q3})
+            else:
+                mean, std = column_bounds["zscore"]
+                details.update({"threshold": z_threshold, "mean": mean, "std": std})
+            entry[method] = details
+        if entry:
+            entry["approximate"] = not quality[column].reservoir.complete
+            outliers[column] = entry
+    report["outliers"] = outliers
+
+    report["issues"] = (int(report["duplicates"]["count"] > 0) + len(missing_columns) + len(mixed)
+                        + len(constant) + len(outliers))
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+def scan_dataframe(df, iqr_factor=IQR_FACTOR, z_threshold=ZSCORE_THRESHOLD, max_rows=MAX_REPORTED_ROWS,
+                   first_row=FIRST_DATA_ROW, row_numbers=None):
+    """
+    Contrôle la qualité d'un DataFrame en mémoire (quartiles exacts).
+
+    Args:
+        df (DataFrame): Données (lignes dans l'ordre de la feuille)
+        iqr_factor (float): Coefficient k de la méthode IQR
+        z_threshold (float): Seuil du z-score
+        max_rows (int): Nombre maximal de lignes listées par anomalie
+        first_row (int): Numéro de ligne de la première ligne du DataFrame
+        row_numbers (list): Numéro dans la feuille de chaque ligne (DataFrame échantillon)
+
+    Returns:
+        dict: Rapport qualité (voir scan_chunks)
+    """
+    return scan_chunks(lambda: [df], iqr_factor, z_threshold, max_rows,
+                       quantile_sample=max(len(df), 1), first_row=first_row, row_numbers=row_numbers)
+
+
+def scan_sheet(file_path, sheet=0, chunk_rows=DEFAULT_CHUNK_ROWS, engine=None, **options):
+    """
+    Contrôle la qualité d'une feuille entière lue par blocs (voir scan_chunks).
+
+    Args:
+        file_path (str): Chemin du fichier Excel ou CSV
+        sheet (int|str): Index ou nom de la feuille
+        chunk_rows (int): Taille des blocs lus
+        engine (str): Moteur de lecture imposé (optionnel)
+        **options: Paramètres de scan_chunks (iqr_factor, z_threshold, max_rows...)
+
+    Returns:
+        dict: Rapport qualité
+    """
+    return scan_chunks(lambda: iter_sheet_chunks(file_path, sheet, chunk_rows, engine), **options)
+
+
+def _format_rows(details, limit=5):
+    """Numéros de ligne d'exemple (ex. « 4, 18, 102… »)."""
+    rows = details["rows"][:limit]
+    suffix = "…" if details["truncated"] or len(details["rows"]) > limit else ""
+    return ", ".join(str(row) for row in rows) + suffix
+
+
+def _count(count, noun):
+    """Effectif suivi d'un nom accordé (ex. « 1 ligne », « 3 lignes »)."""
+    return f"{count} {noun}{'s' if count > 1 else ''}"
+
+
+def quality_recommendations(report, limit=10):
+    """
+    Traduit un rapport qualité en recommandations concrètes.
+
+    Args:
+        report (dict): Rapport renvoyé par scan_chunks, scan_dataframe ou scan_sheet
+        limit (int): Nombre maximal de recommandations
+
+    Returns:
+        list: Recommandations (chaînes), les plus importantes en premier
+    """
+    recommendations = []
+    duplicates = report.get("duplicates", {})
+    if duplicates.get("count"):
+        recommendations.append(f"Supprimer ou vérifier les doublons : {_count(duplicates['count'], 'ligne')} "
+                               f"identique(s) à une ligne précédente (lignes {_format_rows(duplicates)})")
+
+    for column, details in report.get("mixed_types", {}).items():
+        types = ", ".join(f"{kind} : {count}" for kind, count in details["types"].items())
+        recommendations.append(f"Harmoniser les types de la colonne '{column}' ({types} ; "
+                               f"lignes {_format_rows(details)})")
+
+    for column, details in report.get("outliers", {}).items():
+        method = details.get("iqr") or details.get("zscore")
+        if "iqr" in details:
+            rule = f"hors [{round(method['lower'], 2)} ; {round(method['upper'], 2)}]"
+        else:
+            rule = f"à plus de {method['threshold']} écarts-types de la moyenne"
+        recommendations.append(f"Vérifier les valeurs extrêmes de la colonne '{column}' : "
+                               f"{_count(method['count'], 'valeur')} {rule} (lignes {_format_rows(method)})")
+
+    missing = report.get("missing", {})
+    constant = report.get("constant_columns", {})
+    if missing.get("empty_rows", {}).get("count"):
+        empty_rows = missing["empty_rows"]
+        recommendations.append(f"Supprimer les lignes vides : {_count(empty_rows['count'], 'ligne')} "
+                               f"(lignes {_format_rows(empty_rows)})")
+    for column, details in sorted(missing.get("columns", {}).items(), key=lambda item: -item[1]["count"]):
+        if column in constant and constant[column]["empty"]:
+            continue
+        recommendations.append(f"Traiter les valeurs manquantes de la colonne '{column}' : "
+                               f"{_count(details['count'], 'cellule')} vide(s) ({round(details['ratio'] * 100, 1)} %)")
+
+    for column, details in constant.items():
+        if details["empty"]:
+            recommendations.append(f"Supprimer la colonne vide '{column}'")
+        else:
+            recommendations.append(f"La colonne '{column}' ne contient qu'une valeur ({details['value']}) : "
+                                   f"la supprimer ou vérifier l'extraction")
+
+    return recommendations[:limit]
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print("Usage: python data_quality.py <file_path> [sheet_index] [--iqr k] [--zscore seuil] "
+              "[--max-rows n] [--engine nom]", file=sys.stderr)
+        sys.exit(1)
+
+    options = {}
+    engine = None
+    for flag, name, cast in (("--iqr", "iqr_factor", float), ("--zscore", "z_threshold", float),
+                             ("--max-rows", "max_rows", int), ("--engine", None, str)):
+        if flag in sys.argv:
+            position = sys.argv.index(flag)
+            value = cast(sys.argv[position + 1])
+            del sys.argv[position:position + 2]
+            if name:
+                options[name] = value
+            else:
+                engine = value
+
+    try:
+        quality_report = scan_sheet(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 0,
+                                    engine=engine, **options)
+        quality_report["recommendations"] = quality_recommendations(quality_report)
+        print(dumps(quality_report))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
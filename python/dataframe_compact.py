@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DataFrame Compact
+-----------------
+Réduction de l'empreinte mémoire des DataFrames avant analyse.
+Utilisé par excel_analyzer.py et excel_processor.py (option --compact).
+
+- Textes peu variés -> category
+- Entiers -> plus petit type entier (nullable Int8...Int64 si des valeurs manquent)
+- Flottants à valeurs entières -> entiers nullables ; autres flottants -> float32 (optionnel)
+- Booléens avec valeurs manquantes -> boolean nullable
+- Autres textes -> chaînes Arrow (string[pyarrow]) lorsque pyarrow est installé
+"""
+
+import importlib.util
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Ratio maximal valeurs distinctes / valeurs non nulles pour passer en category
+CATEGORY_MAX_RATIO = 0.5
+
+# Nombre maximal de catégories (au-delà, le gain mémoire devient incertain)
+CATEGORY_MAX_UNIQUE = 65535
+
+_NULLABLE_INTEGERS = (
+    ('Int8', np.iinfo(np.int8)),
+    ('Int16', np.iinfo(np.int16)),
+    ('Int32', np.iinfo(np.int32)),
+    ('Int64', np.iinfo(np.int64)),
+)
+
+
+def memory_usage(df):
+    """
+    Mémoire occupée par un DataFrame, contenu des chaînes compris.
+
+    Args:
+        df (DataFrame): Données
+
+    Returns:
+        int: Taille en octets
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _arrow_strings_available():
+    """string[pyarrow] nécessite pyarrow."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _smallest_nullable_integer(minimum, maximum):
+    """Plus petit type entier nullable contenant l'intervalle [minimum, maximum]."""
+    for name, info in _NULLABLE_INTEGERS:
+        if info.min <= minimum and maximum <= info.max:
+            return name
+    return None
+
+
+def _compact_numeric(series, downcast_floats):
+    """Réduit une colonne numérique (entiers, flottants)."""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        if series.hasnans:
+            return series.astype(_smallest_nullable_integer(series.min(), series.max()) or series.dtype)
+        unsigned = series.min() >= 0
+        return pd.to_numeric(series, downcast='unsigned' if unsigned else 'integer')
+
+    values = series.dropna()
+    if len(values) == 0:
+        return series
+    finite = np.isfinite(values.to_numpy(dtype=float))
+    if finite.all() and (values.to_numpy(dtype=float) % 1 == 0).all():
+        # Flottants à valeurs entières (colonne d'entiers avec cellules vides lue par pandas)
+        target = _smallest_nullable_integer(values.min(), values.max())
+        if target:
+            return series.astype(target)
+    if downcast_floats:
+        return pd.to_numeric(series, downcast='float')
+    return series
+
+
+def _compact_text(series, category_max_ratio, arrow_strings):
+    """Réduit une colonne de texte (category ou chaînes Arrow)."""
+    values = series.dropna()
+    if len(values) == 0:
+        return series
+    # Colonnes de type mixte (nombres et textes) : conservées telles quelles
+    if not values.map(type).eq(str).all():
+        if values.map(lambda v: isinstance(v, (bool, np.bool_))).all():
+            return series.astype('boolean')
+        return series
+    unique = values.nunique()
+    if unique <= CATEGORY_MAX_UNIQUE and unique / len(values) <= category_max_ratio:
+        return series.astype('category')
+    if arrow_strings and _arrow_strings_available():
+        return series.astype('string[pyarrow]')
+    return series
+
+
+def compact_dataframe(df, category_max_ratio=CATEGORY_MAX_RATIO, downcast_floats=False, arrow_strings=True):
+    """
+    Convertit les colonnes d'un DataFrame vers des types plus compacts.
+
+    Les valeurs sont conservées à l'identique, sauf avec downcast_floats=True
+    (les flottants passent en float32, soit environ 7 chiffres significatifs).
+
+    Args:
+        df (DataFrame): Données à compacter
+        category_max_ratio (float): Ratio maximal valeurs distinctes / valeurs non nulles pour category
+        downcast_floats (bool): Convertir les flottants en float32
+        arrow_strings (bool): Utiliser string[pyarrow] pour les textes variés
+
+    Returns:
+        tuple: (DataFrame compacté, rapport {"memory_before", "memory_after", "ratio", "columns"})
+    """
+    memory_before = memory_usage(df)
+    converted = {}
+    changes = {}
+
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        dtype = series.dtype
+        try:
+            if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+                new_series = series
+            elif pd.api.types.is_numeric_dtype(dtype):
+                new_series = _compact_numeric(series, downcast_floats)
+            elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+                new_series = _compact_text(series, category_max_ratio, arrow_strings)
+            else:
+                new_series = series
+        except (TypeError, ValueError, OverflowError) as e:
+            print(f"Colonne '{column}' non compactée: {str(e)}", file=sys.stderr)
+            new_series = series
+
+        converted[position] = new_series
+        if new_series.dtype != dtype:
+            changes[str(column)] = {"from": str(dtype), "to": str(new_series.dtype)}
+
+    if changes:
+        result = pd.concat([converted[p] for p in range(len(df.columns))], axis=1)
+        result.columns = df.columns
+    else:
+        result = df
+    memory_after = memory_usage(result)
+
+    report = {
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+        "ratio": round(memory_before / memory_after, 2) if memory_after else None,
+        "columns": changes,
+    }
+    return result, report
+
+
+if __name__ == "__main__":
+    from excel_engines import read_sheet
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print(dumps({"error": "Aucun chemin de fichier fourni."}))
+        sys.exit(1)
+
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    try:
+        frame, _ = read_sheet(positional[0], int(positional[1]) if len(positional) > 1 else 0)
+        _, compact_report = compact_dataframe(frame, downcast_floats="--downcast-floats" in sys.argv)
+        print(dumps(compact_report))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dedup
+-----
+Détection des documents quasi identiques (copies, révisions d'un même contrat ou
+courrier) par signatures MinHash et index LSH persistant.
+Utilisé par text_summarizer.py et document_extractor.py (option --dedup).
+
+- Le texte est normalisé (casse, ponctuation, espaces) puis découpé en
+  séquences de SHINGLE_SIZE mots, hachées de façon stable (CRC32)
+- La signature MinHash (NUM_PERM valeurs) est calculée avec numpy par
+  hachage multiplicatif, par blocs de séquences
+- L'index LSH découpe chaque signature en bandes : une recherche ne consulte que
+  les documents qui partagent au moins une bande, quel que soit le volume indexé ;
+  les candidats sont ensuite vérifiés sur la similarité estimée
+- L'index est enregistré en ajout seul dans un répertoire (signatures binaires et
+  métadonnées JSON Lines) et rechargé au démarrage
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEDUP_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'abia_dedup_index')
+
+NUM_PERM = 128
+BANDS = 16  # 16 bandes de 8 valeurs : seuil de détection LSH proche de 0,7
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+
+# Nombre de séquences hachées à la fois (mémoire : bloc × NUM_PERM × 8 octets)
+_SHINGLE_BLOCK = 8192
+
+_SIGNATURES_FILE = 'signatures.bin'
+_DOCUMENTS_FILE = 'documents.jsonl'
+_LOCK_FILE = 'index.lock'
+
+_WORD = re.compile(r'\w+')
+
+# Paramètres des permutations : graine fixe, les signatures restent comparables d'un lancement à l'autre
+_PERMUTATIONS = np.random.RandomState(20240501).randint(0, 2 ** 32, size=(4, NUM_PERM), dtype=np.uint64)
+_MULTIPLIERS = (_PERMUTATIONS[0] << np.uint64(32)) | _PERMUTATIONS[1] | np.uint64(1)
+_OFFSETS = (_PERMUTATIONS[2] << np.uint64(32)) | _PERMUTATIONS[3]
+_EMPTY_VALUE = np.uint32(0xFFFFFFFF)
+
+
+def normalize_text(text):
+    """Mots du texte en minuscules, sans ponctuation (les chiffres sont conservés)."""
+    return _WORD.findall((text or '').lower())
+
+
+def shingle_hashes(text, shingle_size=SHINGLE_SIZE):
+    """
+    Empreintes 32 bits des séquences de mots d'un texte (valeurs distinctes).
+
+    Args:
+        text (str): Texte du document
+        shingle_size (int): Nombre de mots par séquence
+
+    Returns:
+        ndarray: Empreintes uint64 (valeurs sur 32 bits)
+    """
+    words = normalize_text(text)
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    tokens = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+    if len(tokens) < shingle_size:
+        shingle_size = len(tokens)
+    # Combinaison polynomiale des mots de chaque séquence (dépassements modulo 2^64 voulus)
+    combined = np.zeros(len(tokens) - shingle_size + 1, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(shingle_size):
+            combined = combined * np.uint64(1000003) + tokens[offset:offset + len(combined)]
+    return np.unique((combined ^ (combined >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+
+def minhash_signature(text, shingle_size=SHINGLE_SIZE):
+    """
+    Signature MinHash d'un texte.
+
+    Args:
+        text (str): Texte du document
+        shingle_size (int): Nombre de mots par séquence
+
+    Returns:
+        ndarray: NUM_PERM valeurs uint32 (toutes à 0xFFFFFFFF pour un texte vide)
+    """
+    hashes = shingle_hashes(text, shingle_size)
+    signature = np.full(NUM_PERM, _EMPTY_VALUE, dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        for start in range(0, len(hashes), _SHINGLE_BLOCK):
+            block = hashes[start:start + _SHINGLE_BLOCK, None]
+            # Hachage multiplicatif : 32 bits de poids fort de a·x + b modulo 2^64
+            values = ((block * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)).astype(np.uint32)
+            np.minimum(signature, values.min(axis=0), out=signature)
+    return signature
+
+
+def estimate_similarity(first, second):
+    """Similarité de Jaccard estimée entre deux signatures (part des valeurs égales)."""
+    return float(np.count_nonzero(np.asarray(first) == np.asarray(second))) / NUM_PERM
+
+
+def content_hash(text):
+    """Empreinte du texte normalisé (doublons exacts à la mise en forme près)."""
+    return hashlib.blake2b(' '.join(normalize_text(text)).encode('utf-8'), digest_size=16).hexdigest()
+
+
+@contextmanager
+def _locked(directory):
+    """Verrou exclusif entre processus sur un répertoire d'index (fcntl, msvcrt sous Windows)."""
+    with open(os.path.join(directory, _LOCK_FILE), 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class DedupIndex:
+    """
+    Index LSH de signatures MinHash, enregistré dans un répertoire.
+
+    Chaque document indexé a un identifiant (chemin du fichier en pratique) et des
+    métadonnées libres (par exemple son résumé, réutilisé pour ses doublons).
+    """
+
+    def __init__(self, path=DEDUP_INDEX_DIR, threshold=DEFAULT_THRESHOLD, bands=BANDS):
+        if NUM_PERM % bands:
+            raise ValueError(f"Le nombre de bandes doit diviser {NUM_PERM}")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.ids = []
+        self.metadata = []
+        self.positions = {}  # identifiant -> position de sa dernière version
+        self.buckets = [dict() for _ in range(bands)]
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._count = 0
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _band_keys(self, signature):
+        """Clés des bandes d'une signature."""
+        view = np.ascontiguousarray(signature, dtype=np.uint32).reshape(self.bands, self.rows)
+        return [view[band].tobytes() for band in range(self.bands)]
+
+    def _append(self, doc_id, signature, metadata):
+        """Ajoute un document en mémoire et renvoie sa position."""
+        position = self._count
+        if position >= len(self._signatures):
+            grown = np.empty((max(1024, 2 * len(self._signatures)), NUM_PERM), dtype=np.uint32)
+            grown[:position] = self._signatures[:position]
+            self._signatures = grown
+        self._signatures[position] = signature
+        self._count += 1
+        self.ids.append(doc_id)
+        self.metadata.append(metadata)
+        self.positions[doc_id] = position
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(key, []).append(position)
+        return position
+
+    def _load(self):
+        """Recharge l'index enregistré (les lignes incomplètes d'une écriture interrompue sont ignorées)."""
+        documents_file = os.path.join(self.path, _DOCUMENTS_FILE)
+        signatures_file = os.path.join(self.path, _SIGNATURES_FILE)
+        if not (os.path.exists(documents_file) and os.path.exists(signatures_file)):
+            return
+        # Lecture sous verrou : aucun ajout en cours entre la lecture des signatures et celle des lignes
+        with _locked(self.path):
+            signatures = np.fromfile(signatures_file, dtype=np.uint32)
+            signatures = signatures[:len(signatures) // NUM_PERM * NUM_PERM].reshape(-1, NUM_PERM)
+            with open(documents_file, 'r', encoding='utf-8') as f:
+                for position, line in enumerate(f):
+                    if position >= len(signatures):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entry.get("removed"):
+                        self.positions.pop(entry["id"], None)
+                        continue
+                    self._append(entry["id"], signatures[position], entry.get("metadata") or {})
+
+    def query(self, signature, exclude=None):
+        """
+        Documents indexés proches d'une signature.
+
+        Args:
+            signature (ndarray): Signature MinHash
+            exclude (str): Identifiant à ignorer (le document lui-même)
+
+        Returns:
+            list: (identifiant, similarité estimée), du plus proche au moins proche,
+                au-dessus du seuil de l'index
+        """
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self.buckets[band].get(key, ()))
+        if not candidates:
+            return []
+        # Seule la dernière version de chaque identifiant encore indexé est retenue
+        positions = np.fromiter((position for position in candidates
+                                 if self.positions.get(self.ids[position]) == position
+                                 and self.ids[position] != exclude), dtype=np.int64)
+        if len(positions) == 0:
+            return []
+        similarities = (self._signatures[positions] == signature).sum(axis=1) / NUM_PERM
+        order = np.argsort(-similarities, kind='stable')
+        return [(self.ids[positions[i]], float(similarities[i])) for i in order if similarities[i] >= self.threshold]
+
+    def add(self, doc_id, signature, metadata=None):
+        """
+        Indexe un document et l'enregistre ; une nouvelle version d'un identifiant remplace l'ancienne.
+
+        Args:
+            doc_id (str): Identifiant du document
+            signature (ndarray): Signature MinHash
+            metadata (dict): Métadonnées JSON (résumé, date, empreinte...)
+        """
+        metadata = dict(metadata or {})
+        self._append(doc_id, signature, metadata)
+        self._write(signature, {"id": doc_id, "metadata": metadata})
+
+    def remove(self, doc_id):
+        """
+        Retire un document de l'index (fichier supprimé ou renommé) ; il n'est plus proposé comme doublon.
+
+        Returns:
+            bool: True si le document était indexé
+        """
+        if self.positions.pop(doc_id, None) is None:
+            return False
+        # Ligne de suppression, avec une signature de remplissage pour garder les deux fichiers alignés
+        self._write(np.full(NUM_PERM, _EMPTY_VALUE, dtype=np.uint32), {"id": doc_id, "removed": True})
+        return True
+
+    def _write(self, signature, entry):
+        """Ajoute une signature et sa ligne de métadonnées aux fichiers de l'index."""
+        if not self.path:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # Les deux ajouts se font sous un même verrou : plusieurs processus (extraction,
+            # résumé) partagent l'index, une signature ne peut pas être associée à la ligne d'un autre.
+            # Signature d'abord : une ligne de métadonnées n'existe jamais sans sa signature
+            line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+            with _locked(self.path):
+                with open(os.path.join(self.path, _SIGNATURES_FILE), 'ab') as f:
+                    f.write(np.ascontiguousarray(signature, dtype=np.uint32).tobytes())
+                with open(os.path.join(self.path, _DOCUMENTS_FILE), 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"Impossible d'enregistrer l'index de doublons: {str(e)}", file=sys.stderr)
+
+    def get(self, doc_id):
+        """Métadonnées de la dernière version d'un document indexé (None s'il est inconnu)."""
+        position = self.positions.get(doc_id)
+        return None if position is None else self.metadata[position]
+
+    def check(self, text, doc_id=None, metadata=None, add=True):
+        """
+        Cherche les doublons d'un texte puis l'indexe.
+
+        Args:
+            text (str): Texte du document
+            doc_id (str): Identifiant du document (exclu des résultats)
+            metadata (dict): Métadonnées enregistrées avec le document
+            add (bool): Indexer le document après la recherche
+
+        Returns:
+            dict: duplicate_of (identifiant du plus proche ou None), similarity, exact,
+                matches (au plus 10 documents proches), indexable (False pour un texte de
+                moins de SHINGLE_SIZE mots, ni comparé ni indexé) et signature
+        """
+        signature = minhash_signature(text)
+        if len(normalize_text(text)) < SHINGLE_SIZE:
+            # Texte vide ou trop court (PDF image, page de garde) : sa signature est commune à
+            # des documents sans rapport, il n'est ni comparé ni indexé
+            return {"duplicate_of": None, "similarity": None, "exact": False, "matches": [],
+                    "indexable": False, "signature": signature}
+        digest = content_hash(text)
+        matches = self.query(signature, exclude=doc_id)
+        # Un texte identique a la même signature : il figure parmi les candidats de similarité 1
+        exact = [match for match in matches if match[1] == 1.0 and self.get(match[0]).get("content_hash") == digest]
+        if exact:
+            matches = exact[:1] + [match for match in matches if match[0] != exact[0][0]]
+        if add and doc_id is not None:
+            self.add(doc_id, signature, dict(metadata or {}, content_hash=digest,
+                                             duplicate_of=matches[0][0] if matches else None))
+        return {
+            "duplicate_of": matches[0][0] if matches else None,
+            "similarity": round(matches[0][1], 4) if matches else None,
+            "exact": bool(exact),
+            "matches": [{"id": match_id, "similarity": round(similarity, 4)} for match_id, similarity in matches[:10]],
+            "indexable": True,
+            "signature": signature,
+        }
+
+
+def document_text(file_path):
+    """Texte d'un document .pdf, .docx ou texte (lu avec les extracteurs de l'application)."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.pdf':
+        from text_chunker import iter_pdf_pages
+        return "\n\n".join(text for _, text in iter_pdf_pages(file_path))
+    if extension == '.docx':
+        from docx_stream import extract_docx
+        return "\n".join(extract_docx(file_path)["paragraphs"])
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def benchmark_dedup(documents=20000, words=400, duplicate_rate=0.2, seed=0):
+    """
+    Mesure l'indexation et la recherche sur un corpus synthétique avec des révisions.
+
+    Chaque révision modifie environ 1 % des mots d'un document existant (similarité
+    de Jaccard des séquences proche de 0,9).
+
+    Returns:
+        dict: Durées (signature, ajout, recherche par document), rappel et faux positifs
+    """
+    rng = np.random.RandomState(seed)
+    vocabulary = np.array([f"mot{i}" for i in range(20000)])
+    index = DedupIndex(path=None)
+    originals = []
+    signature_time = add_time = query_time = 0.0
+    found = expected = false_positives = 0
+    for doc in range(documents):
+        revision = originals and rng.rand() < duplicate_rate
+        if revision:
+            source = originals[rng.randint(len(originals))]
+            tokens = source.copy()
+            changed = rng.rand(len(tokens)) < 0.01
+            tokens[changed] = vocabulary[rng.randint(len(vocabulary), size=int(changed.sum()))]
+        else:
+            tokens = vocabulary[rng.randint(len(vocabulary), size=words)]
+            originals.append(tokens)
+        text = ' '.join(tokens)
+        started = time.perf_counter()
+        signature = minhash_signature(text)
+        signature_time += time.perf_counter() - started
+        started = time.perf_counter()
+        matches = index.query(signature)
+        query_time += time.perf_counter() - started
+        if revision:
+            expected += 1
+            found += bool(matches)
+        else:
+            false_positives += bool(matches)
+        started = time.perf_counter()
+        index.add(f"doc{doc}", signature)
+        add_time += time.perf_counter() - started
+    return {
+        "documents": documents,
+        "revisions": expected,
+        "recall": round(found / expected, 4) if expected else None,
+        "false_positives": false_positives,
+        "signature_ms_per_doc": round(signature_time * 1000 / documents, 4),
+        "query_ms_per_doc": round(query_time * 1000 / documents, 4),
+        "add_ms_per_doc": round(add_time * 1000 / documents, 4),
+    }
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    index_path = DEDUP_INDEX_DIR
+    if "--index" in sys.argv:
+        index_path = sys.argv[sys.argv.index("--index") + 1]
+        args.remove(index_path)
+    threshold = DEFAULT_THRESHOLD
+    if "--threshold" in sys.argv:
+        value = sys.argv[sys.argv.index("--threshold") + 1]
+        threshold = float(value)
+        args.remove(value)
+
+    command = args[0] if args else None
+    if command == "benchmark":
+        print(dumps(benchmark_dedup(int(args[1]) if len(args) > 1 else 20000)))
+        sys.exit(0)
+    if command in ("check", "query") and len(args) > 1:
+        # check : recherche puis indexation ; query : recherche seule
+        index = DedupIndex(index_path, threshold)
+        results = []
+        for file_path in args[1:]:
+            started = time.perf_counter()
+            try:
+                match = index.check(document_text(file_path), os.path.abspath(file_path),
+                                    {"name": os.path.basename(file_path)}, add=command == "check")
+                match.pop("signature")
+                match["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                results.append(dict(match, file=file_path))
+            except Exception as e:
+                results.append({"file": file_path, "error": str(e)})
+        print(dumps({"indexed": len(index), "results": results}))
+        sys.exit(0)
+
+    print("Usage: python dedup.py check|query <fichier>... [--index répertoire] [--threshold 0.8] | benchmark [documents]",
+          file=sys.stderr)
+    sys.exit(1)
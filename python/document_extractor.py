@@ -13,12 +13,18 @@ import json
 import os
 from pathlib import Path
 
-def extract_text_from_pdf(file_path):
+from docx_stream import extract_docx
+from json_output import dumps
+from ndjson_protocol import FrameWriter, pop_ndjson_flag
+
+def extract_text_from_pdf(file_path, writer=None):
     """
     Extrait le texte d'un fichier PDF.
     
     Args:
         file_path (str): Chemin vers le fichier PDF
+        writer (FrameWriter): Émetteur NDJSON optionnel ; chaque page extraite est
+            alors diffusée immédiatement dans une trame partial
     
     Returns:
         str: Texte extrait du PDF
@@ -28,7 +34,7 @@ def extract_text_from_pdf(file_path):
         
         # Vérifier si le fichier existe
         if not Path(file_path).exists():
-            return json.dumps({"error": f"Le fichier {file_path} n'existe pas."})
+            return dumps({"error": f"Le fichier {file_path} n'existe pas."})
         
         # Extraire le texte du PDF
         text = ""
@@ -52,6 +58,8 @@ def extract_text_from_pdf(file_path):
                 page_text = page.extract_text()
                 pages.append(page_text)
                 text += page_text + "\n\n"
+                if writer:
+                    writer.partial("pages", [page_text], offset=page_num, total=num_pages)
             
             result = {
                 "metadata": metadata,
@@ -59,78 +67,197 @@ def extract_text_from_pdf(file_path):
                 "pages": pages
             }
             
-            return json.dumps(result)
+            return dumps(result)
     
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
-def extract_text_from_docx(file_path):
+def extract_text_from_docx(file_path, writer=None):
     """
     Extrait le texte d'un fichier Word (DOCX).
     
     Args:
         file_path (str): Chemin vers le fichier DOCX
+        writer (FrameWriter): Émetteur NDJSON optionnel ; les paragraphes sont
+            alors diffusés par blocs dans des trames partial
     
     Returns:
         str: Texte extrait du document Word
     """
     try:
-        import docx
-        
         # Vérifier si le fichier existe
         if not Path(file_path).exists():
-            return json.dumps({"error": f"Le fichier {file_path} n'existe pas."})
+            return dumps({"error": f"Le fichier {file_path} n'existe pas."})
         
-        # Extraire le texte du document Word
-        doc = docx.Document(file_path)
+        # Lecture en flux de word/document.xml (python-docx en repli) ; les paragraphes
+        # sont diffusés par paquets au fil de la lecture
+        on_paragraphs = None
+        if writer:
+            on_paragraphs = lambda items, offset: writer.partial("paragraphs", items, offset=offset)
+        extracted = extract_docx(file_path, on_paragraphs=on_paragraphs)
         
         # Extraire les métadonnées
         metadata = {
-            "paragraph_count": len(doc.paragraphs),
-            "section_count": len(doc.sections),
-            "table_count": len(doc.tables)
+            "paragraph_count": extracted["paragraph_count"],
+            "section_count": extracted["section_count"],
+            "table_count": extracted["table_count"]
         }
         
-        # Extraire le texte de chaque paragraphe
-        paragraphs = []
-        for para in doc.paragraphs:
-            paragraphs.append(para.text)
-        
-        # Extraire le texte des tableaux
-        tables = []
-        for table in doc.tables:
-            table_data = []
-            for row in table.rows:
-                row_data = []
-                for cell in row.cells:
-                    row_data.append(cell.text)
-                table_data.append(row_data)
-            tables.append(table_data)
-        
+        paragraphs = extracted["paragraphs"]
         result = {
             "metadata": metadata,
             "text": "\n".join(paragraphs),
             "paragraphs": paragraphs,
-            "tables": tables
+            "headings": extracted["headings"],
+            "tables": extracted["tables"]
         }
         
-        return json.dumps(result)
+        return dumps(result)
+    
+    except Exception as e:
+        return dumps({"error": str(e)})
+
+def extract_incrementally(file_path, writer=None):
+    """
+    Extrait un document PDF ou Word en ne retraitant que les parties modifiées.
+    
+    Args:
+        file_path (str): Chemin vers le document
+        writer (FrameWriter): Émetteur NDJSON optionnel
+    
+    Returns:
+        str: Texte extrait, résumé, mots-clés et détail des modifications (JSON)
+    """
+    try:
+        if not Path(file_path).exists():
+            return dumps({"error": f"Le fichier {file_path} n'existe pas."})
+        
+        from incremental_extraction import process_document
+        result = process_document(file_path)
+        key = "pages" if "pages" in result else "paragraphs"
+        result["metadata"] = {"page_count" if key == "pages" else "paragraph_count": len(result[key])}
+        if writer:
+            writer.stream_items(key, result[key])
+        
+        return dumps(result)
     
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 if __name__ == "__main__":
+    # Mode NDJSON optionnel (voir ndjson_protocol.py)
+    writer = FrameWriter('document_extractor') if pop_ndjson_flag(sys.argv) else None
+    
+    # Analyse des tableaux du document (--tables, voir document_tables.py)
+    analyze_doc_tables = "--tables" in sys.argv
+    if analyze_doc_tables:
+        sys.argv.remove("--tables")
+    
+    # Découpage en passages avec provenance (--chunks [taille maximale], voir text_chunker.py)
+    chunk_size = None
+    if "--chunks" in sys.argv:
+        position = sys.argv.index("--chunks")
+        chunk_size = 2000
+        if position + 1 < len(sys.argv) and sys.argv[position + 1].isdigit():
+            chunk_size = int(sys.argv[position + 1])
+            del sys.argv[position + 1]
+        del sys.argv[position]
+    
+    # Ré-extraction limitée aux pages ou blocs modifiés depuis le dernier passage, avec
+    # résumé et mots-clés mis à jour (--incremental, voir incremental_extraction.py)
+    incremental = "--incremental" in sys.argv
+    if incremental:
+        sys.argv.remove("--incremental")
+    
+    # Signalement des documents quasi identiques déjà extraits (--dedup, voir dedup.py)
+    check_duplicates = "--dedup" in sys.argv
+    if check_duplicates:
+        sys.argv.remove("--dedup")
+    
     # Vérifier si un chemin de fichier a été fourni
     if len(sys.argv) < 2:
-        print(json.dumps({"error": "Aucun chemin de fichier fourni."}))
+        if writer:
+            writer.error("Aucun chemin de fichier fourni.")
+        else:
+            print(dumps({"error": "Aucun chemin de fichier fourni."}))
         sys.exit(1)
     
     file_path = sys.argv[1]
     file_ext = os.path.splitext(file_path)[1].lower()
     
-    if file_ext == '.pdf':
-        print(extract_text_from_pdf(file_path))
+    if writer:
+        writer.progress("extraction", 5, f"Extraction du texte de {os.path.basename(file_path)}")
+    
+    if incremental and file_ext in ['.pdf', '.docx']:
+        output = extract_incrementally(file_path, writer)
+        streamed = ["pages" if file_ext == '.pdf' else "paragraphs"]
+    elif file_ext == '.pdf':
+        output = extract_text_from_pdf(file_path, writer)
+        streamed = ["pages"]
     elif file_ext in ['.docx', '.doc']:
-        print(extract_text_from_docx(file_path))
+        output = extract_text_from_docx(file_path, writer)
+        streamed = ["paragraphs"]
+    else:
+        output = dumps({"error": f"Format de fichier non pris en charge: {file_ext}"})
+        streamed = []
+    
+    if check_duplicates:
+        result = json.loads(output)
+        if "error" not in result:
+            from dedup import DedupIndex
+            try:
+                # Le document est lié à son plus proche voisin puis indexé
+                match = DedupIndex().check(result["text"], os.path.abspath(file_path),
+                                           {"name": os.path.basename(file_path)})
+                match.pop("signature")
+                result["duplicate"] = match
+            except Exception as e:
+                print(f"Erreur lors de la recherche de doublons: {str(e)}", file=sys.stderr)
+            output = dumps(result)
+    
+    if analyze_doc_tables and file_ext in ['.pdf', '.docx']:
+        result = json.loads(output)
+        if "error" not in result:
+            if writer:
+                writer.progress("tableaux", 80, "Analyse des tableaux")
+            from document_tables import analyze_document_tables, analyze_tables
+            try:
+                # Les tableaux Word déjà extraits sont réutilisés ; ceux des PDF sont
+                # reconstitués à partir de la mise en page
+                if file_ext == '.docx':
+                    result["table_analysis"] = analyze_tables(result.get("tables", []))
+                else:
+                    result["table_analysis"] = analyze_document_tables(file_path)
+            except Exception as e:
+                print(f"Erreur lors de l'analyse des tableaux: {str(e)}", file=sys.stderr)
+                result["table_analysis"] = {"error": str(e)}
+            output = dumps(result)
+    
+    if chunk_size and file_ext in ['.pdf', '.docx']:
+        result = json.loads(output)
+        if "error" not in result:
+            from text_chunker import chunk_pages, chunk_units, paragraph_units
+            # Découpage à partir des pages ou paragraphes déjà extraits : les positions
+            # renvoyées sont celles du champ "text"
+            if file_ext == '.pdf':
+                chunks = chunk_pages(result["pages"], chunk_size)
+            else:
+                heading_indexes = {heading["index"] for heading in result.get("headings", [])}
+                blocks = ({"type": "heading" if index in heading_indexes else "paragraph", "text": text}
+                          for index, text in enumerate(result["paragraphs"]))
+                chunks = chunk_units(paragraph_units(blocks), chunk_size)
+            result["chunks"] = list(chunks)
+            if writer:
+                writer.stream_items("chunks", result["chunks"], chunk_size=100, first_chunk_size=10)
+                streamed.append("chunks")
+            output = dumps(result)
+    
+    if writer:
+        result = json.loads(output)
+        if "error" in result:
+            writer.error(result["error"])
+        else:
+            writer.result({k: v for k, v in result.items() if k not in streamed}, streamed=streamed)
+        writer.metrics()
     else:
-        print(json.dumps({"error": f"Format de fichier non pris en charge: {file_ext}"}))
+        print(output)
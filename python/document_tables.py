@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Document Tables
+---------------
+Conversion des tableaux des documents Word et PDF en DataFrames typés, analysés
+avec les mêmes fonctions que les feuilles Excel (excel_processor.analyze_columns,
+excel_processor.pivot_dataframe).
+Utilisé par document_extractor.py (option --tables).
+
+- DOCX : tableaux lus en flux par docx_stream.py, avec le titre ou le paragraphe
+  qui les précède comme légende
+- PDF : tableaux reconstitués à partir de la mise en page pdfminer (lignes de
+  texte alignées en colonnes), fusionnés d'une page à l'autre
+- Détection de la ligne d'en-tête (sur deux lignes si la première est fusionnée),
+  suppression des en-têtes répétés et des lignes de total
+- Conversion vectorisée des nombres (formats français « 1 234,56 € » et anglais
+  « 1,234.56 », négatifs entre parenthèses) et des dates (time_series.DateParser)
+"""
+
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from docx_stream import iter_docx_blocks
+from json_output import dataframe_to_records
+from time_series import DateParser
+
+# Part minimale de cellules non vides reconnues pour typer une colonne
+MIN_PARSED_RATIO = 0.9
+
+# Valeurs considérées comme vides dans un tableau de document
+EMPTY_MARKERS = ('', '-', '–', '—', 'n/a', 'N/A', 'NA', 'nd', 'ND')
+
+# Libellés des lignes de total (exclues des données, restituées à part)
+_TOTAL_ROW = re.compile(r'^\s*(?:sous[- ]?)?total\b', re.IGNORECASE)
+
+# Symboles monétaires, pourcentages et espaces (dont insécables) retirés avant conversion
+_NUMBER_NOISE = re.compile(r'[\s€$£%]|\b(?:EUR|USD|GBP|CHF)\b', re.IGNORECASE)
+_PARENTHESES = re.compile(r'^\((.*)\)$')
+_FRENCH_NUMBER = re.compile(r'[-+]?(?:\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+,\d+)')
+_ENGLISH_NUMBER = re.compile(r'[-+]?(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+\.\d+)')
+
+# Années, admises dans une ligne d'en-tête (« 2023 », « 2024 »)
+_YEAR = re.compile(r'^(?:19|20)\d{2}$')
+
+# Textes susceptibles d'être des dates (« 15/01/2024 », « 2024-01 », « 3 janv. 2024 ») :
+# seules ces colonnes sont confiées à l'analyseur de dates
+_DATE_LIKE = re.compile(r'\d{1,4}[/.\-]\d{1,2}|\d{1,2}\s+[^\W\d_]{3,}\.?\s+\d{2,4}')
+
+# Mise en page PDF : écart entre deux caractères (en largeurs de caractère) séparant deux
+# cellules, et écart vertical maximal (en hauteurs de ligne) entre deux lignes d'un même tableau
+PDF_CELL_GAP = 1.0
+PDF_ROW_GAP = 2.5
+
+
+def _blank(series):
+    """Masque des cellules vides (NaN, chaîne vide ou marqueur de valeur absente)."""
+    return series.isna() | series.isin(EMPTY_MARKERS)
+
+
+def parse_numbers(series):
+    """
+    Convertit une colonne de textes en nombres si elle en contient presque uniquement.
+
+    La convention (virgule ou point décimal) est choisie une fois pour la colonne,
+    d'après les valeurs non ambiguës (« 12,5 » ou « 1.234,00 » contre « 1,234.00 »).
+
+    Args:
+        series (Series): Textes de la colonne (vides en NaN)
+
+    Returns:
+        Series: Valeurs numériques (NaN pour les vides) ou None si la colonne n'est pas numérique
+    """
+    present = series.dropna()
+    if len(present) == 0:
+        return None
+    text = present.astype(str).str.strip()
+    text = text.str.replace(_PARENTHESES, r'-\1', regex=True)
+    text = text.str.replace(_NUMBER_NOISE, '', regex=True).str.replace('−', '-', regex=False)
+    french = int(text.str.fullmatch(_FRENCH_NUMBER).sum())
+    english = int(text.str.fullmatch(_ENGLISH_NUMBER).sum())
+    if french >= english:
+        text = text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    else:
+        text = text.str.replace(',', '', regex=False)
+    numbers = pd.to_numeric(text, errors='coerce')
+    if numbers.notna().mean() < MIN_PARSED_RATIO:
+        return None
+    result = pd.Series(np.nan, index=series.index, dtype='float64')
+    result.loc[numbers.index] = numbers.astype('float64')
+    if result.notna().all() and (result % 1 == 0).all():
+        return result.astype('int64')
+    return result
+
+
+def _row_kinds(cells):
+    """Vrai pour chaque cellule qui ressemble à un nombre (utilisé pour repérer les en-têtes)."""
+    text = pd.Series(cells, dtype=object).fillna('').astype(str)
+    text = text.str.replace(_PARENTHESES, r'-\1', regex=True).str.replace(_NUMBER_NOISE, '', regex=True)
+    text = text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(text, errors='coerce').notna().tolist()
+
+
+def _unique_names(names):
+    """Noms de colonnes non vides et uniques (« Colonne 3 », « Montant (2) »)."""
+    result = []
+    seen = {}
+    for index, name in enumerate(names):
+        name = re.sub(r'\s+', ' ', str(name or '')).strip() or f"Colonne {index + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name} ({seen[name]})"
+        else:
+            seen[name] = 1
+        result.append(name)
+    return result
+
+
+def _detect_header(grid):
+    """
+    Nombre de lignes d'en-tête d'un tableau (0, 1 ou 2).
+
+    La première ligne est un en-tête si elle ne contient aucun nombre alors que le
+    corps en contient, ou si ses libellés n'apparaissent pas dans leurs colonnes.
+    Une seconde ligne sans nombre s'y ajoute quand la première contient des
+    cellules fusionnées (libellés répétés côte à côte).
+    """
+    if len(grid) < 2:
+        return 0
+    first = grid[0]
+    numeric = [kind and not _YEAR.match(cell) for kind, cell in zip(_row_kinds(first), first)]
+    if any(numeric) or sum(1 for cell in first if cell) < (len(first) + 1) // 2:
+        return 0
+    body = grid[1:]
+    body_numeric = any(any(_row_kinds(row)) for row in body[:20])
+    distinct = all(cell not in {row[column] for row in body} for column, cell in enumerate(first) if cell)
+    if not (body_numeric or distinct):
+        return 0
+    merged = any(first[i] and first[i] == first[i + 1] for i in range(len(first) - 1))
+    if merged and len(grid) > 2 and not any(_row_kinds(grid[1])) and any(any(_row_kinds(row)) for row in grid[2:22]):
+        return 2
+    return 1
+
+
+def table_to_frame(rows, parser=None):
+    """
+    Convertit un tableau de textes (liste de lignes) en DataFrame typé.
+
+    Args:
+        rows (list): Lignes de cellules texte (longueurs éventuellement différentes)
+        parser (DateParser): Analyseur de dates réutilisé (formats mémorisés par colonne)
+
+    Returns:
+        tuple: (DataFrame ou None si le tableau est vide, informations : lignes d'en-tête,
+            lignes de total retirées, en-têtes répétés retirés, types des colonnes)
+    """
+    parser = parser or DateParser()
+    width = max((len(row) for row in rows), default=0)
+    grid = [[(cell or '').strip() if isinstance(cell, str) else ('' if cell is None else str(cell))
+             for cell in row] + [''] * (width - len(row)) for row in rows]
+    grid = [row for row in grid if any(row)]
+    keep = [column for column in range(width) if any(row[column] for row in grid)]
+    grid = [[row[column] for column in keep] for row in grid]
+    info = {"header_rows": 0, "total_rows": [], "repeated_headers": 0, "types": {}}
+    if not grid or not keep:
+        return None, info
+
+    header_rows = _detect_header(grid)
+    info["header_rows"] = header_rows
+    if header_rows == 2:
+        names = [f"{top} {bottom}".strip() if top != bottom else top for top, bottom in zip(grid[0], grid[1])]
+    elif header_rows == 1:
+        names = grid[0]
+    else:
+        names = []
+    columns = _unique_names(names or [''] * len(keep))
+
+    body = []
+    header = grid[:header_rows]
+    for row in grid[header_rows:]:
+        if header_rows and row in header:
+            info["repeated_headers"] += 1
+        elif _TOTAL_ROW.match(next((cell for cell in row if cell), '')):
+            info["total_rows"].append(dict(zip(columns, row)))
+        else:
+            body.append(row)
+
+    frame = pd.DataFrame(body, columns=columns, dtype=object)
+    for column in columns:
+        values = frame[column].where(~_blank(frame[column]))
+        numbers = parse_numbers(values)
+        if numbers is not None:
+            frame[column] = numbers
+            info["types"][column] = "nombre"
+            continue
+        present = values.dropna()
+        dates = None
+        if len(present) and present.astype(str).str.contains(_DATE_LIKE).mean() >= MIN_PARSED_RATIO:
+            dates = parser.parse(present, column)
+        if dates is not None and dates.notna().mean() >= MIN_PARSED_RATIO:
+            frame[column] = dates.reindex(frame.index)
+            info["types"][column] = "date"
+        else:
+            frame[column] = values.astype('str').where(values.notna())
+            info["types"][column] = "texte"
+    return frame, info
+
+
+def docx_tables(file_path):
+    """
+    Tableaux de premier niveau d'un document Word, avec leur légende.
+
+    Yields:
+        dict: {"source": "tableau n", "caption": titre ou paragraphe précédent, "rows": lignes}
+    """
+    caption = None
+    index = 0
+    for block in iter_docx_blocks(file_path):
+        if block["type"] == "table":
+            index += 1
+            yield {"source": f"tableau {index}", "caption": caption, "rows": block["rows"]}
+        elif block["type"] in ("heading", "paragraph") and block["text"].strip():
+            caption = block["text"].strip()
+
+
+def _line_segments(line):
+    """Découpe une ligne de texte pdfminer en segments séparés par de larges espaces."""
+    from pdfminer.layout import LTChar
+
+    segments = []
+    current = None
+    for char in line:
+        if not isinstance(char, LTChar):
+            if current is not None:
+                current["text"] += char.get_text()
+            continue
+        gap_limit = PDF_CELL_GAP * max(char.width, char.size * 0.5)
+        if current is None or char.x0 - current["x1"] > gap_limit:
+            current = {"x0": char.x0, "x1": char.x1, "text": char.get_text()}
+            segments.append(current)
+        else:
+            current["text"] += char.get_text()
+            current["x1"] = max(current["x1"], char.x1)
+    return [segment for segment in segments if segment["text"].strip()]
+
+
+def _page_rows(layout):
+    """Lignes visuelles d'une page : segments regroupés par hauteur, du haut vers le bas."""
+    from pdfminer.layout import LTTextContainer, LTTextLineHorizontal
+
+    items = []
+    pending = [layout]
+    while pending:
+        element = pending.pop()
+        if isinstance(element, LTTextLineHorizontal):
+            center = (element.y0 + element.y1) / 2
+            for segment in _line_segments(element):
+                items.append((center, element.height, segment))
+        elif isinstance(element, LTTextContainer) or hasattr(element, '__iter__'):
+            pending.extend(element)
+    items.sort(key=lambda item: (-item[0], item[2]["x0"]))
+    rows = []
+    for center, height, segment in items:
+        if rows and abs(rows[-1]["center"] - center) <= max(rows[-1]["height"], height) * 0.5:
+            rows[-1]["segments"].append(segment)
+        else:
+            rows.append({"center": center, "height": height, "segments": [segment]})
+    for row in rows:
+        row["segments"].sort(key=lambda segment: segment["x0"])
+    return rows
+
+
+def _columns_of(rows):
+    """Colonnes d'un bloc de lignes : intervalles horizontaux des segments fusionnés."""
+    intervals = sorted((segment["x0"], segment["x1"]) for row in rows for segment in row["segments"])
+    columns = []
+    for x0, x1 in intervals:
+        if columns and x0 <= columns[-1][1]:
+            columns[-1][1] = max(columns[-1][1], x1)
+        else:
+            columns.append([x0, x1])
+    return columns
+
+
+def _block_table(rows):
+    """Tableau (liste de lignes de textes) d'un bloc de lignes alignées."""
+    columns = _columns_of(rows)
+    table = []
+    for row in rows:
+        cells = [''] * len(columns)
+        for segment in row["segments"]:
+            center = (segment["x0"] + segment["x1"]) / 2
+            column = next((i for i, (x0, x1) in enumerate(columns) if x0 <= center <= x1), len(columns) - 1)
+            cells[column] = f"{cells[column]} {segment['text'].strip()}".strip()
+        table.append(cells)
+    return table
+
+
+def pdf_tables(file_path):
+    """
+    Tableaux d'un PDF reconstitués à partir des positions du texte (pdfminer).
+
+    Une suite d'au moins deux lignes rapprochées comportant chacune plusieurs
+    segments forme un tableau ; un tableau qui se poursuit en haut de la page
+    suivante avec le même nombre de colonnes est fusionné avec le précédent.
+
+    Yields:
+        dict: {"source": "page n", "page": n, "caption": None, "rows": lignes}
+    """
+    from pdfminer.high_level import extract_pages
+
+    pending = None  # Tableau en fin de page, susceptible de continuer sur la suivante
+    for page_number, layout in enumerate(extract_pages(file_path), 1):
+        rows = _page_rows(layout)
+        blocks = []
+        block = []
+        for row in rows:
+            tabular = len(row["segments"]) >= 2
+            close = block and block[-1]["center"] - row["center"] <= PDF_ROW_GAP * max(block[-1]["height"], row["height"])
+            if tabular and (not block or close):
+                block.append(row)
+                continue
+            if len(block) >= 2:
+                blocks.append(block)
+            block = [row] if tabular else []
+        if len(block) >= 2:
+            blocks.append(block)
+
+        for position, block in enumerate(blocks):
+            table = _block_table(block)
+            starts_page = rows and block[0] is rows[0]
+            if pending is not None and position == 0 and starts_page and len(table[0]) == len(pending["rows"][0]):
+                pending["rows"].extend(table)
+                pending["source"] = f"pages {pending['page']}-{page_number}"
+                continue
+            if pending is not None:
+                yield pending
+            pending = {"source": f"page {page_number}", "page": page_number, "caption": None, "rows": table}
+        if pending is not None and not (blocks and rows and blocks[-1][-1] is rows[-1]):
+            # Le dernier tableau ne termine pas la page : il ne peut pas continuer plus loin
+            yield pending
+            pending = None
+    if pending is not None:
+        yield pending
+
+
+def iter_document_tables(file_path):
+    """Tableaux d'un document .docx ou .pdf (voir docx_tables et pdf_tables)."""
+    extension = os.path.splitext(str(file_path))[1].lower()
+    if extension == '.pdf':
+        return pdf_tables(file_path)
+    if extension == '.docx':
+        return docx_tables(file_path)
+    raise ValueError(f"Format de document non pris en charge: {extension}")
+
+
+def analyze_tables(tables, pivot=None, preview_rows=5):
+    """
+    Type, analyse et éventuellement croise chaque tableau, en un seul passage.
+
+    Args:
+        tables (iterable): Tableaux {"rows", "source", "caption"} ou simples listes de lignes
+        pivot (dict): Tableau croisé (voir excel_processor.pivot_dataframe) avec une clé
+            "table" optionnelle (numéro du tableau, à partir de 1) ; sans elle, le croisement
+            est calculé sur chaque tableau qui contient les colonnes demandées
+        preview_rows (int): Nombre de lignes d'aperçu par tableau
+
+    Returns:
+        dict: Tableaux analysés (colonnes, aperçu, totaux, croisement) et durée
+    """
+    from excel_processor import analyze_columns, pivot_dataframe
+
+    started = time.perf_counter()
+    pivot = dict(pivot) if pivot else None
+    pivot_table = pivot.pop("table", None) if pivot else None
+    results = []
+    for index, table in enumerate(tables, 1):
+        if not isinstance(table, dict):
+            table = {"rows": table}
+        # Un analyseur de dates par tableau : les formats sont mémorisés par nom de colonne
+        frame, info = table_to_frame(table["rows"], DateParser())
+        entry = {
+            "index": index,
+            "source": table.get("source") or f"tableau {index}",
+            "caption": table.get("caption"),
+        }
+        if frame is None:
+            entry["empty"] = True
+            results.append(entry)
+            continue
+        entry.update({
+            "header": info["header_rows"] > 0,
+            "row_count": int(len(frame)),
+            "column_count": int(len(frame.columns)),
+            "types": info["types"],
+            "columns": analyze_columns(frame),
+            "preview": dataframe_to_records(frame.head(preview_rows)) if preview_rows > 0 else [],
+        })
+        if info["total_rows"]:
+            entry["total_rows"] = info["total_rows"]
+        if info["repeated_headers"]:
+            entry["repeated_headers"] = info["repeated_headers"]
+        if pivot and pivot_table in (None, index):
+            keys = [pivot.get("rows"), pivot.get("columns"), pivot.get("values")]
+            wanted = [name for key in keys for name in ([key] if isinstance(key, str) else key or [])]
+            if pivot_table is not None or all(name in frame.columns for name in wanted):
+                try:
+                    entry["pivot"] = pivot_dataframe(frame, **pivot)
+                except (ValueError, TypeError, KeyError) as e:
+                    entry["pivot"] = {"error": str(e)}
+        results.append(entry)
+    return {
+        "table_count": len(results),
+        "tables": results,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def analyze_document_tables(file_path, pivot=None, preview_rows=5):
+    """
+    Extrait et analyse tous les tableaux d'un document Word ou PDF.
+
+    Args:
+        file_path (str): Chemin du document (.docx ou .pdf)
+        pivot (dict): Tableau croisé optionnel (voir analyze_tables)
+        preview_rows (int): Nombre de lignes d'aperçu par tableau
+
+    Returns:
+        dict: Résultat de analyze_tables, avec le nom du fichier
+    """
+    result = analyze_tables(iter_document_tables(file_path), pivot, preview_rows)
+    result["fileName"] = os.path.basename(str(file_path))
+    return result
+
+
+if __name__ == "__main__":
+    import json
+
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print("Usage: python document_tables.py <fichier.docx|fichier.pdf> [--pivot json|@fichier] [--preview n]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    pivot_spec = None
+    preview = 5
+    if "--pivot" in sys.argv:
+        argument = sys.argv[sys.argv.index("--pivot") + 1]
+        if argument.startswith('@'):
+            with open(argument[1:], 'r', encoding='utf-8') as f:
+                argument = f.read()
+        pivot_spec = json.loads(argument)
+    if "--preview" in sys.argv:
+        preview = int(sys.argv[sys.argv.index("--preview") + 1])
+
+    try:
+        print(dumps(analyze_document_tables(sys.argv[1], pivot_spec, preview)))
+    except Exception as e:
+        print(f"Erreur lors de l'analyse des tableaux: {str(e)}", file=sys.stderr)
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DOCX Stream
+-----------
+Extraction en flux du texte, des titres et des tableaux d'un document Word (.docx).
+Utilisé par document_extractor.py et word_text_extractor.py.
+
+- word/document.xml est lu avec ElementTree.iterparse directement dans l'archive
+  zip : chaque paragraphe ou ligne de tableau est émis puis libéré, la mémoire
+  reste constante quelle que soit la taille du document
+- les niveaux de titre sont résolus une fois à partir de word/styles.xml
+  (styles « heading N » / « Titre N », outlineLvl)
+- les cellules fusionnées sont répétées comme le fait python-docx (row.cells),
+  sans le parcours quadratique de la table
+- python-docx reste le repli pour les archives que le flux ne sait pas lire
+"""
+
+import os
+import re
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_OFFICE_DOCUMENT_TYPES = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument",
+    "http://purl.oclc.org/ooxml/officeDocument/relationships/officeDocument",
+)
+
+# Taille des paquets de paragraphes transmis au rappel on_paragraphs (le premier est petit)
+PARAGRAPH_CHUNK_SIZE = 500
+FIRST_PARAGRAPH_CHUNK_SIZE = 50
+
+# Noms de styles de titre (anglais et français) : « heading 1 », « Titre 2 »...
+_HEADING_NAME = re.compile(r'^(?:heading|titre)\s*(\d)$', re.IGNORECASE)
+_TITLE_NAMES = ('title', 'titre')
+
+# Éléments dont le texte n'appartient pas au paragraphe : propriétés, texte supprimé
+# (révisions), zones de texte et objets dessinés (dupliqués dans mc:Fallback)
+_SKIPPED_LOCAL_NAMES = frozenset(('pPr', 'rPr', 'del', 'moveFrom', 'AlternateContent',
+                                  'drawing', 'pict', 'object'))
+
+
+def _main_part(archive):
+    """Chemin de la partie principale du document (word/document.xml en pratique)."""
+    try:
+        rels = ET.fromstring(archive.read("_rels/.rels"))
+    except KeyError:
+        return "word/document.xml"
+    for rel in rels.iter(f"{{{_PKG_REL_NS}}}Relationship"):
+        if rel.get("Type") in _OFFICE_DOCUMENT_TYPES:
+            return rel.get("Target", "").lstrip("/")
+    return "word/document.xml"
+
+
+def heading_levels(archive, styles_part="word/styles.xml"):
+    """
+    Niveaux de titre des styles de paragraphe d'un document.
+
+    Args:
+        archive (zipfile.ZipFile): Archive DOCX ouverte
+        styles_part (str): Partie des styles
+
+    Returns:
+        dict: styleId -> (nom du style, niveau) ; niveau 0 pour le titre du document,
+            1 à 9 pour les titres, None pour les autres styles
+    """
+    try:
+        root = ET.fromstring(archive.read(styles_part))
+    except KeyError:
+        return {}
+    ns = root.tag[1:].split('}', 1)[0] if root.tag.startswith('{') else _W_NS
+    val = f"{{{ns}}}val"
+    styles = {}
+    based_on = {}
+    for style in root.iter(f"{{{ns}}}style"):
+        if style.get(f"{{{ns}}}type", "paragraph") != "paragraph":
+            continue
+        style_id = style.get(f"{{{ns}}}styleId")
+        name_element = style.find(f"{{{ns}}}name")
+        name = name_element.get(val, style_id) if name_element is not None else style_id
+        level = None
+        match = _HEADING_NAME.match((name or '').strip())
+        if match:
+            level = int(match.group(1))
+        elif (name or '').strip().lower() in _TITLE_NAMES:
+            level = 0
+        else:
+            outline = style.find(f"{{{ns}}}pPr/{{{ns}}}outlineLvl")
+            if outline is not None and (outline.get(val) or '').isdigit() and int(outline.get(val)) < 9:
+                level = int(outline.get(val)) + 1
+        parent = style.find(f"{{{ns}}}basedOn")
+        if parent is not None:
+            based_on[style_id] = parent.get(val)
+        styles[style_id] = (name, level)
+    # Un style dérivé d'un titre sans niveau propre hérite du niveau de son parent
+    for style_id, (name, level) in list(styles.items()):
+        seen = {style_id}
+        parent = based_on.get(style_id)
+        while level is None and parent in styles and parent not in seen:
+            seen.add(parent)
+            level = styles[parent][1]
+            parent = based_on.get(parent)
+        styles[style_id] = (name, level)
+    return styles
+
+
+class _Names:
+    """Noms qualifiés des balises utilisées, pour un espace de noms donné (transitionnel ou strict)."""
+
+    def __init__(self, ns):
+        for local in ('body', 'p', 'tbl', 'tr', 'tc', 'sectPr', 'pPr', 'pStyle', 'outlineLvl',
+                      'tcPr', 'gridSpan', 'vMerge', 'trPr', 'gridBefore', 't', 'tab', 'ptab', 'br',
+                      'cr', 'noBreakHyphen'):
+            setattr(self, local, f"{{{ns}}}{local}")
+        self.val = f"{{{ns}}}val"
+        self.type = f"{{{ns}}}type"
+        self.skipped = frozenset(f"{{{ns}}}{local}" for local in _SKIPPED_LOCAL_NAMES) | frozenset(
+            f"{{http://schemas.openxmlformats.org/markup-compatibility/2006}}{local}"
+            for local in _SKIPPED_LOCAL_NAMES)
+
+
+def _paragraph_text(paragraph, names):
+    """Texte d'un paragraphe (tabulations et sauts de ligne convertis comme python-docx)."""
+    parts = []
+    pending = list(reversed(paragraph))
+    while pending:
+        element = pending.pop()
+        tag = element.tag
+        if tag == names.t:
+            if element.text:
+                parts.append(element.text)
+        elif tag == names.tab or tag == names.ptab:
+            parts.append('\t')
+        elif tag == names.br:
+            if element.get(names.type, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag == names.cr:
+            parts.append('\n')
+        elif tag == names.noBreakHyphen:
+            parts.append('-')
+        elif tag not in names.skipped and len(element):
+            pending.extend(reversed(element))
+    return ''.join(parts)
+
+
+def _paragraph_level(paragraph, names, styles):
+    """(styleId, niveau de titre) d'un paragraphe ; le niveau de plan du paragraphe prime sur le style."""
+    properties = paragraph.find(names.pPr)
+    if properties is None:
+        return None, None
+    style = properties.find(names.pStyle)
+    style_id = style.get(names.val) if style is not None else None
+    outline = properties.find(names.outlineLvl)
+    if outline is not None and (outline.get(names.val) or '').isdigit():
+        level = int(outline.get(names.val))
+        return style_id, level + 1 if level < 9 else None
+    return style_id, styles.get(style_id, (None, None))[1]
+
+
+def _cell_text(cell, names):
+    """Texte d'une cellule : ses paragraphes directs joints par des sauts de ligne (comme python-docx)."""
+    return '\n'.join(_paragraph_text(paragraph, names) for paragraph in cell.iterfind(names.p))
+
+
+def _grid_span(cell_properties, names):
+    """Nombre de colonnes de grille couvertes par une cellule."""
+    if cell_properties is None:
+        return 1
+    span = cell_properties.find(names.gridSpan)
+    value = span.get(names.val) if span is not None else None
+    return int(value) if value and value.isdigit() and int(value) > 0 else 1
+
+
+def _row_cells(row, names, above):
+    """
+    Textes des cellules d'une ligne, cellules fusionnées répétées comme dans python-docx.
+
+    Args:
+        row (Element): Élément w:tr
+        names (_Names): Noms qualifiés
+        above (dict): Ligne précédente, colonne de grille -> (texte, largeur)
+
+    Returns:
+        tuple: (textes de la ligne, grille de la ligne pour la ligne suivante)
+    """
+    values = []
+    grid = {}
+    column = 0
+    row_properties = row.find(names.trPr)
+    if row_properties is not None:
+        before = row_properties.find(names.gridBefore)
+        if before is not None and (before.get(names.val) or '').isdigit():
+            column = int(before.get(names.val))
+    for cell in row.iterfind(names.tc):
+        cell_properties = cell.find(names.tcPr)
+        merge = cell_properties.find(names.vMerge) if cell_properties is not None else None
+        if merge is not None and merge.get(names.val, 'continue') == 'continue' and column in above:
+            # Suite d'une fusion verticale : contenu et largeur de la cellule d'origine
+            text, span = above[column]
+        else:
+            text, span = _cell_text(cell, names), _grid_span(cell_properties, names)
+        values.extend([text] * span)
+        grid[column] = (text, span)
+        column += span
+    return values, grid
+
+
+def _iter_stream_blocks(archive):
+    """Blocs du document lus en flux avec iterparse (voir iter_docx_blocks)."""
+    part = _main_part(archive)
+    styles = heading_levels(archive, os.path.join(os.path.dirname(part), "styles.xml").replace(os.sep, '/'))
+    names = None
+    depth = 0
+    body = None
+    table_depth = 0  # Profondeur de la table de premier niveau ouverte (0 : aucune)
+    table_rows = []
+    above = {}
+    sections = 0
+    with archive.open(part) as stream:
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if names is None:
+                    names = _Names(element.tag[1:].split('}', 1)[0] if element.tag.startswith('{') else _W_NS)
+                elif depth == 2 and element.tag == names.body:
+                    body = element
+                elif depth == 3 and element.tag == names.tbl:
+                    table_depth = depth
+                    table_rows = []
+                    above = {}
+                continue
+            depth -= 1
+            tag = element.tag
+            if tag == names.sectPr:
+                sections += 1
+            if depth == 2 and body is not None:
+                # Fin d'un bloc de premier niveau : émission puis libération
+                if tag == names.p:
+                    style_id, level = _paragraph_level(element, names, styles)
+                    text = _paragraph_text(element, names)
+                    if level is not None:
+                        yield {"type": "heading", "text": text, "level": level, "style": style_id}
+                    else:
+                        yield {"type": "paragraph", "text": text, "style": style_id}
+                elif tag == names.tbl:
+                    yield {"type": "table", "rows": table_rows}
+                    table_depth = 0
+                body.clear()
+            elif table_depth and depth == table_depth and tag == names.tr:
+                # Fin d'une ligne de la table de premier niveau : seule la ligne est gardée en texte
+                values, above = _row_cells(element, names, above)
+                table_rows.append(values)
+                element.clear()
+    yield {"type": "sections", "count": sections}
+
+
+def _iter_python_docx_blocks(file_path):
+    """Blocs du document lus avec python-docx (repli)."""
+    import docx
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(file_path)
+    for item in document.iter_inner_content():
+        if isinstance(item, Paragraph):
+            style_name = item.style.name if item.style is not None else None
+            match = _HEADING_NAME.match((style_name or '').strip())
+            level = int(match.group(1)) if match else (0 if (style_name or '').strip().lower() in _TITLE_NAMES else None)
+            style_id = item.style.style_id if item.style is not None else None
+            if level is not None:
+                yield {"type": "heading", "text": item.text, "level": level, "style": style_id}
+            else:
+                yield {"type": "paragraph", "text": item.text, "style": style_id}
+        elif isinstance(item, Table):
+            yield {"type": "table", "rows": [[cell.text for cell in row.cells] for row in item.rows]}
+    yield {"type": "sections", "count": len(document.sections)}
+
+
+def iter_docx_blocks(file_path, backend=None):
+    """
+    Parcourt les blocs de premier niveau d'un document Word, dans l'ordre du document.
+
+    Args:
+        file_path (str): Chemin du fichier .docx (ou objet fichier)
+        backend (str): 'stream' ou 'python-docx' pour forcer un moteur (par défaut :
+            flux, python-docx en repli si l'archive n'est pas lisible)
+
+    Yields:
+        dict: {"type": "paragraph", "text", "style"}, {"type": "heading", "text", "level",
+            "style"}, {"type": "table", "rows"} puis un dernier {"type": "sections", "count"}
+    """
+    if backend == 'python-docx':
+        yield from _iter_python_docx_blocks(file_path)
+        return
+    emitted = 0
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            for block in _iter_stream_blocks(archive):
+                emitted += 1
+                yield block
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        # Repli uniquement si rien n'a encore été émis (sinon les blocs seraient dupliqués)
+        if backend == 'stream' or emitted:
+            raise
+        print(f"Lecture en flux impossible ({e}), repli sur python-docx", file=sys.stderr)
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)
+        yield from _iter_python_docx_blocks(file_path)
+
+
+def extract_docx(file_path, on_paragraphs=None, backend=None,
+                 chunk_size=PARAGRAPH_CHUNK_SIZE, first_chunk_size=FIRST_PARAGRAPH_CHUNK_SIZE):
+    """
+    Extrait paragraphes, titres et tableaux d'un document Word.
+
+    Args:
+        file_path (str): Chemin du fichier .docx
+        on_paragraphs (callable): Rappel optionnel on_paragraphs(paragraphes, offset) appelé
+            par paquets au fil de la lecture (premier paquet réduit pour un affichage immédiat)
+        backend (str): Moteur forcé (voir iter_docx_blocks)
+        chunk_size (int): Taille des paquets suivants
+        first_chunk_size (int): Taille du premier paquet
+
+    Returns:
+        dict: paragraphs (titres compris), headings ({index, level, text}), tables
+            (listes de lignes), paragraph_count, table_count, section_count
+    """
+    paragraphs = []
+    headings = []
+    tables = []
+    sections = 0
+    sent = 0
+    size = first_chunk_size
+    for block in iter_docx_blocks(file_path, backend):
+        kind = block["type"]
+        if kind == "table":
+            tables.append(block["rows"])
+        elif kind == "sections":
+            sections = block["count"]
+        else:
+            if kind == "heading":
+                headings.append({"index": len(paragraphs), "level": block["level"], "text": block["text"]})
+            paragraphs.append(block["text"])
+            if on_paragraphs and len(paragraphs) - sent >= size:
+                on_paragraphs(paragraphs[sent:], sent)
+                sent = len(paragraphs)
+                size = chunk_size
+    if on_paragraphs and (len(paragraphs) > sent or not paragraphs):
+        on_paragraphs(paragraphs[sent:], sent)
+    return {
+        "paragraphs": paragraphs,
+        "headings": headings,
+        "tables": tables,
+        "paragraph_count": len(paragraphs),
+        "table_count": len(tables),
+        "section_count": sections,
+    }
+
+
+_BENCHMARK_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+
+_BENCHMARK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<Relationships xmlns="{_PKG_REL_NS}"><Relationship Id="rId1" Type="{_OFFICE_DOCUMENT_TYPES[0]}" '
+    'Target="word/document.xml"/></Relationships>'
+)
+
+_BENCHMARK_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<Relationships xmlns="{_PKG_REL_NS}"><Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_BENCHMARK_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles xmlns:w="{_W_NS}">'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Titre2"><w:name w:val="Titre 2"/></w:style>'
+    '</w:styles>'
+)
+
+
+def write_benchmark_docx(output_path, paragraphs=50000, table_every=200, table_rows=20, table_cols=6):
+    """
+    Génère un document Word volumineux : titres, paragraphes avec tabulations et sauts
+    de ligne, tableaux avec cellules fusionnées horizontalement et verticalement.
+
+    Returns:
+        str: Chemin du document
+    """
+    def run(text):
+        return f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>'
+
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _BENCHMARK_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _BENCHMARK_RELS)
+        archive.writestr('word/_rels/document.xml.rels', _BENCHMARK_DOCUMENT_RELS)
+        archive.writestr('word/styles.xml', _BENCHMARK_STYLES)
+        with archive.open('word/document.xml', 'w', force_zip64=True) as raw:
+            raw.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document xmlns:w="{_W_NS}">'
+                      '<w:body>'.encode('utf-8'))
+            buffer = []
+            for index in range(paragraphs):
+                if index % 50 == 0:
+                    style = 'Heading1' if index % 100 == 0 else 'Titre2'
+                    buffer.append(f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr>{run(f"Partie {index // 50}")}</w:p>')
+                else:
+                    buffer.append(f'<w:p>{run(f"Paragraphe {index} : chiffre d’affaires &amp; marge")}'
+                                  f'<w:r><w:tab/><w:t>{index * 3}</w:t><w:br/><w:t>suite</w:t></w:r></w:p>')
+                if table_every and index % table_every == table_every - 1:
+                    buffer.append('<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/></w:tblPr>')
+                    for row in range(table_rows):
+                        cells = []
+                        column = 0
+                        while column < table_cols:
+                            if column == 0 and row % 4:
+                                # Fusion verticale de la première colonne par groupes de 4 lignes
+                                cells.append('<w:tc><w:tcPr><w:vMerge/></w:tcPr><w:p/></w:tc>')
+                                column += 1
+                            elif column == 1 and row % 2 == 0:
+                                cells.append(f'<w:tc><w:tcPr><w:gridSpan w:val="2"/></w:tcPr>'
+                                             f'<w:p>{run(f"L{row} fusion")}</w:p></w:tc>')
+                                column += 2
+                            else:
+                                merge = '<w:tcPr><w:vMerge w:val="restart"/></w:tcPr>' if column == 0 else ''
+                                cells.append(f'<w:tc>{merge}<w:p>{run(f"L{row}C{column}")}</w:p>'
+                                             f'<w:p>{run(str(row * column))}</w:p></w:tc>')
+                                column += 1
+                        buffer.append(f'<w:tr>{"".join(cells)}</w:tr>')
+                    buffer.append('</w:tbl>')
+                if len(buffer) >= 1000:
+                    raw.write(''.join(buffer).encode('utf-8'))
+                    buffer.clear()
+            buffer.append('<w:sectPr><w:pgSz w:w="11906" w:h="16838"/></w:sectPr></w:body></w:document>')
+            raw.write(''.join(buffer).encode('utf-8'))
+    return output_path
+
+
+def benchmark_docx(paragraphs=50000, backends=('stream', 'python-docx'), memory=False):
+    """
+    Compare les moteurs d'extraction sur un document généré (paragraphes par seconde).
+
+    Args:
+        paragraphs (int): Nombre de paragraphes du document
+        backends (tuple): Moteurs mesurés
+        memory (bool): Mesure aussi le pic mémoire Python (tracemalloc, ralentit la mesure)
+
+    Returns:
+        dict: Taille du document et, par moteur : durée, paragraphes/s, tableaux, pic
+            mémoire éventuel et concordance avec le premier moteur
+    """
+    import tempfile
+    import tracemalloc
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_benchmark_docx(os.path.join(directory, 'benchmark.docx'), paragraphs)
+        results = {"paragraphs": paragraphs, "file_bytes": os.path.getsize(path), "backends": {}}
+        reference = None
+        for backend in backends:
+            if memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            extracted = extract_docx(path, backend=backend)
+            elapsed = time.perf_counter() - started
+            measure = {
+                "ms": round(elapsed * 1000, 1),
+                "paragraphs_per_s": round(extracted["paragraph_count"] / elapsed) if elapsed else None,
+                "tables": extracted["table_count"],
+                "headings": len(extracted["headings"]),
+            }
+            if memory:
+                measure["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+                tracemalloc.stop()
+            if reference is None:
+                reference = extracted
+            else:
+                measure["same_paragraphs"] = extracted["paragraphs"] == reference["paragraphs"]
+                measure["same_tables"] = extracted["tables"] == reference["tables"]
+                measure["same_headings"] = extracted["headings"] == reference["headings"]
+            results["backends"][backend] = measure
+    return results
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        args = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+        print(dumps(benchmark_docx(int(args[0]) if args else 50000, memory='--memory' in sys.argv)))
+        sys.exit(0)
+
+    if len(sys.argv) < 2:
+        print("Usage: python docx_stream.py <fichier.docx> [stream|python-docx] | benchmark [paragraphes] [--memory]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    result = extract_docx(sys.argv[1], backend=sys.argv[2] if len(sys.argv) > 2 else None)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    print(dumps(result))
@@ -9,17 +9,22 @@ Utilisé par l'agent Excel de l'application ABIA.
 """
 
 import sys
-import json
 import pandas as pd
-import numpy as np
 from pathlib import Path
 
-def analyze_excel(file_path):
+from dataframe_compact import compact_dataframe
+from excel_engines import read_workbook
+from json_output import dumps
+from workbook_probe import probe_workbook
+
+def analyze_excel(file_path, engine=None, compact=False):
     """
     Analyse un fichier Excel et retourne des statistiques détaillées.
     
     Args:
         file_path (str): Chemin vers le fichier Excel
+        engine (str): Moteur de lecture imposé (voir excel_engines.py, sélection automatique si None)
+        compact (bool): Compacter les feuilles après lecture (voir dataframe_compact.py)
     
     Returns:
         dict: Résultats de l'analyse
@@ -27,17 +32,27 @@ def analyze_excel(file_path):
     try:
         # Vérifier si le fichier existe
         if not Path(file_path).exists():
-            return json.dumps({"error": f"Le fichier {file_path} n'existe pas."})
+            return dumps({"error": f"Le fichier {file_path} n'existe pas."})
+        
+        # Sonder le classeur puis lire toutes les feuilles depuis le contenu déjà chargé
+        probe = probe_workbook(file_path)
+        with probe.open() as source:
+            sheets, used_engine = read_workbook(file_path, engine, source=source)
+        sheet_names = list(sheets.keys())
         
-        # Lire le fichier Excel
-        excel_file = pd.ExcelFile(file_path)
-        sheet_names = excel_file.sheet_names
+        # Compacter les feuilles avant l'analyse pour réduire l'empreinte mémoire
+        memory_reports = {}
+        if compact:
+            for sheet_name in sheet_names:
+                sheets[sheet_name], memory_reports[sheet_name] = compact_dataframe(sheets[sheet_name])
         
         result = {
             "metadata": {
                 "file_path": file_path,
                 "sheet_count": len(sheet_names),
-                "sheets": sheet_names
+                "sheets": sheet_names,
+                "dimensions": {sheet["name"]: sheet["dimension"] for sheet in probe.sheets},
+                "engine": used_engine
             },
             "analysis": {
                 "summary": {
@@ -52,8 +67,7 @@ def analyze_excel(file_path):
         }
         
         # Analyser chaque feuille
-        for sheet_name in sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
+        for sheet_name, df in sheets.items():
             
             # Statistiques de base
             row_count = len(df)
@@ -66,6 +80,8 @@ def analyze_excel(file_path):
                 "column_count": col_count,
                 "columns": {}
             }
+            if sheet_name in memory_reports:
+                sheet_analysis["memory"] = memory_reports[sheet_name]
             
             # Analyser chaque colonne
             for column in df.columns:
@@ -81,7 +97,7 @@ def analyze_excel(file_path):
                 }
                 
                 # Statistiques spécifiques selon le type de données
-                if np.issubdtype(col_data.dtype, np.number):
+                if pd.api.types.is_numeric_dtype(col_data.dtype) and not pd.api.types.is_bool_dtype(col_data.dtype):
                     # Colonne numérique
                     numeric_data = col_data.dropna()
                     if len(numeric_data) > 0:
@@ -99,7 +115,8 @@ def analyze_excel(file_path):
                         })
                     result["analysis"]["summary"]["numeric_columns"][str(column)] = sheet_name
                 
-                elif col_data.dtype == 'object':
+                elif (pd.api.types.is_object_dtype(col_data.dtype) or pd.api.types.is_string_dtype(col_data.dtype)
+                      or isinstance(col_data.dtype, pd.CategoricalDtype)):
                     # Colonne catégorielle (texte)
                     text_data = col_data.dropna()
                     if len(text_data) > 0:
@@ -130,16 +147,17 @@ def analyze_excel(file_path):
             
             result["analysis"]["sheets"][sheet_name] = sheet_analysis
         
-        return json.dumps(result)
+        return dumps(result)
     
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 if __name__ == "__main__":
     # Vérifier si un chemin de fichier a été fourni
     if len(sys.argv) < 2:
-        print(json.dumps({"error": "Aucun chemin de fichier fourni."}))
+        print(dumps({"error": "Aucun chemin de fichier fourni."}))
         sys.exit(1)
     
     file_path = sys.argv[1]
-    print(analyze_excel(file_path))
+    engine = sys.argv[sys.argv.index("--engine") + 1] if "--engine" in sys.argv[:-1] else None
+    print(analyze_excel(file_path, engine, compact="--compact" in sys.argv))
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Excel Consolidation
+-------------------
+Agrégation de plusieurs classeurs Excel/CSV en un seul passage.
+Utilisé par l'agent Excel de l'application ABIA pour les consolidations périodiques.
+
+Chaque fichier est lu dans un processus de travail qui aligne les feuilles et
+colonnes par nom puis réduit immédiatement les lignes en agrégats partiels
+(somme, effectif, min, max, somme des carrés). Le processus principal ne conserve
+que ces agrégats : la mémoire est proportionnelle au nombre de groupes et non
+au nombre de lignes lues.
+"""
+
+import glob
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from csv_ingest import CSV_SHEET_NAME, iter_csv_chunks
+from excel_engines import read_workbook
+from json_output import dataframe_to_records, write_json
+from ndjson_protocol import FrameWriter, pop_ndjson_flag
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.csv')
+SUPPORTED_AGGREGATIONS = ('sum', 'count', 'mean', 'min', 'max', 'std')
+
+# Nom de la dimension ajoutée lorsque les feuilles sont consolidées séparément
+SHEET_KEY = 'feuille'
+
+
+def normalize_name(name):
+    """
+    Normalise un nom de feuille ou de colonne pour l'alignement entre fichiers.
+
+    Les accents, la casse et les espaces/underscores superflus sont ignorés.
+
+    Args:
+        name: Nom d'origine
+
+    Returns:
+        str: Nom normalisé
+    """
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'[\s_]+', ' ', text).strip().lower()
+
+
+def expand_inputs(inputs):
+    """
+    Développe une liste de chemins et de motifs glob en fichiers existants.
+
+    Args:
+        inputs (list|str): Chemins, dossiers ou motifs (ex: 'rapports/*.xlsx')
+
+    Returns:
+        list: Chemins uniques et triés des fichiers supportés
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        elif glob.has_magic(item):
+            candidates = glob.glob(item, recursive=True)
+        else:
+            candidates = [item]
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS:
+                files.append(os.path.abspath(path))
+    return sorted(set(files))
+
+
+def _iter_sheets(file_path, sheets, engine=None):
+    """
+    Parcourt les feuilles demandées d'un fichier sous forme de paires (nom, DataFrame).
+
+    Les fichiers CSV sont lus par blocs : une même feuille peut apparaître plusieurs fois.
+    """
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        if sheets and normalize_name(CSV_SHEET_NAME) not in {normalize_name(s) for s in sheets}:
+            return
+        for chunk in iter_csv_chunks(file_path):
+            yield CSV_SHEET_NAME, chunk
+        return
+    frames, _ = read_workbook(file_path, engine)
+    wanted = {normalize_name(s) for s in sheets} if sheets else None
+    for name, df in frames.items():
+        if wanted is None or normalize_name(name) in wanted:
+            yield name, df
+
+
+def _partial_aggregates(df, group_keys, value_keys):
+    """
+    Réduit un DataFrame aligné en agrégats partiels fusionnables.
+
+    Returns:
+        DataFrame: Index = clés de regroupement, colonnes = (valeur, statistique)
+    """
+    values = df[value_keys].apply(pd.to_numeric, errors='coerce')
+    squares = values.pow(2)
+    if group_keys:
+        keys = [df[k].astype(object).where(df[k].notna(), None) for k in group_keys]
+        grouped_values = values.groupby(keys, dropna=False, sort=False)
+        grouped_squares = squares.groupby(keys, dropna=False, sort=False)
+        stats = {
+            'sum': grouped_values.sum(min_count=1),
+            'count': grouped_values.count(),
+            'min': grouped_values.min(),
+            'max': grouped_values.max(),
+            'sumsq': grouped_squares.sum(min_count=1),
+        }
+    else:
+        stats = {
+            'sum': values.sum(min_count=1).to_frame().T,
+            'count': values.count().to_frame().T,
+            'min': values.min().to_frame().T,
+            'max': values.max().to_frame().T,
+            'sumsq': squares.sum(min_count=1).to_frame().T,
+        }
+    return pd.concat(stats, axis=1).swaplevel(0, 1, axis=1)
+
+
+def aggregate_file(file_path, group_by=None, values=None, sheets=None, by_sheet=False):
+    """
+    Lit un fichier et le réduit en agrégats partiels (exécuté dans un processus de travail).
+
+    Args:
+        file_path (str): Chemin du fichier
+        group_by (list): Colonnes de regroupement (noms alignés)
+        values (list): Colonnes de valeurs (toutes les colonnes numériques si None)
+        sheets (list): Feuilles à inclure (toutes si None)
+        by_sheet (bool): Ajouter la feuille comme dimension de regroupement
+
+    Returns:
+        dict: Agrégats partiels, noms d'origine des colonnes et informations du fichier
+    """
+    info = {"file": os.path.basename(file_path), "path": file_path, "rows": 0, "sheets": []}
+    group_keys = [normalize_name(c) for c in (group_by or [])]
+    wanted_values = [normalize_name(c) for c in values] if values else None
+    names = {}
+    partials = []
+
+    try:
+        for sheet_name, df in _iter_sheets(file_path, sheets):
+            _aggregate_sheet(sheet_name, df, group_keys, wanted_values, by_sheet, info, names, partials)
+    except Exception as e:
+        info["error"] = str(e)
+        return {"info": info, "partials": None, "names": {}}
+
+    partial = _merge_partials(partials) if partials else None
+    return {"info": info, "partials": partial, "names": names}
+
+
+def _aggregate_sheet(sheet_name, df, group_keys, wanted_values, by_sheet, info, names, partials):
+    """Aligne les colonnes d'une feuille (ou d'un bloc CSV) et ajoute ses agrégats partiels."""
+    # Aligner les colonnes par nom normalisé (la première occurrence l'emporte)
+    originals = list(df.columns)
+    normalized = [normalize_name(c) for c in originals]
+    keep = ~pd.Index(normalized).duplicated()
+    df = df.loc[:, keep]
+    df.columns = [n for n, k in zip(normalized, keep) if k]
+    for original, key in zip(originals, normalized):
+        names.setdefault(key, str(original))
+
+    if str(sheet_name) not in info["sheets"]:
+        info["sheets"].append(str(sheet_name))
+    info["rows"] += len(df)
+
+    keys = list(group_keys)
+    if by_sheet:
+        df[SHEET_KEY] = normalize_name(sheet_name)
+        names.setdefault(SHEET_KEY, SHEET_KEY)
+        keys.append(SHEET_KEY)
+
+    if any(k not in df.columns for k in keys):
+        return
+    if wanted_values is None:
+        value_keys = [c for c in df.columns
+                      if c not in keys and pd.api.types.is_numeric_dtype(df[c])
+                      and not pd.api.types.is_bool_dtype(df[c])]
+    else:
+        value_keys = [c for c in wanted_values if c in df.columns]
+    if not value_keys or len(df) == 0:
+        return
+    partials.append(_partial_aggregates(df, keys, value_keys))
+
+
+def _merge_partials(partials):
+    """Fusionne des agrégats partiels (sommes additionnées, min/max combinés)."""
+    combined = pd.concat(partials, axis=0, sort=False)
+    if len(partials) == 1 and combined.index.is_unique:
+        return combined
+    level = list(range(combined.index.nlevels))
+    merged = {}
+    for stat in ('sum', 'count', 'min', 'max', 'sumsq'):
+        block = combined.xs(stat, axis=1, level=1).groupby(level=level, dropna=False, sort=False)
+        if stat in ('sum', 'sumsq'):
+            merged[stat] = block.sum(min_count=1)
+        elif stat == 'count':
+            merged[stat] = block.sum()
+        elif stat == 'min':
+            merged[stat] = block.min()
+        else:
+            merged[stat] = block.max()
+    return pd.concat(merged, axis=1).swaplevel(0, 1, axis=1)
+
+
+def _finalize(partial, aggregations):
+    """Calcule les agrégations demandées à partir des agrégats partiels."""
+    result = {}
+    value_keys = list(dict.fromkeys(partial.columns.get_level_values(0)))
+    for value in value_keys:
+        block = partial[value]
+        total = block['sum']
+        count = block['count']
+        for agg in aggregations:
+            if agg == 'sum':
+                result[(value, agg)] = total
+            elif agg == 'count':
+                result[(value, agg)] = count
+            elif agg == 'mean':
+                result[(value, agg)] = total / count.replace(0, np.nan)
+            elif agg == 'min':
+                result[(value, agg)] = block['min']
+            elif agg == 'max':
+                result[(value, agg)] = block['max']
+            elif agg == 'std':
+                variance = (block['sumsq'] - total.pow(2) / count.replace(0, np.nan)) / (count - 1).where(count > 1)
+                result[(value, agg)] = np.sqrt(variance.clip(lower=0))
+    return pd.DataFrame(result, index=partial.index)
+
+
+def _flatten(frame, names, index_names):
+    """Aplati un tableau d'agrégats en enregistrements JSON avec les noms d'origine."""
+    frame = frame.copy()
+    frame.columns = [f"{names.get(v, v)}_{agg}" for v, agg in frame.columns]
+    frame.index.names = [names.get(k, k) for k in index_names] if index_names else [None]
+    if index_names:
+        frame = frame.reset_index()
+    return dataframe_to_records(frame)
+
+
+def consolidate_workbooks(inputs, group_by=None, values=None, aggregations=('sum', 'count', 'mean'),
+                          pivot=None, sheets=None, by_sheet=False, max_workers=None,
+                          use_processes=True, on_file_done=None):
+    """
+    Consolide un ensemble de classeurs : agrégats globaux, pivot et écarts par fichier.
+
+    Args:
+        inputs (list|str): Fichiers, dossiers ou motifs glob
+        group_by (list): Colonnes de regroupement
+        values (list): Colonnes de valeurs (toutes les colonnes numériques si None)
+        aggregations (tuple): Agrégations parmi SUPPORTED_AGGREGATIONS
+        pivot (str): Colonne de regroupement à placer en colonnes du tableau croisé
+        sheets (list): Feuilles à inclure (toutes si None)
+        by_sheet (bool): Consolider chaque feuille séparément
+        max_workers (int): Nombre de lectures parallèles
+        use_processes (bool): Lire dans des processus (sinon des threads)
+        on_file_done (callable): Rappel (info, terminés, total) après chaque fichier
+
+    Returns:
+        dict: Résultat consolidé compact
+    """
+    files = expand_inputs(inputs)
+    if not files:
+        return {"error": "Aucun fichier Excel ou CSV trouvé pour la consolidation"}
+    unknown = [a for a in aggregations if a not in SUPPORTED_AGGREGATIONS]
+    if unknown:
+        return {"error": f"Agrégations non supportées: {', '.join(unknown)}"}
+
+    group_by = list(group_by or [])
+    if pivot and pivot not in group_by:
+        group_by.append(pivot)
+
+    executor_class = ProcessPoolExecutor if use_processes and len(files) > 1 else ThreadPoolExecutor
+    workers = max_workers or min(len(files), os.cpu_count() or 1)
+
+    outcomes = {}
+    with executor_class(max_workers=workers) as executor:
+        futures = {
+            executor.submit(aggregate_file, path, group_by, values, sheets, by_sheet): path
+            for path in files
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                outcomes[path] = future.result()
+            except Exception as e:
+                outcomes[path] = {"info": {"file": os.path.basename(path), "path": path, "error": str(e)},
+                                  "partials": None, "names": {}}
+            if on_file_done:
+                on_file_done(outcomes[path]["info"], done, len(files))
+
+    names = {}
+    per_file = []
+    for path in files:
+        outcome = outcomes[path]
+        for key, original in outcome["names"].items():
+            names.setdefault(key, original)
+        if outcome["partials"] is not None:
+            per_file.append((outcome["info"]["file"], outcome["partials"]))
+
+    result = {
+        "files": [outcomes[path]["info"] for path in files],
+        "file_count": len(files),
+        "total_rows": int(sum(outcomes[p]["info"].get("rows", 0) for p in files)),
+        "group_by": [names.get(normalize_name(c), c) for c in group_by],
+        "aggregations": list(aggregations),
+        "columns": names,
+    }
+    if not per_file:
+        result["error"] = "Aucune donnée agrégeable (colonnes de regroupement ou de valeurs introuvables)"
+        return result
+
+    group_keys = [normalize_name(c) for c in group_by] + ([SHEET_KEY] if by_sheet else [])
+    consolidated = _finalize(_merge_partials([p for _, p in per_file]), aggregations)
+    result["aggregates"] = _flatten(consolidated, names, group_keys)
+
+    # Tableau croisé : la dimension pivot passe en colonnes
+    if pivot and group_keys:
+        pivot_key = normalize_name(pivot)
+        pivot_table = consolidated.unstack(level=group_keys.index(pivot_key)) if len(group_keys) > 1 \
+            else consolidated.T
+        if len(group_keys) > 1:
+            pivot_table.columns = [f"{names.get(v, v)}_{agg}_{p}" for v, agg, p in pivot_table.columns]
+            row_keys = [k for k in group_keys if k != pivot_key]
+            pivot_table.index.names = [names.get(k, k) for k in row_keys]
+            result["pivot"] = dataframe_to_records(pivot_table.reset_index())
+        else:
+            pivot_table.index = [f"{names.get(v, v)}_{agg}" for v, agg in pivot_table.index]
+            pivot_table.columns = [str(c) for c in pivot_table.columns]
+            result["pivot"] = dataframe_to_records(pivot_table.reset_index(names="mesure"))
+
+    # Totaux par fichier et écarts entre fichiers consécutifs (ordre des noms)
+    totals = []
+    previous = None
+    for file_name, partial in per_file:
+        sums = partial.xs('sum', axis=1, level=1).sum(min_count=1)
+        entry = {"file": file_name,
+                 "totals": {names.get(k, k): (None if pd.isna(v) else float(v)) for k, v in sums.items()}}
+        if previous is not None:
+            deltas = {}
+            for key, value in entry["totals"].items():
+                before = previous["totals"].get(key)
+                if value is None or before is None:
+                    continue
+                deltas[key] = {
+                    "absolute": value - before,
+                    "percent": (value - before) / abs(before) * 100 if before else None,
+                }
+            entry["delta_vs_previous"] = deltas
+        totals.append(entry)
+        previous = entry
+    result["per_file"] = totals
+    return result
+
+
+def _split_list(value):
+    """Découpe une option de type 'a,b,c' en liste."""
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+if __name__ == "__main__":
+    writer = FrameWriter('excel_consolidation') if pop_ndjson_flag(sys.argv) else None
+    usage = ("Usage: python excel_consolidation.py <fichiers|dossier|motif>... [--group-by a,b] "
+             "[--values x,y] [--agg sum,mean] [--pivot colonne] [--sheets s1,s2] [--by-sheet] "
+             "[--workers n] [--ndjson]")
+
+    inputs = []
+    options = {}
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ('--group-by', '--values', '--agg', '--pivot', '--sheets', '--workers') and i + 1 < len(args):
+            options[arg] = args[i + 1]
+            i += 2
+        elif arg == '--by-sheet':
+            options[arg] = True
+            i += 1
+        else:
+            inputs.append(arg)
+            i += 1
+
+    if not inputs:
+        if writer:
+            writer.error(usage)
+        else:
+            write_json({"error": usage})
+        sys.exit(1)
+
+    def report(info, done, total):
+        if writer:
+            writer.progress("consolidation", round(done * 90 / total, 1), f"{info['file']} traité ({done}/{total})")
+
+    result = consolidate_workbooks(
+        inputs,
+        group_by=_split_list(options.get('--group-by')),
+        values=_split_list(options.get('--values')),
+        aggregations=tuple(_split_list(options.get('--agg')) or ('sum', 'count', 'mean')),
+        pivot=options.get('--pivot'),
+        sheets=_split_list(options.get('--sheets')),
+        by_sheet=options.get('--by-sheet', False),
+        max_workers=int(options['--workers']) if '--workers' in options else None,
+        on_file_done=report,
+    )
+
+    if writer:
+        if "error" in result and "aggregates" not in result:
+            writer.error(result["error"], details={"files": result.get("files", [])})
+        else:
+            writer.result(result)
+        writer.metrics(files=result.get("file_count"), rows=result.get("total_rows"))
+    else:
+        write_json(result)
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Excel Engines
+-------------
+Sélection du moteur de lecture des classeurs pour les scripts Excel de l'application ABIA.
+
+Moteurs pris en charge :
+- calamine : lecteur Rust via pandas (engine='calamine'), si python-calamine est installé
+- openpyxl : lecteur .xlsx/.xlsm en mode lecture seule
+- xlrd     : lecteur .xls (BIFF)
+- csv      : lecteur CSV avec détection de l'encodage et du dialecte (voir csv_ingest.py)
+
+Le moteur est choisi automatiquement selon l'extension du fichier (calamine en
+priorité : il est plus rapide qu'openpyxl quelle que soit la taille du classeur,
+y compris avec nrows), avec une surcharge possible à chaque appel. En cas
+d'échec, le moteur suivant de la liste des candidats est essayé.
+"""
+
+import datetime
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from csv_ingest import CSV_SHEET_NAME, iter_csv_chunks, read_csv
+
+ENGINES = ('calamine', 'openpyxl', 'xlrd', 'csv')
+
+# Moteurs capables de lire chaque extension, par ordre de préférence
+ENGINES_BY_EXTENSION = {
+    '.xlsx': ('calamine', 'openpyxl'),
+    '.xlsm': ('calamine', 'openpyxl'),
+    '.xls': ('calamine', 'xlrd'),
+    '.csv': ('csv',),
+}
+
+
+def _pandas_supports_calamine():
+    """pandas >= 2.2 accepte engine='calamine'."""
+    major, minor = (int(part) for part in pd.__version__.split('.')[:2])
+    return (major, minor) >= (2, 2)
+
+
+def available_engines():
+    """
+    Liste les moteurs utilisables dans l'environnement courant.
+
+    Returns:
+        list: Noms des moteurs disponibles
+    """
+    engines = []
+    if _pandas_supports_calamine() and importlib.util.find_spec('python_calamine') is not None:
+        engines.append('calamine')
+    if importlib.util.find_spec('openpyxl') is not None:
+        engines.append('openpyxl')
+    if importlib.util.find_spec('xlrd') is not None:
+        engines.append('xlrd')
+    engines.append('csv')
+    return engines
+
+
+def engine_candidates(file_path, engine=None):
+    """
+    Détermine les moteurs à essayer pour un fichier, dans l'ordre.
+
+    Args:
+        file_path (str): Chemin du fichier
+        engine (str): Moteur imposé (None ou 'auto' pour une sélection automatique)
+
+    Returns:
+        list: Moteurs candidats (le premier est le moteur sélectionné)
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    supported = ENGINES_BY_EXTENSION.get(file_ext)
+    if supported is None:
+        raise ValueError(f"Le format de fichier {file_ext} n'est pas pris en charge")
+
+    available = available_engines()
+    candidates = [e for e in supported if e in available]
+
+    if engine and engine != 'auto':
+        if engine not in ENGINES:
+            raise ValueError(f"Moteur de lecture inconnu: {engine}")
+        if engine not in candidates:
+            raise ValueError(f"Le moteur {engine} n'est pas disponible pour les fichiers {file_ext}")
+        return [engine] + [e for e in candidates if e != engine]
+    return candidates
+
+
+def select_engine(file_path, engine=None):
+    """
+    Sélectionne le moteur de lecture d'un fichier.
+
+    Args:
+        file_path (str): Chemin du fichier
+        engine (str): Moteur imposé (optionnel)
+
+    Returns:
+        str: Nom du moteur
+    """
+    return engine_candidates(file_path, engine)[0]
+
+
+def list_sheets(file_path, engine=None):
+    """
+    Liste les feuilles d'un classeur sans charger les cellules.
+
+    Args:
+        file_path (str): Chemin du fichier
+        engine (str): Moteur imposé (optionnel)
+
+    Returns:
+        list: Noms des feuilles
+    """
+    last_error = None
+    for candidate in engine_candidates(file_path, engine):
+        try:
+            if candidate == 'csv':
+                return [CSV_SHEET_NAME]
+            if candidate == 'openpyxl':
+                from openpyxl import load_workbook
+                workbook = load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    return list(workbook.sheetnames)
+                finally:
+                    workbook.close()
+            if candidate == 'xlrd':
+                import xlrd
+                workbook = xlrd.open_workbook(file_path, on_demand=True, formatting_info=False)
+                try:
+                    return workbook.sheet_names()
+                finally:
+                    workbook.release_resources()
+            with pd.ExcelFile(file_path, engine=candidate) as excel_file:
+                return list(excel_file.sheet_names)
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+
+def _read_with_engine(file_path, candidate, sheet, nrows, **kwargs):
+    """Lit une feuille (ou toutes si sheet=None) avec un moteur donné."""
+    if candidate == 'csv':
+        df = read_csv(file_path, nrows=nrows, **kwargs)
+        return {CSV_SHEET_NAME: df} if sheet is None else df
+    try:
+        return pd.read_excel(file_path, sheet_name=sheet, nrows=nrows, engine=candidate, **kwargs)
+    except ValueError as ve:
+        # Certaines versions de xlrd refusent nrows : lecture complète puis troncature
+        if nrows is not None and "nrows" in str(ve):
+            data = pd.read_excel(file_path, sheet_name=sheet, engine=candidate, **kwargs)
+            if isinstance(data, dict):
+                return {name: df.head(nrows) for name, df in data.items()}
+            return data.head(nrows)
+        raise
+
+
+def read_sheet(file_path, sheet=0, nrows=None, engine=None, source=None, **kwargs):
+    """
+    Lit une feuille avec le moteur sélectionné, en essayant les suivants en cas d'échec.
+
+    Args:
+        file_path (str): Chemin du fichier (détermine les moteurs candidats)
+        sheet (int|str): Index ou nom de la feuille (None pour toutes les feuilles)
+        nrows (int): Nombre maximal de lignes (None pour toutes)
+        engine (str): Moteur imposé (optionnel)
+        source: Contenu déjà chargé à lire à la place du fichier (ex: WorkbookProbe.open())
+        **kwargs: Options transmises à pandas
+
+    Returns:
+        tuple: (DataFrame ou dict de DataFrames, moteur utilisé)
+    """
+    last_error = None
+    for candidate in engine_candidates(file_path, engine):
+        try:
+            if source is not None and hasattr(source, 'seek'):
+                source.seek(0)
+            data = source if source is not None else file_path
+            return _read_with_engine(data, candidate, sheet, nrows, **kwargs), candidate
+        except Exception as e:
+            print(f"Lecture de '{file_path}' avec le moteur {candidate} impossible: {str(e)}", file=sys.stderr)
+            last_error = e
+    raise last_error
+
+
+def read_workbook(file_path, engine=None, **kwargs):
+    """
+    Lit toutes les feuilles d'un classeur en une seule ouverture.
+
+    Args:
+        file_path (str): Chemin du fichier
+        engine (str): Moteur imposé (optionnel)
+        **kwargs: Options transmises à read_sheet (dont source)
+
+    Returns:
+        tuple: (dict {nom de feuille: DataFrame}, moteur utilisé)
+    """
+    return read_sheet(file_path, sheet=None, engine=engine, **kwargs)
+
+
+def _iter_raw_rows(file_path, candidate, sheet):
+    """Parcourt les lignes brutes d'une feuille (listes de valeurs), sans DataFrame intermédiaire."""
+    if candidate == 'calamine':
+        from python_calamine import CalamineWorkbook
+        workbook = CalamineWorkbook.from_path(file_path)
+        worksheet = workbook.get_sheet_by_index(sheet) if isinstance(sheet, int) else workbook.get_sheet_by_name(sheet)
+        yield from worksheet.iter_rows()
+    elif candidate == 'openpyxl':
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[sheet] if isinstance(sheet, int) else workbook[sheet]
+            for row in worksheet.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        import xlrd
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            worksheet = workbook.sheet_by_index(sheet) if isinstance(sheet, int) else workbook.sheet_by_name(sheet)
+            for r in range(worksheet.nrows):
+                row = []
+                for cell in worksheet.row(r):
+                    if cell.ctype == xlrd.XL_CELL_DATE:
+                        row.append(xlrd.xldate.xldate_as_datetime(cell.value, workbook.datemode))
+                    elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                        row.append(None)
+                    else:
+                        row.append(cell.value)
+                yield row
+        finally:
+            workbook.release_resources()
+
+
+def _chunk_kind(series):
+    """Nature des valeurs d'une colonne dans un bloc : 'empty', 'numeric', 'datetime' ou 'object'."""
+    if not series.notna().any():
+        return 'empty'
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return 'object'
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return 'datetime'
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred in ('date', 'datetime', 'datetime64'):
+        return 'datetime'
+    if inferred in ('integer', 'floating', 'mixed-integer-float'):
+        return 'numeric'
+    return 'object'
+
+
+def _rows_to_frame(rows, columns, kinds):
+    """
+    Construit un bloc de lignes ; les cellules vides deviennent NaN et les dates datetime64.
+
+    Le type d'une colonne est fixé par le premier bloc où elle a une valeur (`kinds`,
+    complété sur place) : tous les blocs d'une feuille ont ainsi les mêmes types. Les
+    nombres restent en float64, comme dans le classeur, car un bloc suivant peut contenir
+    des cellules vides ou des décimales ; une colonne dont un bloc contredit le type
+    retenu (texte dans une colonne numérique) est rendue en objets, sans perte de valeurs.
+    """
+    width = len(columns)
+    if any(len(row) != width for row in rows):
+        rows = [(list(row) + [None] * width)[:width] for row in rows]
+    df = pd.DataFrame(rows, columns=columns)
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+            # calamine renvoie "" pour les cellules vides
+            series = series.replace("", None)
+        kind = _chunk_kind(series)
+        if kind != 'empty':
+            kinds.setdefault(column, kind)
+        target = kinds.get(column)
+        if target == 'numeric' and kind in ('numeric', 'empty'):
+            series = pd.to_numeric(series, errors='coerce').astype('float64')
+        elif target == 'datetime' and kind in ('datetime', 'empty'):
+            series = pd.to_datetime(series, errors='coerce')
+        else:
+            series = series.astype(object)
+        df[column] = series
+    return df
+
+
+def _iter_engine_chunks(file_path, candidate, sheet, chunk_rows):
+    """Blocs d'une feuille lus avec un moteur donné (voir iter_sheet_chunks)."""
+    rows = _iter_raw_rows(file_path, candidate, sheet)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = []
+    for position, name in enumerate(header):
+        label = f"Unnamed: {position}" if name is None or name == "" else str(name)
+        # Noms dupliqués : suffixes .1, .2... comme pandas
+        base, suffix = label, 1
+        while label in columns:
+            label = f"{base}.{suffix}"
+            suffix += 1
+        columns.append(label)
+
+    kinds = {}
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= chunk_rows:
+            yield _rows_to_frame(buffer, columns, kinds)
+            buffer = []
+    if buffer:
+        yield _rows_to_frame(buffer, columns, kinds)
+
+
+def iter_sheet_chunks(file_path, sheet=0, chunk_rows=50000, engine=None):
+    """
+    Parcourt une feuille par blocs de lignes, en mémoire bornée.
+
+    La première ligne fournit les noms de colonnes, comme pour pandas.read_excel. Comme
+    read_sheet, les moteurs suivants sont essayés si le moteur sélectionné échoue avant
+    le premier bloc ; les types des colonnes sont les mêmes dans tous les blocs.
+
+    Args:
+        file_path (str): Chemin du fichier
+        sheet (int|str): Index ou nom de la feuille
+        chunk_rows (int): Nombre de lignes par bloc
+        engine (str): Moteur imposé (optionnel)
+
+    Yields:
+        DataFrame: Blocs successifs
+    """
+    candidates = engine_candidates(file_path, engine)
+    if candidates[0] == 'csv':
+        yield from iter_csv_chunks(file_path, chunk_rows)
+        return
+
+    last_error = None
+    for candidate in candidates:
+        chunks = _iter_engine_chunks(file_path, candidate, sheet, chunk_rows)
+        try:
+            first = next(chunks, None)
+        except Exception as e:
+            print(f"Lecture de '{file_path}' avec le moteur {candidate} impossible: {str(e)}", file=sys.stderr)
+            last_error = e
+            continue
+        if first is not None:
+            yield first
+            yield from chunks
+        return
+    raise last_error
+
+
+def _generate_workbook(path, rows, cols):
+    """Génère un classeur .xlsx de test (valeurs numériques, textes et dates)."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Données")
+    sheet.append([f"col_{c}" for c in range(cols)])
+    start = datetime.date(2024, 1, 1)
+    labels = ("Nord", "Sud", "Est", "Ouest")
+    for r in range(rows):
+        row = []
+        for c in range(cols):
+            kind = c % 3
+            if kind == 0:
+                row.append(r * 1.5 + c)
+            elif kind == 1:
+                row.append(labels[(r + c) % len(labels)])
+            else:
+                row.append(start + datetime.timedelta(days=r % 365))
+        sheet.append(row)
+    workbook.save(path)
+
+
+def benchmark_engines(rows=(1000, 10000, 50000), cols=10, repeat=3, engines=None):
+    """
+    Mesure le débit (lignes/s) de chaque moteur sur des classeurs générés.
+
+    Args:
+        rows (tuple): Tailles de classeur à générer
+        cols (int): Nombre de colonnes
+        repeat (int): Nombre de mesures par moteur (le meilleur temps est retenu)
+        engines (list): Moteurs à mesurer (tous les moteurs disponibles si None)
+
+    Returns:
+        list: Résultats {"format", "rows", "engine", "seconds", "rows_per_sec"}
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="abia_bench_") as tmp_dir:
+        for row_count in rows:
+            xlsx_path = os.path.join(tmp_dir, f"bench_{row_count}.xlsx")
+            _generate_workbook(xlsx_path, row_count, cols)
+            csv_path = os.path.join(tmp_dir, f"bench_{row_count}.csv")
+            pd.read_excel(xlsx_path, engine='openpyxl').to_csv(csv_path, index=False)
+
+            for path in (xlsx_path, csv_path):
+                file_ext = os.path.splitext(path)[1].lower()
+                for candidate in ENGINES_BY_EXTENSION[file_ext]:
+                    if candidate not in available_engines() or (engines and candidate not in engines):
+                        continue
+                    timings = []
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        _read_with_engine(path, candidate, 0, None)
+                        timings.append(time.perf_counter() - started)
+                    best = min(timings)
+                    results.append({
+                        "format": file_ext,
+                        "rows": row_count,
+                        "engine": candidate,
+                        "seconds": round(best, 4),
+                        "rows_per_sec": int(row_count / best) if best > 0 else None
+                    })
+    return results
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('engines', 'select', 'benchmark'):
+        print("Usage: python excel_engines.py engines | select <file_path> [engine] | benchmark [rows,...] [cols]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'engines':
+        print(dumps({"engines": available_engines()}))
+    elif command == 'select':
+        try:
+            path = sys.argv[2]
+            print(dumps({"file": path, "candidates": engine_candidates(path, sys.argv[3] if len(sys.argv) > 3 else None)}))
+        except (IndexError, ValueError) as e:
+            print(dumps({"error": str(e)}))
+            sys.exit(1)
+    else:
+        sizes = tuple(int(n) for n in sys.argv[2].split(',')) if len(sys.argv) > 2 else (1000, 10000, 50000)
+        columns = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        for entry in benchmark_engines(sizes, columns):
+            print(f"{entry['format']:6} {entry['rows']:>8} lignes  {entry['engine']:9} "
+                  f"{entry['seconds']:>8.4f} s  {entry['rows_per_sec']:>10} lignes/s")
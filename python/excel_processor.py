@@ -9,9 +9,24 @@ import os
 import json
 import pandas as pd
 import numpy as np
-from openpyxl import load_workbook
-import xlrd
 import traceback
+import hashlib
+import tempfile
+import time
+
+from chart_renderer import ChartRenderer, load_chart_specs
+from csv_ingest import CSV_SHEET_NAME, read_csv
+from data_quality import FIRST_DATA_ROW, quality_recommendations, scan_dataframe, scan_sheet
+from dataframe_compact import compact_dataframe
+from excel_engines import iter_sheet_chunks, read_sheet, select_engine
+from json_output import dataframe_to_records, dumps, to_jsonable, write_json
+from json_scanner import extract_json_objects
+from ndjson_protocol import FrameWriter, pop_ndjson_flag
+from prompt_packer import CHARS_PER_TOKEN, pack_dataframe, pack_text_lines
+from report_export import export_report
+from sampling import SAMPLING_METHODS, sample_sheet
+from time_series import time_series_frame, time_series_sheet
+from workbook_probe import probe_workbook
 
 def convert_sections_to_array(sections_dict):
     """
@@ -31,7 +46,22 @@ def convert_sections_to_array(sections_dict):
         })
     return sections_array
 
-def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols=20, sheet_index=0):
+def _sample_rows(file_path, sheet_index, max_rows, engine, sampling, stratify_column):
+    """
+    Lit un échantillon représentatif de la feuille et les agrégats exacts en une passe.
+    
+    Returns:
+        tuple: (DataFrame échantillon, moteur utilisé, résultat de sample_sheet)
+    """
+    if sampling == 'stratified' and not stratify_column:
+        print("Aucune colonne de stratification fournie, échantillonnage par réservoir", file=sys.stderr)
+        stratify_column = None
+    sampled = sample_sheet(file_path, sheet_index, max_rows, stratify_column if sampling == 'stratified' else None,
+                           engine=engine)
+    return sampled["sample"].reset_index(drop=True), select_engine(file_path, engine), sampled
+
+def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols=20, sheet_index=0, engine=None,
+                       sampling='head', stratify_column=None):
     """
     Traite un fichier Excel et extrait les données dans le format spécifié.
     
@@ -41,6 +71,10 @@ def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols
         max_rows (int): Nombre maximum de lignes à extraire
         max_cols (int): Nombre maximum de colonnes à extraire
         sheet_index (int): Index de la feuille à traiter (0 = première feuille)
+        engine (str): Moteur de lecture imposé (voir excel_engines.py, sélection automatique si None)
+        sampling (str): Sélection des lignes : 'head' (premières lignes), 'reservoir' ou 'stratified'
+            (échantillon représentatif et agrégats exacts sur toute la feuille, voir sampling.py)
+        stratify_column (str): Colonne de stratification pour sampling='stratified'
         
     Returns:
         dict: Métadonnées du fichier et données extraites
@@ -55,108 +89,65 @@ def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols
         # Charger le fichier Excel avec pandas
         if file_ext in ('.xlsx', '.xls', '.xlsm', '.csv'):
             try:
+                df = None
+                used_engine = None
+                probe = None
+                sampled = None
                 # Essayer d'abord d'ouvrir le fichier comme CSV si l'extension est .csv
                 if file_ext == '.csv':
                     try:
-                        df = pd.read_csv(file_path, nrows=max_rows)
-                        sheet_names = ["CSV Data"]
+                        if sampling in ('reservoir', 'stratified'):
+                            df, used_engine, sampled = _sample_rows(file_path, 0, max_rows, 'csv', sampling, stratify_column)
+                        else:
+                            df, used_engine = read_sheet(file_path, nrows=max_rows, engine='csv')
+                        sheet_names = [CSV_SHEET_NAME]
                         sheet_count = 1
                         sheet_index = 0
                     except Exception as csv_error:
                         return {"error": f"Erreur lors de la lecture du fichier CSV: {str(csv_error)}"}
                 else:
-                    # Obtenir le nombre de feuilles et leurs noms
-                    sheet_names = []
+                    # Obtenir le nombre de feuilles et leurs noms sans charger les cellules ;
+                    # le contenu lu par la sonde est réutilisé pour la lecture pandas
                     try:
-                        if file_ext == '.xlsx' or file_ext == '.xlsm':
-                            try:
-                                workbook = load_workbook(file_path, read_only=True, data_only=True)
-                                sheet_names = workbook.sheetnames
-                                sheet_count = len(sheet_names)
-                            except Exception as openpyxl_error:
-                                if "not a zip file" in str(openpyxl_error).lower() or "central directory" in str(openpyxl_error).lower():
-                                    # Essayer de lire le fichier comme CSV si le format XLSX est corrompu
-                                    try:
-                                        df = pd.read_csv(file_path, nrows=max_rows)
-                                        sheet_names = ["Recovered Data"]
-                                        sheet_count = 1
-                                        sheet_index = 0
-                                        print(f"Fichier Excel corrompu, lu comme CSV: {file_path}", file=sys.stderr)
-                                    except:
-                                        # Si cela échoue également, réessayer avec xlrd comme dernier recours
-                                        try:
-                                            workbook = xlrd.open_workbook(file_path, on_demand=True, formatting_info=False)
-                                            sheet_names = workbook.sheet_names()
-                                            sheet_count = workbook.nsheets
-                                        except Exception as xlrd_error:
-                                            return {"error": f"Format de fichier Excel non reconnu ou corrompu. Essayez de le réenregistrer au format .xlsx ou .csv. Détails: {str(openpyxl_error)}"}
-                                else:
-                                    raise openpyxl_error
-                        else:  # .xls
-                            try:
-                                workbook = xlrd.open_workbook(file_path, on_demand=True, formatting_info=False)
-                                sheet_names = workbook.sheet_names()
-                                sheet_count = workbook.nsheets
-                            except Exception as xlrd_error:
-                                if "not a .xls file" in str(xlrd_error).lower():
-                                    # Essayer de lire le fichier comme CSV si le format XLS est corrompu
-                                    try:
-                                        df = pd.read_csv(file_path, nrows=max_rows)
-                                        sheet_names = ["Recovered Data"]
-                                        sheet_count = 1
-                                        sheet_index = 0
-                                        print(f"Fichier Excel corrompu, lu comme CSV: {file_path}", file=sys.stderr)
-                                    except:
-                                        return {"error": f"Format de fichier Excel non reconnu ou corrompu. Essayez de le réenregistrer au format .xlsx ou .csv. Détails: {str(xlrd_error)}"}
-                                else:
-                                    raise xlrd_error
-                        
-                        # Vérifier que l'index de feuille est valide
-                        if sheet_index >= sheet_count:
-                            sheet_index = 0
+                        select_engine(file_path, engine)
+                        probe = probe_workbook(file_path)
+                        sheet_names = probe.sheet_names
+                    except ValueError as engine_error:
+                        return {"error": str(engine_error)}
                     except Exception as sheet_error:
-                        return {"error": f"Erreur lors de la lecture des feuilles du fichier Excel: {str(sheet_error)}"}
+                        error_text = str(sheet_error).lower()
+                        if not any(marker in error_text for marker in ("not a zip file", "central directory", "not a .xls file", "unsupported format", "cannot detect file format", "corrupted")):
+                            return {"error": f"Erreur lors de la lecture des feuilles du fichier Excel: {str(sheet_error)}"}
+                        # Essayer de lire le fichier comme CSV si le classeur est corrompu
+                        try:
+                            df = read_csv(file_path, nrows=max_rows)
+                            used_engine = 'csv'
+                            sheet_names = ["Recovered Data"]
+                            sheet_index = 0
+                            print(f"Fichier Excel corrompu, lu comme CSV: {file_path}", file=sys.stderr)
+                        except Exception:
+                            return {"error": f"Format de fichier Excel non reconnu ou corrompu. Essayez de le réenregistrer au format .xlsx ou .csv. Détails: {str(sheet_error)}"}
+                    sheet_count = len(sheet_names)
+                    
+                    # Vérifier que l'index de feuille est valide
+                    if sheet_index >= sheet_count:
+                        sheet_index = 0
                     
                     # Si nous n'avons pas encore de DataFrame (cas où nous avons récupéré les feuilles avec succès)
-                    if 'df' not in locals():
-                        # Déterminer le moteur en fonction de l'extension du fichier
-                        engine = None
-                        if file_ext == '.xls':
-                            engine = 'xlrd'
-                        elif file_ext in ('.xlsx', '.xlsm'):
-                            engine = 'openpyxl'
-                        
+                    if df is None:
                         try:
-                            # Charger la feuille spécifiée avec pandas, en spécifiant le moteur
-                            df = pd.read_excel(file_path, sheet_name=sheet_index, nrows=max_rows, engine=engine)
-                        except ValueError as ve:
-                            if "'nrows' must be an integer >=0" in str(ve) and engine == 'xlrd':
-                                sheet_name_to_read = sheet_names[sheet_index] if sheet_index < len(sheet_names) else sheet_index
-                                print(f"Avertissement: La lecture partielle (avec nrows) du fichier .xls '{file_path}' (feuille: {sheet_name_to_read}) a échoué avec xlrd. Tentative de lecture complète puis sélection des premières {max_rows} lignes.", file=sys.stderr)
-                                try:
-                                    df_full = pd.read_excel(file_path, sheet_name=sheet_index, engine=engine)
-                                    df = df_full.head(max_rows)
-                                    print(f"Lecture complète et sélection des {len(df)} premières lignes réussies pour '{file_path}'.", file=sys.stderr)
-                                except Exception as e_fallback:
-                                    print(f"Erreur lors de la tentative de lecture complète du fichier Excel '{file_path}' après l'échec de nrows: {str(e_fallback)}", file=sys.stderr)
-                                    return {"error": f"Impossible de lire le contenu du fichier Excel. Le fichier pourrait être corrompu. Détails (fallback xlrd): {str(e_fallback)}"}
+                            if sampling in ('reservoir', 'stratified'):
+                                # Une passe sur toute la feuille, en mémoire bornée
+                                df, used_engine, sampled = _sample_rows(file_path, sheet_index, max_rows, engine,
+                                                                        sampling, stratify_column)
                             else:
-                                print(f"Erreur pandas (ValueError non gérée spécifiquement ou moteur autre que xlrd): {str(ve)} pour {file_path}", file=sys.stderr)
-                                return {"error": f"Erreur lors de la lecture du fichier Excel avec pandas. Détails: {str(ve)}"}
+                                # Charger la feuille spécifiée ; les moteurs suivants sont essayés en cas d'échec
+                                with probe.open() as source:
+                                    df, used_engine = read_sheet(file_path, sheet_index, nrows=max_rows, engine=engine,
+                                                                 source=source)
                         except Exception as pd_error:
-                            print(f"Erreur pandas (générique) lors de la lecture de '{file_path}': {str(pd_error)}", file=sys.stderr)
-                            # Essayer une dernière fois avec des options plus permissives
-                            try:
-                                if engine == 'openpyxl':
-                                    # Pour les fichiers XLSX, essayer avec des options plus permissives
-                                    df = pd.read_excel(file_path, sheet_name=sheet_index, nrows=max_rows, engine=engine, 
-                                                      keep_default_na=True, na_values=['NA'], convert_float=True)
-                                else:
-                                    # Pour les autres formats (ou si le moteur n'est pas openpyxl), relancer l'erreur originale
-                                    # car la logique de fallback spécifique à openpyxl ne s'applique pas.
-                                    return {"error": f"Impossible de lire le contenu du fichier Excel. Le fichier pourrait être corrompu ou dans un format non supporté. Détails: {str(pd_error)}"}
-                            except Exception as final_read_error:
-                                return {"error": f"Impossible de lire le contenu du fichier Excel même avec des options permissives. Le fichier pourrait être sévèrement corrompu. Détails: {str(final_read_error)}"}
+                            print(f"Erreur pandas lors de la lecture de '{file_path}': {str(pd_error)}", file=sys.stderr)
+                            return {"error": f"Impossible de lire le contenu du fichier Excel. Le fichier pourrait être corrompu ou dans un format non supporté. Détails: {str(pd_error)}"}
                 
                 # Limiter le nombre de colonnes
                 if len(df.columns) > max_cols:
@@ -165,8 +156,13 @@ def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols
                 # Obtenir le nom de la feuille
                 sheet_name = sheet_names[sheet_index] if sheet_names else f"Sheet {sheet_index+1}"
                 
-                # Remplacer les valeurs NaN par None pour la sérialisation JSON
-                df = df.replace({np.nan: None})
+                # Nombre total de lignes estimé d'après les dimensions de la feuille
+                estimated_rows = probe.sheets[sheet_index].get("estimated_data_rows") if probe else None
+                
+                # Remplacer les valeurs NaN par None pour l'affichage tabulaire
+                # (le format JSON convertit colonne par colonne, sans copie du tableau)
+                if format_type in ('markdown', 'text'):
+                    df = df.replace({np.nan: None})
                 
                 # Extraire les métadonnées
                 file_name = os.path.basename(file_path)
@@ -175,8 +171,8 @@ def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols
                 
                 # Formater les données selon le format demandé
                 if format_type == 'json':
-                    # Convertir en liste de dictionnaires
-                    data = df.to_dict(orient='records')
+                    # Convertir en liste de dictionnaires (NaN/NaT -> None)
+                    data = dataframe_to_records(df)
                 elif format_type == 'markdown':
                     # Convertir en tableau Markdown
                     data = df.to_markdown(index=False)
@@ -188,7 +184,7 @@ def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols
                     data = df.to_string(index=False)
                 
                 # Retourner les métadonnées et les données
-                return {
+                result = {
                     "fileName": file_name,
                     "sheetName": sheet_name,
                     "rowCount": row_count,
@@ -196,8 +192,27 @@ def process_excel_file(file_path, format_type='markdown', max_rows=100, max_cols
                     "format": format_type,
                     "data": data,
                     "sheet_count": sheet_count,
-                    "sheet_names": sheet_names
+                    "sheet_names": sheet_names,
+                    "estimated_total_rows": estimated_rows,
+                    "engine": used_engine,
+                    # Champs internes (feuille réellement lue), retirés par main avant la sortie
+                    "_file_path": file_path,
+                    "_sheet_index": sheet_index
                 }
+                if sampled is not None:
+                    # Effectif exact et agrégats calculés sur toute la feuille (colonnes affichées)
+                    result["estimated_total_rows"] = sampled["rows_total"]
+                    result["sampling"] = {
+                        "method": sampled["method"],
+                        "rows_total": sampled["rows_total"],
+                        "stratify_column": sampled["stratify_column"],
+                        "strata": sampled["strata"],
+                        # Numéro dans la feuille de chaque ligne de l'échantillon
+                        "sheet_rows": [int(position) + FIRST_DATA_ROW for position in sampled["sample"].index]
+                    }
+                    result["aggregates"] = {str(col): sampled["aggregates"][str(col)] for col in df.columns
+                                            if str(col) in sampled["aggregates"]}
+                return result
             
             except Exception as e:
                 error_msg = f"Erreur lors du traitement du fichier Excel: {str(e)}"
@@ -246,6 +261,12 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
         recommandations = []
         calculs_exemple = {}
         
+        # Résultats de l'analyse LLM (renseignés uniquement si une analyse est fournie)
+        llm_sections = []
+        llm_recommendations = []
+        llm_title = None
+        llm_summary = None
+        
         # Convertir les données en DataFrame si elles sont au format JSON
         if data.get("format") == "json" and isinstance(data.get("data"), list):
             df = pd.DataFrame(data.get("data"))
@@ -253,14 +274,15 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
             # Pour les données markdown, on essaie de les reconvertir en DataFrame
             try:
                 # Créer un DataFrame à partir des données brutes pour l'analyse
-                file_ext = os.path.splitext(data.get("fileName", ""))[1].lower()
-                engine = 'xlrd' if file_ext == '.xls' else 'openpyxl'
-                df_temp = pd.read_excel(data.get("_file_path", ""), sheet_name=data.get("_sheet_index", 0), 
-                                        nrows=data.get("rowCount", 100), engine=engine)
+                df_temp, _ = read_sheet(data.get("_file_path", ""), data.get("_sheet_index", 0),
+                                        nrows=data.get("rowCount", 100), engine=data.get("engine"))
                 df = df_temp.replace({np.nan: None})
             except Exception as e:
                 print(f"Erreur lors de la conversion des données markdown en DataFrame: {str(e)}", file=sys.stderr)
         
+        # Agrégats exacts sur toute la feuille lorsque les lignes proviennent d'un échantillon
+        aggregates = data.get("aggregates") or {}
+        
         if df is not None:
             # Identifier les colonnes numériques
             numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
@@ -270,14 +292,28 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
                 sections["Statistiques"] = {}
                 for col in numeric_cols[:5]:  # Limiter à 5 colonnes pour éviter la surcharge
                     try:
-                        sections["Statistiques"][col] = {
-                            "Moyenne": round(df[col].mean(), 2),
-                            "Médiane": round(df[col].median(), 2),
-                            "Min": round(df[col].min(), 2),
-                            "Max": round(df[col].max(), 2)
-                        }
+                        exact = aggregates.get(str(col))
+                        if exact and exact.get("numeric_count"):
+                            sections["Statistiques"][col] = {
+                                "Moyenne": round(exact["mean"], 2),
+                                # Médiane estimée sur l'échantillon représentatif
+                                "Médiane": round(df[col].median(), 2),
+                                "Min": round(exact["min"], 2),
+                                "Max": round(exact["max"], 2),
+                                "Écart-type": round(exact["std"], 2)
+                            }
+                        else:
+                            sections["Statistiques"][col] = {
+                                "Moyenne": round(df[col].mean(), 2),
+                                "Médiane": round(df[col].median(), 2),
+                                "Min": round(df[col].min(), 2),
+                                "Max": round(df[col].max(), 2)
+                            }
                     except:
                         pass
+                if aggregates and data.get("sampling"):
+                    file_info["lignes_totales"] = data["sampling"]["rows_total"]
+                    file_info["echantillonnage"] = data["sampling"]["method"]
             
             # Détecter les sections potentielles basées sur les noms de colonnes
             finance_keywords = ["montant", "prix", "coût", "revenu", "dépense", "taux", "impôt", "valeur"]
@@ -309,6 +345,32 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
                     except:
                         sections["Périodes"][col] = "Données variables"
             
+            # Évolution par période (feuille entière si la série a été calculée, sinon lignes chargées)
+            series = data.get("time_series")
+            if not series or "error" in series:
+                try:
+                    series = time_series_frame(df, date_column=date_cols[0] if date_cols else None,
+                                               value_columns=numeric_cols[:3] or None)
+                except ValueError:
+                    series = None  # Aucune colonne de dates exploitable
+                except Exception as e:
+                    print(f"Erreur lors du calcul de la série temporelle: {str(e)}", file=sys.stderr)
+                    series = None
+            
+            if series and series.get("periods"):
+                sections.setdefault("Périodes", {})[series["date_column"]] = {
+                    "Début": series["start"],
+                    "Fin": series["end"],
+                    "Périodes": len(series["periods"])
+                }
+                # Dernières périodes seulement, pour limiter la taille du rapport
+                sections["Évolution par période"] = {
+                    entry["period"]: entry["values"] for entry in series["periods"][-12:]
+                }
+                for col, summary in list(series["summary"].items())[:3]:
+                    if summary.get("last_growth") is not None:
+                        calculs_exemple[f"Évolution de {col} (dernière période)"] = f"{summary['last_growth'] * 100:+.1f} %"
+            
             if product_cols:
                 sections["Produits"] = {}
                 for col in product_cols[:3]:
@@ -319,18 +381,47 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
                     except:
                         sections["Produits"][col] = "Données variables"
             
-            # Générer des recommandations basées sur l'analyse des données
-            if len(numeric_cols) > 0:
-                recommandations.append("Vérifier les valeurs extrêmes dans les colonnes numériques")
+            # Générer des recommandations à partir du contrôle qualité (feuille entière si disponible)
+            quality = data.get("quality")
+            if not quality or "error" in quality:
+                # Lignes d'un échantillon : citer leurs numéros dans la feuille, pas leurs positions
+                sheet_rows = (data.get("sampling") or {}).get("sheet_rows")
+                if data.get("format") != "json" or not sheet_rows or len(sheet_rows) != len(df):
+                    sheet_rows = None
+                try:
+                    quality = scan_dataframe(df, row_numbers=sheet_rows)
+                except Exception as e:
+                    print(f"Erreur lors du contrôle qualité des données: {str(e)}", file=sys.stderr)
+                    quality = None
             
-            if df.isnull().sum().sum() > 0:
-                recommandations.append("Traiter les valeurs manquantes dans le jeu de données")
+            if quality:
+                recommandations.extend(quality_recommendations(quality))
+                sections["Qualité des données"] = {
+                    "Lignes contrôlées": quality["rows"],
+                    "Lignes en double": quality["duplicates"]["count"],
+                    "Cellules vides": quality["missing"]["cells"],
+                    "Types mélangés": list(quality["mixed_types"]),
+                    "Colonnes constantes": list(quality["constant_columns"]),
+                    "Valeurs extrêmes": {col: (details.get("iqr") or details.get("zscore"))["count"]
+                                         for col, details in quality["outliers"].items()}
+                }
+            else:
+                if len(numeric_cols) > 0:
+                    recommandations.append("Vérifier les valeurs extrêmes dans les colonnes numériques")
+                
+                if df.isnull().sum().sum() > 0:
+                    recommandations.append("Traiter les valeurs manquantes dans le jeu de données")
             
             # Ajouter des exemples de calculs si des colonnes numériques sont présentes
             if len(numeric_cols) >= 2:
-                calculs_exemple[f"Somme de {numeric_cols[0]}"] = f"Total: {round(df[numeric_cols[0]].sum(), 2)}"
+                exact = aggregates.get(str(numeric_cols[0]))
+                total = exact["sum"] if exact and exact.get("numeric_count") else df[numeric_cols[0]].sum()
+                calculs_exemple[f"Somme de {numeric_cols[0]}"] = f"Total: {round(total, 2)}"
                 if len(numeric_cols) >= 2:
                     calculs_exemple[f"Rapport {numeric_cols[0]}/{numeric_cols[1]}"] = f"Formule: {numeric_cols[0]} / {numeric_cols[1]}"
+        elif data.get("quality") and "error" not in data["quality"]:
+            # Données non reconstituées : recommandations du contrôle qualité de la feuille
+            recommandations.extend(quality_recommendations(data["quality"]))
         
         # Intégrer l'analyse LLM si disponible
         if llm_analysis and isinstance(llm_analysis, str) and llm_analysis.strip():
@@ -346,44 +437,35 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
                 # Essayer d'extraire du JSON de l'analyse LLM
                 if '{' in llm_analysis and '}' in llm_analysis:
                     # Recherche de structures JSON valides dans la réponse LLM
-                    import re
-                    import json
-                    
-                    # Rechercher les blocs JSON potentiels
-                    json_matches = re.findall(r'\{[^{}]*((\{[^{}]*\})[^{}]*)*\}', llm_analysis)
-                    for potential_json, _ in json_matches:
-                        try:
-                            json_data = json.loads(potential_json)
-                            if isinstance(json_data, dict):
-                                if 'title' in json_data or 'titre' in json_data:
-                                    llm_title = json_data.get('title') or json_data.get('titre')
-                                
-                                if 'summary' in json_data or 'resume' in json_data:
-                                    llm_summary = json_data.get('summary') or json_data.get('resume')
-                                
-                                # Extraction des sections 
-                                llm_json_sections = json_data.get('sections', [])
-                                if isinstance(llm_json_sections, list):
-                                    for section in llm_json_sections:
-                                        if isinstance(section, dict):
-                                            title = section.get('title') or section.get('titre') or 'Section sans titre'
-                                            content = section.get('content') or section.get('contenu') or ''
-                                            llm_sections.append({'titre': title, 'contenu': content})
-                                elif isinstance(llm_json_sections, dict):
-                                    for title, content in llm_json_sections.items():
-                                        llm_sections.append({'titre': title, 'contenu': content if isinstance(content, str) else str(content)})
-                                
-                                # Extraction des recommandations
-                                recommendations = json_data.get('recommendations') or json_data.get('recommandations') or []
-                                if isinstance(recommendations, list):
-                                    for rec in recommendations:
-                                        if isinstance(rec, str):
-                                            llm_recommendations.append(rec)
-                                        elif isinstance(rec, dict) and ('text' in rec or 'texte' in rec):
-                                            llm_recommendations.append(rec.get('text') or rec.get('texte'))
-                            break  # Utiliser le premier JSON valide trouvé
-                        except json.JSONDecodeError:
-                            continue
+                    # Objets JSON équilibrés (blocs ```json puis texte libre), en un seul passage linéaire
+                    for json_data in extract_json_objects(llm_analysis):
+                        if 'title' in json_data or 'titre' in json_data:
+                            llm_title = json_data.get('title') or json_data.get('titre')
+                        
+                        if 'summary' in json_data or 'resume' in json_data:
+                            llm_summary = json_data.get('summary') or json_data.get('resume')
+                        
+                        # Extraction des sections 
+                        llm_json_sections = json_data.get('sections', [])
+                        if isinstance(llm_json_sections, list):
+                            for section in llm_json_sections:
+                                if isinstance(section, dict):
+                                    title = section.get('title') or section.get('titre') or 'Section sans titre'
+                                    content = section.get('content') or section.get('contenu') or ''
+                                    llm_sections.append({'titre': title, 'contenu': content})
+                        elif isinstance(llm_json_sections, dict):
+                            for title, content in llm_json_sections.items():
+                                llm_sections.append({'titre': title, 'contenu': content if isinstance(content, str) else str(content)})
+                        
+                        # Extraction des recommandations
+                        recommendations = json_data.get('recommendations') or json_data.get('recommandations') or []
+                        if isinstance(recommendations, list):
+                            for rec in recommendations:
+                                if isinstance(rec, str):
+                                    llm_recommendations.append(rec)
+                                elif isinstance(rec, dict) and ('text' in rec or 'texte' in rec):
+                                    llm_recommendations.append(rec.get('text') or rec.get('texte'))
+                        break  # Utiliser le premier objet JSON valide trouvé
                 
                 # Si aucun JSON valide n'a été trouvé, extraire les sections par analyse de texte
                 if not llm_sections:
@@ -535,7 +617,66 @@ def generate_structured_report(data, instructions=None, llm_analysis=None):
             "calculs_exemple": {}
         }
 
-def analyze_excel_data(data, column_types=True, stats=True, preview_rows=5):
+def analyze_columns(df, column_types=True, stats=True):
+    """
+    Type et statistiques de chaque colonne d'un DataFrame.
+    
+    Args:
+        df (DataFrame): Données à analyser
+        column_types (bool): Inclure le type détecté de chaque colonne
+        stats (bool): Inclure les statistiques (valeurs manquantes, distinctes, numériques, fréquentes)
+        
+    Returns:
+        dict: Analyse par nom de colonne
+    """
+    columns = {}
+    for col in df.columns:
+        col_analysis = {}
+        
+        # Détecter le type de données
+        if column_types:
+            # Ignorer les valeurs None pour la détection de type
+            non_null_values = df[col].dropna()
+            
+            if len(non_null_values) == 0:
+                col_type = "unknown"
+            elif pd.api.types.is_numeric_dtype(non_null_values):
+                if pd.api.types.is_integer_dtype(non_null_values) or all(non_null_values.apply(lambda x: isinstance(x, int) or x.is_integer())):
+                    col_type = "integer"
+                else:
+                    col_type = "float"
+            elif pd.api.types.is_datetime64_any_dtype(non_null_values):
+                col_type = "datetime"
+            elif pd.api.types.is_bool_dtype(non_null_values):
+                col_type = "boolean"
+            else:
+                col_type = "string"
+            
+            col_analysis["type"] = col_type
+        
+        # Calculer les statistiques
+        if stats:
+            col_analysis["null_count"] = int(df[col].isna().sum())
+            col_analysis["unique_values"] = int(df[col].nunique())
+            
+            # Statistiques pour les colonnes numériques
+            if pd.api.types.is_numeric_dtype(df[col]):
+                col_analysis["min"] = to_jsonable(df[col].min())
+                col_analysis["max"] = to_jsonable(df[col].max())
+                col_analysis["mean"] = to_jsonable(df[col].mean())
+                col_analysis["median"] = to_jsonable(df[col].median())
+                col_analysis["std"] = to_jsonable(df[col].std())
+            
+            # Valeurs les plus fréquentes pour les colonnes textuelles
+            elif col_type == "string":
+                value_counts = df[col].value_counts().head(5).to_dict()
+                col_analysis["most_common_values"] = {str(k): int(v) for k, v in value_counts.items()}
+        
+        columns[col] = col_analysis
+    
+    return columns
+
+def analyze_excel_data(data, column_types=True, stats=True, preview_rows=5, compact=False):
     """
     Analyse les données Excel et génère des statistiques et informations descriptives.
     
@@ -544,6 +685,7 @@ def analyze_excel_data(data, column_types=True, stats=True, preview_rows=5):
         column_types (bool): Inclure les types de colonnes dans l'analyse
         stats (bool): Inclure des statistiques dans l'analyse
         preview_rows (int): Nombre de lignes à inclure dans l'aperçu
+        compact (bool): Compacter le DataFrame avant l'analyse (voir dataframe_compact.py)
         
     Returns:
         dict: Analyse des données
@@ -558,6 +700,9 @@ def analyze_excel_data(data, column_types=True, stats=True, preview_rows=5):
         
         # Convertir les données en DataFrame
         df = pd.DataFrame(data["data"])
+        memory_report = None
+        if compact:
+            df, memory_report = compact_dataframe(df)
         
         analysis = {
             "fileName": data["fileName"],
@@ -566,55 +711,15 @@ def analyze_excel_data(data, column_types=True, stats=True, preview_rows=5):
             "columnCount": data["columnCount"],
             "columns": {}
         }
+        if memory_report:
+            analysis["memory"] = memory_report
         
         # Ajouter l'aperçu des données
         if preview_rows > 0:
-            analysis["preview"] = df.head(preview_rows).to_dict(orient='records')
+            analysis["preview"] = dataframe_to_records(df.head(preview_rows))
         
         # Analyser chaque colonne
-        for col in df.columns:
-            col_analysis = {}
-            
-            # Détecter le type de données
-            if column_types:
-                # Ignorer les valeurs None pour la détection de type
-                non_null_values = df[col].dropna()
-                
-                if len(non_null_values) == 0:
-                    col_type = "unknown"
-                elif pd.api.types.is_numeric_dtype(non_null_values):
-                    if all(non_null_values.apply(lambda x: isinstance(x, int) or x.is_integer())):
-                        col_type = "integer"
-                    else:
-                        col_type = "float"
-                elif pd.api.types.is_datetime64_any_dtype(non_null_values):
-                    col_type = "datetime"
-                elif pd.api.types.is_bool_dtype(non_null_values):
-                    col_type = "boolean"
-                else:
-                    col_type = "string"
-                
-                col_analysis["type"] = col_type
-            
-            # Calculer les statistiques
-            if stats:
-                col_analysis["null_count"] = df[col].isna().sum()
-                col_analysis["unique_values"] = df[col].nunique()
-                
-                # Statistiques pour les colonnes numériques
-                if pd.api.types.is_numeric_dtype(df[col]):
-                    col_analysis["min"] = df[col].min()
-                    col_analysis["max"] = df[col].max()
-                    col_analysis["mean"] = df[col].mean()
-                    col_analysis["median"] = df[col].median()
-                    col_analysis["std"] = df[col].std()
-                
-                # Valeurs les plus fréquentes pour les colonnes textuelles
-                elif col_type == "string":
-                    value_counts = df[col].value_counts().head(5).to_dict()
-                    col_analysis["most_common_values"] = value_counts
-            
-            analysis["columns"][col] = col_analysis
+        analysis["columns"] = analyze_columns(df, column_types, stats)
         
         return analysis
     
@@ -623,7 +728,9 @@ def analyze_excel_data(data, column_types=True, stats=True, preview_rows=5):
         traceback.print_exc()
         return {"error": error_msg}
 
-def format_prompt_for_deepseek(data, instructions, include_analysis=True, max_data_length=8000):
+def format_prompt_for_deepseek(data, instructions, include_analysis=True, max_data_length=8000,
+                               max_tokens=None, sampling_strategy='representative', serialization='auto',
+                               compact=False):
     """
     Formate les données Excel et les instructions pour l'envoi à l'API DeepSeek.
     
@@ -632,6 +739,11 @@ def format_prompt_for_deepseek(data, instructions, include_analysis=True, max_da
         instructions (str): Instructions pour l'analyse
         include_analysis (bool): Inclure l'analyse automatique dans le prompt
         max_data_length (int): Longueur maximale des données à inclure dans le prompt
+            (utilisée pour déduire le budget de tokens si max_tokens n'est pas fourni)
+        max_tokens (int): Budget de tokens réservé aux données
+        sampling_strategy (str): Sélection des lignes ('representative', 'stratified', 'head')
+        serialization (str): Sérialisation des lignes ('auto', 'csv', 'tsv', 'columns')
+        compact (bool): Compacter les données avant l'analyse automatique
         
     Returns:
         str: Prompt formaté pour DeepSeek
@@ -655,8 +767,9 @@ Format des données: {data['format']}
         prompt += f"INSTRUCTIONS:\n{instructions}\n\n"
         
         # Ajouter l'analyse si demandée
+        analysis_included = False
         if include_analysis and data["format"] == "json":
-            analysis = analyze_excel_data(data)
+            analysis = analyze_excel_data(data, compact=compact)
             if "error" not in analysis:
                 prompt += "ANALYSE AUTOMATIQUE DES DONNÉES:\n"
                 
@@ -675,15 +788,38 @@ Format des données: {data['format']}
                         info = analysis["columns"][col]
                         prompt += f"- {col}: min={info.get('min')}, max={info.get('max')}, moyenne={info.get('mean')}, médiane={info.get('median')}\n"
                 
+                # Agrégats exacts sur toute la feuille (échantillonnage représentatif)
+                aggregates = data.get("aggregates")
+                if aggregates and data.get("sampling"):
+                    prompt += f"\nAgrégats exacts sur les {data['sampling']['rows_total']} lignes de la feuille "
+                    prompt += f"(les données ci-dessous sont un échantillon {data['sampling']['method']}):\n"
+                    for col, info in aggregates.items():
+                        if info.get("numeric_count"):
+                            prompt += f"- {col}: somme={info['sum']}, moyenne={info['mean']}, écart-type={info['std']}, min={info['min']}, max={info['max']}\n"
+                        elif info.get("top_values"):
+                            top = ", ".join(f"{value} ({count})" for value, count in info["top_values"].items())
+                            prompt += f"- {col}: valeurs les plus fréquentes: {top}\n"
+                
                 prompt += "\n"
+                analysis_included = True
         
         # Ajouter les données
         prompt += "DONNÉES:\n"
         
-        # Convertir les données en texte et les tronquer si nécessaire
-        data_str = str(data["data"])
-        if len(data_str) > max_data_length:
-            data_str = data_str[:max_data_length] + "...[données tronquées pour respecter la limite de contexte]"
+        # Emballer les données dans le budget de tokens, sans jamais couper une ligne
+        token_budget = max_tokens if max_tokens is not None else max_data_length // CHARS_PER_TOKEN
+        if data["format"] == "json" and isinstance(data["data"], list):
+            packed = pack_dataframe(pd.DataFrame(data["data"]), token_budget,
+                                    serialization=serialization,
+                                    strategy=sampling_strategy,
+                                    include_stats=not analysis_included)
+            data_str = packed["text"]
+            if packed["rows_included"] < packed["rows_total"]:
+                data_str += f"...[{packed['rows_included']} lignes représentatives sur {packed['rows_total']} pour respecter la limite de contexte]"
+        else:
+            data_str, kept_lines, total_lines = pack_text_lines(str(data["data"]), token_budget)
+            if kept_lines < total_lines:
+                data_str += f"\n...[{kept_lines} lignes sur {total_lines} pour respecter la limite de contexte]"
         
         prompt += data_str + "\n\n"
         
@@ -697,13 +833,706 @@ Format des données: {data['format']}
         traceback.print_exc()
         return f"Erreur: {error_msg}\n\nInstructions: {instructions}"
 
+# Agrégations autorisées pour les tableaux croisés
+PIVOT_AGGREGATIONS = ('sum', 'mean', 'count', 'min', 'max', 'median', 'std', 'nunique', 'first', 'last')
+
+# Opérateurs de filtre supportés par les tableaux croisés
+PIVOT_FILTER_OPERATORS = ('==', '!=', '>', '>=', '<', '<=', 'in', 'not_in', 'contains')
+
+# Cache des tableaux croisés : en mémoire pour le processus courant, sur disque entre les appels
+PIVOT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'abia_pivot_cache')
+PIVOT_CACHE_MAX_ENTRIES = 200
+_pivot_memory_cache = {}
+
+def _apply_pivot_filters(df, filters):
+    """
+    Applique les filtres d'un tableau croisé par masques vectorisés.
+    
+    Args:
+        df (DataFrame): Données sources
+        filters (list|dict): Liste de {"column", "op", "value"} ou raccourci {colonne: valeur(s)}
+        
+    Returns:
+        DataFrame: Données filtrées
+    """
+    if not filters:
+        return df
+    if isinstance(filters, dict):
+        filters = [
+            {"column": col, "op": "in" if isinstance(val, list) else "==", "value": val}
+            for col, val in filters.items()
+        ]
+    
+    mask = np.ones(len(df), dtype=bool)
+    for flt in filters:
+        column = flt.get("column")
+        op = flt.get("op", "==")
+        value = flt.get("value")
+        if column not in df.columns:
+            raise ValueError(f"Colonne de filtre introuvable: {column}")
+        if op not in PIVOT_FILTER_OPERATORS:
+            raise ValueError(f"Opérateur de filtre non supporté: {op}")
+        series = df[column]
+        if op == '==':
+            condition = series == value
+        elif op == '!=':
+            condition = series != value
+        elif op == '>':
+            condition = series > value
+        elif op == '>=':
+            condition = series >= value
+        elif op == '<':
+            condition = series < value
+        elif op == '<=':
+            condition = series <= value
+        elif op == 'in':
+            condition = series.isin(value if isinstance(value, list) else [value])
+        elif op == 'not_in':
+            condition = ~series.isin(value if isinstance(value, list) else [value])
+        else:  # contains
+            condition = series.astype(str).str.contains(str(value), case=False, regex=False, na=False)
+        mask &= condition.fillna(False).to_numpy(dtype=bool)
+    return df[mask]
+
+def pivot_dataframe(df, rows=None, columns=None, values=None, aggfunc='sum', filters=None):
+    """
+    Calcule un tableau croisé ou un regroupement sur l'intégralité d'un DataFrame.
+    
+    Args:
+        df (DataFrame): Données sources
+        rows (list): Colonnes placées en lignes
+        columns (list): Colonnes placées en colonnes
+        values (list): Colonnes agrégées (colonnes numériques restantes si None)
+        aggfunc (str|list|dict): Agrégation(s) parmi PIVOT_AGGREGATIONS, éventuellement par colonne
+        filters (list|dict): Filtres appliqués avant l'agrégation
+        
+    Returns:
+        dict: Tableau croisé sous forme d'enregistrements et totaux généraux
+    """
+    rows = [rows] if isinstance(rows, str) else list(rows or [])
+    columns = [columns] if isinstance(columns, str) else list(columns or [])
+    keys = rows + columns
+    
+    missing = [col for col in keys if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes introuvables: {', '.join(map(str, missing))}")
+    
+    if values is None:
+        values = [col for col in df.columns if col not in keys and pd.api.types.is_numeric_dtype(df[col])
+                  and not pd.api.types.is_bool_dtype(df[col])]
+    else:
+        values = [values] if isinstance(values, str) else list(values)
+        missing = [col for col in values if col not in df.columns]
+        if missing:
+            raise ValueError(f"Colonnes de valeurs introuvables: {', '.join(map(str, missing))}")
+    
+    requested = aggfunc.values() if isinstance(aggfunc, dict) else ([aggfunc] if isinstance(aggfunc, str) else aggfunc)
+    for func in requested:
+        for name in ([func] if isinstance(func, str) else func):
+            if name not in PIVOT_AGGREGATIONS:
+                raise ValueError(f"Agrégation non supportée: {name}")
+    
+    source_rows = len(df)
+    df = _apply_pivot_filters(df, filters)
+    
+    if not values:
+        # Sans colonne de valeurs, on compte les lignes de chaque groupe
+        table = df.groupby(keys, dropna=False, observed=True).size().to_frame("count") if keys \
+            else pd.DataFrame({"count": [len(df)]})
+    elif keys:
+        agg_spec = aggfunc if isinstance(aggfunc, dict) else {col: aggfunc for col in values}
+        table = df.groupby(keys, dropna=False, observed=True)[values].agg(agg_spec)
+    else:
+        table = df[values].agg(aggfunc)
+        table = table.to_frame().T if isinstance(table, pd.Series) and not isinstance(aggfunc, (list, dict)) \
+            else table
+    
+    if columns and rows:
+        table = table.unstack(level=list(range(len(rows), len(keys))))
+    elif columns:
+        # Sans dimension en lignes, le tableau croisé se réduit à une seule ligne
+        table = table.unstack(level=list(range(len(keys))))
+        table = table.to_frame().T if isinstance(table, pd.Series) else table
+    
+    # Aplatir les en-têtes multi-niveaux : "valeur_agrégation_modalité"
+    if isinstance(table.columns, pd.MultiIndex):
+        table.columns = ["_".join(str(part) for part in col if part != "") for col in table.columns]
+    else:
+        table.columns = [str(col) for col in table.columns]
+    
+    if rows:
+        table = table.reset_index()
+    elif not columns:
+        table = table.reset_index(names="mesure") if not isinstance(table.index, pd.RangeIndex) else table
+    
+    totals = {}
+    for col in values:
+        series = pd.to_numeric(df[col], errors='coerce')
+        totals[str(col)] = {"sum": to_jsonable(series.sum()), "count": int(series.count())}
+    
+    return {
+        "rows": [str(col) for col in rows],
+        "columns": [str(col) for col in columns],
+        "values": [str(col) for col in values],
+        "aggfunc": aggfunc,
+        "source_row_count": source_rows,
+        "filtered_row_count": int(len(df)),
+        "headers": list(table.columns),
+        "data": dataframe_to_records(table),
+        "totals": totals
+    }
+
+def _pivot_cache_key(file_path, sheet_index, spec):
+    """Clé de cache d'un tableau croisé : fichier (chemin, taille, date) + spécification."""
+    stat = os.stat(file_path)
+    payload = json.dumps({
+        "path": os.path.abspath(file_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sheet": sheet_index,
+        "spec": spec
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _read_pivot_cache(key):
+    """Lit un tableau croisé en cache (mémoire puis disque)."""
+    if key in _pivot_memory_cache:
+        return _pivot_memory_cache[key]
+    cache_file = os.path.join(PIVOT_CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        os.utime(cache_file)  # Marquer l'entrée comme récemment utilisée
+        _pivot_memory_cache[key] = result
+        return result
+    except (OSError, ValueError):
+        return None
+
+def _write_pivot_cache(key, result):
+    """Enregistre un tableau croisé en cache et évince les entrées les plus anciennes."""
+    _pivot_memory_cache[key] = result
+    try:
+        os.makedirs(PIVOT_CACHE_DIR, exist_ok=True)
+        tmp_file = os.path.join(PIVOT_CACHE_DIR, f"{key}.json.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(dumps(result))
+        os.replace(tmp_file, os.path.join(PIVOT_CACHE_DIR, f"{key}.json"))
+        
+        entries = [os.path.join(PIVOT_CACHE_DIR, name) for name in os.listdir(PIVOT_CACHE_DIR) if name.endswith('.json')]
+        if len(entries) > PIVOT_CACHE_MAX_ENTRIES:
+            entries.sort(key=os.path.getmtime)
+            for old_entry in entries[:len(entries) - PIVOT_CACHE_MAX_ENTRIES]:
+                os.remove(old_entry)
+    except OSError as e:
+        print(f"Impossible d'écrire le cache du tableau croisé: {str(e)}", file=sys.stderr)
+
+def compute_pivot(file_path, spec, sheet_index=0, use_cache=True, engine=None):
+    """
+    Calcule un tableau croisé sur la totalité d'une feuille, avec cache par (fichier, spécification).
+    
+    Args:
+        file_path (str): Chemin vers le fichier Excel ou CSV
+        spec (dict): Spécification {"rows", "columns", "values", "aggfunc", "filters"}
+        sheet_index (int|str): Index ou nom de la feuille
+        use_cache (bool): Utiliser le cache des résultats
+        engine (str): Moteur de lecture imposé (optionnel)
+        
+    Returns:
+        dict: Tableau croisé (voir pivot_dataframe) et métadonnées d'exécution
+    """
+    try:
+        if not os.path.exists(file_path):
+            return {"error": f"Le fichier {file_path} n'existe pas"}
+        
+        started = time.perf_counter()
+        key = _pivot_cache_key(file_path, sheet_index, spec) if use_cache else None
+        if key:
+            cached = _read_pivot_cache(key)
+            if cached is not None:
+                return dict(cached, cached=True, elapsed_ms=round((time.perf_counter() - started) * 1000, 3))
+        
+        probe = probe_workbook(file_path)
+        sheet_names = probe.sheet_names
+        if isinstance(sheet_index, int):
+            sheet_found = 0 <= sheet_index < len(sheet_names)
+        else:
+            sheet_found = sheet_index in sheet_names
+        if not sheet_found:
+            return {"error": f"Feuille introuvable: {sheet_index} (feuilles disponibles: {', '.join(map(str, sheet_names))})"}
+        sheet_name = sheet_names[sheet_index] if isinstance(sheet_index, int) else sheet_index
+        with probe.open() as source:
+            df, _ = read_sheet(file_path, sheet_name, engine=engine, source=source)
+        
+        result = pivot_dataframe(
+            df,
+            rows=spec.get("rows"),
+            columns=spec.get("columns"),
+            values=spec.get("values"),
+            aggfunc=spec.get("aggfunc", "sum"),
+            filters=spec.get("filters")
+        )
+        result["fileName"] = os.path.basename(file_path)
+        result["sheetName"] = str(sheet_name)
+        
+        if key:
+            _write_pivot_cache(key, result)
+        return dict(result, cached=False, elapsed_ms=round((time.perf_counter() - started) * 1000, 3))
+    
+    except ValueError as e:
+        return {"error": f"Spécification de tableau croisé invalide: {str(e)}"}
+    except Exception as e:
+        traceback.print_exc()
+        return {"error": f"Erreur lors du calcul du tableau croisé: {str(e)}"}
+
+def pivot_main(args, writer=None, engine=None):
+    """
+    Sous-commande `pivot` : python excel_processor.py pivot <file_path> <spec_json|@spec_file> [sheet_index]
+    """
+    if len(args) < 2:
+        message = "Arguments insuffisants. Usage: python excel_processor.py pivot <file_path> <spec_json|@spec_file> [sheet_index] [--no-cache]"
+        if writer:
+            writer.error(message)
+        else:
+            print(json.dumps({"error": message}))
+        sys.exit(1)
+    
+    use_cache = "--no-cache" not in args
+    args = [arg for arg in args if arg != "--no-cache"]
+    file_path, spec_arg = args[0], args[1]
+    sheet_index = args[2] if len(args) > 2 else 0
+    if isinstance(sheet_index, str) and sheet_index.isdigit():
+        sheet_index = int(sheet_index)
+    
+    try:
+        if spec_arg.startswith("@"):
+            with open(spec_arg[1:], 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+        else:
+            spec = json.loads(spec_arg)
+    except (OSError, ValueError) as e:
+        result = {"error": f"Spécification de tableau croisé illisible: {str(e)}"}
+    else:
+        result = compute_pivot(file_path, spec, sheet_index, use_cache=use_cache, engine=engine)
+    
+    if writer:
+        if "error" in result:
+            writer.error(result["error"])
+        else:
+            writer.result(result)
+        writer.metrics(cached=result.get("cached"))
+    else:
+        write_json(result, sys.stdout)
+
+# Nombre maximal de lignes détaillées par catégorie (ajoutées, supprimées, modifiées)
+DIFF_MAX_DETAILS = 500
+
+# Constantes de mélange des empreintes (arithmétique uint64 modulo 2^64)
+_HASH_MULTIPLIER = np.uint64(0x100000001B3)
+_OCCURRENCE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def _hash_columns(df, columns):
+    """
+    Calcule une empreinte par cellule, colonne par colonne, de façon vectorisée.
+    
+    Chaque cellule est normalisée de la même façon quel que soit le type déduit pour
+    sa colonne (qui peut varier d'un bloc ou d'un moteur à l'autre) : les valeurs
+    numériques, y compris le texte numérique d'une colonne texte ('3', 3, 3.0), sont
+    comparées en float64, les autres cellules sous forme de texte. Une cellule « N/A »
+    dans une colonne numérique ne modifie ainsi que l'empreinte de sa propre ligne.
+    
+    Args:
+        df (DataFrame): Bloc de lignes
+        columns (list): Colonnes à traiter, dans l'ordre
+        
+    Returns:
+        tuple: (matrice uint64 lignes × colonnes, dict {colonne: valeurs numériques float64})
+    """
+    hashes = np.empty((len(df), len(columns)), dtype=np.uint64)
+    numeric = {}
+    for j, column in enumerate(columns):
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            hashes[:, j] = pd.util.hash_pandas_object(series.astype('datetime64[ns]'), index=False).to_numpy()
+            continue
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            values = series.astype('float64')
+            text = None
+        else:
+            values = pd.to_numeric(series.astype(object), errors='coerce').astype('float64')
+            text = (series.notna() & values.isna()).to_numpy()
+        numeric[column] = values.to_numpy()
+        column_hashes = pd.util.hash_pandas_object(values.replace(-0.0, 0.0), index=False).to_numpy(copy=True)
+        if text is not None and text.any():
+            column_hashes[text] = pd.util.hash_pandas_object(series[text].astype(str), index=False).to_numpy()
+        hashes[:, j] = column_hashes
+    return hashes, numeric
+
+def _combine_hashes(hashes):
+    """Combine les empreintes de plusieurs colonnes en une empreinte par ligne."""
+    combined = np.zeros(hashes.shape[0], dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(hashes.shape[1]):
+            combined = (combined * _HASH_MULTIPLIER) ^ hashes[:, j]
+    return combined
+
+def _with_occurrence(keys):
+    """Rend les clés uniques en y mêlant leur rang d'apparition (clés dupliquées)."""
+    occurrence = pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy().astype(np.uint64)
+    with np.errstate(over='ignore'):
+        return keys + occurrence * _OCCURRENCE_MULTIPLIER
+
+def _scan_for_diff(chunks, columns):
+    """Première passe : empreintes par cellule et valeurs numériques de chaque ligne."""
+    hash_blocks = []
+    numeric_blocks = {column: [] for column in columns}
+    rows = 0
+    for chunk in chunks:
+        missing = [c for c in columns if c not in chunk.columns]
+        for column in missing:
+            chunk[column] = None
+        hashes, numeric = _hash_columns(chunk, columns)
+        hash_blocks.append(hashes)
+        for column in columns:
+            numeric_blocks[column].append(numeric.get(column, np.full(len(chunk), np.nan)))
+        rows += len(chunk)
+    hashes = np.vstack(hash_blocks) if hash_blocks else np.empty((0, len(columns)), dtype=np.uint64)
+    numeric = {column: np.concatenate(blocks) if blocks else np.empty(0) for column, blocks in numeric_blocks.items()}
+    return hashes, numeric, rows
+
+def _fetch_rows(chunks, positions):
+    """Seconde passe : extrait les lignes aux positions demandées ({position: dict})."""
+    wanted = np.unique(np.asarray(positions, dtype=np.int64))
+    found = {}
+    offset = 0
+    if len(wanted) == 0:
+        return found
+    for chunk in chunks:
+        end = offset + len(chunk)
+        local = wanted[(wanted >= offset) & (wanted < end)]
+        if len(local):
+            for position, record in zip(local, dataframe_to_records(chunk.iloc[local - offset])):
+                found[int(position)] = record
+            wanted = wanted[wanted >= end]
+            if len(wanted) == 0:
+                break
+        offset = end
+    return found
+
+def diff_sources(old_chunks, new_chunks, key_columns=None, max_details=DIFF_MAX_DETAILS):
+    """
+    Compare deux versions d'une feuille par empreintes de lignes, en temps linéaire.
+    
+    Les lignes sont alignées par colonnes clés (lignes modifiées détectées) ou, sans clé,
+    par empreinte de ligne complète (les modifications apparaissent alors comme une
+    suppression et un ajout). Seules les empreintes et les valeurs numériques sont
+    conservées en mémoire ; les lignes détaillées sont relues dans une seconde passe.
+    
+    Args:
+        old_chunks (callable): Fonction retournant un itérable de blocs de l'ancienne version
+        new_chunks (callable): Fonction retournant un itérable de blocs de la nouvelle version
+        key_columns (list): Colonnes identifiant une ligne (optionnel)
+        max_details (int): Nombre maximal de lignes détaillées par catégorie
+        
+    Returns:
+        dict: Résumé, colonnes ajoutées/supprimées, changements par colonne et lignes détaillées
+    """
+    old_iter, new_iter = iter(old_chunks()), iter(new_chunks())
+    old_first, new_first = next(old_iter, None), next(new_iter, None)
+    old_columns = [str(c) for c in old_first.columns] if old_first is not None else []
+    new_columns = [str(c) for c in new_first.columns] if new_first is not None else []
+    
+    common = [c for c in old_columns if c in new_columns]
+    key_columns = [str(c) for c in (key_columns or [])]
+    missing_keys = [c for c in key_columns if c not in common]
+    if missing_keys:
+        return {"error": f"Colonnes clés absentes de l'une des versions: {', '.join(missing_keys)}"}
+    value_columns = [c for c in common if c not in key_columns]
+    
+    def renamed(first, rest):
+        # Les noms de colonnes sont comparés sous forme de texte
+        for chunk in ([first] if first is not None else []):
+            yield chunk.rename(columns=str)
+        for chunk in rest:
+            yield chunk.rename(columns=str)
+    
+    ordered = key_columns + value_columns
+    old_hashes, old_numeric, old_rows = _scan_for_diff(renamed(old_first, old_iter), ordered)
+    new_hashes, new_numeric, new_rows = _scan_for_diff(renamed(new_first, new_iter), ordered)
+    key_count = len(key_columns)
+    
+    # Clés d'alignement : colonnes clés ou ligne complète, rendues uniques par rang d'apparition
+    old_values = _combine_hashes(old_hashes[:, key_count:])
+    new_values = _combine_hashes(new_hashes[:, key_count:])
+    if key_columns:
+        old_keys = _with_occurrence(_combine_hashes(old_hashes[:, :key_count]))
+        new_keys = _with_occurrence(_combine_hashes(new_hashes[:, :key_count]))
+    else:
+        old_keys = _with_occurrence(old_values)
+        new_keys = _with_occurrence(new_values)
+    
+    # Collision d'empreintes (très improbable) : la première occurrence l'emporte
+    old_index = pd.Index(old_keys)
+    first = ~old_index.duplicated()
+    old_positions = np.flatnonzero(first)
+    if len(old_positions):
+        found = old_index[first].get_indexer(new_keys)
+        matches = np.where(found >= 0, old_positions[np.maximum(found, 0)], -1)
+    else:
+        matches = np.full(len(new_keys), -1)
+    
+    added = np.flatnonzero(matches < 0)
+    matched_new = np.flatnonzero(matches >= 0)
+    matched_old = matches[matched_new]
+    removed_mask = np.ones(old_rows, dtype=bool)
+    removed_mask[matched_old] = False
+    removed = np.flatnonzero(removed_mask)
+    
+    changed = old_values[matched_old] != new_values[matched_new]
+    modified_old, modified_new = matched_old[changed], matched_new[changed]
+    
+    # Changements par colonne (lignes modifiées) et écarts numériques
+    cell_changes = old_hashes[modified_old, key_count:] != new_hashes[modified_new, key_count:]
+    column_changes = {column: int(count) for column, count in zip(value_columns, cell_changes.sum(axis=0)) if count}
+    numeric_deltas = {}
+    for column in value_columns:
+        old_vals, new_vals = old_numeric[column], new_numeric[column]
+        if np.isnan(old_vals).all() and np.isnan(new_vals).all():
+            continue
+        numeric_deltas[column] = {
+            "old_total": float(np.nansum(old_vals)),
+            "new_total": float(np.nansum(new_vals)),
+            "delta_total": float(np.nansum(new_vals) - np.nansum(old_vals)),
+            "modified_rows_delta": float(np.nansum(new_vals[modified_new] - old_vals[modified_old]))
+        }
+    
+    # Seconde passe : lignes détaillées (nombre borné)
+    added_detail, removed_detail = added[:max_details], removed[:max_details]
+    modified_detail = list(zip(modified_old[:max_details], modified_new[:max_details]))
+    old_records = _fetch_rows(renamed(None, old_chunks()), list(removed_detail) + [o for o, _ in modified_detail])
+    new_records = _fetch_rows(renamed(None, new_chunks()), list(added_detail) + [n for _, n in modified_detail])
+    
+    modified_rows = []
+    for (old_pos, new_pos), cells in zip(modified_detail, cell_changes[:max_details]):
+        old_record, new_record = old_records[int(old_pos)], new_records[int(new_pos)]
+        modified_rows.append({
+            "old_row": int(old_pos) + 2,  # Numéro de ligne dans la feuille (en-tête en ligne 1)
+            "new_row": int(new_pos) + 2,
+            "key": {column: new_record.get(column) for column in key_columns},
+            "changes": {column: {"old": old_record.get(column), "new": new_record.get(column)}
+                        for column, is_changed in zip(value_columns, cells) if is_changed}
+        })
+    
+    return {
+        "key_columns": key_columns,
+        "columns": {
+            "added": [c for c in new_columns if c not in old_columns],
+            "removed": [c for c in old_columns if c not in new_columns],
+            "common": common
+        },
+        "summary": {
+            "old_rows": old_rows,
+            "new_rows": new_rows,
+            "added": int(len(added)),
+            "removed": int(len(removed)),
+            "modified": int(len(modified_old)),
+            "unchanged": int(len(matched_old) - len(modified_old))
+        },
+        "column_changes": column_changes,
+        "numeric_deltas": numeric_deltas,
+        "added_rows": [dict(new_records[int(p)], _row=int(p) + 2) for p in added_detail],
+        "removed_rows": [dict(old_records[int(p)], _row=int(p) + 2) for p in removed_detail],
+        "modified_rows": modified_rows,
+        "truncated": bool(max(len(added), len(removed), len(modified_old)) > max_details)
+    }
+
+def diff_dataframes(old_df, new_df, key_columns=None, max_details=DIFF_MAX_DETAILS):
+    """
+    Compare deux DataFrames déjà chargés (voir diff_sources).
+    
+    Args:
+        old_df (DataFrame): Ancienne version
+        new_df (DataFrame): Nouvelle version
+        key_columns (list): Colonnes identifiant une ligne (optionnel)
+        max_details (int): Nombre maximal de lignes détaillées par catégorie
+        
+    Returns:
+        dict: Résultat de la comparaison
+    """
+    return diff_sources(lambda: [old_df], lambda: [new_df], key_columns, max_details)
+
+def diff_excel_files(old_path, new_path, key_columns=None, sheet_index=0, max_details=DIFF_MAX_DETAILS,
+                     engine=None, chunk_rows=50000):
+    """
+    Compare deux versions d'un fichier Excel ou CSV en lisant les feuilles par blocs.
+    
+    Args:
+        old_path (str): Chemin de l'ancienne version
+        new_path (str): Chemin de la nouvelle version
+        key_columns (list): Colonnes identifiant une ligne (optionnel)
+        sheet_index (int|str): Index ou nom de la feuille comparée dans les deux fichiers
+        max_details (int): Nombre maximal de lignes détaillées par catégorie
+        engine (str): Moteur de lecture imposé (optionnel)
+        chunk_rows (int): Taille des blocs lus
+        
+    Returns:
+        dict: Résultat de la comparaison et métadonnées d'exécution
+    """
+    for path in (old_path, new_path):
+        if not os.path.exists(path):
+            return {"error": f"Le fichier {path} n'existe pas"}
+    
+    try:
+        started = time.perf_counter()
+        result = diff_sources(
+            lambda: iter_sheet_chunks(old_path, sheet_index, chunk_rows, engine),
+            lambda: iter_sheet_chunks(new_path, sheet_index, chunk_rows, engine),
+            key_columns,
+            max_details
+        )
+        if "error" in result:
+            return result
+        result["old_file"] = os.path.basename(old_path)
+        result["new_file"] = os.path.basename(new_path)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+    except Exception as e:
+        traceback.print_exc()
+        return {"error": f"Erreur lors de la comparaison des fichiers: {str(e)}"}
+
+def diff_self_check():
+    """
+    Vérifie la comparaison sur des cas connus (types de colonnes différents d'une version,
+    ou d'un bloc, à l'autre).
+    
+    Returns:
+        dict: ok et, par cas, le résumé obtenu et le résumé attendu
+    """
+    old_df = pd.DataFrame({"k": [1, 2, 3], "v": [1.0, 2.0, 3.0]})
+    cases = {
+        # Une cellule texte dans une colonne numérique ne modifie que sa ligne
+        "text_cell_in_numeric_column": (
+            lambda: [old_df], lambda: [pd.DataFrame({"k": [1, 2, 3], "v": [1.0, 2.0, "x"]})], ["k"],
+            {"added": 0, "removed": 0, "modified": 1, "unchanged": 2}, {"v": 3.0}
+        ),
+        # Clés lues comme texte dans une version et comme nombres dans l'autre
+        "text_and_numeric_keys": (
+            lambda: [old_df.astype({"k": str})], lambda: [old_df], ["k"],
+            {"added": 0, "removed": 0, "modified": 0, "unchanged": 3}, {"v": 6.0}
+        ),
+        # Type déduit bloc par bloc : seul le second bloc contient du texte
+        "dtype_inferred_per_chunk": (
+            lambda: [old_df], lambda: [old_df.iloc[:2], pd.DataFrame({"k": [3], "v": ["N/A"]})], ["k"],
+            {"added": 0, "removed": 0, "modified": 1, "unchanged": 2}, {"v": 3.0}
+        )
+    }
+    results = {}
+    for name, (old_chunks, new_chunks, keys, expected, new_totals) in cases.items():
+        result = diff_sources(old_chunks, new_chunks, keys)
+        summary = {key: result["summary"][key] for key in expected}
+        totals = {column: result["numeric_deltas"].get(column, {}).get("new_total") for column in new_totals}
+        results[name] = {
+            "ok": summary == expected and totals == new_totals,
+            "summary": summary,
+            "expected": expected,
+            "new_totals": totals,
+            "expected_new_totals": new_totals
+        }
+    return {"ok": all(case["ok"] for case in results.values()), "cases": results}
+
+def diff_main(args, writer=None, engine=None):
+    """
+    Sous-commande `diff` : python excel_processor.py diff <ancien> <nouveau> [--keys col1,col2] [--sheet index] [--max-details N]
+    ou python excel_processor.py diff --self-check
+    """
+    if "--self-check" in args:
+        result = diff_self_check()
+        write_json(result, sys.stdout)
+        if not result["ok"]:
+            sys.exit(1)
+        return
+    
+    options = {"--keys": None, "--sheet": "0", "--max-details": str(DIFF_MAX_DETAILS)}
+    positional = []
+    i = 0
+    while i < len(args):
+        if args[i] in options and i + 1 < len(args):
+            options[args[i]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    
+    if len(positional) < 2:
+        message = "Arguments insuffisants. Usage: python excel_processor.py diff <ancien_fichier> <nouveau_fichier> [--keys col1,col2] [--sheet index] [--max-details N]"
+        if writer:
+            writer.error(message)
+        else:
+            print(json.dumps({"error": message}))
+        sys.exit(1)
+    
+    sheet_index = int(options["--sheet"]) if options["--sheet"].isdigit() else options["--sheet"]
+    key_columns = [c.strip() for c in options["--keys"].split(",") if c.strip()] if options["--keys"] else None
+    if writer:
+        writer.progress("comparaison", 10, "Calcul des empreintes de lignes")
+    result = diff_excel_files(positional[0], positional[1], key_columns, sheet_index,
+                              int(options["--max-details"]), engine)
+    
+    if writer:
+        if "error" in result:
+            writer.error(result["error"])
+            writer.metrics()
+            return
+        streamed = []
+        for key in ("modified_rows", "added_rows", "removed_rows"):
+            writer.stream_items(key, result[key])
+            streamed.append(key)
+        writer.result({k: v for k, v in result.items() if k not in streamed}, streamed=streamed)
+        writer.metrics(**result["summary"])
+    else:
+        write_json(result, sys.stdout, stream_key='modified_rows')
+
 def main():
     """
     Point d'entrée principal du script lorsqu'il est exécuté directement.
     Attend un chemin de fichier Excel et des options en arguments.
+    Avec l'option --ndjson, la sortie suit le protocole de trames de ndjson_protocol.py.
     """
+    writer = FrameWriter('excel_processor') if pop_ndjson_flag(sys.argv) else None
+    
+    # Moteur de lecture imposé (--engine calamine|openpyxl|xlrd|csv)
+    engine = None
+    if "--engine" in sys.argv:
+        position = sys.argv.index("--engine")
+        engine = sys.argv[position + 1] if position + 1 < len(sys.argv) else None
+        del sys.argv[position:position + 2]
+    
+    # Sélection des lignes (--sample-rows head|reservoir|stratified [--stratify-by colonne])
+    row_sampling = 'head'
+    stratify_column = None
+    for option in ("--sample-rows", "--stratify-by"):
+        if option in sys.argv:
+            position = sys.argv.index(option)
+            value = sys.argv[position + 1] if position + 1 < len(sys.argv) else None
+            del sys.argv[position:position + 2]
+            if option == "--sample-rows" and value in SAMPLING_METHODS:
+                row_sampling = value
+            elif option == "--stratify-by":
+                stratify_column = value
+    
+    # Sous-commandes
+    if len(sys.argv) > 1 and sys.argv[1] == "pivot":
+        pivot_main(sys.argv[2:], writer, engine)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "diff":
+        diff_main(sys.argv[2:], writer, engine)
+        return
+    
     if len(sys.argv) < 6:
-        print(json.dumps({"error": "Arguments insuffisants. Usage: python excel_processor.py <file_path> <format> <max_rows> <max_cols> <sheet_index> [instructions]"}));
+        usage_error = "Arguments insuffisants. Usage: python excel_processor.py <file_path> <format> <max_rows> <max_cols> <sheet_index> [instructions] [--engine nom] [--sample-rows head|reservoir|stratified] [--stratify-by colonne] [--ndjson]"
+        if writer:
+            writer.error(usage_error)
+        else:
+            print(json.dumps({"error": usage_error}));
         sys.exit(1)
         
     file_path = sys.argv[1]
@@ -715,12 +1544,32 @@ def main():
     try:
         # Traiter le fichier Excel
         # Respecter l'ordre des paramètres défini dans la signature de la fonction
-        result = process_excel_file(file_path, format_type, max_rows, max_cols, sheet_index)
+        if writer:
+            writer.progress("lecture", 10, f"Lecture du fichier {os.path.basename(file_path)}")
+        result = process_excel_file(file_path, format_type, max_rows, max_cols, sheet_index, engine,
+                                    row_sampling, stratify_column)
+        # Les traitements complémentaires portent sur la feuille retenue (index hors limites ramené à 0)
+        sheet_index = result.get("_sheet_index", sheet_index)
+        
+        # En mode NDJSON, les premières lignes sont diffusées avant tout traitement complémentaire
+        streamed = []
+        if writer:
+            if "error" in result:
+                writer.error(result["error"])
+                writer.metrics()
+                return
+            writer.progress("lecture", 40, "Données extraites")
+            if isinstance(result.get("data"), list):
+                writer.stream_items("data", result["data"])
+                streamed.append("data")
         
         # Initialiser les variables pour les arguments complémentaires
         generate_report = False
         instructions = ""
         llm_analysis = None  # Initialiser explicitement
+        prompt_options = {}
+        chart_argument = None
+        export_path = None
         
         # Traiter les arguments complémentaires
         i = 6
@@ -748,6 +1597,53 @@ def main():
                     except Exception as e:
                         print(f"Erreur lors de la lecture du fichier d'analyse LLM: {str(e)}", file=sys.stderr)
                     i += 1
+            elif arg == "--max-tokens":
+                i += 1
+                if i < len(sys.argv):
+                    prompt_options["max_tokens"] = int(sys.argv[i])
+                    i += 1
+            elif arg == "--compact":
+                prompt_options["compact"] = True
+                i += 1
+            elif arg == "--charts":
+                # Graphiques sur la feuille entière : 'auto', spécifications JSON ou @fichier
+                i += 1
+                chart_argument = "auto"
+                if i < len(sys.argv) and not sys.argv[i].startswith("--"):
+                    chart_argument = sys.argv[i]
+                    i += 1
+            elif arg == "--export":
+                # Export du rapport structuré et des données de la feuille (.xlsx, .docx ou .md)
+                i += 1
+                if i < len(sys.argv):
+                    export_path = sys.argv[i]
+                    generate_report = True
+                    i += 1
+            elif arg == "--time-series":
+                # Série temporelle sur la feuille entière (fréquence D, W, M ou Q, mensuelle par défaut)
+                i += 1
+                freq = 'M'
+                if i < len(sys.argv) and not sys.argv[i].startswith("--"):
+                    freq = sys.argv[i]
+                    i += 1
+                try:
+                    result["time_series"] = time_series_sheet(file_path, sheet_index, freq=freq, engine=engine)
+                except Exception as e:
+                    print(f"Erreur lors du calcul de la série temporelle: {str(e)}", file=sys.stderr)
+                    result["time_series"] = {"error": str(e)}
+            elif arg == "--quality":
+                # Contrôle qualité de la feuille entière, lue par blocs
+                try:
+                    result["quality"] = scan_sheet(file_path, sheet_index, engine=engine)
+                except Exception as e:
+                    print(f"Erreur lors du contrôle qualité de la feuille: {str(e)}", file=sys.stderr)
+                    result["quality"] = {"error": str(e)}
+                i += 1
+            elif arg == "--sampling":
+                i += 1
+                if i < len(sys.argv):
+                    prompt_options["sampling_strategy"] = sys.argv[i]
+                    i += 1
             elif not arg.startswith("--") and instructions == "":
                 # Pour compatibilité avec l'ancien format
                 instructions = arg
@@ -755,6 +1651,28 @@ def main():
             else:
                 i += 1
         
+        # Lancer le rendu des graphiques en arrière-plan pendant l'analyse
+        chart_renderer = None
+        chart_futures = []
+        if chart_argument:
+            try:
+                chart_renderer = ChartRenderer()
+                # Spécifications explicites : ne lire la feuille que si une image manque au cache
+                if chart_argument != "auto":
+                    chart_futures = [chart_renderer.lookup(spec, file_path, sheet_index)
+                                     for spec in load_chart_specs(chart_argument, None)]
+                if not chart_futures or not all(chart_futures):
+                    chart_frame, _ = read_sheet(file_path, sheet_index, engine=engine)
+                    chart_futures = [chart_renderer.submit(chart_frame, spec, file_path, sheet_index)
+                                     for spec in load_chart_specs(chart_argument, chart_frame)]
+            except Exception as e:
+                print(f"Erreur lors de la préparation des graphiques: {str(e)}", file=sys.stderr)
+                result["charts"] = [{"error": str(e)}]
+                chart_futures = []
+        
+        if writer and (generate_report or instructions):
+            writer.progress("analyse", 60, "Préparation de l'analyse")
+        
         if generate_report:
             # Générer un rapport structuré au format JSON
             print(f"Génération d'un rapport structuré {'avec analyse LLM' if llm_analysis else 'sans analyse LLM'}", file=sys.stderr)
@@ -772,19 +1690,42 @@ def main():
                 structured_report = generate_structured_report(result, instructions, None)
                 result["structured_report"] = structured_report
         elif instructions:  # Si des instructions sont fournies, formater le prompt pour DeepSeek
-            prompt = format_prompt_for_deepseek(result, instructions)
+            prompt = format_prompt_for_deepseek(result, instructions, **prompt_options)
             result["prompt"] = prompt
         
+        # Exporter le rapport et les lignes de la feuille entière, lues par blocs
+        if export_path and "structured_report" in result:
+            if writer:
+                writer.progress("export", 90, f"Export vers {os.path.basename(export_path)}")
+            result["export"] = export_report(
+                result["structured_report"], export_path,
+                tables={"Données": iter_sheet_chunks(file_path, sheet_index, engine=engine)}
+            )
+        
+        # Récupérer les graphiques rendus
+        if chart_futures:
+            result["charts"] = [future.result() for future in chart_futures]
+        if chart_renderer:
+            chart_renderer.close()
+        
         # Supprimer les champs internes avant de retourner le résultat
         result.pop("_file_path", None)
         result.pop("_sheet_index", None)
 
-        # Imprimer le résultat au format JSON sur stdout
-        print(json.dumps(result))
+        if writer:
+            writer.progress("finalisation", 100, "Traitement terminé")
+            writer.result({k: v for k, v in result.items() if k not in streamed}, streamed=streamed)
+            writer.metrics(rows=result.get("rowCount"), columns=result.get("columnCount"))
+        else:
+            # Imprimer le résultat au format JSON sur stdout, en diffusant le tableau de données
+            write_json(result, sys.stdout)
 
     except Exception as e:
         # Capturer toute exception non gérée dans main() et la retourner comme JSON
-        print(json.dumps({"error": f"Erreur inattendue dans l'exécution du script Python: {str(e)}"}))
+        if writer:
+            writer.error(f"Erreur inattendue dans l'exécution du script Python: {str(e)}")
+        else:
+            print(json.dumps({"error": f"Erreur inattendue dans l'exécution du script Python: {str(e)}"}))
         # Optionnel: logguer l'erreur complète sur stderr pour le débogage côté serveur
         import traceback
         print(f"Traceback de l'erreur inattendue: {traceback.format_exc()}", file=sys.stderr)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fast Tokenizer
+--------------
+Découpage en phrases et en mots pour le français et l'anglais, à base d'expressions
+régulières précompilées, sans ressource à télécharger.
+Utilisé par text_summarizer.py (moteur par défaut), text_chunker.py et
+incremental_extraction.py.
+
+- Phrases : ponctuation finale suivie d'une majuscule, d'un chiffre ou d'une
+  ouverture, ou ligne vide ; les abréviations courantes (« M. », « art. »,
+  « e.g. ») ne terminent pas une phrase
+- Mots : adresses web et e-mail, nombres (« 3,14 », « 12/05/2024 », « 1 200 » avec
+  espace insécable), élisions séparées (« l' », « qu' »), contractions anglaises
+  (« do » + « n't »), mots composés (« peut-être »), ponctuation
+- Le moteur NLTK (punkt, treebank) reste disponible : option --tokenizer nltk ou
+  variable d'environnement ABIA_TOKENIZER ; il n'est importé qu'à sa sélection
+- `python fast_tokenizer.py benchmark` mesure les débits des deux moteurs et leur
+  accord (frontières de phrases, mots) sur un corpus de test
+"""
+
+import os
+import re
+import sys
+import time
+
+BACKENDS = ('fast', 'nltk')
+DEFAULT_BACKEND = 'fast'
+BACKEND_ENV = 'ABIA_TOKENIZER'
+
+# Fin de phrase : ponctuation finale (et guillemets ou parenthèses fermants) suivie
+# d'espaces puis d'une majuscule, d'un chiffre ou d'une ouverture (« guillemet
+# français » compris) ; ou ligne vide
+_SENTENCE_END = re.compile(r'[.!?…]+["»”’)\]]*\s+(?=[«"“(\[]?[ \u00a0\u202f]?[A-ZÀ-ÖØ-Þ0-9])|\n[ \t]*\n\s*')
+
+# Abréviations courantes qui ne terminent pas une phrase
+_ABBREVIATIONS = frozenset((
+    'm', 'mm', 'mme', 'mmes', 'mlle', 'dr', 'pr', 'me', 'st', 'ste', 'art', 'al', 'cf', 'ex', 'p', 'pp',
+    'vol', 'fig', 'n', 'no', 'nos', 'env', 'etc', 'mr', 'mrs', 'ms', 'inc', 'ltd', 'vs', 'e.g', 'i.e', 'av',
+    'bd', 'chap', 'réf', 'tél', 'tel', 'jan', 'janv', 'fév', 'févr', 'feb', 'avr', 'apr', 'juil', 'aug',
+    'sept', 'sep', 'oct', 'nov', 'déc', 'dec', 'jr', 'sr', 'co', 'corp', 'dept', 'approx',
+))
+_LAST_WORD = re.compile(r'([\w.]+)[.!?…]+["»”’)\]]*$')
+
+# Mots : l'ordre des alternatives fixe les priorités (adresses avant mots, élisions
+# avant mots, nombres avant ponctuation) ; comme NLTK, le point d'une abréviation
+# reste attaché au mot. Les espaces sont absorbés en tête de correspondance et le
+# mot simple est essayé en premier : aucune position n'essaie toutes les alternatives
+_TOKEN = re.compile(r"""\s*(
+    [^\W\d_]+(?![\w'’.@:-])                         # mot simple (cas le plus fréquent)
+  | https?://[^\s<>"]*[^\s<>".,;:!?)\]]              # adresse web
+  | [\w.+-]+@[\w-]+(?:\.[\w-]+)+                     # adresse e-mail
+  | (?:[A-Za-z]\.){2,}                               # sigle à points (U.S., i.e.)
+  | (?:%s|[A-Za-z])\.(?=\s+\S)                        # abréviation (M., art., p.)
+  | \d{1,3}(?:[\u00a0\u202f]\d{3})+(?:,\d+)?          # nombre à espaces insécables (1 200,50)
+  | \d+(?:[.,:/-]\d+)*                               # nombre, date, heure (3,14 - 12/05/2024)
+  | aujourd['’]hui|prud['’]hom\w*                    # apostrophe interne
+  | \w+(?=n['’]t\b)                                  # radical d'une contraction anglaise (do|n't)
+  | n['’]t\b                                         # négation anglaise
+  | (?:qu|lorsqu|puisqu|jusqu|quoiqu|presqu|[cdjlmnst])['’](?=\w)  # élision (l', qu')
+  | ['’](?:s|re|ve|ll|d|m)\b                         # contraction anglaise ('s, 're)
+  | \w+(?:[-‐]\w+)*                                  # mot, mot composé (peut-être)
+  | \.\.\.|[^\w\s]                                   # ponctuation
+)""" % '|'.join(sorted((re.escape(word) for word in _ABBREVIATIONS if '.' not in word), key=len, reverse=True)),
+    re.VERBOSE | re.IGNORECASE)
+
+# Mots vides français et anglais les plus fréquents (formes élidées comprises)
+STOPWORDS = frozenset("""
+a à afin ai aie aient aies ait alors as au aucun aucune aupres auquel aura aurai auraient aurais aurait
+auras aurez auriez aurons auront aussi autre autres aux auxquelles auxquels avaient avais avait avant avec
+avez aviez avions avoir avons ayant ayez ayons c ça car ce ceci cela celle celles celui cependant certain
+certaine certaines certains ces cet cette ceux chacun chacune chaque chez ci comme comment d dans de des
+deux devant donc dont du elle elles en encore entre es est et étaient étais était étant été êtes étiez
+étions être eu eue eues eûmes eurent eus eusse eussent eusses eussiez eussions eut eût eûtes eux fait
+faites fois font furent fus fusse fussent fusses fussiez fussions fut fût fûtes hors ici il ils j je jusqu
+jusque l la là le les leur leurs lui m ma mais me même mêmes mes moi mon n ne ni nos notre nous on ont ou
+où par parce pas peu peut plus pour pourquoi qu quand que quel quelle quelles quels qui quoi s sa sans se
+sera serai seraient serais serait seras serez seriez serions serons seront ses si sien soi soient sois
+soit sommes son sont sous soyez soyons suis sur t ta te tes toi ton tous tout toute toutes très tu un une
+unes uns vers via voici voilà vos votre vous y
+c' d' j' l' m' n' s' t' qu' jusqu' lorsqu' puisqu' c’ d’ j’ l’ m’ n’ s’ t’ qu’ jusqu’ lorsqu’ puisqu’
+about above after again against all am an and any are aren as at be because been before being below
+between both but by can cannot could did didn do does doesn doing don down during each few for from
+further had hadn has hasn have haven having he her here hers herself him himself his how i if in into is
+isn it its itself just let me more most my myself no nor not now of off on once only or other ought our
+ours ourselves out over own same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was wasn we were weren what when where
+which while who whom why will with won would you your yours yourself yourselves n't n’t
+""".split())
+
+
+def _is_abbreviation(text, end):
+    """Vrai si la ponctuation qui finit en `end` suit une abréviation (« M. », « art. »)."""
+    match = _LAST_WORD.search(text, max(0, end - 12), end)
+    if not match:
+        return False
+    word = match.group(1).lower().rstrip('.')
+    return word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+
+def split_sentences(text, start=0):
+    """
+    Découpe un texte en phrases, espaces suivants compris (la concaténation redonne le texte).
+
+    Args:
+        text (str): Texte à découper
+        start (int): Position du texte dans le document
+
+    Yields:
+        tuple: (fragment, position du fragment dans le document)
+    """
+    position = 0
+    for match in _SENTENCE_END.finditer(text):
+        stripped_end = match.start() + len(match.group().rstrip())
+        if match.group()[0] != '\n' and _is_abbreviation(text, stripped_end):
+            continue
+        if match.end() > position:
+            yield text[position:match.end()], start + position
+            position = match.end()
+    if position < len(text):
+        yield text[position:], start + position
+
+
+def sent_tokenize(text):
+    """Phrases d'un texte, sans les espaces qui les entourent."""
+    return [sentence for sentence in (fragment.strip() for fragment, _ in split_sentences(text)) if sentence]
+
+
+def word_tokenize(text):
+    """Mots et signes de ponctuation d'un texte, dans l'ordre."""
+    return _TOKEN.findall(text)
+
+
+def is_word(token):
+    """Vrai pour un mot ou un nombre (faux pour la ponctuation et les contractions « 's »)."""
+    return token[:1].isalnum()
+
+
+class FastTokenizer:
+    """Moteur intégré (expressions régulières)."""
+
+    name = 'fast'
+    stopwords = STOPWORDS
+
+    @staticmethod
+    def sent_tokenize(text):
+        return sent_tokenize(text)
+
+    @staticmethod
+    def word_tokenize(text):
+        return word_tokenize(text)
+
+
+class NltkTokenizer:
+    """Moteur NLTK (punkt, treebank), importé et initialisé à la première utilisation."""
+
+    name = 'nltk'
+
+    def __init__(self):
+        import nltk
+        from nltk.corpus import stopwords
+
+        # Ressources installées par init.py, téléchargées ici seulement si elles sont absentes
+        nltk.data.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+        for resource, path in (('punkt', 'tokenizers/punkt'), ('stopwords', 'corpora/stopwords')):
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                nltk.download(resource, quiet=True)
+        self._sent_tokenize = nltk.tokenize.sent_tokenize
+        self._word_tokenize = nltk.tokenize.word_tokenize
+        self.stopwords = frozenset(stopwords.words('french') + stopwords.words('english'))
+
+    def sent_tokenize(self, text):
+        return self._sent_tokenize(text)
+
+    def word_tokenize(self, text):
+        return self._word_tokenize(text)
+
+
+_instances = {}
+
+
+def get_tokenizer(backend=None):
+    """
+    Moteur de découpage.
+
+    Args:
+        backend (str): 'fast' ou 'nltk' ; par défaut la variable d'environnement
+            ABIA_TOKENIZER, sinon 'fast'
+
+    Returns:
+        FastTokenizer | NltkTokenizer: Moteur (une instance par nom)
+    """
+    backend = (backend or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Moteur de découpage inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+    if backend not in _instances:
+        _instances[backend] = FastTokenizer() if backend == 'fast' else NltkTokenizer()
+    return _instances[backend]
+
+
+# Corpus de test : cas difficiles des deux langues (abréviations, nombres, élisions,
+# contractions, adresses, citations)
+SAMPLE_CORPUS = """Le contrat a été signé le 12/05/2024 par M. Dupont et Mme Martin. L'entreprise s'engage à livrer 1 200 unités au prix de 3,14 € l'unité, soit 3 768 € HT. Qu'en pense la direction ?
+Selon l'art. 4 du contrat, les pénalités de retard s'élèvent à 1,5 % par semaine. Voir aussi p. 12 et cf. annexe B. Aujourd'hui, l'équipe n'a reçu aucune réclamation !
+Le Dr Bernard a rappelé que la réunion du 3 mars, à 14:30, porterait sur la qualité. « C'est une priorité », a-t-il déclaré. Les résultats sont-ils satisfaisants ? Peut-être.
+The U.S. office didn't confirm the order. Mr. Smith said it's "under review" and we'll know by Friday. Revenue grew 12.5% in Q3, e.g. in the retail segment.
+Please contact support@example.com or visit https://www.example.com/orders?id=42 for details. They've shipped 2,500 units since Jan. 3, and the client hasn't complained.
+Le rapport (voir chap. 2) présente l'évolution des ventes entre 2019 et 2023. Jusqu'à présent, aucune anomalie n'a été détectée. Lorsqu'un écart dépasse 5 %, une alerte est émise.
+"""
+
+
+def _sentence_starts(text, sentences):
+    """Positions de début des phrases dans le texte (pour comparer deux découpages)."""
+    starts = set()
+    position = 0
+    for sentence in sentences:
+        found = text.find(sentence[:20], position)
+        if found >= 0:
+            starts.add(found)
+            position = found + 1
+    return starts
+
+
+def agreement(text, reference, candidate=None):
+    """
+    Accord entre deux moteurs sur un texte.
+
+    Args:
+        text (str): Texte de test
+        reference: Moteur de référence (NLTK en pratique)
+        candidate: Moteur évalué (moteur intégré par défaut)
+
+    Returns:
+        dict: précision, rappel et F1 des frontières de phrases, accord sur les mots
+            (F1 de la plus longue sous-suite commune des séquences de mots)
+    """
+    from difflib import SequenceMatcher
+
+    candidate = candidate or get_tokenizer('fast')
+    expected = _sentence_starts(text, reference.sent_tokenize(text))
+    found = _sentence_starts(text, candidate.sent_tokenize(text))
+    common = len(expected & found)
+    precision = common / len(found) if found else 0.0
+    recall = common / len(expected) if expected else 0.0
+    reference_words = reference.word_tokenize(text)
+    candidate_words = candidate.word_tokenize(text)
+    matcher = SequenceMatcher(None, reference_words, candidate_words, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    differences = [(reference_words[i1:i2], candidate_words[j1:j2])
+                   for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+    return {
+        "sentences": {"reference": len(expected), "candidate": len(found),
+                      "precision": round(precision, 4), "recall": round(recall, 4),
+                      "f1": round(2 * precision * recall / (precision + recall), 4) if common else 0.0},
+        "words": {"reference": len(reference_words), "candidate": len(candidate_words),
+                  "agreement": round(2 * matched / (len(reference_words) + len(candidate_words)), 4)
+                  if reference_words or candidate_words else 1.0,
+                  "differences": [[' '.join(a), ' '.join(b)] for a, b in differences[:20]]},
+    }
+
+
+def benchmark_tokenizers(texts=None, repeat=200):
+    """
+    Débits des moteurs sur un corpus, et accord du moteur intégré avec NLTK.
+
+    Args:
+        texts (list): Textes du corpus (SAMPLE_CORPUS par défaut)
+        repeat (int): Nombre de répétitions du corpus pour la mesure des débits
+
+    Returns:
+        dict: Pour chaque moteur disponible, durées et débits ; accord et accélération
+    """
+    texts = texts or [SAMPLE_CORPUS]
+    corpus = "\n\n".join(texts)
+    large = "\n\n".join([corpus] * repeat)
+    report = {"characters": len(large)}
+    timings = {}
+    for backend in BACKENDS:
+        try:
+            tokenizer = get_tokenizer(backend)
+        except Exception as e:
+            report[backend] = {"error": f"{type(e).__name__}: {str(e)}"}
+            continue
+        started = time.perf_counter()
+        sentences = tokenizer.sent_tokenize(large)
+        sentence_time = time.perf_counter() - started
+        started = time.perf_counter()
+        words = sum(len(tokenizer.word_tokenize(sentence)) for sentence in sentences)
+        word_time = time.perf_counter() - started
+        timings[backend] = sentence_time + word_time
+        report[backend] = {
+            "sentences": len(sentences),
+            "words": words,
+            "sent_tokenize_ms": round(sentence_time * 1000, 3),
+            "word_tokenize_ms": round(word_time * 1000, 3),
+            "mb_per_s": round(len(large) / 1e6 / (sentence_time + word_time), 3),
+        }
+    if len(timings) == 2:
+        report["speedup"] = round(timings['nltk'] / timings['fast'], 2)
+        report["agreement"] = agreement(corpus, get_tokenizer('nltk'))
+    return report
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    args = sys.argv[1:]
+    if args and args[0] == "benchmark":
+        repeat = 200
+        if "--repeat" in args:
+            position = args.index("--repeat")
+            repeat = int(args[position + 1])
+            del args[position:position + 2]
+        texts = []
+        for path in args[1:]:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                texts.append(f.read())
+        print(dumps(benchmark_tokenizers(texts, repeat)))
+        sys.exit(0)
+    if args and args[0] in ("sentences", "words") and len(args) == 2:
+        with open(args[1], 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        print(dumps(sent_tokenize(text) if args[0] == "sentences" else word_tokenize(text)))
+        sys.exit(0)
+
+    print("Usage: python fast_tokenizer.py sentences|words <fichier> | benchmark [fichiers...] [--repeat n]",
+          file=sys.stderr)
+    sys.exit(1)
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Folder Watcher
+--------------
+Surveillance d'un dossier de travail : l'extraction, le résumé et les index des
+documents sont tenus à jour au fil des modifications, sans re-balayage à la demande.
+Utilisé par l'agent Document de l'application ABIA (commandes watch, scan et query).
+
+- Linux : inotify (appelé via ctypes, sans dépendance) sur le dossier et ses
+  sous-dossiers ; ailleurs, ou si inotify est indisponible, comparaison périodique
+  des tailles et dates de modification
+- Les événements sont regroupés : un fichier n'est traité qu'après DEBOUNCE secondes
+  sans activité sur le dossier (ou MAX_DELAY secondes après son premier événement),
+  par lots d'au plus BATCH_SIZE fichiers ; une copie de milliers de fichiers donne
+  quelques lots et non des milliers de traitements
+- Seuls les fichiers nouveaux, modifiés (taille ou date) ou supprimés par rapport au
+  catalogue sont traités : extraction incrémentale (incremental_extraction.py),
+  résumé, mots-clés et index des doublons (dedup.py)
+- Le catalogue est enregistré après chaque lot ; les recherches (commande query)
+  le lisent directement et ne déclenchent jamais de balayage
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import queue
+import select
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+FOLDER_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'abia_folder_index')
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.md')
+
+DEBOUNCE = 1.0
+MAX_DELAY = 10.0
+BATCH_SIZE = 200
+POLL_INTERVAL = 2.0
+
+# Constantes inotify (linux/inotify.h)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+RESCAN = None  # événement « tout re-vérifier » (file d'événements inotify saturée)
+
+
+def is_candidate(path):
+    """Fichier à indexer : extension prise en charge, ni fichier caché ni fichier temporaire d'Office."""
+    name = os.path.basename(path)
+    return (name.lower().endswith(SUPPORTED_EXTENSIONS)
+            and not name.startswith(('.', '~$')))
+
+
+def scan_folder(folder):
+    """
+    Relevé des fichiers à indexer d'un dossier et de ses sous-dossiers.
+
+    Returns:
+        dict: chemin absolu -> (taille, date de modification en ns)
+    """
+    snapshot = {}
+    pending = [os.path.abspath(folder)]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.'):
+                        pending.append(entry.path)
+                elif entry.is_file() and is_candidate(entry.path):
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+    return snapshot
+
+
+class InotifySource:
+    """Événements inotify d'un dossier et de ses sous-dossiers (Linux)."""
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.directories = {}  # descripteur de surveillance -> dossier
+        self.watch_tree(os.path.abspath(folder))
+
+    def watch_tree(self, directory):
+        """Surveille un dossier et ses sous-dossiers ; renvoie les fichiers déjà présents."""
+        files = []
+        pending = [directory]
+        while pending:
+            directory = pending.pop()
+            wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                print(f"Dossier non surveillé {directory}: {os.strerror(error)}", file=sys.stderr)
+                continue
+            self.directories[wd] = directory
+            try:
+                for entry in os.scandir(directory):
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith('.'):
+                            pending.append(entry.path)
+                    elif is_candidate(entry.path):
+                        files.append(entry.path)
+            except OSError:
+                continue
+        return files
+
+    def read(self, timeout):
+        """
+        Attend des événements.
+
+        Args:
+            timeout (float): Attente maximale en secondes
+
+        Returns:
+            list: Chemins concernés (RESCAN si des événements ont été perdus)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += _EVENT_HEADER.size + length
+            if mask & _IN_Q_OVERFLOW:
+                paths.append(RESCAN)
+                continue
+            directory = self.directories.get(wd)
+            if mask & _IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # Dossier créé ou déplacé dans l'arborescence : ses fichiers ont pu
+                    # être copiés avant que la surveillance ne soit en place
+                    paths.extend(self.watch_tree(path))
+                elif mask & _IN_MOVED_FROM:
+                    # Dossier sorti de l'arborescence : ses fichiers sont vérifiés au prochain lot
+                    paths.append(RESCAN)
+            elif is_candidate(path):
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Détection des modifications par relevés périodiques (repli sans inotify)."""
+
+    def __init__(self, folder, interval=POLL_INTERVAL):
+        self.folder = folder
+        self.interval = interval
+        self.snapshot = scan_folder(folder)
+        self.next_scan = time.monotonic() + interval
+
+    def read(self, timeout):
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0.0))
+        self.next_scan = time.monotonic() + self.interval
+        snapshot = scan_folder(self.folder)
+        changed = [path for path, signature in snapshot.items() if self.snapshot.get(path) != signature]
+        changed.extend(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_source(folder, polling=False):
+    """Source d'événements : inotify si disponible, relevés périodiques sinon."""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifySource(folder)
+        except (OSError, AttributeError) as e:
+            print(f"inotify indisponible, surveillance par relevés périodiques: {str(e)}", file=sys.stderr)
+    return PollingSource(folder)
+
+
+class Debouncer:
+    """
+    Regroupe les événements par fichier et libère des lots une fois l'activité retombée.
+
+    Args:
+        debounce (float): Durée sans événement avant de libérer les fichiers en attente
+        max_delay (float): Délai maximal entre le premier événement d'un fichier et son traitement
+        batch_size (int): Nombre maximal de fichiers par lot
+    """
+
+    def __init__(self, debounce=DEBOUNCE, max_delay=MAX_DELAY, batch_size=BATCH_SIZE):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.pending = {}  # chemin -> date du premier événement (ordre d'arrivée conservé)
+        self.last_event = 0.0
+        self.rescan = False
+
+    def add(self, paths, now=None):
+        now = time.monotonic() if now is None else now
+        for path in paths:
+            if path is RESCAN:
+                self.rescan = True
+            else:
+                self.pending.setdefault(path, now)
+        if paths:
+            self.last_event = now
+
+    def timeout(self, now=None):
+        """Attente avant le prochain lot possible (None s'il n'y a rien en attente)."""
+        if not self.pending and not self.rescan:
+            return None
+        now = time.monotonic() if now is None else now
+        quiet = self.last_event + self.debounce - now
+        oldest = min(self.pending.values(), default=now) + self.max_delay - now
+        return max(0.0, min(quiet, oldest))
+
+    def ready(self, now=None):
+        """
+        Lots prêts à être traités.
+
+        Returns:
+            tuple: (liste de lots de chemins, re-vérification complète demandée)
+        """
+        wait = self.timeout(now)
+        if wait is None or wait > 0:
+            return [], False
+        paths = list(self.pending)
+        self.pending.clear()
+        rescan, self.rescan = self.rescan, False
+        return [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)], rescan
+
+
+def _catalog_path(folder, index_dir):
+    key = hashlib.blake2b(os.path.abspath(folder).encode('utf-8'), digest_size=12).hexdigest()
+    return os.path.join(index_dir, key)
+
+
+class FolderIndex:
+    """
+    Catalogue des documents d'un dossier : signature du fichier, résumé, mots-clés et doublon.
+
+    Le catalogue et l'index des doublons sont enregistrés dans un sous-répertoire
+    de index_dir propre au dossier.
+    """
+
+    def __init__(self, folder, index_dir=FOLDER_INDEX_DIR):
+        self.folder = os.path.abspath(folder)
+        self.path = _catalog_path(folder, index_dir)
+        self.catalog_file = os.path.join(self.path, 'catalog.json')
+        self.lock = threading.Lock()
+        self.documents = {}
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                self.documents = json.load(f).get("documents", {})
+        except (OSError, ValueError):
+            pass
+        self._dedup = None
+
+    @property
+    def dedup(self):
+        if self._dedup is None:
+            from dedup import DedupIndex
+            self._dedup = DedupIndex(os.path.join(self.path, 'dedup'))
+        return self._dedup
+
+    def stale(self, paths):
+        """Chemins dont le fichier diffère du catalogue (nouveau, modifié ou supprimé)."""
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                signature = None
+            with self.lock:
+                entry = self.documents.get(path)
+            if signature is None:
+                if entry is not None:
+                    stale.append(path)
+            elif entry is None or entry.get("signature") != signature:
+                stale.append(path)
+        return stale
+
+    def reconcile(self):
+        """Chemins à retraiter après un arrêt ou une perte d'événements (comparaison avec le dossier)."""
+        snapshot = scan_folder(self.folder)
+        with self.lock:
+            documents = dict(self.documents)
+        changed = [path for path, signature in snapshot.items()
+                   if documents.get(path, {}).get("signature") != list(signature)]
+        changed.extend(path for path in documents if path not in snapshot)
+        return changed
+
+    def _index_file(self, path, signature):
+        """Extraction, résumé, mots-clés et doublon d'un fichier."""
+        from incremental_extraction import analyze_unit, process_document, summarize_units
+
+        if path.lower().endswith(('.pdf', '.docx')):
+            result = process_document(path)
+            text, summary, keywords = result["text"], result["summary"], result["keywords"]
+        else:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            analysis = analyze_unit(text)
+            summary, keywords = summarize_units([analysis], analysis["counts"])
+        match = self.dedup.check(text, path, {"name": os.path.basename(path)})
+        return {
+            "signature": signature,
+            "name": os.path.basename(path),
+            "characters": len(text),
+            "summary": summary,
+            "keywords": keywords,
+            "duplicate_of": match["duplicate_of"],
+            "indexed_at": time.time(),
+        }
+
+    def process(self, paths):
+        """
+        Met à jour le catalogue pour un lot de chemins puis l'enregistre.
+
+        Returns:
+            dict: Fichiers indexés, retirés, en erreur et durée du lot
+        """
+        started = time.perf_counter()
+        report = {"indexed": [], "removed": [], "errors": {}}
+        # Fichiers disparus d'abord : un fichier renommé ne doit pas être lié à son ancien chemin
+        existing = []
+        for path in self.stale(paths):
+            try:
+                existing.append((path, os.stat(path)))
+            except OSError:
+                with self.lock:
+                    self.documents.pop(path, None)
+                report["removed"].append(path)
+                self._forget(path)
+        for path, stat in existing:
+            try:
+                entry = self._index_file(path, [stat.st_size, stat.st_mtime_ns])
+            except Exception as e:
+                # Fichier en cours d'écriture ou illisible : la signature est enregistrée
+                # pour ne pas le retraiter avant sa prochaine modification
+                entry = {"signature": [stat.st_size, stat.st_mtime_ns], "name": os.path.basename(path),
+                         "error": str(e)}
+                report["errors"][path] = str(e)
+            with self.lock:
+                self.documents[path] = entry
+            report["indexed"].append(path)
+        if report["indexed"] or report["removed"]:
+            self.save()
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return report
+
+    def _forget(self, path):
+        """Retire un fichier disparu de l'index des doublons et supprime son état incrémental."""
+        from incremental_extraction import state_path
+        self.dedup.remove(path)
+        try:
+            os.remove(state_path(path))
+        except OSError:
+            pass
+
+    def save(self):
+        """Enregistre le catalogue (fichier temporaire puis remplacement : les lecteurs ne voient jamais d'état partiel)."""
+        with self.lock:
+            data = {"folder": self.folder, "updated_at": time.time(), "documents": dict(self.documents)}
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = self.catalog_file + f'.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.catalog_file)
+        except OSError as e:
+            print(f"Impossible d'enregistrer le catalogue: {str(e)}", file=sys.stderr)
+
+    def search(self, terms, limit=20):
+        """
+        Recherche dans le catalogue (noms, mots-clés et résumés), sans accès aux fichiers.
+
+        Args:
+            terms (list): Termes recherchés
+            limit (int): Nombre maximal de résultats
+
+        Returns:
+            list: Documents triés par nombre de termes trouvés
+        """
+        terms = [term.lower() for term in terms]
+        results = []
+        with self.lock:
+            items = list(self.documents.items())
+        for path, entry in items:
+            keywords = set(entry.get("keywords") or [])
+            haystack = ' '.join([entry.get("name", "")] + list(entry.get("summary") or [])).lower()
+            score = sum(2 if term in keywords else 1 if term in haystack else 0 for term in terms)
+            if score:
+                results.append((score, path, entry))
+        results.sort(key=lambda item: (-item[0], item[1]))
+        return [{"path": path, "score": score, **{key: entry.get(key) for key in ("summary", "keywords", "duplicate_of")}}
+                for score, path, entry in results[:limit]]
+
+
+def watch(folder, index_dir=FOLDER_INDEX_DIR, polling=False, debounce=DEBOUNCE, max_delay=MAX_DELAY,
+          batch_size=BATCH_SIZE, on_batch=None, stop=None):
+    """
+    Surveille un dossier et tient son catalogue à jour jusqu'à l'arrêt.
+
+    Le traitement des lots se fait dans un thread séparé : la lecture des événements
+    n'est jamais bloquée par une extraction longue.
+
+    Args:
+        folder (str): Dossier surveillé
+        index_dir (str): Répertoire des catalogues
+        polling (bool): Forcer la surveillance par relevés périodiques
+        debounce (float): Durée sans événement avant traitement
+        max_delay (float): Délai maximal de traitement d'un événement
+        batch_size (int): Taille maximale d'un lot
+        on_batch (callable): Appelé avec le rapport de chaque lot
+        stop (threading.Event): Arrêt demandé
+    """
+    stop = stop or threading.Event()
+    index = FolderIndex(folder, index_dir)
+    source = open_source(folder, polling)
+    debouncer = Debouncer(debounce, max_delay, batch_size)
+    batches = queue.Queue()
+
+    def worker():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            # Une erreur hors des fichiers (catalogue, index des doublons) ne doit pas arrêter le thread :
+            # les lots suivants seraient mis en file sans jamais être traités
+            try:
+                report = index.process(batch)
+            except Exception as e:
+                print(f"Erreur lors du traitement d'un lot de {len(batch)} fichier(s): {str(e)}", file=sys.stderr)
+                report = {"indexed": [], "removed": [], "errors": {path: str(e) for path in batch}}
+            report["pending"] = batches.qsize()
+            try:
+                if on_batch and (report["indexed"] or report["removed"] or report["errors"]):
+                    on_batch(report)
+            except Exception as e:
+                print(f"Erreur lors de la diffusion du rapport de lot: {str(e)}", file=sys.stderr)
+
+    thread = threading.Thread(target=worker, name='folder-index', daemon=True)
+    thread.start()
+    def enqueue_reconcile():
+        changed = index.reconcile()
+        for i in range(0, len(changed), batch_size):
+            batches.put(changed[i:i + batch_size])
+
+    # Rattrapage des modifications survenues pendant l'arrêt du service
+    enqueue_reconcile()
+    try:
+        while not stop.is_set():
+            wait = debouncer.timeout()
+            debouncer.add(source.read(1.0 if wait is None else min(wait, 1.0)))
+            ready, rescan = debouncer.ready()
+            if rescan:
+                # Relevé complet découpé en lots comme au démarrage
+                enqueue_reconcile()
+            for batch in ready:
+                if batch:
+                    batches.put(batch)
+    finally:
+        source.close()
+        batches.put(None)
+        thread.join()
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    args = sys.argv[1:]
+    index_dir = FOLDER_INDEX_DIR
+    if "--index-dir" in args:
+        position = args.index("--index-dir")
+        index_dir = args[position + 1]
+        del args[position:position + 2]
+    polling = "--poll" in args
+    if polling:
+        args.remove("--poll")
+    debounce = DEBOUNCE
+    if "--debounce" in args:
+        position = args.index("--debounce")
+        debounce = float(args[position + 1])
+        del args[position:position + 2]
+
+    command = args[0] if args else None
+    if command == "watch" and len(args) == 2:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        # Une ligne JSON par lot traité
+        try:
+            watch(args[1], index_dir, polling, debounce, on_batch=lambda report: print(dumps(report), flush=True),
+                  stop=stop)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    if command == "scan" and len(args) == 2:
+        index = FolderIndex(args[1], index_dir)
+        changed = index.reconcile()
+        reports = [index.process(changed[i:i + BATCH_SIZE]) for i in range(0, len(changed), BATCH_SIZE)]
+        print(dumps({"documents": len(index.documents),
+                     "indexed": sum(len(report["indexed"]) for report in reports),
+                     "removed": sum(len(report["removed"]) for report in reports),
+                     "errors": {path: error for report in reports for path, error in report["errors"].items()}}))
+        sys.exit(0)
+    if command == "query" and len(args) >= 3:
+        index = FolderIndex(args[1], index_dir)
+        print(dumps({"documents": len(index.documents), "results": index.search(args[2:])}))
+        sys.exit(0)
+
+    print("Usage: python folder_watcher.py watch|scan <dossier> [--poll] [--debounce s] [--index-dir répertoire]\n"
+          "       python folder_watcher.py query <dossier> <terme>...", file=sys.stderr)
+    sys.exit(1)
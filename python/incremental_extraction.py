@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental Extraction
+----------------------
+Ré-extraction incrémentale des documents modifiés (PDF page par page, Word par
+blocs de paragraphes), avec mise à jour du résumé et des mots-clés.
+Utilisé par document_extractor.py (option --incremental).
+
+- Chaque page PDF est identifiée par l'empreinte de son flux de contenu, de ses
+  polices (/ToUnicode, /Encoding) et de ses XObjects de formulaire : seules les
+  pages dont l'un d'eux a changé sont ré-extraites
+- Les paragraphes Word sont regroupés en blocs dont les limites dépendent du contenu
+  (titres, empreinte du paragraphe) : insérer un paragraphe ne modifie qu'un bloc
+- Chaque unité est analysée une seule fois (fréquences des mots, phrases) ; les
+  analyses sont indexées par empreinte du texte et réutilisées d'une version à
+  l'autre, quelle que soit leur position
+- Les fréquences globales sont corrigées des seules unités ajoutées ou retirées ;
+  le résumé et les mots-clés sont recalculés à partir des analyses enregistrées,
+  sans relire ni re-tokeniser le document
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from fast_tokenizer import STOPWORDS, is_word, split_sentences, word_tokenize
+
+INCREMENTAL_STATE_DIR = os.path.join(tempfile.gettempdir(), 'abia_incremental_state')
+
+# Version du format d'état : un état d'une autre version est ignoré
+STATE_VERSION = 2
+
+# Un bloc Word se termine sur un titre ou après un paragraphe dont l'empreinte est
+# multiple de BLOCK_MODULUS (blocs de 16 paragraphes en moyenne, limites stables)
+BLOCK_MODULUS = 16
+MAX_BLOCK_PARAGRAPHS = 200
+
+
+def text_hash(text):
+    """Empreinte courte d'un texte."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def analyze_unit(text):
+    """
+    Analyse une unité de texte (page ou bloc) pour le résumé et les mots-clés.
+
+    Args:
+        text (str): Texte de l'unité
+
+    Returns:
+        dict: counts (fréquences des mots hors mots vides) et sentences
+            (liste de [phrase, mots hors mots vides])
+    """
+    counts = Counter()
+    sentences = []
+    for sentence, _ in split_sentences(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        words = [word for word in word_tokenize(sentence.lower()) if is_word(word) and word not in STOPWORDS]
+        counts.update(words)
+        sentences.append([sentence, words])
+    return {"counts": dict(counts), "sentences": sentences}
+
+
+def summarize_units(analyses, counts, num_sentences=5, num_keywords=10):
+    """
+    Résumé extractif et mots-clés à partir des analyses d'unités.
+
+    Même méthode que text_summarizer.py : les phrases sont notées par la somme des
+    fréquences normalisées de leurs mots, les mots-clés sont les plus fréquents.
+
+    Args:
+        analyses (list): Analyses des unités, dans l'ordre du document
+        counts (dict): Fréquences des mots du document
+        num_sentences (int): Nombre de phrases du résumé
+        num_keywords (int): Nombre de mots-clés
+
+    Returns:
+        tuple: (phrases du résumé dans l'ordre du document, mots-clés)
+    """
+    keywords = heapq.nlargest(num_keywords, (word for word in counts if len(word) > 2), key=counts.get)
+    sentences = [sentence for analysis in analyses for sentence in analysis["sentences"]]
+    if len(sentences) <= num_sentences:
+        return [' '.join(sentence for sentence, _ in sentences)], keywords
+    max_frequency = max(counts.values()) if counts else 1
+    scores = ((sum(counts.get(word, 0) for word in words) / max_frequency, index)
+              for index, (_, words) in enumerate(sentences) if words)
+    best = sorted(index for _, index in heapq.nlargest(num_sentences, scores, key=lambda item: (item[0], -item[1])))
+    return [sentences[index][0] for index in best], keywords
+
+
+def _canonical_bytes(value, depth=0):
+    """Représentation stable d'un objet PDF (flux décodés, dictionnaires triés, références résolues)."""
+    if depth > 8:
+        raise ValueError("Objet PDF trop imbriqué")
+    value = value.get_object() if hasattr(value, 'get_object') else value
+    if hasattr(value, 'get_data'):
+        return value.get_data()
+    if isinstance(value, dict):
+        return b'<<' + b''.join(str(key).encode('utf-8') + b' ' + _canonical_bytes(item, depth + 1)
+                                for key, item in sorted(value.items())) + b'>>'
+    if isinstance(value, list):
+        return b'[' + b' '.join(_canonical_bytes(item, depth + 1) for item in value) + b']'
+    return str(value).encode('utf-8')
+
+
+def _resources_digest(resources, memo, active=()):
+    """
+    Empreinte des ressources qui déterminent le texte d'une page : polices (nom,
+    /ToUnicode, /Encoding) et XObjects de formulaire (flux et ressources, récursivement).
+
+    Les empreintes des objets partagés entre pages (polices, formulaires) sont mémorisées
+    dans memo. Un XObject illisible lève une exception : la page est alors ré-extraite.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    resources = resources.get_object() if resources is not None else None
+    if resources is None:
+        return digest.hexdigest()
+    fonts = resources.get('/Font')
+    if fonts is not None:
+        for name, reference in sorted(fonts.get_object().items()):
+            key = ('font', getattr(reference, 'idnum', None))
+            if key[1] is None or key not in memo:
+                font = reference.get_object()
+                font_digest = hashlib.blake2b(str(font.get('/BaseFont')).encode('utf-8'), digest_size=12)
+                for entry in ('/ToUnicode', '/Encoding'):
+                    if entry in font:
+                        font_digest.update(entry.encode('utf-8') + _canonical_bytes(font[entry]))
+                memo[key] = font_digest.hexdigest()
+            digest.update(f"{name}={memo[key]};".encode('utf-8'))
+    xobjects = resources.get('/XObject')
+    if xobjects is not None:
+        for name, reference in sorted(xobjects.get_object().items()):
+            xobject = reference.get_object()
+            subtype = xobject.get('/Subtype')
+            digest.update(f"{name}:{subtype};".encode('utf-8'))
+            if subtype != '/Form':
+                continue  # Les images ne contiennent pas de texte extrait
+            key = ('form', getattr(reference, 'idnum', None))
+            if key in active:
+                continue  # Formulaire qui se référence lui-même
+            if key[1] is None or key not in memo:
+                form_digest = hashlib.blake2b(xobject.get_data(), digest_size=12)
+                form_digest.update(_resources_digest(xobject.get('/Resources'), memo, active + (key,)).encode('utf-8'))
+                memo[key] = form_digest.hexdigest()
+            digest.update(memo[key].encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _page_fingerprint(page, memo):
+    """
+    Empreinte d'une page PDF sans extraire le texte : flux de contenu, polices (avec
+    leurs tables /ToUnicode et /Encoding) et XObjects de formulaire (/Fm0 Do).
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    digest.update(_resources_digest(page.get('/Resources'), memo).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _pdf_units(file_path, previous, stats):
+    """Pages d'un PDF : (empreinte du flux, texte), le texte n'étant extrait que pour les pages modifiées."""
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        memo = {}
+        for page in reader.pages:
+            try:
+                fingerprint = _page_fingerprint(page, memo)
+            except Exception:
+                # Ressource illisible : la page est ré-extraite
+                fingerprint = None
+            if fingerprint and fingerprint in previous:
+                yield fingerprint, previous[fingerprint]
+                continue
+            stats["extracted"] += 1
+            yield fingerprint, page.extract_text() or ''
+
+
+def _docx_units(file_path):
+    """Blocs de paragraphes d'un document Word (listes de paragraphes), à limites définies par le contenu."""
+    from docx_stream import iter_docx_blocks
+
+    block = []
+    for item in iter_docx_blocks(file_path):
+        if item["type"] not in ("paragraph", "heading"):
+            continue
+        if item["type"] == "heading" and block:
+            yield None, block
+            block = []
+        block.append(item["text"])
+        if (int(text_hash(item["text"])[:8], 16) % BLOCK_MODULUS == 0 and item["type"] != "heading") \
+                or len(block) >= MAX_BLOCK_PARAGRAPHS:
+            yield None, block
+            block = []
+    if block:
+        yield None, block
+
+
+def state_path(file_path, state_dir=INCREMENTAL_STATE_DIR):
+    """Fichier d'état associé à un document."""
+    key = hashlib.blake2b(os.path.abspath(file_path).encode('utf-8'), digest_size=12).hexdigest()
+    return os.path.join(state_dir, key + '.json')
+
+
+def _load_state(path):
+    """Charge un état enregistré (None s'il est absent, illisible ou d'une autre version)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get("version") == STATE_VERSION else None
+
+
+def _save_state(path, state):
+    """Enregistre l'état (écriture dans un fichier temporaire puis remplacement)."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Impossible d'enregistrer l'état incrémental: {str(e)}", file=sys.stderr)
+
+
+def process_document(file_path, state_dir=INCREMENTAL_STATE_DIR, num_sentences=5, num_keywords=10):
+    """
+    Extrait un document en ne retraitant que les pages ou blocs modifiés depuis le dernier passage.
+
+    Args:
+        file_path (str): Chemin du document (.pdf ou .docx)
+        state_dir (str): Répertoire des états ; None pour un traitement complet sans état
+        num_sentences (int): Nombre de phrases du résumé
+        num_keywords (int): Nombre de mots-clés
+
+    Returns:
+        dict: text, pages (PDF) ou paragraphs (Word), summary, keywords et changes
+            (unités, unités réutilisées, analysées, retirées, positions modifiées et,
+            pour un PDF, pages ré-extraites)
+    """
+    started = time.perf_counter()
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in ('.pdf', '.docx'):
+        raise ValueError(f"Format de fichier non pris en charge: {extension}")
+
+    path = state_path(file_path, state_dir) if state_dir else None
+    state = (_load_state(path) if path else None) or {}
+    previous_units = state.get("units", {})
+    previous_pages = state.get("pages", {})
+    counts = Counter(state.get("counts", {}))
+
+    stats = {"extracted": 0}
+    if extension == '.pdf':
+        raw_units = _pdf_units(file_path, previous_pages, stats)
+    else:
+        raw_units = _docx_units(file_path)
+
+    order, units, pages, analyses, changed = [], {}, {}, [], []
+    for position, (fingerprint, content) in enumerate(raw_units):
+        text = content if isinstance(content, str) else "\n".join(content)
+        digest = text_hash(text)
+        if fingerprint:
+            pages[fingerprint] = text
+        if digest not in units:
+            analysis = previous_units.get(digest)
+            if analysis is None:
+                analysis = dict(analyze_unit(text), text=text)
+                if not isinstance(content, str):
+                    analysis["paragraphs"] = content
+                changed.append(position)
+            units[digest] = analysis
+        order.append(digest)
+        analyses.append(units[digest])
+
+    # Fréquences globales : retrait des occurrences disparues, ajout des nouvelles
+    old_occurrences = Counter(state.get("order", []))
+    new_occurrences = Counter(order)
+    for digest in old_occurrences.keys() | new_occurrences.keys():
+        delta = new_occurrences[digest] - old_occurrences[digest]
+        if delta:
+            analysis = units.get(digest) or previous_units[digest]
+            for word, count in analysis["counts"].items():
+                counts[word] += delta * count
+    counts = +counts  # suppression des mots devenus absents
+
+    summary, keywords = summarize_units(analyses, counts, num_sentences, num_keywords)
+    texts = [units[digest]["text"] for digest in order]
+
+    if path:
+        _save_state(path, {
+            "version": STATE_VERSION,
+            "path": os.path.abspath(file_path),
+            "order": order,
+            "units": units,
+            "pages": pages,
+            "counts": dict(counts),
+        })
+
+    result = {
+        "text": "".join(text + "\n\n" for text in texts) if extension == '.pdf' else "\n".join(texts),
+        "summary": summary,
+        "keywords": keywords,
+        "changes": {
+            "units": len(order),
+            "reused": len(order) - len(changed),
+            "analyzed": len(changed),
+            "removed": sum(1 for digest in previous_units if digest not in units),
+            "changed_positions": changed,
+            "first_run": not state,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        },
+    }
+    if extension == '.pdf':
+        result["pages"] = texts
+        result["changes"]["extracted"] = stats["extracted"]
+    else:
+        result["paragraphs"] = [paragraph for digest in order for paragraph in units[digest]["paragraphs"]]
+    return result
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    args = sys.argv[1:]
+    state_dir = INCREMENTAL_STATE_DIR
+    if "--state-dir" in args:
+        position = args.index("--state-dir")
+        state_dir = args[position + 1]
+        del args[position:position + 2]
+    summary_only = "--summary" in args
+    if summary_only:
+        args.remove("--summary")
+
+    if len(args) != 1:
+        print("Usage: python incremental_extraction.py <fichier.pdf|fichier.docx> [--summary] [--state-dir répertoire]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        result = process_document(args[0], state_dir)
+        if summary_only:
+            result = {key: result[key] for key in ("summary", "keywords", "changes")}
+        print(dumps(result))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON Output
+-----------
+Couche de sérialisation JSON commune aux scripts Python de l'application ABIA.
+
+Gère les types NumPy/pandas (scalaires, NaN, NaT, dates), utilise orjson lorsqu'il
+est installé et permet d'écrire progressivement un grand tableau de données sur
+stdout afin que le processus Node puisse commencer l'analyse avant la fin du script.
+"""
+
+import datetime
+import decimal
+import json
+import math
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel
+    orjson = None
+
+# Nombre d'enregistrements encodés puis écrits à chaque étape du streaming
+DEFAULT_CHUNK_SIZE = 2000
+
+# Caractères échappés en \uXXXX pour que la sortie reste en ASCII, comme json.dumps
+# (ensure_ascii) : Node lit les pipes en UTF-8 alors que stdout peut être en cp1252 sous Windows
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+
+
+def to_jsonable(value):
+    """
+    Convertit une valeur non sérialisable nativement en équivalent JSON.
+
+    Utilisée comme hook `default` par les encodeurs.
+
+    Args:
+        value: Valeur à convertir
+
+    Returns:
+        Valeur compatible JSON
+    """
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if isinstance(value, (np.bool_,)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return None if math.isnan(value) or math.isinf(value) else value
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else pd.Timestamp(value).isoformat()
+    if isinstance(value, (pd.Timedelta, datetime.timedelta)):
+        return str(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.tolist()
+    if isinstance(value, pd.DataFrame):
+        return dataframe_to_records(value)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def _sanitize(value):
+    """Remplace récursivement NaN/Inf par None (JSON strict, lisible par JSON.parse)."""
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, dict):
+        return {k: _sanitize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_sanitize(v) for v in value]
+    return value
+
+
+def _escape_non_ascii(match):
+    """Séquence \\uXXXX d'un caractère (paire de substitution au-delà du plan de base)."""
+    code = ord(match.group())
+    if code < 0x10000:
+        return f"\\u{code:04x}"
+    code -= 0x10000
+    return f"\\u{0xd800 | (code >> 10):04x}\\u{0xdc00 | (code & 0x3ff):04x}"
+
+
+def dumps(obj):
+    """
+    Sérialise un objet Python en texte JSON strict.
+
+    Avec ou sans orjson, le texte est en ASCII (caractères non ASCII échappés en
+    \\uXXXX) avec des séparateurs compacts : il s'imprime sur n'importe quel stdout
+    et Node le relit à l'identique. Seule l'écriture des exposants peut différer (1e20/1e+20).
+
+    Args:
+        obj: Objet à sérialiser (dict, list, scalaires NumPy, DataFrame...)
+
+    Returns:
+        str: Texte JSON
+    """
+    if orjson is not None:
+        try:
+            # orjson remplace nativement NaN par null
+            text = orjson.dumps(
+                obj,
+                default=to_jsonable,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            ).decode('utf-8')
+            return text if text.isascii() else _NON_ASCII.sub(_escape_non_ascii, text)
+        except TypeError:
+            pass  # ex. entiers hors plage 64 bits : on se rabat sur json
+    try:
+        return json.dumps(obj, default=to_jsonable, allow_nan=False, separators=(',', ':'))
+    except ValueError:
+        # Des NaN Python sont présents : seul ce cas paie le coût d'une copie nettoyée
+        return json.dumps(_sanitize(obj), default=to_jsonable, allow_nan=False, separators=(',', ':'))
+
+
+def _column_to_python(series):
+    """Convertit une colonne en tableau d'objets Python, valeurs manquantes -> None."""
+    values = series.to_numpy(dtype=object)
+    missing = series.isna().to_numpy()
+    if missing.any():
+        values[missing] = None
+    return values
+
+
+def dataframe_to_records(df):
+    """
+    Convertit un DataFrame en liste de dictionnaires sans copie intermédiaire du tableau.
+
+    Remplace `df.replace({np.nan: None}).to_dict(orient='records')` : la conversion
+    se fait colonne par colonne et les NaN/NaT deviennent None.
+
+    Args:
+        df (DataFrame): Données à convertir
+
+    Returns:
+        list: Enregistrements (un dict par ligne)
+    """
+    names = [str(c) if not isinstance(c, str) else c for c in df.columns]
+    columns = [_column_to_python(df.iloc[:, i]) for i in range(len(names))]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def iter_json_array(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encode un tableau JSON par morceaux.
+
+    Args:
+        records (list|DataFrame): Enregistrements à encoder
+        chunk_size (int): Nombre d'enregistrements par morceau
+
+    Yields:
+        str: Fragments de texte dont la concaténation est un tableau JSON valide
+    """
+    yield "["
+    total = len(records)
+    for start in range(0, total, chunk_size):
+        if isinstance(records, pd.DataFrame):
+            chunk = dataframe_to_records(records.iloc[start:start + chunk_size])
+        else:
+            chunk = records[start:start + chunk_size]
+        fragment = dumps(chunk)[1:-1]
+        if fragment:
+            yield ("," if start else "") + fragment
+    yield "]"
+
+
+def write_json(result, stream=None, stream_key='data', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Écrit un résultat JSON sur un flux, en diffusant progressivement un champ volumineux.
+
+    Les autres champs sont écrits en premier, puis le tableau `stream_key` est
+    encodé et vidé morceau par morceau, ce qui permet au consommateur de commencer
+    la lecture avant la fin de l'encodage.
+
+    Args:
+        result (dict): Résultat à écrire
+        stream: Flux de sortie (sys.stdout par défaut)
+        stream_key (str): Champ contenant le tableau à diffuser
+        chunk_size (int): Nombre d'enregistrements par morceau
+    """
+    stream = stream or sys.stdout
+    payload = result.get(stream_key) if isinstance(result, dict) else None
+
+    if not isinstance(payload, (list, pd.DataFrame)) or len(payload) <= chunk_size:
+        if isinstance(payload, pd.DataFrame):
+            result = dict(result, **{stream_key: dataframe_to_records(payload)})
+        stream.write(dumps(result) + "\n")
+        stream.flush()
+        return
+
+    head = {k: v for k, v in result.items() if k != stream_key}
+    head_text = dumps(head)
+    stream.write(head_text[:-1] + ("," if head else "") + dumps(stream_key) + ":")
+    for fragment in iter_json_array(payload, chunk_size):
+        stream.write(fragment)
+        stream.flush()
+    stream.write("}\n")
+    stream.flush()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON Scanner
+------------
+Extraction des objets JSON contenus dans une réponse de LLM (texte libre,
+blocs de code Markdown, JSON partiellement invalide).
+Utilisé par excel_processor.py (generate_structured_report).
+
+Le texte est parcouru une seule fois : un scanner repère les paires d'accolades
+équilibrées en tenant compte des chaînes JSON et de leurs échappements, puis
+chaque candidat est décodé par json.JSONDecoder.raw_decode. Après un échec de
+décodage, l'analyse reprend après la position de l'erreur : aucun caractère
+n'est décodé deux fois et la durée reste linéaire, y compris sur des entrées
+hostiles de plusieurs mégaoctets.
+"""
+
+import bisect
+import json
+import random
+import re
+import string
+import sys
+import time
+
+# Profondeur d'imbrication maximale d'un candidat (au-delà, il est ignoré sans être décodé)
+MAX_DEPTH = 200
+
+# Jetons significatifs pour le scanner : accolades, guillemets, échappements et fins de ligne
+_TOKENS = re.compile(r'[{}"\\\n]')
+
+# Délimiteur de bloc de code Markdown (```json ... ```)
+_FENCE = re.compile(r'^[ \t]*(`{3,}|~{3,})[ \t]*([\w+-]*)[^\n]*$', re.MULTILINE)
+
+_decoder = json.JSONDecoder()
+
+
+def brace_pairs(text):
+    """
+    Repère les paires d'accolades équilibrées d'un texte, en un seul passage.
+
+    Les guillemets ne sont interprétés qu'à l'intérieur d'une accolade ouverte (les
+    guillemets du texte libre sont ignorés) ; un saut de ligne brut met fin à une
+    chaîne, qui ne peut pas en contenir en JSON.
+
+    Args:
+        text (str): Texte à analyser
+
+    Returns:
+        list: Paires (début, fin incluse, profondeur maximale relative), par ordre de début
+    """
+    pairs = []
+    # Piles parallèles d'entiers (positions des accolades ouvertes et profondeur atteinte
+    # depuis) : pas d'objets suivis par le ramasse-miettes, même sur '{' * 10**7
+    starts = []
+    depths = []
+    in_string = False
+    skip = -1  # Position du caractère échappé à ignorer
+    for match in _TOKENS.finditer(text):
+        position = match.start()
+        if position == skip:
+            continue
+        token = match.group()
+        if in_string:
+            if token == '"' or token == '\n':
+                in_string = False
+            elif token == '\\':
+                skip = position + 1
+        elif token == '{':
+            if depths and depths[-1] < 1:
+                depths[-1] = 1
+            starts.append(position)
+            depths.append(0)
+        elif token == '}':
+            if starts:
+                depth = depths.pop()
+                pairs.append((starts.pop(), position, depth))
+                if depths and depths[-1] <= depth:
+                    depths[-1] = depth + 1
+        elif token == '"' and starts:
+            in_string = True
+    pairs.sort()
+    return pairs
+
+
+def _candidate_tree(pairs):
+    """Relie chaque paire à la plus petite paire qui la contient ; renvoie (racines, enfants par début)."""
+    children = {}
+    roots = []
+    enclosing = []
+    for pair in pairs:
+        while enclosing and enclosing[-1][1] < pair[0]:
+            enclosing.pop()
+        if enclosing:
+            children.setdefault(enclosing[-1][0], []).append(pair)
+        else:
+            roots.append(pair)
+        enclosing.append(pair)
+    return roots, children
+
+
+def _remaining_candidates(children, start, resume):
+    """
+    Sous-paires d'une paire rejetée qui restent à essayer après la position `resume`.
+
+    Une sous-paire commencée avant `resume` mais terminée après est remplacée par ses
+    propres sous-paires : un objet valide imbriqué dans du pseudo-JSON reste trouvé.
+    """
+    remaining = []
+    pending = list(reversed(children.get(start, ())))
+    while pending:
+        pair = pending.pop()
+        if pair[0] >= resume:
+            remaining.append(pair)
+        elif pair[1] >= resume:
+            pending.extend(reversed(children.get(pair[0], ())))
+    return remaining
+
+
+def find_json_objects(text, max_depth=MAX_DEPTH):
+    """
+    Trouve les objets JSON de plus haut niveau d'un texte.
+
+    Un candidat invalide est remplacé par ses sous-objets situés après la position
+    de l'erreur de décodage (par exemple un objet JSON valide dans du pseudo-JSON).
+
+    Args:
+        text (str): Texte à analyser
+        max_depth (int): Profondeur d'imbrication maximale d'un candidat
+
+    Returns:
+        list: Tuples (début, fin exclue, objet décodé), dans l'ordre du texte
+    """
+    if not text or '{' not in text:
+        return []
+    roots, children = _candidate_tree(brace_pairs(text))
+    found = []
+    resume = 0  # Position avant laquelle plus rien n'est décodé
+    pending = list(reversed(roots))
+    while pending:
+        start, end, depth = pending.pop()
+        if start < resume:
+            continue
+        if depth > max_depth:
+            resume = end + 1
+            continue
+        # Décodage sur la seule paire : JSONDecodeError calcule sa ligne depuis le début
+        # du document, ce qui rendrait chaque échec proportionnel à la position
+        try:
+            value, stop = _decoder.raw_decode(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            resume = start + max(e.pos, 1)
+            pending.extend(reversed(_remaining_candidates(children, start, resume)))
+            continue
+        except RecursionError:
+            resume = end + 1
+            continue
+        resume = start + stop
+        if resume == end + 1:
+            found.append((start, resume, value))
+        else:
+            pending.extend(reversed(_remaining_candidates(children, start, resume)))
+    return found
+
+
+def iter_code_blocks(text):
+    """
+    Parcourt les blocs de code Markdown délimités par ``` ou ~~~.
+
+    Args:
+        text (str): Texte à analyser
+
+    Yields:
+        tuple: (langage en minuscules, contenu, début du contenu, fin du contenu)
+    """
+    opening = None
+    for match in _FENCE.finditer(text):
+        fence, language = match.group(1), match.group(2)
+        if opening is None:
+            opening = (fence, language.lower(), match.end() + 1)
+        elif fence[0] == opening[0][0] and len(fence) >= len(opening[0]) and not language:
+            content_start = min(opening[2], match.start())
+            yield opening[1], text[content_start:match.start()], content_start, match.start()
+            opening = None
+
+
+def extract_json_objects(text, max_depth=MAX_DEPTH):
+    """
+    Extrait les objets JSON d'une réponse de LLM : blocs ```json d'abord, puis texte libre.
+
+    Args:
+        text (str): Réponse du LLM
+        max_depth (int): Profondeur d'imbrication maximale
+
+    Returns:
+        list: Objets décodés (dict), blocs de code en premier, sans doublon
+    """
+    if not text:
+        return []
+    objects = []
+    fenced_spans = []
+    for language, content, start, end in iter_code_blocks(text):
+        if language not in ('json', 'json5', 'javascript', 'js', ''):
+            continue
+        try:
+            value = json.loads(content)
+        except (json.JSONDecodeError, RecursionError):
+            continue
+        if isinstance(value, dict):
+            objects.append(value)
+            fenced_spans.append((start, end))
+    span_starts = [span[0] for span in fenced_spans]
+    for start, stop, value in find_json_objects(text, max_depth):
+        # Blocs triés et disjoints : seul le bloc commencé juste avant peut contenir l'objet
+        index = bisect.bisect_right(span_starts, start) - 1
+        if index < 0 or stop > fenced_spans[index][1]:
+            objects.append(value)
+    return objects
+
+
+def _random_value(rng, depth=0):
+    """Valeur JSON aléatoire (chaînes avec accolades, guillemets et échappements)."""
+    kind = rng.random()
+    if depth > 3 or kind < 0.3:
+        alphabet = string.ascii_letters + ' {}[]"\\:,éà\n\t'
+        return rng.choice([rng.randint(-1000, 1000), rng.random(), True, None,
+                           ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))])
+    if kind < 0.5:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{rng.randint(0, 99)}": _random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+def _random_noise(rng, length):
+    """Texte libre hostile : accolades et guillemets non appariés, pseudo-JSON."""
+    pieces = ['Voici l\'analyse ', '{', '}', '"', '\\', '\n', '{titre: "x"}', '{"a": ', '```', ' : ', 'réf. {1}']
+    return ''.join(rng.choice(pieces) if rng.random() < 0.3 else rng.choice(string.ascii_letters + ' .,\n')
+                   for _ in range(length))
+
+
+def fuzz(iterations=500, seed=0):
+    """
+    Vérifie l'extraction sur des textes aléatoires mêlant bruit hostile et objets JSON valides.
+
+    Chaque objet valide, séparé du bruit par une ligne vide, doit être retrouvé à l'identique.
+
+    Returns:
+        dict: Nombre de cas, d'objets attendus et d'échecs (avec le premier cas en échec)
+    """
+    rng = random.Random(seed)
+    failures = []
+    expected_total = 0
+    for case in range(iterations):
+        parts, expected = [], []
+        for _ in range(rng.randint(1, 5)):
+            parts.append(_random_noise(rng, rng.randint(0, 200)))
+            # Le bruit peut laisser une chaîne ou des accolades ouvertes : on les referme
+            parts.append('"}' * 3 + '\n\n')
+            value = {"titre": f"cas {case}", "contenu": _random_value(rng)}
+            parts.append(json.dumps(value, ensure_ascii=rng.random() < 0.5))
+            parts.append('\n\n')
+            expected.append(value)
+        text = ''.join(parts)
+        expected_total += len(expected)
+        found = [value for value in extract_json_objects(text) if isinstance(value, dict) and "titre" in value
+                 and str(value.get("titre", "")).startswith("cas ")]
+        if not all(value in found for value in expected):
+            failures.append({"case": case, "text": text[:2000]})
+    return {"cases": iterations, "objects": expected_total, "failures": len(failures),
+            "first_failure": failures[0] if failures else None}
+
+
+def _adversarial_inputs(size):
+    """Entrées hostiles de `size` caractères environ."""
+    repeat = lambda pattern: pattern * (size // len(pattern))
+    valid = json.dumps({"titre": "Rapport", "sections": [{"title": "A", "content": "x" * 50}] * 5})
+    return {
+        "open_braces": repeat('{'),
+        "close_braces": repeat('}'),
+        "unclosed_keys": repeat('{"a":'),
+        "deep_nesting": repeat('{"a":') + '1' + repeat('}')[:size // 5],
+        "quotes": repeat('"'),
+        "unterminated_string": '{"a": "' + repeat('x'),
+        "backslashes": '{"a": "' + repeat('\\'),
+        "pseudo_json": repeat('{titre: "x", "b": [1, 2}, '),
+        "nested_pseudo_json": '{x' * (MAX_DEPTH - 1) + repeat('{"a": 1} ') + '}' * (MAX_DEPTH - 1),
+        "fenced_blocks": repeat('```json\n{"a": 1}\n```\n'),
+        "many_objects": repeat(valid + ' texte '),
+        "prose": repeat('Analyse des ventes : hausse de 12 % (voir "annexe"). '),
+    }
+
+
+def benchmark_scanner(size=4 * 1024 * 1024, sizes=None):
+    """
+    Mesure l'extraction sur des entrées hostiles et vérifie que la durée croît linéairement.
+
+    Args:
+        size (int): Taille de la plus grande entrée (caractères)
+        sizes (list): Tailles mesurées (par défaut size/4, size/2, size)
+
+    Returns:
+        dict: Par entrée et par taille : durée (ms), objets trouvés, débit (Mo/s)
+    """
+    sizes = sizes or [size // 4, size // 2, size]
+    results = {}
+    for current in sizes:
+        for name, text in _adversarial_inputs(current).items():
+            started = time.perf_counter()
+            found = extract_json_objects(text)
+            elapsed = time.perf_counter() - started
+            results.setdefault(name, {})[str(len(text))] = {
+                "ms": round(elapsed * 1000, 1),
+                "objects": len(found),
+                "mb_per_s": round(len(text) / (1024 * 1024) / elapsed, 1) if elapsed else None,
+            }
+    # Croissance de la durée entre la plus petite et la plus grande taille, rapportée à celle
+    # de la taille : proche de 1 pour un coût linéaire, proche du ratio de tailles s'il est quadratique
+    for name, timings in results.items():
+        measures = list(timings.values())
+        first, last = measures[0]["ms"], measures[-1]["ms"]
+        if first and len(measures) > 1:
+            timings["growth_vs_linear"] = round(last / first / (sizes[-1] / sizes[0]), 2)
+    return results
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "fuzz":
+        report = fuzz(int(sys.argv[2]) if len(sys.argv) > 2 else 500, int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+        print(dumps(report))
+        sys.exit(1 if report["failures"] else 0)
+    if command == "benchmark":
+        print(dumps(benchmark_scanner(int(sys.argv[2]) if len(sys.argv) > 2 else 4 * 1024 * 1024)))
+        sys.exit(0)
+    if command == "extract" and len(sys.argv) > 2:
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            print(dumps({"objects": extract_json_objects(f.read())}))
+        sys.exit(0)
+
+    print("Usage: python json_scanner.py extract <fichier> | fuzz [itérations] [graine] | benchmark [taille]",
+          file=sys.stderr)
+    sys.exit(1)
@@ -6,14 +6,129 @@ Mail Analyzer
 ------------
 Script Python pour l'analyse et la génération de modèles d'e-mails.
 Utilisé par l'agent Mail de l'application ABIA.
+
+Le publipostage (commande merge) génère une lettre par ligne d'un fichier Excel
+ou CSV de destinataires, l'analyse, et l'écrit au fil de l'eau en JSONL, EML et DOCX.
+
+L'analyse des boîtes aux lettres (commande mailbox) lit en flux un fichier mbox ou
+un répertoire de fichiers .eml, extrait corps et pièces jointes (PDF, Word, Excel,
+CSV) et écrit une ligne JSONL par message avec son évaluation (ton, clarté, dates).
 """
 
 import sys
 import json
+import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+from json_output import dumps
+
+# Modèles de lettres : « {champ|valeur par défaut} » est remplacé par le paramètre
+# correspondant, « {date} » par la date du jour
+TEMPLATE_SOURCES = {
+    "motivation": {
+        "coordonnees_expediteur": "{nom|Prénom NOM}\n{adresse|Adresse}\n{telephone|Téléphone}\n{email|Email}",
+        "coordonnees_destinataire": "{entreprise|Nom de l'entreprise}\nÀ l'attention de {destinataire|Nom du destinataire}\n{adresse_entreprise|Adresse de l'entreprise}",
+        "objet": "Objet : Candidature au poste de {poste|intitulé du poste}",
+        "introduction": "Madame, Monsieur,\n\nJe me permets de vous adresser ma candidature pour le poste de {poste|intitulé du poste} au sein de votre entreprise, suite à l'annonce parue {source_annonce|source de l'annonce}.",
+        "experience": "Titulaire de [diplôme/formation], j'ai acquis une expérience significative dans [domaine d'expertise] au cours de mes [X] années d'expérience professionnelle. J'ai notamment développé des compétences en [compétences clés] qui correspondent parfaitement aux exigences du poste.",
+        "motivation": "Votre entreprise {entreprise|nom de l'entreprise} m'intéresse particulièrement pour [raisons de l'intérêt pour l'entreprise]. Le poste de {poste|intitulé du poste} représente pour moi une opportunité idéale de mettre à profit mes compétences et mon expérience, tout en relevant de nouveaux défis professionnels.",
+        "conclusion": "Je me tiens à votre disposition pour un entretien qui me permettrait de vous présenter plus en détail mes motivations et mes compétences. Dans cette attente, je vous prie d'agréer, Madame, Monsieur, l'expression de mes salutations distinguées.",
+        "signature": "{nom|Prénom NOM}\n{date}"
+    },
+    "reclamation": {
+        "coordonnees_expediteur": "{nom|Prénom NOM}\n{adresse|Adresse}\n{telephone|Téléphone}\n{email|Email}",
+        "coordonnees_destinataire": "{entreprise|Nom de l'entreprise}\nService {service|client}\n{adresse_entreprise|Adresse de l'entreprise}",
+        "reference": "Référence client : {reference_client|numéro client}\nRéférence commande : {reference_commande|numéro de commande}",
+        "objet": "Objet : Réclamation concernant {objet_reclamation|objet de la réclamation}",
+        "description": "Madame, Monsieur,\n\nJe vous contacte au sujet de {objet_reclamation|objet de la réclamation} {date_incident|date de l'incident}.\n\n[Description détaillée du problème rencontré]",
+        "demande": "Suite à ce problème, je vous demande de bien vouloir [demande spécifique : remboursement, échange, réparation, etc.].",
+        "conclusion": "Sans réponse satisfaisante de votre part sous {delai|15 jours}, je me verrai contraint(e) de faire appel aux services compétents pour résoudre ce litige.\n\nJe vous remercie par avance de l'attention que vous porterez à ma demande et vous prie d'agréer, Madame, Monsieur, l'expression de mes salutations distinguées.",
+        "signature": "{nom|Prénom NOM}\n{date}"
+    },
+    "administrative": {
+        "coordonnees_expediteur": "{nom|Prénom NOM}\n{adresse|Adresse}\n{telephone|Téléphone}\n{email|Email}",
+        "coordonnees_destinataire": "{organisme|Nom de l'organisme}\nÀ l'attention de {destinataire|Nom du destinataire}\n{adresse_organisme|Adresse de l'organisme}",
+        "objet": "Objet : {objet|Objet de la lettre}",
+        "corps": "Madame, Monsieur,\n\n[Corps de la lettre avec les informations pertinentes]",
+        "conclusion": "Je vous remercie par avance de l'attention que vous porterez à ma demande et vous prie d'agréer, Madame, Monsieur, l'expression de mes salutations distinguées.",
+        "signature": "{nom|Prénom NOM}\n{date}"
+    }
+}
+
+_PLACEHOLDER = re.compile(r'\{(\w+)(?:\|([^}]*))?\}')
+
+def _compile_template(source):
+    """Découpe un texte de modèle en fragments fixes et en champs (nom, valeur par défaut)."""
+    parts = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(source):
+        if match.start() > position:
+            parts.append(source[position:match.start()])
+        parts.append((match.group(1), match.group(2) or ''))
+        position = match.end()
+    if position < len(source):
+        parts.append(source[position:])
+    return tuple(parts)
+
+# Modèles découpés une fois pour toutes : la génération se limite à une concaténation
+COMPILED_TEMPLATES = {
+    template_type: {section: _compile_template(source) for section, source in sections.items()}
+    for template_type, sections in TEMPLATE_SOURCES.items()
+}
+
+# Dates : format JJ/MM/AAAA ou JJ mois AAAA
+_DATE_PATTERNS = (
+    re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b'),
+    re.compile(r'\b\d{1,2}\s(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s\d{4}\b')
+)
+
+# Marqueurs de ton, en minuscules
+_FORMAL_WORDS = ('veuillez', 'agréer', 'salutations distinguées', 'je vous prie', 'madame', 'monsieur')
+_INFORMAL_WORDS = ('salut', 'coucou', 'hey', 'cool', 'super')
+
+_SENTENCE_SPLIT = re.compile(r'[.!?]')
+
+MERGE_FORMATS = ('jsonl', 'eml', 'docx')
+
+# Lettres par tâche envoyée aux processus du publipostage
+MERGE_CHUNK_SIZE = 250
+
+# Colonnes reconnues pour l'adresse e-mail du destinataire
+RECIPIENT_EMAIL_COLUMNS = ('email_destinataire', 'destinataire_email', 'to', 'courriel_destinataire')
+
+# Lots de messages envoyés aux processus de l'analyse des boîtes aux lettres : la
+# fenêtre de lots en cours borne la mémoire, quelle que soit la taille de l'archive
+MAILBOX_CHUNK_MESSAGES = 200
+MAILBOX_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Texte conservé dans la sortie pour le corps et chaque pièce jointe (caractères)
+MAILBOX_TEXT_LIMIT = 20000
+
+# Pièces jointes plus volumineuses : signalées sans extraction
+ATTACHMENT_MAX_BYTES = 50 * 1024 * 1024
+
+# Extension utilisée quand une pièce jointe n'a pas de nom de fichier exploitable
+_ATTACHMENT_TYPES = {
+    'application/pdf': '.pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx',
+    'application/vnd.ms-excel': '.xls',
+    'text/csv': '.csv'
+}
+
+# Début de message dans un fichier mbox (ligne « From ... »)
+_MBOX_SEPARATOR = re.compile(rb'^From ', re.MULTILINE)
+
+_HTML_DROP = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_HTML_BREAK = re.compile(r'<(?:br|/p|/div|/tr|/li|/h\d)\b[^>]*>', re.IGNORECASE)
+_HTML_TAG = re.compile(r'<[^>]*>')
+_BLANK_LINES = re.compile(r'\n\s*\n\s*')
+
 def analyze_mail_template(template_type, content):
     """
     Analyse un modèle d'e-mail et suggère des améliorations.
@@ -56,12 +171,7 @@ def analyze_mail_template(template_type, content):
         
         # Vérifier la présence de dates
         all_text = ' '.join(content.values())
-        date_patterns = [
-            r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',  # Format DD/MM/YYYY
-            r'\b\d{1,2}\s(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s\d{4}\b'  # Format DD Month YYYY
-        ]
-        
-        has_date = any(re.search(pattern, all_text) for pattern in date_patterns)
+        has_date = any(pattern.search(all_text) for pattern in _DATE_PATTERNS)
         
         if template_type in ['reclamation', 'administrative'] and not has_date:
             suggestions.append({
@@ -105,55 +215,29 @@ def analyze_mail_template(template_type, content):
     except Exception as e:
         return {"error": str(e)}
 
-def generate_mail_template(template_type, parameters=None):
+def generate_mail_template(template_type, parameters=None, today=None):
     """
     Génère un modèle d'e-mail basé sur le type et les paramètres fournis.
     
     Args:
         template_type (str): Type de modèle (motivation, reclamation, etc.)
         parameters (dict): Paramètres pour personnaliser le modèle
+        today (str): Date affichée dans la signature (date du jour par défaut)
     
     Returns:
         dict: Modèle d'e-mail généré
     """
     try:
-        today = datetime.now().strftime("%d/%m/%Y")
-        
-        templates = {
-            "motivation": {
-                "coordonnees_expediteur": f"{parameters.get('nom', 'Prénom NOM')}\n{parameters.get('adresse', 'Adresse')}\n{parameters.get('telephone', 'Téléphone')}\n{parameters.get('email', 'Email')}",
-                "coordonnees_destinataire": f"{parameters.get('entreprise', 'Nom de l\'entreprise')}\nÀ l'attention de {parameters.get('destinataire', 'Nom du destinataire')}\n{parameters.get('adresse_entreprise', 'Adresse de l\'entreprise')}",
-                "objet": f"Objet : Candidature au poste de {parameters.get('poste', 'intitulé du poste')}",
-                "introduction": f"Madame, Monsieur,\n\nJe me permets de vous adresser ma candidature pour le poste de {parameters.get('poste', 'intitulé du poste')} au sein de votre entreprise, suite à l'annonce parue {parameters.get('source_annonce', 'source de l\'annonce')}.",
-                "experience": "Titulaire de [diplôme/formation], j'ai acquis une expérience significative dans [domaine d'expertise] au cours de mes [X] années d'expérience professionnelle. J'ai notamment développé des compétences en [compétences clés] qui correspondent parfaitement aux exigences du poste.",
-                "motivation": f"Votre entreprise {parameters.get('entreprise', 'nom de l\'entreprise')} m'intéresse particulièrement pour [raisons de l'intérêt pour l'entreprise]. Le poste de {parameters.get('poste', 'intitulé du poste')} représente pour moi une opportunité idéale de mettre à profit mes compétences et mon expérience, tout en relevant de nouveaux défis professionnels.",
-                "conclusion": "Je me tiens à votre disposition pour un entretien qui me permettrait de vous présenter plus en détail mes motivations et mes compétences. Dans cette attente, je vous prie d'agréer, Madame, Monsieur, l'expression de mes salutations distinguées.",
-                "signature": f"{parameters.get('nom', 'Prénom NOM')}\n{today}"
-            },
-            "reclamation": {
-                "coordonnees_expediteur": f"{parameters.get('nom', 'Prénom NOM')}\n{parameters.get('adresse', 'Adresse')}\n{parameters.get('telephone', 'Téléphone')}\n{parameters.get('email', 'Email')}",
-                "coordonnees_destinataire": f"{parameters.get('entreprise', 'Nom de l\'entreprise')}\nService {parameters.get('service', 'client')}\n{parameters.get('adresse_entreprise', 'Adresse de l\'entreprise')}",
-                "reference": f"Référence client : {parameters.get('reference_client', 'numéro client')}\nRéférence commande : {parameters.get('reference_commande', 'numéro de commande')}",
-                "objet": f"Objet : Réclamation concernant {parameters.get('objet_reclamation', 'objet de la réclamation')}",
-                "description": f"Madame, Monsieur,\n\nJe vous contacte au sujet de {parameters.get('objet_reclamation', 'objet de la réclamation')} {parameters.get('date_incident', 'date de l\'incident')}.\n\n[Description détaillée du problème rencontré]",
-                "demande": "Suite à ce problème, je vous demande de bien vouloir [demande spécifique : remboursement, échange, réparation, etc.].",
-                "conclusion": f"Sans réponse satisfaisante de votre part sous {parameters.get('delai', '15 jours')}, je me verrai contraint(e) de faire appel aux services compétents pour résoudre ce litige.\n\nJe vous remercie par avance de l'attention que vous porterez à ma demande et vous prie d'agréer, Madame, Monsieur, l'expression de mes salutations distinguées.",
-                "signature": f"{parameters.get('nom', 'Prénom NOM')}\n{today}"
-            },
-            "administrative": {
-                "coordonnees_expediteur": f"{parameters.get('nom', 'Prénom NOM')}\n{parameters.get('adresse', 'Adresse')}\n{parameters.get('telephone', 'Téléphone')}\n{parameters.get('email', 'Email')}",
-                "coordonnees_destinataire": f"{parameters.get('organisme', 'Nom de l\'organisme')}\nÀ l'attention de {parameters.get('destinataire', 'Nom du destinataire')}\n{parameters.get('adresse_organisme', 'Adresse de l\'organisme')}",
-                "objet": f"Objet : {parameters.get('objet', 'Objet de la lettre')}",
-                "corps": "Madame, Monsieur,\n\n[Corps de la lettre avec les informations pertinentes]",
-                "conclusion": "Je vous remercie par avance de l'attention que vous porterez à ma demande et vous prie d'agréer, Madame, Monsieur, l'expression de mes salutations distinguées.",
-                "signature": f"{parameters.get('nom', 'Prénom NOM')}\n{today}"
-            }
-        }
-        
-        if template_type not in templates:
+        template = COMPILED_TEMPLATES.get(template_type)
+        if template is None:
             return {"error": f"Type de modèle non pris en charge: {template_type}"}
         
-        return templates.get(template_type, {"error": "Modèle non trouvé"})
+        values = dict(parameters or {})
+        values["date"] = today or datetime.now().strftime("%d/%m/%Y")
+        return {
+            section: ''.join(part if isinstance(part, str) else str(values.get(part[0], part[1])) for part in parts)
+            for section, parts in template.items()
+        }
     except Exception as e:
         return {"error": str(e)}
 
@@ -167,15 +251,10 @@ def _evaluate_tone(text):
     Returns:
         float: Score entre 0 et 10
     """
-    # Mots formels
-    formal_words = ['veuillez', 'agréer', 'salutations distinguées', 'je vous prie', 'madame', 'monsieur']
-    
-    # Mots informels
-    informal_words = ['salut', 'coucou', 'hey', 'cool', 'super']
-    
-    # Calculer le score
-    formal_count = sum(1 for word in formal_words if word.lower() in text.lower())
-    informal_count = sum(1 for word in informal_words if word.lower() in text.lower())
+    # Calculer le score (texte passé en minuscules une seule fois)
+    lowered = text.lower()
+    formal_count = sum(1 for word in _FORMAL_WORDS if word in lowered)
+    informal_count = sum(1 for word in _INFORMAL_WORDS if word in lowered)
     
     # Plus le score est élevé, plus le ton est formel
     if formal_count + informal_count == 0:
@@ -195,7 +274,7 @@ def _evaluate_clarity(text):
         float: Score entre 0 et 10
     """
     # Facteurs qui réduisent la clarté
-    avg_sentence_length = len(text) / max(1, len(re.split(r'[.!?]', text)))
+    avg_sentence_length = len(text) / max(1, len(_SENTENCE_SPLIT.split(text)))
     
     # Pénaliser les phrases trop longues
     if avg_sentence_length > 30:
@@ -211,17 +290,645 @@ def _evaluate_clarity(text):
     
     return max(0, min(10, clarity_score))
 
+def iter_recipients(file_path, sheet=0):
+    """
+    Lit les destinataires d'un fichier Excel ou CSV (une ligne par lettre).
+    
+    Les cellules sont lues comme du texte (codes postaux, références) ; les
+    cellules vides sont omises pour laisser place aux valeurs par défaut.
+    
+    Args:
+        file_path (str): Fichier .xlsx, .xls ou .csv
+        sheet (int|str): Feuille à lire
+    
+    Yields:
+        dict: Paramètres d'une lettre {colonne: valeur}
+    """
+    from excel_engines import read_sheet
+    
+    df, _ = read_sheet(file_path, sheet, dtype=str)
+    columns = [str(column).strip() for column in df.columns]
+    for row in df.itertuples(index=False, name=None):
+        yield {column: value.strip() for column, value in zip(columns, row) if isinstance(value, str) and value.strip()}
+
+def _header_value(value):
+    """Valeur d'en-tête d'e-mail sur une seule ligne, encodée (RFC 2047) si elle n'est pas ASCII."""
+    from email.header import Header
+    
+    value = ' '.join(str(value).split())
+    return value if value.isascii() else Header(value, 'utf-8').encode()
+
+def _letter_message(letter, parameters, date_header):
+    """
+    Lettre au format e-mail (objet en sujet, autres sections dans le corps).
+    
+    Le message est assemblé directement (corps UTF-8 en 8 bits) : la construction
+    d'un EmailMessage coûte plus cher que l'écriture du fichier.
+    """
+    subject = letter.get("objet", "")
+    headers = [("Subject", subject[len("Objet :"):] if subject.startswith("Objet :") else subject)]
+    if parameters.get("email"):
+        headers.append(("From", parameters["email"]))
+    recipient = next((parameters[column] for column in RECIPIENT_EMAIL_COLUMNS if parameters.get(column)), None)
+    if recipient:
+        headers.append(("To", recipient))
+    lines = [f"{name}: {_header_value(value)}" for name, value in headers]
+    lines += [f"Date: {date_header}", "MIME-Version: 1.0", 'Content-Type: text/plain; charset="utf-8"',
+              "Content-Transfer-Encoding: 8bit", ""]
+    body = "\n\n".join(text for section, text in letter.items() if section != "objet")
+    lines.extend(body.splitlines())
+    return ("\r\n".join(lines) + "\r\n").encode('utf-8')
+
+def _merge_chunk(task):
+    """
+    Génère, analyse et écrit un lot de lettres (exécuté dans un processus du publipostage).
+    
+    Returns:
+        list: (ligne JSONL, score global ou None, nombre de suggestions) par lettre
+    """
+    from email.utils import formatdate
+    
+    template_type, defaults, today, start, rows, output_dir, formats = task
+    date_header = formatdate(localtime=True)
+    results = []
+    for offset, row in enumerate(rows):
+        index = start + offset
+        parameters = dict(defaults, **row)
+        letter = generate_mail_template(template_type, parameters, today)
+        analysis = analyze_mail_template(template_type, letter)
+        files = {}
+        name = f"lettre_{index + 1:06d}"
+        try:
+            if "eml" in formats:
+                files["eml"] = os.path.join(output_dir, "eml", name + ".eml")
+                with open(files["eml"], 'wb') as f:
+                    f.write(_letter_message(letter, parameters, date_header))
+            if "docx" in formats:
+                from report_export import export_blocks
+                files["docx"] = os.path.join(output_dir, "docx", name + ".docx")
+                export_blocks([("paragraph", text) for text in letter.values()], files["docx"], 'docx')
+        except Exception as e:
+            analysis = dict(analysis, error=f"Erreur lors de l'écriture de la lettre: {str(e)}")
+        record = {"index": index, "parameters": row, "letter": letter, "analysis": analysis, "files": files}
+        evaluation = analysis.get("evaluation") or {}
+        results.append((dumps(record), evaluation.get("overall"), len(analysis.get("suggestions") or [])))
+    return results
+
+def _run_ordered(function, tasks, workers=None):
+    """
+    Exécute une fonction sur chaque tâche dans un pool de processus.
+    
+    Une fenêtre bornée de tâches en cours garde la mémoire constante quelle que soit
+    la longueur de la source ; les résultats sont produits dans l'ordre des tâches.
+    
+    Args:
+        function (callable): Fonction de niveau module appliquée à chaque tâche
+        tasks (iterable): Tâches, lues au fur et à mesure
+        workers (int): Nombre de processus (0 pour tout traiter dans le processus courant)
+    
+    Yields:
+        Résultat de chaque tâche
+    """
+    if workers == 0:
+        for task in tasks:
+            yield function(task)
+        return
+    max_workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        window = deque()
+        for task in tasks:
+            window.append(executor.submit(function, task))
+            if len(window) >= 2 * max_workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+def mail_merge(template_type, recipients_path, output_dir, formats=MERGE_FORMATS, parameters=None, workers=None,
+               sheet=0, chunk_size=MERGE_CHUNK_SIZE):
+    """
+    Publipostage : une lettre personnalisée et analysée par destinataire.
+    
+    Les lettres sont produites par lots dans un pool de processus et écrites au fil
+    de l'eau : letters.jsonl (lettre, paramètres et analyse, dans l'ordre du fichier),
+    eml/lettre_NNNNNN.eml et docx/lettre_NNNNNN.docx.
+    
+    Args:
+        template_type (str): Type de modèle (motivation, reclamation, administrative)
+        recipients_path (str): Fichier Excel ou CSV des destinataires (une colonne par paramètre)
+        output_dir (str): Répertoire de sortie
+        formats (tuple): Formats écrits parmi 'jsonl', 'eml' et 'docx'
+        parameters (dict): Paramètres communs (expéditeur...), complétés par chaque ligne
+        workers (int): Nombre de processus (0 pour tout traiter dans le processus courant)
+        sheet (int|str): Feuille du classeur
+        chunk_size (int): Lettres par lot
+    
+    Returns:
+        dict: Nombre de lettres, fichiers produits, moyenne des scores et durée
+    """
+    started = time.perf_counter()
+    if template_type not in COMPILED_TEMPLATES:
+        return {"error": f"Type de modèle non pris en charge: {template_type}"}
+    unknown = [fmt for fmt in formats if fmt not in MERGE_FORMATS]
+    if unknown:
+        return {"error": f"Format non pris en charge: {', '.join(unknown)} (valeurs possibles: {', '.join(MERGE_FORMATS)})"}
+    
+    os.makedirs(output_dir, exist_ok=True)
+    for fmt in ("eml", "docx"):
+        if fmt in formats:
+            os.makedirs(os.path.join(output_dir, fmt), exist_ok=True)
+    today = datetime.now().strftime("%d/%m/%Y")
+    defaults = dict(parameters or {})
+    
+    def tasks():
+        rows = []
+        start = 0
+        for row in iter_recipients(recipients_path, sheet):
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield (template_type, defaults, today, start, rows, output_dir, tuple(formats))
+                start += len(rows)
+                rows = []
+        if rows:
+            yield (template_type, defaults, today, start, rows, output_dir, tuple(formats))
+    
+    letters = with_suggestions = 0
+    total_score = 0.0
+    jsonl_path = os.path.join(output_dir, "letters.jsonl") if "jsonl" in formats else None
+    jsonl = open(jsonl_path, 'w', encoding='utf-8') if jsonl_path else None
+    try:
+        for chunk in _run_ordered(_merge_chunk, tasks(), workers):
+            for line, overall, suggestions in chunk:
+                if jsonl:
+                    jsonl.write(line + "\n")
+                letters += 1
+                total_score += overall or 0.0
+                with_suggestions += bool(suggestions)
+    finally:
+        if jsonl:
+            jsonl.close()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "template_type": template_type,
+        "letters": letters,
+        "output_dir": output_dir,
+        "formats": list(formats),
+        "jsonl": jsonl_path,
+        "letters_with_suggestions": with_suggestions,
+        "average_overall": round(total_score / letters, 3) if letters else None,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "letters_per_s": round(letters / elapsed, 1) if elapsed else None,
+    }
+
+def benchmark_merge(letters=10000, formats=MERGE_FORMATS, workers=None):
+    """
+    Mesure le publipostage sur un fichier CSV de destinataires généré.
+    
+    Returns:
+        dict: Résultat de mail_merge (durée et débit)
+    """
+    import csv
+    import shutil
+    import tempfile
+    
+    directory = tempfile.mkdtemp(prefix='abia_merge_')
+    try:
+        recipients_path = os.path.join(directory, 'destinataires.csv')
+        with open(recipients_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(["entreprise", "destinataire", "adresse_entreprise", "email_destinataire",
+                             "objet_reclamation", "reference_commande", "date_incident"])
+            for i in range(letters):
+                writer.writerow([f"Société {i}", f"M. Client {i}", f"{i} rue de la Paix\n7500{i % 10} Paris",
+                                 f"client{i}@example.com", f"la commande {10000 + i}", f"CMD-{10000 + i}",
+                                 f"le {i % 28 + 1:02d}/03/2024"])
+        result = mail_merge('reclamation', recipients_path, os.path.join(directory, 'sortie'), formats,
+                            {"nom": "Jeanne Martin", "email": "jeanne.martin@example.com"}, workers)
+        result["output_dir"] = None
+        result["jsonl"] = None
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _mbox_message(parts):
+    """Assemble un message mbox, sans la ligne vide qui le sépare du suivant (comme mailbox.mbox)."""
+    message = b''.join(parts)
+    if message.endswith(b'\r\n\r\n'):
+        return message[:-2]
+    if message.endswith(b'\n\n'):
+        return message[:-1]
+    return message
+
+def _iter_mbox(file_path, block_size=1024 * 1024):
+    """
+    Messages bruts d'un fichier mbox, lus par blocs.
+    
+    Contrairement à mailbox.mbox, aucune table des matières n'est construite : la
+    mémoire utilisée ne dépend que du message en cours.
+    
+    Yields:
+        tuple: (position de la ligne « From » dans le fichier, octets du message)
+    """
+    with open(file_path, 'rb') as f:
+        pending = b''
+        parts = []
+        start = None
+        offset = 0
+        while True:
+            block = f.read(block_size)
+            data = pending + block
+            pending = b''
+            if block:
+                # Traitement jusqu'à la dernière fin de ligne : data commence toujours en début de ligne
+                cut = data.rfind(b'\n') + 1
+                data, pending = data[:cut], data[cut:]
+            position = 0
+            for match in _MBOX_SEPARATOR.finditer(data):
+                if start is not None:
+                    parts.append(data[position:match.start()])
+                    yield start, _mbox_message(parts)
+                parts = []
+                start = offset + match.start()
+                end = data.find(b'\n', match.start())
+                position = len(data) if end < 0 else end + 1
+            if start is not None and position < len(data):
+                parts.append(data[position:])
+            offset += len(data)
+            if not block:
+                break
+        if start is not None:
+            yield start, _mbox_message(parts)
+
+def iter_mailbox(path):
+    """
+    Parcourt une boîte aux lettres : fichier mbox, fichier .eml ou répertoire
+    (parcouru récursivement, fichiers .eml et .mbox).
+    
+    Les fichiers .eml ne sont pas lus ici : ils le sont par le processus qui les analyse.
+    
+    Args:
+        path (str): Fichier ou répertoire
+    
+    Yields:
+        tuple: (fichier, position dans le fichier mbox ou None, octets du message ou None)
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                extension = os.path.splitext(name)[1].lower()
+                if extension == '.eml':
+                    yield os.path.join(root, name), None, None
+                elif extension == '.mbox':
+                    file_path = os.path.join(root, name)
+                    for offset, raw in _iter_mbox(file_path):
+                        yield file_path, offset, raw
+    elif os.path.splitext(path)[1].lower() == '.eml':
+        yield path, None, None
+    else:
+        for offset, raw in _iter_mbox(path):
+            yield path, offset, raw
+
+def _decode_header(value):
+    """
+    Valeur d'en-tête décodée sur une seule ligne (mots encodés RFC 2047 et
+    en-têtes 8 bits bruts, lus en UTF-8 puis en Latin-1 à défaut).
+    """
+    from email.header import Header, decode_header
+    
+    if value is None:
+        return None
+    if isinstance(value, Header) or '=?' in value:
+        try:
+            chunks = decode_header(value)
+        except Exception:
+            chunks = [(str(value), None)]
+        parts = []
+        for data, charset in chunks:
+            if isinstance(data, str):
+                parts.append(data)
+                continue
+            try:
+                parts.append(data.decode(charset if charset and charset != 'unknown-8bit' else 'utf-8'))
+            except (LookupError, UnicodeDecodeError):
+                parts.append(data.decode('latin-1'))
+        value = ''.join(parts)
+    return ' '.join(value.split())
+
+def _part_text(part):
+    """Contenu textuel décodé d'une partie de message."""
+    payload = part.get_payload(decode=True) or b''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        return payload.decode('latin-1')
+
+def _html_text(source):
+    """Texte d'un contenu HTML (balises retirées, entités décodées)."""
+    import html
+    
+    text = _HTML_TAG.sub(' ', _HTML_BREAK.sub('\n', _HTML_DROP.sub(' ', source)))
+    return _BLANK_LINES.sub('\n\n', html.unescape(text)).strip()
+
+def _attachment_text(filename, content_type, data):
+    """
+    Texte d'une pièce jointe, extrait avec les lecteurs de l'application.
+    
+    Returns:
+        tuple: (texte ou None si le format n'est pas pris en charge, informations sur le contenu)
+    """
+    import io
+    
+    extension = os.path.splitext(filename or '')[1].lower() or _ATTACHMENT_TYPES.get(content_type, '')
+    if extension == '.pdf':
+        from text_chunker import iter_pdf_pages
+        pages = [text for _, text in iter_pdf_pages(io.BytesIO(data))]
+        return "\n\n".join(pages), {"pages": len(pages)}
+    if extension == '.docx':
+        from docx_stream import extract_docx
+        extracted = extract_docx(io.BytesIO(data))
+        return "\n".join(extracted["paragraphs"]), {"paragraphs": extracted["paragraph_count"],
+                                                     "tables": extracted["table_count"]}
+    if extension in ('.xlsx', '.xlsm', '.xls', '.csv'):
+        from excel_engines import read_sheet
+        # Le nom de fichier ne sert qu'au choix du moteur : le contenu est lu en mémoire
+        sheets, _ = read_sheet('piece_jointe' + extension, None, source=io.BytesIO(data), dtype=str)
+        texts = [f"[{name}]\n" + df.to_csv(sep='\t', index=False) for name, df in sheets.items()]
+        return "\n".join(texts), {"sheets": {str(name): {"rows": len(df), "columns": len(df.columns)}
+                                             for name, df in sheets.items()}}
+    if content_type == 'text/html' or extension in ('.html', '.htm'):
+        return _html_text(data.decode('utf-8', errors='replace')), {}
+    if content_type.startswith('text/') or extension in ('.txt', '.md'):
+        return data.decode('utf-8', errors='replace'), {}
+    return None, {}
+
+def _limited(record, key, text, limit):
+    """Ajoute un texte à un enregistrement, tronqué à limit caractères (omis si limit vaut 0)."""
+    record[key + "_chars"] = len(text)
+    if limit:
+        record[key] = text[:limit]
+        if len(text) > limit:
+            record[key + "_truncated"] = True
+
+def analyze_message(raw, text_limit=MAILBOX_TEXT_LIMIT):
+    """
+    Analyse un e-mail : en-têtes, corps, pièces jointes et évaluation du texte.
+    
+    Args:
+        raw (bytes): Message au format RFC 5322
+        text_limit (int): Caractères conservés pour le corps et chaque pièce jointe
+            (0 pour ne garder que les métriques)
+    
+    Returns:
+        dict: En-têtes (message_id, date, from, to, cc, subject), corps, pièces jointes
+            (nom, type, taille, texte extrait) et évaluation (ton, clarté, dates citées)
+    """
+    from email import message_from_bytes
+    from email.utils import parsedate_to_datetime
+    
+    message = message_from_bytes(raw)
+    record = {
+        "message_id": _decode_header(message.get("Message-ID")),
+        "date": None,
+        "from": _decode_header(message.get("From")),
+        "to": _decode_header(message.get("To")),
+        "cc": _decode_header(message.get("Cc")),
+        "subject": _decode_header(message.get("Subject")) or ""
+    }
+    try:
+        record["date"] = parsedate_to_datetime(message.get("Date")).isoformat()
+    except Exception:
+        record["date"] = _decode_header(message.get("Date"))
+    
+    # Premier texte brut (HTML à défaut) hors pièces jointes, pièces jointes extraites
+    plain = html_body = None
+    attachments = []
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        content_type = part.get_content_type()
+        filename = _decode_header(part.get_filename())
+        if part.get_content_disposition() != 'attachment' and not filename:
+            if content_type == 'text/plain' and plain is None:
+                plain = _part_text(part)
+                continue
+            if content_type == 'text/html' and html_body is None:
+                html_body = _part_text(part)
+                continue
+            if content_type.startswith('text/') or content_type.startswith('message/'):
+                continue
+        data = part.get_payload(decode=True) or b''
+        attachment = {"filename": filename, "content_type": content_type, "size": len(data)}
+        if len(data) > ATTACHMENT_MAX_BYTES:
+            attachment["skipped"] = f"Pièce jointe de plus de {ATTACHMENT_MAX_BYTES // (1024 * 1024)} Mo"
+        else:
+            try:
+                text, details = _attachment_text(filename, content_type, data)
+                if text is not None:
+                    attachment.update(details)
+                    _limited(attachment, "text", text, text_limit)
+            except Exception as e:
+                attachment["error"] = str(e)
+        attachments.append(attachment)
+    
+    if plain is not None:
+        body, record["body_type"] = plain, "plain"
+    elif html_body is not None:
+        body, record["body_type"] = _html_text(html_body), "html"
+    else:
+        body, record["body_type"] = "", None
+    _limited(record, "body", body, text_limit)
+    record["attachments"] = attachments
+    
+    # Évaluation du message (objet et corps)
+    text = record["subject"] + "\n" + body
+    dates = []
+    for pattern in _DATE_PATTERNS:
+        dates.extend(match for match in pattern.findall(text) if match not in dates)
+    tone_score = _evaluate_tone(text)
+    clarity_score = _evaluate_clarity(text)
+    record["evaluation"] = {
+        "tone": tone_score,
+        "clarity": clarity_score,
+        "overall": (tone_score + clarity_score) / 2,
+        "has_date": bool(dates),
+        "dates": dates[:10]
+    }
+    return record
+
+def _mailbox_chunk(task):
+    """
+    Analyse un lot de messages (exécuté dans un processus de l'analyse des boîtes).
+    
+    Returns:
+        list: (ligne JSONL, octets lus, évaluation ou None, pièces jointes, pièces jointes extraites)
+            par message
+    """
+    start, items, text_limit = task
+    results = []
+    for offset_in_chunk, (source, offset, raw) in enumerate(items):
+        record = {"index": start + offset_in_chunk, "source": source}
+        if offset is not None:
+            record["offset"] = offset
+        size = 0
+        try:
+            if raw is None:
+                with open(source, 'rb') as f:
+                    raw = f.read()
+            size = len(raw)
+            record.update(analyze_message(raw, text_limit))
+        except Exception as e:
+            record["error"] = str(e)
+        attachments = record.get("attachments") or []
+        extracted = sum(1 for attachment in attachments if "text_chars" in attachment)
+        results.append((dumps(record), size, record.get("evaluation"), len(attachments), extracted))
+    return results
+
+def analyze_mailbox(path, output_path=None, workers=None, text_limit=MAILBOX_TEXT_LIMIT,
+                    chunk_messages=MAILBOX_CHUNK_MESSAGES, chunk_bytes=MAILBOX_CHUNK_BYTES):
+    """
+    Analyse en flux une boîte aux lettres (mbox, .eml ou répertoire de .eml).
+    
+    Les messages sont lus au fil de l'eau et analysés par lots dans un pool de
+    processus ; une ligne JSONL par message est écrite dans l'ordre de l'archive.
+    
+    Args:
+        path (str): Fichier mbox, fichier .eml ou répertoire
+        output_path (str): Fichier JSONL de sortie (sortie standard si None)
+        workers (int): Nombre de processus (0 pour tout traiter dans le processus courant)
+        text_limit (int): Caractères conservés pour le corps et chaque pièce jointe
+        chunk_messages (int): Messages par lot
+        chunk_bytes (int): Taille maximale d'un lot (octets des messages mbox)
+    
+    Returns:
+        dict: Nombre de messages, erreurs, pièces jointes, moyennes des scores et durée
+    """
+    started = time.perf_counter()
+    if not os.path.exists(path):
+        return {"error": f"Le chemin {path} n'existe pas."}
+    
+    def tasks():
+        items = []
+        size = start = 0
+        for item in iter_mailbox(path):
+            items.append(item)
+            size += len(item[2]) if item[2] else 0
+            if len(items) >= chunk_messages or size >= chunk_bytes:
+                yield (start, items, text_limit)
+                start += len(items)
+                items = []
+                size = 0
+        if items:
+            yield (start, items, text_limit)
+    
+    messages = errors = with_dates = attachments = extracted = total_bytes = 0
+    totals = {"tone": 0.0, "clarity": 0.0, "overall": 0.0}
+    output = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+    try:
+        for chunk in _run_ordered(_mailbox_chunk, tasks(), workers):
+            for line, size, evaluation, message_attachments, message_extracted in chunk:
+                output.write(line + "\n")
+                messages += 1
+                total_bytes += size
+                attachments += message_attachments
+                extracted += message_extracted
+                if evaluation is None:
+                    errors += 1
+                    continue
+                with_dates += evaluation["has_date"]
+                for key in totals:
+                    totals[key] += evaluation[key]
+    finally:
+        if output_path:
+            output.close()
+        else:
+            output.flush()
+    
+    elapsed = time.perf_counter() - started
+    analyzed = messages - errors
+    return {
+        "path": path,
+        "output": output_path,
+        "messages": messages,
+        "errors": errors,
+        "bytes": total_bytes,
+        "attachments": attachments,
+        "attachments_extracted": extracted,
+        "messages_with_dates": with_dates,
+        "average": {key: round(total / analyzed, 3) for key, total in totals.items()} if analyzed else None,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "messages_per_s": round(messages / elapsed, 1) if elapsed else None,
+        "mb_per_s": round(total_bytes / (1024 * 1024) / elapsed, 2) if elapsed else None
+    }
+
+def benchmark_mailbox(messages=20000, attachment_every=10, workers=None):
+    """
+    Mesure l'analyse d'un fichier mbox généré (un message sur attachment_every porte
+    une pièce jointe Word ou CSV).
+    
+    Returns:
+        dict: Résultat d'analyze_mailbox, taille du fichier et pic mémoire du processus principal
+    """
+    import resource
+    import shutil
+    import tempfile
+    from email.message import EmailMessage
+    from email.utils import formatdate
+    from report_export import export_blocks
+    
+    directory = tempfile.mkdtemp(prefix='abia_mailbox_')
+    try:
+        docx_path = os.path.join(directory, 'piece.docx')
+        export_blocks([("paragraph", f"Ligne {i} de la pièce jointe, livrée le {i % 28 + 1}/03/2024.") for i in range(50)],
+                      docx_path, 'docx')
+        with open(docx_path, 'rb') as f:
+            docx_data = f.read()
+        csv_data = "\n".join(["reference;montant"] + [f"CMD-{i};{i * 3.5}" for i in range(200)]).encode('utf-8')
+        
+        mbox_path = os.path.join(directory, 'archive.mbox')
+        with open(mbox_path, 'wb') as f:
+            for i in range(messages):
+                message = EmailMessage()
+                message["From"] = f"Client {i} <client{i}@example.com>"
+                message["To"] = "service@example.com"
+                message["Subject"] = f"Réclamation commande CMD-{10000 + i}"
+                message["Date"] = formatdate(1700000000 + i * 60)
+                message["Message-ID"] = f"<{i}@example.com>"
+                body = (f"Madame, Monsieur,\n\nMa commande CMD-{10000 + i} du {i % 28 + 1:02d}/03/2024 n'est pas arrivée. "
+                        "Je vous prie de bien vouloir me rembourser.\n\nVeuillez agréer mes salutations distinguées.\n")
+                message.set_content(body * (1 + i % 5))
+                if attachment_every and i % attachment_every == 0:
+                    if (i // attachment_every) % 2:
+                        message.add_attachment(csv_data, maintype='text', subtype='csv', filename='commandes.csv')
+                    else:
+                        message.add_attachment(docx_data, maintype='application',
+                                               subtype='vnd.openxmlformats-officedocument.wordprocessingml.document',
+                                               filename='details.docx')
+                raw = message.as_bytes()
+                f.write(f"From client{i}@example.com {formatdate(1700000000 + i * 60, usegmt=True)}\n".encode('ascii'))
+                f.write(raw.replace(b'\nFrom ', b'\n>From '))
+                f.write(b'\n\n')
+        
+        result = analyze_mailbox(mbox_path, os.path.join(directory, 'messages.jsonl'), workers)
+        result["path"] = result["output"] = None
+        result["file_mb"] = round(os.path.getsize(mbox_path) / (1024 * 1024), 1)
+        result["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
 if __name__ == "__main__":
     # Vérifier les arguments
     if len(sys.argv) < 2:
-        print(json.dumps({"error": "Arguments insuffisants."}))
+        print(dumps({"error": "Arguments insuffisants."}))
         sys.exit(1)
     
     command = sys.argv[1]
     
     if command == "analyze":
         if len(sys.argv) < 4:
-            print(json.dumps({"error": "Arguments insuffisants pour l'analyse."}))
+            print(dumps({"error": "Arguments insuffisants pour l'analyse."}))
             sys.exit(1)
         
         template_type = sys.argv[2]
@@ -230,20 +937,88 @@ if __name__ == "__main__":
         try:
             content = json.loads(content_json)
             result = analyze_mail_template(template_type, content)
-            print(json.dumps(result))
+            print(dumps(result))
         except Exception as e:
-            print(json.dumps({"error": str(e)}))
+            print(dumps({"error": str(e)}))
     
     elif command == "generate":
         if len(sys.argv) < 3:
-            print(json.dumps({"error": "Arguments insuffisants pour la génération."}))
+            print(dumps({"error": "Arguments insuffisants pour la génération."}))
             sys.exit(1)
         
         template_type = sys.argv[2]
         parameters = json.loads(sys.argv[3]) if len(sys.argv) > 3 else None
         
         result = generate_mail_template(template_type, parameters)
-        print(json.dumps(result))
+        print(dumps(result))
+    
+    elif command in ("merge", "benchmark"):
+        # Options du publipostage : --formats jsonl,eml,docx --params json|@fichier --workers n --sheet n
+        args = sys.argv[2:]
+        options = {}
+        for option in ("--formats", "--params", "--workers", "--sheet"):
+            if option in args:
+                position = args.index(option)
+                options[option] = args[position + 1]
+                del args[position:position + 2]
+        formats = tuple(options["--formats"].split(',')) if "--formats" in options else MERGE_FORMATS
+        workers = int(options["--workers"]) if "--workers" in options else None
+        
+        if command == "benchmark":
+            print(dumps(benchmark_merge(int(args[0]) if args else 10000, formats, workers)))
+            sys.exit(0)
+        
+        if len(args) < 3:
+            print(dumps({"error": "Usage: python mail_analyzer.py merge <type> <destinataires.xlsx|csv> <répertoire> "
+                                  "[--formats jsonl,eml,docx] [--params json|@fichier] [--workers n] [--sheet n]"}))
+            sys.exit(1)
+        
+        try:
+            parameters = None
+            if "--params" in options:
+                value = options["--params"]
+                if value.startswith('@'):
+                    with open(value[1:], 'r', encoding='utf-8') as f:
+                        value = f.read()
+                parameters = json.loads(value)
+            sheet = options.get("--sheet", 0)
+            sheet = int(sheet) if str(sheet).isdigit() else sheet
+            print(dumps(mail_merge(args[0], args[1], args[2], formats, parameters, workers, sheet)))
+        except Exception as e:
+            print(dumps({"error": str(e)}))
+            sys.exit(1)
+    
+    elif command in ("mailbox", "benchmark-mailbox"):
+        # Options de l'analyse des boîtes : --workers n --text-limit n
+        args = sys.argv[2:]
+        options = {}
+        for option in ("--workers", "--text-limit"):
+            if option in args:
+                position = args.index(option)
+                options[option] = int(args[position + 1])
+                del args[position:position + 2]
+        workers = options.get("--workers")
+        
+        if command == "benchmark-mailbox":
+            print(dumps(benchmark_mailbox(int(args[0]) if args else 20000, workers=workers)))
+            sys.exit(0)
+        
+        if not args:
+            print(dumps({"error": "Usage: python mail_analyzer.py mailbox <fichier.mbox|fichier.eml|répertoire> "
+                                  "[sortie.jsonl] [--workers n] [--text-limit n]"}))
+            sys.exit(1)
+        
+        try:
+            result = analyze_mailbox(args[0], args[1] if len(args) > 1 else None, workers,
+                                     options.get("--text-limit", MAILBOX_TEXT_LIMIT))
+        except Exception as e:
+            result = {"error": str(e)}
+        # Sans fichier de sortie, les messages occupent la sortie standard : le bilan passe sur stderr
+        if len(args) > 1 or "error" in result:
+            print(dumps(result))
+        else:
+            print(dumps(result), file=sys.stderr)
+        sys.exit(1 if "error" in result else 0)
     
     else:
-        print(json.dumps({"error": f"Commande non reconnue: {command}"}))
+        print(dumps({"error": f"Commande non reconnue: {command}"}))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NDJSON Protocol
+---------------
+Protocole de sortie commun aux scripts Python de l'application ABIA.
+
+Chaque ligne écrite sur stdout est une trame JSON autonome et typée :
+
+- progress : avancement d'une étape ({"step", "progress", "message"})
+- partial  : résultat partiel exploitable immédiatement ({"key", "offset", "items"})
+- result   : résultat final (les champs déjà diffusés en trames partial sont omis)
+- error    : erreur fatale ({"message", "details"})
+- metrics  : mesures d'exécution (durées, volumes)
+
+Le mode est activé par l'option `--ndjson` ; sans elle, les scripts conservent
+leur sortie historique (un seul objet JSON ou du texte).
+"""
+
+import sys
+import time
+
+from json_output import dumps
+
+PROTOCOL_VERSION = 1
+FRAME_TYPES = ('progress', 'partial', 'result', 'error', 'metrics')
+NDJSON_FLAG = '--ndjson'
+
+# Schéma JSON (draft-07) des trames, publié avec `python ndjson_protocol.py schema`
+FRAME_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "title": "ABIA NDJSON frame",
+    "type": "object",
+    "required": ["v", "type", "seq", "source", "data"],
+    "properties": {
+        "v": {"const": PROTOCOL_VERSION},
+        "type": {"enum": list(FRAME_TYPES)},
+        "seq": {"type": "integer", "minimum": 0},
+        "source": {"type": "string"},
+        "ts": {"type": "number"},
+        "data": {"type": "object"},
+    },
+    "allOf": [
+        {
+            "if": {"properties": {"type": {"const": "progress"}}},
+            "then": {"properties": {"data": {
+                "required": ["step", "progress"],
+                "properties": {
+                    "step": {"type": "string"},
+                    "progress": {"type": "number", "minimum": 0, "maximum": 100},
+                    "message": {"type": "string"},
+                },
+            }}},
+        },
+        {
+            "if": {"properties": {"type": {"const": "partial"}}},
+            "then": {"properties": {"data": {
+                "required": ["key", "offset", "items"],
+                "properties": {
+                    "key": {"type": "string"},
+                    "offset": {"type": "integer", "minimum": 0},
+                    "items": {"type": "array"},
+                    "total": {"type": ["integer", "null"]},
+                },
+            }}},
+        },
+        {
+            "if": {"properties": {"type": {"const": "result"}}},
+            "then": {"properties": {"data": {
+                "properties": {"streamed": {"type": "array", "items": {"type": "string"}}},
+            }}},
+        },
+        {
+            "if": {"properties": {"type": {"const": "error"}}},
+            "then": {"properties": {"data": {
+                "required": ["message"],
+                "properties": {"message": {"type": "string"}},
+            }}},
+        },
+        {
+            "if": {"properties": {"type": {"const": "metrics"}}},
+            "then": {"properties": {"data": {
+                "additionalProperties": {"type": ["number", "integer", "string", "boolean", "null"]},
+            }}},
+        },
+    ],
+}
+
+# Champs obligatoires du bloc "data" pour chaque type de trame
+_REQUIRED_DATA_FIELDS = {
+    'progress': ('step', 'progress'),
+    'partial': ('key', 'offset', 'items'),
+    'result': (),
+    'error': ('message',),
+    'metrics': (),
+}
+
+
+def validate_frame(frame):
+    """
+    Vérifie qu'une trame respecte le schéma du protocole (sans dépendance externe).
+
+    Args:
+        frame (dict): Trame décodée
+
+    Returns:
+        list: Messages d'erreur (vide si la trame est valide)
+    """
+    errors = []
+    if not isinstance(frame, dict):
+        return ["La trame doit être un objet JSON"]
+    for field in ('v', 'type', 'seq', 'source', 'data'):
+        if field not in frame:
+            errors.append(f"Champ manquant: {field}")
+    if errors:
+        return errors
+    if frame['v'] != PROTOCOL_VERSION:
+        errors.append(f"Version de protocole non supportée: {frame['v']}")
+    if frame['type'] not in FRAME_TYPES:
+        errors.append(f"Type de trame inconnu: {frame['type']}")
+        return errors
+    if not isinstance(frame['seq'], int) or frame['seq'] < 0:
+        errors.append("Le champ seq doit être un entier positif")
+    data = frame['data']
+    if not isinstance(data, dict):
+        errors.append("Le champ data doit être un objet")
+        return errors
+    for field in _REQUIRED_DATA_FIELDS[frame['type']]:
+        if field not in data:
+            errors.append(f"Champ data.{field} manquant pour une trame {frame['type']}")
+    if frame['type'] == 'progress' and isinstance(data.get('progress'), (int, float)):
+        if not 0 <= data['progress'] <= 100:
+            errors.append("data.progress doit être compris entre 0 et 100")
+    if frame['type'] == 'partial' and not isinstance(data.get('items', []), list):
+        errors.append("data.items doit être un tableau")
+    if frame['type'] == 'metrics':
+        for key, value in data.items():
+            if value is not None and not isinstance(value, (int, float, str, bool)):
+                errors.append(f"data.{key} doit être un nombre, un texte, un booléen ou null")
+    return errors
+
+
+def pop_ndjson_flag(argv):
+    """
+    Retire l'option --ndjson de la liste d'arguments.
+
+    Les arguments positionnels des scripts restent ainsi inchangés.
+
+    Args:
+        argv (list): Arguments de la ligne de commande (modifiés sur place)
+
+    Returns:
+        bool: True si le mode NDJSON est demandé
+    """
+    if NDJSON_FLAG in argv:
+        while NDJSON_FLAG in argv:
+            argv.remove(NDJSON_FLAG)
+        return True
+    return False
+
+
+class FrameWriter:
+    """
+    Écrit les trames NDJSON d'un script sur un flux, une trame par ligne.
+    """
+
+    def __init__(self, source, stream=None):
+        """
+        Args:
+            source (str): Nom du script émetteur (ex: 'excel_processor')
+            stream: Flux de sortie (sys.stdout par défaut)
+        """
+        self.source = source
+        self.stream = stream or sys.stdout
+        self.seq = 0
+        self.started = time.perf_counter()
+        self.first_frame_ms = None
+
+    def emit(self, frame_type, data):
+        """
+        Écrit une trame et vide le flux immédiatement.
+
+        Args:
+            frame_type (str): Type de trame (voir FRAME_TYPES)
+            data (dict): Contenu de la trame
+        """
+        if frame_type not in FRAME_TYPES:
+            raise ValueError(f"Type de trame inconnu: {frame_type}")
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        if self.first_frame_ms is None:
+            self.first_frame_ms = elapsed_ms
+        frame = {
+            "v": PROTOCOL_VERSION,
+            "type": frame_type,
+            "seq": self.seq,
+            "source": self.source,
+            "ts": round(elapsed_ms, 3),
+            "data": data,
+        }
+        self.seq += 1
+        self.stream.write(dumps(frame) + "\n")
+        self.stream.flush()
+
+    def progress(self, step, progress, message=None):
+        """Trame d'avancement (progress entre 0 et 100)."""
+        data = {"step": step, "progress": progress}
+        if message is not None:
+            data["message"] = message
+        self.emit('progress', data)
+
+    def partial(self, key, items, offset=0, total=None):
+        """Trame de résultat partiel : `items` sont les éléments de `key` à partir de `offset`."""
+        self.emit('partial', {"key": key, "offset": offset, "items": list(items), "total": total})
+
+    def stream_items(self, key, items, chunk_size=500, first_chunk_size=50):
+        """
+        Diffuse une liste en trames partial successives.
+
+        Le premier morceau est volontairement petit pour un affichage immédiat.
+
+        Args:
+            key (str): Nom du champ diffusé
+            items (list): Éléments à diffuser
+            chunk_size (int): Taille des morceaux suivants
+            first_chunk_size (int): Taille du premier morceau
+        """
+        total = len(items)
+        offset = 0
+        size = first_chunk_size
+        while offset < total:
+            self.partial(key, items[offset:offset + size], offset=offset, total=total)
+            offset += size
+            size = chunk_size
+        if total == 0:
+            self.partial(key, [], offset=0, total=0)
+
+    def result(self, data, streamed=None):
+        """
+        Trame de résultat final.
+
+        Args:
+            data (dict): Résultat (sans les champs déjà diffusés)
+            streamed (list): Noms des champs diffusés en trames partial
+        """
+        payload = dict(data) if isinstance(data, dict) else {"value": data}
+        if streamed:
+            payload["streamed"] = list(streamed)
+        self.emit('result', payload)
+
+    def error(self, message, details=None):
+        """Trame d'erreur."""
+        data = {"message": str(message)}
+        if details is not None:
+            data["details"] = details
+        self.emit('error', data)
+
+    def metrics(self, **values):
+        """Trame de mesures ; la durée totale et le délai de première trame sont ajoutés."""
+        values.setdefault("elapsed_ms", round((time.perf_counter() - self.started) * 1000, 3))
+        values.setdefault("first_frame_ms", round(self.first_frame_ms or 0.0, 3))
+        values.setdefault("frames", self.seq + 1)
+        self.emit('metrics', values)
+
+
+if __name__ == "__main__":
+    import json
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('schema', 'validate'):
+        print("Usage: python ndjson_protocol.py schema | validate < frames.ndjson", file=sys.stderr)
+        sys.exit(1)
+
+    if sys.argv[1] == 'schema':
+        print(json.dumps(FRAME_SCHEMA, indent=2, ensure_ascii=False))
+    else:
+        invalid = 0
+        for line_number, line in enumerate(sys.stdin, start=1):
+            if not line.strip():
+                continue
+            try:
+                problems = validate_frame(json.loads(line))
+            except json.JSONDecodeError as e:
+                problems = [f"JSON invalide: {e}"]
+            for problem in problems:
+                invalid += 1
+                print(f"Ligne {line_number}: {problem}", file=sys.stderr)
+        sys.exit(1 if invalid else 0)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Prompt Packer
+-------------
+Construction de prompts sous contrainte de budget de tokens pour les données tabulaires.
+Utilisé par excel_processor.py pour préparer les données envoyées à l'API DeepSeek.
+
+Le module choisit une sérialisation compacte (CSV, TSV ou orientée colonnes),
+sélectionne les lignes les plus représentatives et garantit qu'aucune ligne
+n'est coupée en cours de route.
+"""
+
+import csv
+import io
+import math
+
+import numpy as np
+import pandas as pd
+
+# Approximation usuelle : ~4 caractères par token pour les tokenizers BPE
+CHARS_PER_TOKEN = 4
+
+SERIALIZATIONS = ('csv', 'tsv', 'columns')
+STRATEGIES = ('representative', 'stratified', 'head')
+
+# Nombre de lignes utilisées pour estimer le coût de chaque sérialisation
+_SERIALIZATION_SAMPLE = 50
+
+
+def estimate_tokens(text):
+    """
+    Estime le nombre de tokens d'un texte.
+
+    Args:
+        text (str): Texte à évaluer
+
+    Returns:
+        int: Nombre de tokens estimé
+    """
+    if not text:
+        return 0
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _format_cell(value):
+    """Convertit une cellule en texte court (None/NaN -> chaîne vide)."""
+    if value is None or value is pd.NaT:
+        return ""
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+        return repr(round(value, 6))
+    if isinstance(value, (np.integer, np.bool_)):
+        return str(value.item())
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+        if pd.isna(value):
+            return ""
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    return str(value).replace("\n", " ").replace("\r", " ")
+
+
+def _column_arrays(df):
+    """Tableaux NumPy des colonnes, pour un accès ligne à ligne sans créer de Series."""
+    return [df.iloc[:, i].to_numpy() for i in range(len(df.columns))]
+
+
+def _row_cells(columns, position):
+    """Retourne les cellules formatées de la ligne à la position donnée."""
+    return [_format_cell(column[position]) for column in columns]
+
+
+def _serialize_line(cells, serialization):
+    """Sérialise une ligne de cellules selon le format demandé."""
+    if serialization == 'tsv':
+        return "\t".join(cell.replace("\t", " ") for cell in cells)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(cells)
+    return buffer.getvalue()
+
+
+def _row_cost(cells, serialization):
+    """Coût en caractères d'une ligne dans la sérialisation donnée."""
+    if serialization == 'columns':
+        # Chaque cellule est ajoutée à la ligne de sa colonne avec un séparateur
+        return sum(len(cell) + 1 for cell in cells)
+    return len(_serialize_line(cells, serialization)) + 1
+
+
+def choose_serialization(df, sample_size=_SERIALIZATION_SAMPLE):
+    """
+    Choisit la sérialisation la plus compacte en l'évaluant sur un échantillon.
+
+    Args:
+        df (DataFrame): Données à sérialiser
+        sample_size (int): Nombre de lignes de l'échantillon
+
+    Returns:
+        str: 'csv', 'tsv' ou 'columns'
+    """
+    if len(df) == 0:
+        return 'csv'
+    positions = np.linspace(0, len(df) - 1, num=min(sample_size, len(df)), dtype=int)
+    columns = _column_arrays(df)
+    sample_rows = [_row_cells(columns, int(p)) for p in np.unique(positions)]
+    header = [_format_cell(c) for c in df.columns]
+
+    costs = {}
+    for serialization in ('csv', 'tsv'):
+        costs[serialization] = _row_cost(header, serialization) + sum(
+            _row_cost(cells, serialization) for cells in sample_rows)
+    # Le format colonnes répète le nom de colonne une seule fois mais
+    # n'est lisible que si les colonnes sont peu nombreuses
+    if len(df.columns) <= 8:
+        costs['columns'] = sum(len(h) + 3 for h in header) + sum(
+            _row_cost(cells, 'columns') for cells in sample_rows)
+
+    return min(costs, key=costs.get)
+
+
+def _van_der_corput_order(n):
+    """
+    Ordre de priorité des positions 0..n-1 tel que chaque préfixe soit réparti
+    uniformément sur l'ensemble des lignes (suite de van der Corput en base 2).
+    """
+    if n <= 1:
+        return np.arange(n)
+    bits = int(math.ceil(math.log2(n)))
+    positions = np.arange(n, dtype=np.int64)
+    reversed_bits = np.zeros(n, dtype=np.int64)
+    for bit in range(bits):
+        reversed_bits |= ((positions >> bit) & 1) << (bits - 1 - bit)
+    return np.argsort(reversed_bits, kind='stable')
+
+
+def _extreme_positions(df):
+    """Positions des lignes contenant les minima/maxima des colonnes numériques."""
+    positions = []
+    for col in df.select_dtypes(include=['number']).columns:
+        values = df[col]
+        if values.notna().any():
+            positions.append(int(np.nanargmin(values.to_numpy(dtype=float, na_value=np.nan))))
+            positions.append(int(np.nanargmax(values.to_numpy(dtype=float, na_value=np.nan))))
+    return positions
+
+
+def _pick_stratify_column(df):
+    """Choisit une colonne catégorielle de faible cardinalité pour la stratification."""
+    best = None
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        unique_count = df[col].nunique(dropna=True)
+        if 1 < unique_count <= 50 and (best is None or unique_count < best[1]):
+            best = (col, unique_count)
+    return best[0] if best else None
+
+
+def row_priority(df, strategy='representative', stratify_column=None, seed=0):
+    """
+    Calcule l'ordre dans lequel les lignes doivent être ajoutées au prompt.
+
+    Args:
+        df (DataFrame): Données sources
+        strategy (str): 'representative' (extrêmes puis répartition uniforme),
+            'stratified' (tour de rôle entre les valeurs d'une colonne) ou 'head'
+        stratify_column (str): Colonne de stratification (détectée si None)
+        seed (int): Graine du générateur aléatoire pour la stratification
+
+    Returns:
+        ndarray: Positions des lignes par ordre de priorité décroissante
+    """
+    n = len(df)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Stratégie de sélection inconnue: {strategy}")
+
+    if strategy == 'head' or n == 0:
+        return np.arange(n)
+
+    if strategy == 'stratified':
+        column = stratify_column if stratify_column in df.columns else _pick_stratify_column(df)
+        if column is not None:
+            rng = np.random.default_rng(seed)
+            codes, _ = pd.factorize(df[column], use_na_sentinel=False)
+            # Rang aléatoire de chaque ligne au sein de sa strate, puis tour de rôle
+            shuffled = rng.permutation(n)
+            order = shuffled[np.argsort(codes[shuffled], kind='stable')]
+            sorted_codes = codes[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+            rank_in_stratum = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+            return order[np.lexsort((sorted_codes, rank_in_stratum))]
+
+    # 'representative' (ou 'stratified' sans colonne exploitable)
+    base = _van_der_corput_order(n)
+    extremes = _extreme_positions(df)
+    if not extremes:
+        return base
+    extremes = list(dict.fromkeys(extremes))
+    mask = np.ones(n, dtype=bool)
+    mask[extremes] = False
+    return np.concatenate([np.asarray(extremes, dtype=np.int64), base[mask[base]]])
+
+
+def summarize_columns(df):
+    """
+    Produit des statistiques agrégées compactes sur l'ensemble des lignes.
+
+    Args:
+        df (DataFrame): Données sources
+
+    Returns:
+        list: Lignes de texte décrivant chaque colonne
+    """
+    lines = []
+    for col in df.columns:
+        series = df[col]
+        nulls = int(series.isna().sum())
+        if pd.api.types.is_bool_dtype(series):
+            lines.append(f"- {col}: booléen, vrais={int(series.sum())}, vides={nulls}")
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.dropna()
+            if len(values) == 0:
+                lines.append(f"- {col}: numérique, vides={nulls}")
+                continue
+            lines.append(
+                f"- {col}: numérique, min={_format_cell(values.min())}, max={_format_cell(values.max())}, "
+                f"moyenne={_format_cell(float(values.mean()))}, somme={_format_cell(float(values.sum()))}, vides={nulls}")
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dropna()
+            if len(values) == 0:
+                lines.append(f"- {col}: date, vides={nulls}")
+                continue
+            lines.append(f"- {col}: date, de {_format_cell(values.min())} à {_format_cell(values.max())}, vides={nulls}")
+        else:
+            counts = series.astype(object).where(series.notna()).dropna().astype(str).value_counts()
+            top = ", ".join(f"{k} ({v})" for k, v in counts.head(3).items())
+            lines.append(f"- {col}: texte, {len(counts)} valeurs distinctes, fréquentes: {top}, vides={nulls}")
+    return lines
+
+
+def pack_dataframe(df, token_budget, serialization='auto', strategy='representative',
+                   stratify_column=None, include_stats=True, token_counter=None):
+    """
+    Emballe un DataFrame dans un texte respectant un budget de tokens.
+
+    Les statistiques agrégées sont calculées sur toutes les lignes, puis les lignes
+    sont ajoutées par ordre de priorité tant que le budget le permet. Les lignes
+    sont toujours complètes et restituées dans leur ordre d'origine.
+
+    Args:
+        df (DataFrame): Données à emballer
+        token_budget (int): Nombre maximal de tokens pour le texte produit
+        serialization (str): 'auto', 'csv', 'tsv' ou 'columns'
+        strategy (str): Stratégie de sélection des lignes (voir row_priority)
+        stratify_column (str): Colonne de stratification optionnelle
+        include_stats (bool): Inclure les statistiques agrégées
+        token_counter (callable): Fonction de comptage des tokens (estimation par défaut)
+
+    Returns:
+        dict: Texte emballé et informations sur le contenu retenu
+    """
+    count_tokens = token_counter or estimate_tokens
+    if serialization == 'auto':
+        serialization = choose_serialization(df)
+    if serialization not in SERIALIZATIONS:
+        raise ValueError(f"Sérialisation inconnue: {serialization}")
+
+    parts = []
+    if include_stats and len(df.columns) > 0:
+        stats_text = "Statistiques (toutes les lignes):\n" + "\n".join(summarize_columns(df)) + "\n"
+        if count_tokens(stats_text) <= token_budget:
+            parts.append(stats_text)
+
+    header = [_format_cell(c) for c in df.columns]
+    # Le séparateur "\n" entre les parties compte aussi dans le budget
+    remaining = token_budget - count_tokens("\n".join(parts) + ("\n" if parts else ""))
+    label = {
+        'csv': "Lignes (CSV):\n",
+        'tsv': "Lignes (TSV):\n",
+        'columns': "Colonnes (valeurs séparées par |, une position par ligne):\n",
+    }[serialization]
+    if serialization == 'columns':
+        used = len(label) + sum(len(h) + 3 for h in header)
+    else:
+        used = len(label) + _row_cost(header, serialization)
+
+    # Sélection sur une estimation en caractères : seules les lignes retenues
+    # sont formatées, le coût reste donc proportionnel au budget
+    char_budget = remaining * CHARS_PER_TOKEN
+    selected = []
+    if remaining > 0:
+        columns = _column_arrays(df)
+        for position in row_priority(df, strategy, stratify_column):
+            cells = _row_cells(columns, int(position))
+            cost = _row_cost(cells, serialization)
+            if used + cost > char_budget:
+                break
+            used += cost
+            selected.append((int(position), cells))
+
+    def render(rows):
+        rows = sorted(rows, key=lambda item: item[0])
+        if serialization == 'columns':
+            body = "".join(
+                f"{name}: " + "|".join(cells[i] for _, cells in rows) + "\n"
+                for i, name in enumerate(header))
+        else:
+            lines = [_serialize_line(header, serialization)]
+            lines.extend(_serialize_line(cells, serialization) for _, cells in rows)
+            body = "\n".join(lines) + "\n"
+        return label + body
+
+    # Un compteur de tokens personnalisé peut être plus strict que l'estimation :
+    # on retire alors les lignes les moins prioritaires, jamais une ligne partielle
+    rows_text = render(selected) if selected else ""
+    while selected and count_tokens(rows_text) > remaining:
+        selected = selected[:max(0, int(len(selected) * 0.9))]
+        rows_text = render(selected) if selected else ""
+    if selected:
+        parts.append(rows_text)
+
+    text = "\n".join(parts)
+    return {
+        "text": text,
+        "serialization": serialization,
+        "strategy": strategy,
+        "rows_total": int(len(df)),
+        "rows_included": len(selected),
+        "tokens": count_tokens(text),
+    }
+
+
+def pack_text_lines(text, token_budget, token_counter=None):
+    """
+    Tronque un texte tabulaire (Markdown, CSV, texte) sur une frontière de ligne.
+
+    Args:
+        text (str): Texte à tronquer
+        token_budget (int): Nombre maximal de tokens
+        token_counter (callable): Fonction de comptage des tokens
+
+    Returns:
+        tuple: (texte retenu, nombre de lignes retenues, nombre total de lignes)
+    """
+    count_tokens = token_counter or estimate_tokens
+    lines = text.splitlines()
+    if count_tokens(text) <= token_budget:
+        return text, len(lines), len(lines)
+
+    kept = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line + "\n")
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept), len(kept), len(lines)
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Report Export
+-------------
+Export des rapports structurés (voir excel_processor.generate_structured_report)
+et de leurs tableaux de données vers XLSX, DOCX et Markdown.
+Utilisé par excel_processor.py (option --export) et mail_analyzer.py (publipostage).
+
+Les lignes des tableaux sont écrites au fil de l'eau, sans matérialiser le
+tableau complet : les sources peuvent être des DataFrames, des listes
+d'enregistrements ou des flux de blocs (iter_sheet_chunks).
+
+- XLSX : openpyxl en mode write_only (une feuille « Rapport » puis une feuille par tableau)
+- DOCX : XML WordprocessingML écrit directement dans l'archive zip
+- Markdown : tableaux au format pipe
+"""
+
+import datetime
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+EXPORT_FORMATS = ('xlsx', 'docx', 'md')
+
+# Nombre de lignes converties à la fois lorsque la source est un DataFrame
+EXPORT_CHUNK_ROWS = 10000
+
+# Caractères interdits dans le XML (et donc dans les cellules XLSX et les paragraphes DOCX)
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Caractères interdits dans les noms de feuilles Excel
+_ILLEGAL_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def _cell(value):
+    """Valeur de cellule exportable (None pour les valeurs manquantes, JSON pour les structures)."""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, str):
+        return _ILLEGAL_XML_CHARS.sub('', value)
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, (bool, int, datetime.date, datetime.time)):
+        return value
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def _text(value):
+    """Texte d'une cellule pour les formats texte (DOCX, Markdown)."""
+    return _format(_cell(value))
+
+
+def _format(value):
+    """Texte d'une valeur déjà convertie par _cell."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "Oui" if value else "Non"
+    if isinstance(value, float):
+        return format(value, '.15g')
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date().isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _frame_rows(frame):
+    """Lignes d'un DataFrame, converties par tranches."""
+    for start in range(0, len(frame), EXPORT_CHUNK_ROWS):
+        block = frame.iloc[start:start + EXPORT_CHUNK_ROWS]
+        for row in block.itertuples(index=False, name=None):
+            yield [_cell(value) for value in row]
+
+
+def iter_table(source):
+    """
+    Normalise une source de tableau en (en-têtes, itérateur de lignes).
+
+    Args:
+        source: DataFrame, liste d'enregistrements, dict {"headers", "data"} (tableau croisé)
+                ou itérable de DataFrames (blocs)
+
+    Returns:
+        tuple: (liste des en-têtes, itérateur de listes de valeurs)
+    """
+    if isinstance(source, pd.DataFrame):
+        return [str(column) for column in source.columns], _frame_rows(source)
+
+    if isinstance(source, dict) and "headers" in source:
+        headers = list(source["headers"])
+        records = source.get("data", source.get("rows", []))
+        return [str(h) for h in headers], ([_cell(record.get(h)) for h in headers] if isinstance(record, dict)
+                                           else [_cell(value) for value in record] for record in records)
+
+    if isinstance(source, list):
+        if source and not isinstance(source[0], dict):
+            raise ValueError("Une liste doit contenir des enregistrements (dict)")
+        headers = list(dict.fromkeys(key for record in source for key in record))
+        return [str(h) for h in headers], ([_cell(record.get(h)) for h in headers] for record in source)
+
+    # Flux de blocs : les en-têtes sont lus sur le premier bloc
+    chunks = iter(source)
+    first = next(chunks, None)
+    if first is None:
+        return [], iter(())
+    headers = [str(column) for column in first.columns]
+    return headers, itertools.chain.from_iterable(_frame_rows(chunk) for chunk in itertools.chain([first], chunks))
+
+
+def _summary_value(value):
+    """Valeur d'un tableau de synthèse (listes de valeurs simples jointes par des virgules)."""
+    if isinstance(value, (list, tuple)) and not any(isinstance(item, (dict, list, tuple)) for item in value):
+        return ", ".join(_text(item) for item in value)
+    return _cell(value)
+
+
+def _content_blocks(content):
+    """Blocs d'affichage du contenu d'une section (paragraphe, liste ou tableau)."""
+    if isinstance(content, dict):
+        if content and all(isinstance(value, dict) for value in content.values()):
+            # Dictionnaire de dictionnaires : une ligne par clé, une colonne par sous-clé
+            columns = list(dict.fromkeys(key for value in content.values() for key in value))
+            rows = ([_cell(name)] + [_cell(value.get(column)) for column in columns] for name, value in content.items())
+            yield ("table", [""] + [str(column) for column in columns], rows)
+        else:
+            yield ("table", ["Élément", "Valeur"], ([str(key), _summary_value(value)] for key, value in content.items()))
+    elif isinstance(content, (list, tuple)):
+        yield ("bullets", [_text(item) for item in content])
+    elif content not in (None, ""):
+        yield ("paragraph", _text(content))
+
+
+def report_blocks(report, tables=None):
+    """
+    Décompose un rapport structuré en blocs (titre, paragraphe, liste, tableau).
+
+    Args:
+        report (dict): Rapport structuré
+        tables (dict): Tableaux complémentaires {nom: source} (voir iter_table)
+
+    Yields:
+        tuple: ("title"|"heading"|"paragraph", texte), ("bullets", éléments) ou ("table", en-têtes, lignes)
+    """
+    yield ("title", _text(report.get("titre") or "Rapport d'analyse"))
+    file_info = report.get("fichier") or {}
+    if file_info:
+        yield ("table", ["Fichier", ""], ([str(key), _cell(value)] for key, value in file_info.items()))
+    if report.get("resume"):
+        yield ("heading", "Résumé")
+        yield ("paragraph", _text(report["resume"]))
+
+    sections = report.get("sections") or []
+    if isinstance(sections, dict):
+        sections = [{"title": title, "content": content} for title, content in sections.items()]
+    for section in sections:
+        yield ("heading", _text(section.get("title") or section.get("titre") or "Section"))
+        yield from _content_blocks(section.get("content", section.get("contenu")))
+
+    if report.get("recommandations"):
+        yield ("heading", "Recommandations")
+        yield ("bullets", [_text(item) for item in report["recommandations"]])
+    if report.get("calculs_exemple"):
+        yield ("heading", "Calculs")
+        yield from _content_blocks(report["calculs_exemple"])
+
+    for name, source in (tables or {}).items():
+        headers, rows = iter_table(source)
+        yield ("table_heading", str(name))
+        yield ("table", headers, rows)
+
+
+def _sheet_title(name, used):
+    """Nom de feuille Excel valide (31 caractères) et unique."""
+    base = _ILLEGAL_SHEET_CHARS.sub(' ', name).strip()[:31] or "Tableau"
+    title, suffix = base, 2
+    while title.lower() in used:
+        title = f"{base[:31 - len(str(suffix)) - 1]}_{suffix}"
+        suffix += 1
+    used.add(title.lower())
+    return title
+
+
+def _export_xlsx(blocks, output_path):
+    """Écrit les blocs dans un classeur openpyxl en mode write_only."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    used_titles = {"rapport"}
+    summary = workbook.create_sheet("Rapport")
+    title_font, bold = Font(bold=True, size=14), Font(bold=True)
+    data_sheet = None
+    counts = {"tables": 0, "rows": 0}
+
+    def styled(sheet, value, font):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = font
+        return cell
+
+    for block in blocks:
+        kind = block[0]
+        if kind == "title":
+            summary.append([styled(summary, block[1], title_font)])
+        elif kind == "heading":
+            summary.append([])
+            summary.append([styled(summary, block[1], bold)])
+        elif kind == "paragraph":
+            summary.append([block[1]])
+        elif kind == "bullets":
+            for item in block[1]:
+                summary.append([f"• {item}"])
+        elif kind == "table_heading":
+            # Les tableaux de données ont chacun leur feuille
+            data_sheet = workbook.create_sheet(_sheet_title(block[1], used_titles))
+        elif kind == "table":
+            target = data_sheet or summary
+            target.append([styled(target, header, bold) for header in block[1]])
+            for row in block[2]:
+                target.append(row)
+                if data_sheet is not None:
+                    counts["rows"] += 1
+            if data_sheet is not None:
+                counts["tables"] += 1
+                data_sheet = None
+    workbook.save(output_path)
+    return counts
+
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+_DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_W_NAMESPACE = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+_DOCX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles {_W_NAMESPACE}>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/>'
+    '<w:pPr><w:spacing w:after="120"/></w:pPr><w:rPr><w:sz w:val="22"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:rPr><w:b/><w:sz w:val="40"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:keepNext/><w:spacing w:before="240"/><w:outlineLvl w:val="0"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="30"/></w:rPr></w:style>'
+    '<w:style w:type="table" w:styleId="TableGrid"><w:name w:val="Table Grid"/><w:tblPr><w:tblBorders>'
+    + ''.join(f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+              for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
+    + '</w:tblBorders></w:tblPr></w:style>'
+    '</w:styles>'
+)
+
+
+def _docx_paragraph(text, style=None, bold=False):
+    """Paragraphe WordprocessingML (sauts de ligne conservés)."""
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    run_properties = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    lines = _ILLEGAL_XML_CHARS.sub('', text).split('\n')
+    content = '<w:br/>'.join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in lines)
+    return f'<w:p>{properties}<w:r>{run_properties}{content}</w:r></w:p>'
+
+
+def _docx_row(values, header=False):
+    """Ligne de tableau WordprocessingML."""
+    row_properties = '<w:trPr><w:tblHeader/></w:trPr>' if header else ''
+    if header:
+        cells = ''.join(f'<w:tc>{_docx_paragraph(_format(value), bold=True)}</w:tc>' for value in values)
+    else:
+        # Cas courant sans saut de ligne : pas de découpage du texte
+        cells = ''.join(f'<w:tc><w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p></w:tc>'
+                        if '\n' not in text else f'<w:tc>{_docx_paragraph(text)}</w:tc>'
+                        for text in map(_format, values))
+    return f'<w:tr>{row_properties}{cells}</w:tr>'
+
+
+def _export_docx(blocks, output_path):
+    """Écrit les blocs dans un document Word en produisant le XML au fil de l'eau."""
+    counts = {"tables": 0, "rows": 0}
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _DOCX_RELS)
+        archive.writestr('word/_rels/document.xml.rels', _DOCX_DOCUMENT_RELS)
+        archive.writestr('word/styles.xml', _DOCX_STYLES)
+        with archive.open('word/document.xml', 'w', force_zip64=True) as raw:
+            buffer = []
+            def write(fragment):
+                buffer.append(fragment)
+                if len(buffer) >= 1000:
+                    raw.write(''.join(buffer).encode('utf-8'))
+                    buffer.clear()
+
+            write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {_W_NAMESPACE}><w:body>')
+            data_table = False
+            for block in blocks:
+                kind = block[0]
+                if kind == "title":
+                    write(_docx_paragraph(block[1], "Title"))
+                elif kind in ("heading", "table_heading"):
+                    write(_docx_paragraph(block[1], "Heading1"))
+                    data_table = kind == "table_heading"
+                elif kind == "paragraph":
+                    write(_docx_paragraph(block[1]))
+                elif kind == "bullets":
+                    for item in block[1]:
+                        write(_docx_paragraph(f"• {item}"))
+                elif kind == "table":
+                    write('<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr>')
+                    write(_docx_row(block[1], header=True))
+                    for row in block[2]:
+                        write(_docx_row(row))
+                        if data_table:
+                            counts["rows"] += 1
+                    # Un paragraphe doit séparer deux tableaux consécutifs
+                    write('</w:tbl><w:p/>')
+                    if data_table:
+                        counts["tables"] += 1
+                        data_table = False
+            write('<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+                  '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134"/></w:sectPr>'
+                  '</w:body></w:document>')
+            raw.write(''.join(buffer).encode('utf-8'))
+    return counts
+
+
+def _markdown_cell(value):
+    """Cellule de tableau Markdown (barres verticales et sauts de ligne neutralisés)."""
+    text = _format(value)
+    if '|' in text or '\n' in text or '\r' in text:
+        text = text.replace('|', '\\|').replace('\r', '').replace('\n', '<br>')
+    return text
+
+
+def _export_markdown(blocks, output_path):
+    """Écrit les blocs dans un fichier Markdown, ligne par ligne."""
+    counts = {"tables": 0, "rows": 0}
+    with open(output_path, 'w', encoding='utf-8', newline='\n') as f:
+        data_table = False
+        for block in blocks:
+            kind = block[0]
+            if kind == "title":
+                f.write(f"# {block[1]}\n\n")
+            elif kind in ("heading", "table_heading"):
+                f.write(f"## {block[1]}\n\n")
+                data_table = kind == "table_heading"
+            elif kind == "paragraph":
+                f.write(f"{block[1]}\n\n")
+            elif kind == "bullets":
+                f.writelines(f"- {item}\n" for item in block[1])
+                f.write("\n")
+            elif kind == "table":
+                headers = block[1]
+                f.write("| " + " | ".join(_markdown_cell(h) for h in headers) + " |\n")
+                f.write("|" + "---|" * len(headers) + "\n")
+                for row in block[2]:
+                    f.write("| " + " | ".join(_markdown_cell(value) for value in row) + " |\n")
+                    if data_table:
+                        counts["rows"] += 1
+                f.write("\n")
+                if data_table:
+                    counts["tables"] += 1
+                    data_table = False
+    return counts
+
+
+_EXPORTERS = {'xlsx': _export_xlsx, 'docx': _export_docx, 'md': _export_markdown}
+
+
+def export_blocks(blocks, output_path, export_format=None):
+    """
+    Écrit directement une suite de blocs (voir report_blocks), sans rapport structuré.
+
+    Utilisé pour les documents courts produits en série (lettres du publipostage
+    de mail_analyzer.py) : pas de fichier temporaire ni de mesure.
+
+    Args:
+        blocks (iterable): Blocs ("title"|"heading"|"paragraph", texte), ("bullets", liste)
+            ou ("table", en-têtes, lignes)
+        output_path (str): Fichier de sortie
+        export_format (str): 'xlsx', 'docx' ou 'md' (déduit de l'extension si None)
+
+    Returns:
+        dict: Nombre de tableaux et de lignes écrits
+    """
+    export_format = (export_format or os.path.splitext(output_path)[1].lstrip('.')).lower()
+    return _EXPORTERS['md' if export_format == 'markdown' else export_format](blocks, output_path)
+
+
+def export_report(report, output_path, tables=None, export_format=None):
+    """
+    Exporte un rapport structuré et ses tableaux de données.
+
+    Args:
+        report (dict): Rapport structuré (titre, fichier, resume, sections, recommandations, calculs_exemple)
+        output_path (str): Fichier de sortie
+        tables (dict): Tableaux de données {nom: source} écrits ligne à ligne (voir iter_table)
+        export_format (str): 'xlsx', 'docx' ou 'md' (déduit de l'extension si None)
+
+    Returns:
+        dict: {"path", "format", "tables", "rows", "bytes", "elapsed_ms"} ou {"error"}
+    """
+    started = time.perf_counter()
+    export_format = (export_format or os.path.splitext(output_path)[1].lstrip('.')).lower()
+    export_format = 'md' if export_format == 'markdown' else export_format
+    if export_format not in _EXPORTERS:
+        return {"error": f"Format d'export non pris en charge: {export_format} "
+                         f"(valeurs possibles: {', '.join(EXPORT_FORMATS)})"}
+
+    # Écriture dans un fichier temporaire : un export interrompu ne remplace pas le précédent
+    directory = os.path.dirname(os.path.abspath(output_path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(output_path)}.{os.getpid()}.tmp")
+    try:
+        counts = _EXPORTERS[export_format](report_blocks(report, tables), tmp_path)
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return {"error": f"Erreur lors de l'export du rapport: {str(e)}"}
+
+    return {
+        "path": output_path,
+        "format": export_format,
+        "tables": counts["tables"],
+        "rows": counts["rows"],
+        "bytes": os.path.getsize(output_path),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _benchmark_chunks(rows, cols, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Blocs de données synthétiques générés à la demande (jamais matérialisés en entier)."""
+    rng = np.random.default_rng(0)
+    regions = np.array(["Nord", "Sud", "Est", "Ouest"], dtype=object)
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        data = {"id": np.arange(start, start + size)}
+        for col in range(cols - 1):
+            if col % 3 == 1:
+                data[f"col_{col}"] = regions[rng.integers(0, len(regions), size)]
+            else:
+                data[f"col_{col}"] = rng.random(size) * 1000
+        yield pd.DataFrame(data)
+
+
+def benchmark_export(rows=100000, cols=8, formats=EXPORT_FORMATS, memory=False):
+    """
+    Mesure l'export d'un rapport accompagné d'un tableau de `rows` lignes, pour chaque format.
+
+    Args:
+        rows (int): Nombre de lignes du tableau
+        cols (int): Nombre de colonnes du tableau
+        formats (tuple): Formats mesurés
+        memory (bool): Mesurer aussi le pic de mémoire Python (tracemalloc ralentit fortement l'export)
+
+    Returns:
+        dict: Par format : durée (ms), taille du fichier et, si demandé, pic de mémoire (Mo)
+    """
+    import tracemalloc
+
+    report = {"titre": "Rapport de test", "fichier": {"nom": "benchmark.xlsx"}, "resume": "Export de référence",
+              "sections": [{"title": "Statistiques", "content": {"col_0": {"Moyenne": 500.0, "Max": 999.9}}}],
+              "recommandations": ["Vérifier les valeurs extrêmes"], "calculs_exemple": {"Somme": "Total: 1"}}
+    results = {"rows": rows, "columns": cols}
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in formats:
+            if memory:
+                tracemalloc.start()
+            outcome = export_report(report, os.path.join(directory, f"benchmark.{export_format}"),
+                                    tables={"Données": _benchmark_chunks(rows, cols)})
+            if memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            if "error" in outcome:
+                results[export_format] = outcome
+                continue
+            results[export_format] = {
+                "elapsed_ms": outcome["elapsed_ms"],
+                "bytes": outcome["bytes"],
+                "rows_per_second": round(rows / (outcome["elapsed_ms"] / 1000)) if outcome["elapsed_ms"] else None,
+            }
+            if memory:
+                results[export_format]["peak_memory_mb"] = round(peak / (1024 * 1024), 1)
+    return results
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        rows_arg = [arg for arg in sys.argv[2:] if arg.isdigit()]
+        print(dumps(benchmark_export(int(rows_arg[0]) if rows_arg else 100000, memory="--memory" in sys.argv)))
+        sys.exit(0)
+
+    if len(sys.argv) < 3:
+        print("Usage: python report_export.py <report_json|@report_file> <output.xlsx|.docx|.md> "
+              "[--table nom=fichier_excel_ou_csv[#feuille]]...\n"
+              "       python report_export.py benchmark [lignes] [--memory]", file=sys.stderr)
+        sys.exit(1)
+
+    from excel_engines import iter_sheet_chunks
+
+    try:
+        report_arg = sys.argv[1]
+        if report_arg.startswith("@"):
+            with open(report_arg[1:], 'r', encoding='utf-8') as f:
+                source_report = json.load(f)
+        else:
+            source_report = json.loads(report_arg)
+        # Rapport complet d'excel_processor.py : le rapport structuré est sous "structured_report"
+        source_report = source_report.get("structured_report", source_report)
+
+        table_sources = {}
+        args = sys.argv[3:]
+        for position, arg in enumerate(args):
+            if arg == "--table" and position + 1 < len(args):
+                # nom=fichier[#feuille]
+                name, _, location = args[position + 1].partition("=")
+                path, _, sheet = location.partition("#")
+                table_sources[name] = iter_sheet_chunks(path, int(sheet) if sheet.isdigit() else sheet or 0)
+        print(dumps(export_report(source_report, sys.argv[2], table_sources)))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
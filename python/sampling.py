@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sampling
+--------
+Échantillonnage représentatif d'une feuille en une seule passe, en mémoire bornée.
+Utilisé par excel_processor.py pour les aperçus, les prompts et les rapports.
+
+- Échantillonnage par réservoir (algorithme R, vectorisé par bloc)
+- Variante stratifiée : un réservoir par valeur d'une colonne, répartition
+  proportionnelle aux effectifs en fin de passe
+- Agrégats exacts sur toute la feuille (effectif, somme, min, max, moyenne,
+  écart-type par fusion de moments) calculés pendant la même passe
+"""
+
+import math
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from excel_engines import iter_sheet_chunks
+
+SAMPLING_METHODS = ('head', 'reservoir', 'stratified')
+
+# Nombre maximal de strates suivies séparément (les suivantes sont regroupées)
+MAX_STRATA = 50
+OTHER_STRATUM = "__autres__"
+
+# Nombre maximal de valeurs distinctes comptées exactement par colonne de texte
+MAX_TRACKED_VALUES = 10000
+
+DEFAULT_CHUNK_ROWS = 50000
+
+
+class ReservoirSampler:
+    """
+    Réservoir de taille fixe : chaque ligne vue a la même probabilité d'y figurer.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.rows = {}  # emplacement -> (position d'origine, ligne)
+
+    def add(self, df, positions):
+        """
+        Ajoute un bloc de lignes au réservoir.
+
+        Args:
+            df (DataFrame): Bloc de lignes
+            positions (ndarray): Position d'origine de chaque ligne dans la feuille
+        """
+        count = len(df)
+        if count == 0 or self.size <= 0:
+            self.seen += count
+            return
+        ranks = np.arange(self.seen, self.seen + count)
+        # Les premières lignes remplissent le réservoir, les suivantes remplacent
+        # un emplacement tiré au hasard avec une probabilité size / (rang + 1)
+        slots = np.where(ranks < self.size, ranks, self.rng.integers(0, ranks + 1))
+        selected = np.flatnonzero(slots < self.size)
+        # Seul le dernier remplacement de chaque emplacement compte
+        final = {}
+        for index in selected:
+            final[slots[index]] = index
+        for slot, index in final.items():
+            self.rows[slot] = (int(positions[index]), df.iloc[index])
+        self.seen += count
+
+    def sample(self, limit=None):
+        """Lignes retenues (au plus `limit`), dans l'ordre de la feuille."""
+        entries = list(self.rows.values())
+        if limit is not None and limit < len(entries):
+            chosen = self.rng.choice(len(entries), size=limit, replace=False)
+            entries = [entries[i] for i in chosen]
+        return sorted(entries, key=lambda entry: entry[0])
+
+
+class ColumnAggregator:
+    """
+    Agrégats exacts d'une colonne, fusionnés bloc par bloc.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.numeric_count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.values = Counter()
+        self.values_truncated = False
+        self.kind = None
+
+    def update(self, series):
+        """Intègre un bloc de valeurs."""
+        self.count += len(series)
+        self.nulls += int(series.isna().sum())
+        values = series.dropna()
+        if len(values) == 0:
+            return
+
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            self.kind = self.kind or 'numeric'
+            data = values.to_numpy(dtype=float)
+            n = len(data)
+            chunk_mean = float(data.mean())
+            chunk_m2 = float(((data - chunk_mean) ** 2).sum())
+            # Fusion des moments (Chan et al.) : stable numériquement
+            total_n = self.numeric_count + n
+            delta = chunk_mean - self.mean
+            self.mean += delta * n / total_n
+            self.m2 += chunk_m2 + delta * delta * self.numeric_count * n / total_n
+            self.numeric_count = total_n
+            self.total += float(data.sum())
+            self._update_bounds(float(data.min()), float(data.max()))
+        elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+            self.kind = self.kind or 'datetime'
+            self._update_bounds(values.min(), values.max())
+        else:
+            self.kind = 'text' if self.kind in (None, 'text') else 'mixed'
+            if not self.values_truncated:
+                self.values.update(values.astype(str).tolist())
+                if len(self.values) > MAX_TRACKED_VALUES:
+                    self.values_truncated = True
+
+    def _update_bounds(self, low, high):
+        try:
+            self.minimum = low if self.minimum is None or low < self.minimum else self.minimum
+            self.maximum = high if self.maximum is None or high > self.maximum else self.maximum
+        except TypeError:
+            pass  # Types incomparables entre blocs
+
+    def result(self):
+        """Agrégats finaux de la colonne."""
+        stats = {"type": self.kind or 'empty', "count": self.count, "null_count": self.nulls}
+        if self.kind == 'numeric' or (self.kind == 'mixed' and self.numeric_count):
+            variance = self.m2 / (self.numeric_count - 1) if self.numeric_count > 1 else 0.0
+            stats.update({
+                "numeric_count": self.numeric_count,
+                "sum": self.total,
+                "mean": self.mean if self.numeric_count else None,
+                "std": math.sqrt(variance),
+                "min": self.minimum,
+                "max": self.maximum,
+            })
+        elif self.kind == 'datetime':
+            stats.update({"min": self.minimum, "max": self.maximum})
+        if self.values:
+            stats["top_values"] = dict(self.values.most_common(5))
+            stats["unique_count"] = None if self.values_truncated else len(self.values)
+        return stats
+
+
+def _allocate(strata_counts, size):
+    """Répartit `size` lignes entre les strates proportionnellement (au moins 1 par strate)."""
+    total = sum(strata_counts.values())
+    if total == 0:
+        return {}
+    if len(strata_counts) >= size:
+        # Plus de strates que de lignes demandées : une ligne pour les plus grandes
+        largest = sorted(strata_counts, key=strata_counts.get, reverse=True)[:size]
+        return {key: 1 for key in largest}
+    quotas = {key: max(1, size * count / total) for key, count in strata_counts.items()}
+    allocation = {key: min(strata_counts[key], int(quota)) for key, quota in quotas.items()}
+    remaining = size - sum(allocation.values())
+    # Plus forts restes, dans la limite des effectifs de chaque strate
+    for key in sorted(quotas, key=lambda k: quotas[k] - int(quotas[k]), reverse=True):
+        if remaining <= 0:
+            break
+        if allocation[key] < strata_counts[key]:
+            allocation[key] += 1
+            remaining -= 1
+    return allocation
+
+
+def sample_chunks(chunks, sample_size=100, stratify_column=None, seed=0):
+    """
+    Échantillonne un flux de blocs et calcule les agrégats exacts en une passe.
+
+    Args:
+        chunks (iterable): Blocs de lignes (DataFrames aux colonnes identiques)
+        sample_size (int): Nombre de lignes de l'échantillon
+        stratify_column (str): Colonne de stratification (None pour un réservoir simple)
+        seed (int): Graine du générateur aléatoire (échantillon reproductible)
+
+    Returns:
+        dict: {"sample" (DataFrame), "rows_total", "aggregates", "method", "strata"}
+    """
+    rng = np.random.default_rng(seed)
+    reservoirs = {}
+    strata_counts = Counter()
+    aggregators = {}
+    columns = None
+    offset = 0
+
+    for chunk in chunks:
+        if columns is None:
+            columns = list(chunk.columns)
+            aggregators = {column: ColumnAggregator() for column in columns}
+            if stratify_column is not None and stratify_column not in columns:
+                raise ValueError(f"Colonne de stratification introuvable: {stratify_column}")
+
+        for position, column in enumerate(columns):
+            aggregators[column].update(chunk.iloc[:, position])
+
+        positions = np.arange(offset, offset + len(chunk))
+        if stratify_column is None:
+            reservoirs.setdefault(None, ReservoirSampler(sample_size, rng)).add(chunk, positions)
+        else:
+            keys = chunk[stratify_column].astype(object).where(chunk[stratify_column].notna(), None)
+            keys = keys.map(lambda v: str(v) if v is not None else None)
+            for key, index in keys.groupby(keys, dropna=False, sort=False).groups.items():
+                key = None if isinstance(key, float) and math.isnan(key) else key
+                if key not in reservoirs and len(reservoirs) >= MAX_STRATA:
+                    key = OTHER_STRATUM
+                rows = chunk.index.get_indexer(index)
+                strata_counts[key] += len(rows)
+                reservoirs.setdefault(key, ReservoirSampler(sample_size, rng)).add(chunk.iloc[rows], positions[rows])
+        offset += len(chunk)
+
+    if stratify_column is None:
+        entries = reservoirs[None].sample() if None in reservoirs else []
+    else:
+        entries = []
+        for key, quota in _allocate(strata_counts, sample_size).items():
+            entries.extend(reservoirs[key].sample(quota))
+        entries.sort(key=lambda entry: entry[0])
+
+    if entries:
+        sample = pd.DataFrame([row.to_numpy() for _, row in entries], columns=columns)
+        sample.index = [position for position, _ in entries]
+        # Rétablir les types des blocs (l'assemblage ligne à ligne produit des objets)
+        sample = sample.infer_objects()
+    else:
+        sample = pd.DataFrame(columns=columns or [])
+
+    return {
+        "sample": sample,
+        "rows_total": offset,
+        "aggregates": {str(column): aggregator.result() for column, aggregator in aggregators.items()},
+        "method": 'stratified' if stratify_column is not None else 'reservoir',
+        "stratify_column": stratify_column,
+        "strata": {str(key): count for key, count in strata_counts.most_common()} if stratify_column is not None else None,
+    }
+
+
+def sample_sheet(file_path, sheet=0, sample_size=100, stratify_column=None, seed=0,
+                 chunk_rows=DEFAULT_CHUNK_ROWS, engine=None):
+    """
+    Échantillonne une feuille en une passe (voir sample_chunks).
+
+    Args:
+        file_path (str): Chemin du fichier Excel ou CSV
+        sheet (int|str): Index ou nom de la feuille
+        sample_size (int): Nombre de lignes de l'échantillon
+        stratify_column (str): Colonne de stratification (optionnel)
+        seed (int): Graine du générateur aléatoire
+        chunk_rows (int): Taille des blocs lus
+        engine (str): Moteur de lecture imposé (optionnel)
+
+    Returns:
+        dict: Échantillon, effectif total et agrégats exacts
+    """
+    chunks = iter_sheet_chunks(file_path, sheet, chunk_rows, engine)
+    return sample_chunks(chunks, sample_size, stratify_column, seed)
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print("Usage: python sampling.py <file_path> [taille] [colonne_de_stratification]", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        outcome = sample_sheet(sys.argv[1],
+                               sample_size=int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+                               stratify_column=sys.argv[3] if len(sys.argv) > 3 else None)
+        outcome["sample"] = outcome["sample"].reset_index(drop=True)
+        print(dumps(outcome))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
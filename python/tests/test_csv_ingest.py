@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lecture par blocs des CSV avec le lecteur en flux de pyarrow (voir csv_ingest.py).
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('pyarrow')
+
+from csv_ingest import iter_csv_chunks  # noqa: E402
+
+ROWS = 200000
+
+
+@pytest.fixture
+def late_change_csv(tmp_path):
+    """CSV dont une colonne devient alphanumérique et une autre contient « N/A » après le premier bloc."""
+    path = tmp_path / "ledger.csv"
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("id;code;montant\n")
+        for i in range(ROWS):
+            code = i if i < 150000 else f"A{i}"
+            amount = 'N/A' if i == 190000 else i * 1.5
+            f.write(f"{i};{code};{amount}\n")
+    return str(path)
+
+
+def test_late_type_change_does_not_stop_the_stream(late_change_csv):
+    chunks = list(iter_csv_chunks(late_change_csv, 20000, engine='pyarrow'))
+    assert len(chunks) > 1
+    df = pd.concat(chunks, ignore_index=True)
+    assert len(df) == ROWS
+    assert str(df["code"].iloc[-1]) == f"A{ROWS - 1}"
+    assert df["montant"].isna().sum() == 1
+
+
+def test_imposed_dtype_applies_to_every_chunk(late_change_csv):
+    for chunk in iter_csv_chunks(late_change_csv, 20000, dtype={"code": str}, engine='pyarrow'):
+        assert pd.api.types.is_string_dtype(chunk["code"].dtype)
+        assert pd.api.types.is_integer_dtype(chunk["id"].dtype) or pd.api.types.is_float_dtype(chunk["id"].dtype)
+
+
+def test_same_values_as_c_engine(late_change_csv):
+    pyarrow_df = pd.concat(iter_csv_chunks(late_change_csv, 20000, engine='pyarrow'), ignore_index=True)
+    c_df = pd.concat(iter_csv_chunks(late_change_csv, 20000, engine='c'), ignore_index=True)
+    assert pyarrow_df["id"].tolist() == c_df["id"].tolist()
+    assert pyarrow_df["code"].astype(str).tolist() == c_df["code"].astype(str).tolist()
+    assert pyarrow_df["montant"].fillna(-1).tolist() == c_df["montant"].fillna(-1).tolist()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Text Chunker
+------------
+Découpage des documents en passages de taille bornée, avec leur provenance
+(pages, positions dans le texte extrait, section).
+Utilisé par document_extractor.py (option --chunks) pour n'envoyer au LLM que
+les passages utiles plutôt que le document entier.
+
+- Le découpage suit les frontières de phrases et de titres ; une phrase plus
+  longue que la taille maximale est coupée sur un espace
+- Deux passages consécutifs d'une même section partagent leurs dernières phrases
+  (chevauchement borné en caractères)
+- Les pages (ou paragraphes Word) sont consommées comme un flux : seul le passage
+  en cours est gardé en mémoire
+- Les positions renvoyées sont celles du texte produit par document_extractor.py
+  (pages séparées par une ligne vide, paragraphes Word par un saut de ligne)
+"""
+
+import os
+import re
+import sys
+import time
+
+from fast_tokenizer import split_sentences
+from prompt_packer import CHARS_PER_TOKEN, estimate_tokens
+
+DEFAULT_MAX_CHARS = 2000
+DEFAULT_OVERLAP = 200
+
+# Séparateurs ajoutés entre les unités par document_extractor.py
+PAGE_SEPARATOR = "\n\n"
+PARAGRAPH_SEPARATOR = "\n"
+
+# Lignes de titre dans un texte brut : Markdown, numérotation (« 2.1 », « IV. »),
+# mots d'en-tête usuels, ou ligne courte entièrement en majuscules
+_HEADING_LINE = re.compile(
+    r'^[ \t]*(?:#{1,6}[ \t]+\S[^\n]*'
+    r'|(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.)[ \t]+[A-ZÀ-ÖØ-Þ][^\n]{0,80}'
+    r'|(?:Chapitre|Article|Section|Annexe|Partie|Titre|Chapter|Appendix)[ \t]+[\w.-]+[^\n]{0,80}'
+    r'|[A-ZÀ-ÖØ-Þ][A-ZÀ-ÖØ-Þ0-9 \t\'’,&-]{2,80})[ \t]*$',
+    re.MULTILINE
+)
+
+
+class _Unit:
+    """Fragment de texte brut (phrase et espaces qui la suivent) et sa provenance."""
+
+    __slots__ = ('text', 'start', 'page', 'heading')
+
+    def __init__(self, text, start, page, heading=False):
+        self.text = text
+        self.start = start
+        self.page = page
+        self.heading = heading
+
+
+def _text_units(text, start, page, detect_headings):
+    """Unités d'un bloc de texte brut : lignes de titre et phrases."""
+    position = 0
+    if detect_headings:
+        for match in _HEADING_LINE.finditer(text):
+            line_end = match.end() + (1 if text.startswith('\n', match.end()) else 0)
+            for fragment, offset in split_sentences(text[position:match.start()], start + position):
+                yield _Unit(fragment, offset, page)
+            yield _Unit(text[match.start():line_end], start + match.start(), page, heading=True)
+            position = line_end
+    for fragment, offset in split_sentences(text[position:], start + position):
+        yield _Unit(fragment, offset, page)
+
+
+def page_units(pages, separator=PAGE_SEPARATOR, detect_headings=True):
+    """
+    Unités d'un flux de pages de texte (PDF, texte brut).
+
+    Args:
+        pages (iterable): Textes des pages, ou tuples (numéro de page, texte)
+        separator (str): Séparateur ajouté après chaque page dans le texte du document
+        detect_headings (bool): Repérer les lignes de titre
+
+    Yields:
+        _Unit: Unités dans l'ordre du document
+    """
+    offset = 0
+    for index, page in enumerate(pages, 1):
+        number, text = page if isinstance(page, tuple) else (index, page)
+        text = (text or '') + separator
+        yield from _text_units(text, offset, number, detect_headings)
+        offset += len(text)
+
+
+def paragraph_units(blocks, separator=PARAGRAPH_SEPARATOR):
+    """
+    Unités d'un flux de blocs docx_stream (paragraphes et titres ; tableaux ignorés,
+    comme dans le texte de document_extractor.py).
+
+    Yields:
+        _Unit: Unités dans l'ordre du document (page : None)
+    """
+    offset = 0
+    first = True
+    for block in blocks:
+        if block["type"] not in ("paragraph", "heading"):
+            continue
+        text = ('' if first else separator) + block["text"]
+        first = False
+        if block["type"] == "heading":
+            yield _Unit(text, offset, None, heading=True)
+        else:
+            for fragment, position in split_sentences(text, offset):
+                yield _Unit(fragment, position, None)
+        offset += len(text)
+
+
+def _split_long(unit, max_chars):
+    """Coupe une unité trop longue sur des espaces (ou brutalement s'il n'y en a pas)."""
+    text = unit.text
+    position = 0
+    while len(text) - position > max_chars:
+        cut = text.rfind(' ', position + max_chars // 2, position + max_chars)
+        cut = cut + 1 if cut > 0 else position + max_chars
+        yield _Unit(text[position:cut], unit.start + position, unit.page)
+        position = cut
+    yield _Unit(text[position:], unit.start + position, unit.page)
+
+
+def _make_chunk(units, index, section):
+    """Passage construit à partir de ses unités (texte exact du document et provenance)."""
+    raw = ''.join(unit.text for unit in units)
+    text = raw.strip()
+    start = units[0].start + (len(raw) - len(raw.lstrip()))
+    pages = [unit.page for unit in units if unit.page is not None and unit.text.strip()]
+    return {
+        "index": index,
+        "text": text,
+        "start": start,
+        "end": start + len(text),
+        "page_start": pages[0] if pages else None,
+        "page_end": pages[-1] if pages else None,
+        "section": section,
+        "headings": [unit.text.strip().lstrip('#').strip() for unit in units if unit.heading],
+        "chars": len(text),
+        "tokens": estimate_tokens(text),
+    }
+
+
+def chunk_units(units, max_chars=DEFAULT_MAX_CHARS, overlap=DEFAULT_OVERLAP, min_chars=None):
+    """
+    Regroupe des unités en passages bornés qui se chevauchent.
+
+    Un titre ouvre un nouveau passage dès que le passage en cours a atteint
+    `min_chars` ; le chevauchement ne franchit pas un titre.
+
+    Args:
+        units (iterable): Unités (voir page_units, paragraph_units)
+        max_chars (int): Taille maximale d'un passage
+        overlap (int): Taille maximale reprise du passage précédent (phrases entières)
+        min_chars (int): Taille en dessous de laquelle un titre ne coupe pas le passage
+            (max_chars / 4 par défaut)
+
+    Yields:
+        dict: Passages (texte, début/fin dans le document, pages, section, titres, tokens estimés)
+    """
+    if max_chars <= 0:
+        raise ValueError("La taille maximale des passages doit être positive")
+    overlap = max(0, min(overlap, max_chars // 2))
+    min_chars = max_chars // 4 if min_chars is None else min_chars
+    current = []
+    size = 0
+    fresh = 0  # Caractères ajoutés depuis le dernier passage émis (hors chevauchement)
+    section = None  # Dernier titre rencontré avant le passage en cours
+    chunk_section = None
+    index = 0
+
+    for unit in units:
+        if unit.heading:
+            if fresh >= min_chars or (fresh and size + len(unit.text) > max_chars):
+                yield _make_chunk(current, index, chunk_section)
+                index += 1
+                current, size, fresh = [], 0, 0
+            elif not fresh:
+                # Le chevauchement ne traverse pas les titres
+                current, size = [], 0
+            section = unit.text.strip().lstrip('#').strip()
+            if not current:
+                chunk_section = section
+            current.append(unit)
+            size += len(unit.text)
+            fresh += len(unit.text)
+            continue
+
+        for piece in (_split_long(unit, max_chars) if len(unit.text) > max_chars else (unit,)):
+            length = len(piece.text)
+            if fresh and size + length > max_chars:
+                yield _make_chunk(current, index, chunk_section)
+                index += 1
+                # Chevauchement : dernières phrases entières du passage, hors titres
+                tail = []
+                tail_size = 0
+                for previous in reversed(current):
+                    if previous.heading or tail_size + len(previous.text) > overlap:
+                        break
+                    tail.append(previous)
+                    tail_size += len(previous.text)
+                current = tail[::-1]
+                size = tail_size
+                fresh = 0
+                chunk_section = section
+                # Le chevauchement cède la place si la phrase suivante ne tient pas avec lui
+                while current and size + length > max_chars:
+                    size -= len(current.pop(0).text)
+            if not current:
+                chunk_section = section
+            current.append(piece)
+            size += length
+            if piece.text.strip():
+                fresh += length
+    if fresh:
+        yield _make_chunk(current, index, chunk_section)
+
+
+def chunk_pages(pages, max_chars=DEFAULT_MAX_CHARS, overlap=DEFAULT_OVERLAP, min_chars=None,
+                separator=PAGE_SEPARATOR):
+    """Passages d'un flux de pages de texte (voir page_units et chunk_units)."""
+    return chunk_units(page_units(pages, separator), max_chars, overlap, min_chars)
+
+
+def chunk_text(text, max_chars=DEFAULT_MAX_CHARS, overlap=DEFAULT_OVERLAP, min_chars=None):
+    """Passages d'un texte unique, sans numéro de page."""
+    units = page_units([(None, text)], separator='')
+    return chunk_units(units, max_chars, overlap, min_chars)
+
+
+def iter_pdf_pages(file_path):
+    """Textes des pages d'un PDF (chemin ou flux binaire), lus une page à la fois (PyPDF2)."""
+    import PyPDF2
+
+    if hasattr(file_path, 'read'):
+        for page_number, page in enumerate(PyPDF2.PdfReader(file_path).pages, 1):
+            yield page_number, page.extract_text() or ''
+        return
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for page_number, page in enumerate(reader.pages, 1):
+            yield page_number, page.extract_text() or ''
+
+
+def chunk_document(file_path, max_chars=DEFAULT_MAX_CHARS, overlap=DEFAULT_OVERLAP, min_chars=None):
+    """
+    Passages d'un document (.pdf, .docx ou texte), lu en flux.
+
+    Args:
+        file_path (str): Chemin du document
+        max_chars (int): Taille maximale d'un passage
+        overlap (int): Chevauchement maximal entre deux passages
+        min_chars (int): Taille minimale avant coupure sur un titre
+
+    Yields:
+        dict: Passages (voir chunk_units)
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.pdf':
+        units = page_units(iter_pdf_pages(file_path))
+    elif extension == '.docx':
+        from docx_stream import iter_docx_blocks
+        units = paragraph_units(iter_docx_blocks(file_path))
+    else:
+        def lines():
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                # Blocs de lignes lus au fil de l'eau (page None, pas de séparateur ajouté)
+                block = []
+                for line in f:
+                    block.append(line)
+                    if not line.strip() and len(block) > 200:
+                        yield None, ''.join(block)
+                        block = []
+                if block:
+                    yield None, ''.join(block)
+        units = page_units(lines(), separator='')
+    return chunk_units(units, max_chars, overlap, min_chars)
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print("Usage: python text_chunker.py <fichier> [--max-chars n | --max-tokens n] [--overlap n]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    options = {"max_chars": DEFAULT_MAX_CHARS, "overlap": DEFAULT_OVERLAP}
+    for flag, key, factor in (("--max-chars", "max_chars", 1), ("--max-tokens", "max_chars", CHARS_PER_TOKEN),
+                              ("--overlap", "overlap", 1)):
+        if flag in sys.argv:
+            options[key] = int(sys.argv[sys.argv.index(flag) + 1]) * factor
+
+    started = time.perf_counter()
+    try:
+        # Un passage JSON par ligne, émis dès qu'il est complet
+        count = 0
+        for chunk in chunk_document(sys.argv[1], **options):
+            print(dumps(chunk))
+            count += 1
+        print(f"{count} passages en {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
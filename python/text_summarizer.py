@@ -1,46 +1,42 @@
 
 import sys
 import os
-import re
 import heapq
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import sent_tokenize, word_tokenize
+from functools import lru_cache
 
-# Télécharger les ressources NLTK nécessaires
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+from fast_tokenizer import get_tokenizer, is_word
+from ndjson_protocol import FrameWriter, pop_ndjson_flag
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
+@lru_cache(maxsize=4)
+def _tokenize(text, backend=None):
+    """Split the text into sentences and lowercase content words, once per text and backend."""
+    tokenizer = get_tokenizer(backend)
+    sentences = tokenizer.sent_tokenize(text)
+    stop_words = tokenizer.stopwords
+    sentence_words = [
+        [word for word in tokenizer.word_tokenize(sentence.lower()) if is_word(word) and word not in stop_words]
+        for sentence in sentences
+    ]
+    return sentences, sentence_words
 
-def summarize_text(text, num_sentences=5):
+def summarize_text(text, num_sentences=5, backend=None):
     """Generate a summary of the given text."""
-    # Nettoyer le texte
-    clean_text = re.sub(r'\s+', ' ', text)
-    clean_text = re.sub(r'[^\w\s]', '', clean_text)
-    
-    # Tokeniser le texte en phrases
-    sentences = sent_tokenize(text)
+    return ' '.join(summarize_sentences(text, num_sentences, backend))
+
+def summarize_sentences(text, num_sentences=5, backend=None):
+    """Return the summary sentences of the given text, in document order."""
+    # Tokeniser le texte en phrases et en mots (résultat partagé avec extract_keywords)
+    sentences, sentence_words = _tokenize(text, backend)
     
     # Si le texte est trop court, retourner le texte original
     if len(sentences) <= num_sentences:
-        return text
+        return [text]
     
     # Calculer la fréquence des mots
-    stop_words = set(stopwords.words('french') + stopwords.words('english'))
     word_frequencies = {}
-    
-    for word in word_tokenize(clean_text.lower()):
-        if word not in stop_words:
-            if word not in word_frequencies:
-                word_frequencies[word] = 1
-            else:
-                word_frequencies[word] += 1
+    for words in sentence_words:
+        for word in words:
+            word_frequencies[word] = word_frequencies.get(word, 0) + 1
     
     # Normaliser les fréquences
     if word_frequencies:
@@ -50,43 +46,28 @@ def summarize_text(text, num_sentences=5):
     
     # Calculer le score de chaque phrase
     sentence_scores = {}
-    for i, sentence in enumerate(sentences):
-        for word in word_tokenize(sentence.lower()):
-            if word in word_frequencies:
-                if i not in sentence_scores:
-                    sentence_scores[i] = word_frequencies[word]
-                else:
-                    sentence_scores[i] += word_frequencies[word]
+    for i, words in enumerate(sentence_words):
+        if words:
+            sentence_scores[i] = sum(word_frequencies[word] for word in words)
     
     # Sélectionner les phrases avec les scores les plus élevés
     summary_sentences = heapq.nlargest(num_sentences, sentence_scores, key=sentence_scores.get)
     summary_sentences.sort()  # Trier par ordre d'apparition
     
     # Construire le résumé
-    summary = [sentences[i] for i in summary_sentences]
-    
-    return ' '.join(summary)
+    return [sentences[i] for i in summary_sentences]
 
-def extract_keywords(text, num_keywords=10):
+def extract_keywords(text, num_keywords=10, backend=None):
     """Extract the most important keywords from the text."""
-    # Nettoyer le texte
-    clean_text = re.sub(r'\s+', ' ', text)
-    clean_text = re.sub(r'[^\w\s]', '', clean_text)
-    
-    # Tokeniser le texte en mots
-    words = word_tokenize(clean_text.lower())
-    
-    # Filtrer les mots vides
-    stop_words = set(stopwords.words('french') + stopwords.words('english'))
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 2]
+    # Mots du texte hors mots vides (découpage partagé avec summarize_sentences)
+    _, sentence_words = _tokenize(text, backend)
     
     # Calculer la fréquence des mots
     word_frequencies = {}
-    for word in filtered_words:
-        if word not in word_frequencies:
-            word_frequencies[word] = 1
-        else:
-            word_frequencies[word] += 1
+    for words in sentence_words:
+        for word in words:
+            if len(word) > 2:
+                word_frequencies[word] = word_frequencies.get(word, 0) + 1
     
     # Sélectionner les mots-clés avec les fréquences les plus élevées
     keywords = heapq.nlargest(num_keywords, word_frequencies, key=word_frequencies.get)
@@ -94,13 +75,39 @@ def extract_keywords(text, num_keywords=10):
     return keywords
 
 if __name__ == "__main__":
+    # Mode NDJSON optionnel (voir ndjson_protocol.py)
+    writer = FrameWriter('text_summarizer') if pop_ndjson_flag(sys.argv) else None
+    
+    # Moteur de découpage (--tokenizer fast|nltk, voir fast_tokenizer.py)
+    backend = None
+    if "--tokenizer" in sys.argv:
+        position = sys.argv.index("--tokenizer")
+        backend = sys.argv[position + 1]
+        del sys.argv[position:position + 2]
+    
+    # Réutilisation du résumé d'un document quasi identique déjà traité
+    # (--dedup [répertoire de l'index], voir dedup.py)
+    dedup_index = None
+    if "--dedup" in sys.argv:
+        position = sys.argv.index("--dedup")
+        from dedup import DEDUP_INDEX_DIR, DedupIndex
+        index_path = DEDUP_INDEX_DIR
+        if position + 1 < len(sys.argv) and os.path.isdir(sys.argv[position + 1]):
+            index_path = sys.argv.pop(position + 1)
+        del sys.argv[position]
+        dedup_index = DedupIndex(index_path)
+    
     if len(sys.argv) != 2:
-        print("Usage: python text_summarizer.py <text_file_path>", file=sys.stderr)
+        if writer:
+            writer.error("Usage: python text_summarizer.py <text_file_path> [--ndjson] [--dedup [index_dir]] [--tokenizer fast|nltk]")
+        print("Usage: python text_summarizer.py <text_file_path> [--ndjson] [--dedup [index_dir]] [--tokenizer fast|nltk]", file=sys.stderr)
         sys.exit(1)
     
     text_path = sys.argv[1]
     
     if not os.path.exists(text_path):
+        if writer:
+            writer.error(f"File {text_path} does not exist.")
         print(f"Error: File {text_path} does not exist.", file=sys.stderr)
         sys.exit(1)
     
@@ -108,11 +115,47 @@ if __name__ == "__main__":
         with open(text_path, 'r', encoding='utf-8') as file:
             text = file.read()
         
+        sentences = keywords = duplicate = None
+        if dedup_index is not None:
+            match = dedup_index.check(text, os.path.abspath(text_path), add=False)
+            previous = dedup_index.get(match["duplicate_of"]) if match["duplicate_of"] else None
+            if previous and "summary" in previous:
+                sentences, keywords = previous["summary"], previous["keywords"]
+                duplicate = {"duplicate_of": match["duplicate_of"], "similarity": match["similarity"]}
+                print(f"Résumé repris de {match['duplicate_of']} (similarité {match['similarity']})", file=sys.stderr)
+        
+        if writer:
+            writer.progress("resume", 10, "Génération du résumé")
+            # Diffuser les phrases du résumé dès qu'elles sont connues
+            if sentences is None:
+                sentences = summarize_sentences(text, backend=backend)
+            writer.stream_items("summary", sentences, first_chunk_size=1)
+            writer.progress("mots-cles", 70, "Extraction des mots-clés")
+            if keywords is None:
+                keywords = extract_keywords(text, backend=backend)
+            writer.partial("keywords", keywords, total=len(keywords))
+            if dedup_index is not None and match["indexable"]:
+                dedup_index.add(os.path.abspath(text_path), match["signature"],
+                                {"summary": sentences, "keywords": keywords, **(duplicate or {})})
+            result = {"summary": ' '.join(sentences), "keywords": keywords}
+            if duplicate:
+                result["duplicate"] = duplicate
+            writer.result(result, streamed=["summary", "keywords"])
+            writer.metrics(characters=len(text), sentences=len(sentences))
+            sys.exit(0)
+        
         # Générer le résumé
-        summary = summarize_text(text)
+        if sentences is None:
+            sentences = summarize_sentences(text, backend=backend)
+        summary = ' '.join(sentences)
         
         # Extraire les mots-clés
-        keywords = extract_keywords(text)
+        if keywords is None:
+            keywords = extract_keywords(text, backend=backend)
+        
+        if dedup_index is not None and match["indexable"]:
+            dedup_index.add(os.path.abspath(text_path), match["signature"],
+                            {"summary": sentences, "keywords": keywords, **(duplicate or {})})
         
         # Afficher le résultat
         print("## Résumé du document")
@@ -121,5 +164,7 @@ if __name__ == "__main__":
         print(", ".join(keywords))
         
     except Exception as e:
+        if writer:
+            writer.error(str(e))
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time Series
+-----------
+Séries temporelles calculées localement sur la totalité d'une feuille.
+Utilisé par excel_processor.py (option --time-series, rapport structuré).
+
+- Détection et conversion vectorisée des colonnes de dates (dates Excel, numéros
+  de série, textes) ; le format d'une colonne texte est détecté une seule fois
+  sur un échantillon puis réutilisé pour tous les blocs
+- Regroupement par jour, semaine, mois ou trimestre (somme, moyenne, effectif, min, max)
+- Moyenne mobile sur les périodes, évolution d'une période à l'autre et sur un an
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from excel_engines import iter_sheet_chunks
+
+# Fréquences de regroupement (codes de période pandas) et alias français
+FREQUENCIES = {'D': 'D', 'W': 'W', 'M': 'M', 'Q': 'Q'}
+FREQUENCY_ALIASES = {'jour': 'D', 'semaine': 'W', 'mois': 'M', 'trimestre': 'Q'}
+
+# Nombre de périodes séparant deux périodes comparables d'une année sur l'autre
+YEAR_OVER_YEAR_PERIODS = {'W': 52, 'M': 12, 'Q': 4}
+
+AGGREGATIONS = ('sum', 'mean', 'count', 'min', 'max')
+
+# Formats essayés sur les colonnes texte, format français en premier
+DATE_FORMATS = (
+    '%d/%m/%Y', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%y',
+    '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d',
+    '%d-%m-%Y', '%d.%m.%Y', '%m/%Y', '%Y-%m', '%m/%d/%Y',
+)
+
+# Mots-clés des noms de colonnes de dates
+DATE_KEYWORDS = ("date", "année", "mois", "jour", "période", "echéance", "échéance")
+
+# Valeurs distinctes examinées pour détecter le format d'une colonne texte
+FORMAT_SAMPLE_SIZE = 200
+
+# Part minimale de valeurs reconnues pour considérer une colonne comme datée
+MIN_PARSED_RATIO = 0.9
+
+# Numéros de série Excel plausibles (1954 à 2119)
+EXCEL_SERIAL_RANGE = (20000, 80000)
+EXCEL_EPOCH = '1899-12-30'
+
+# Nombre maximal de colonnes numériques agrégées par défaut
+MAX_VALUE_COLUMNS = 10
+
+DEFAULT_CHUNK_ROWS = 50000
+
+
+class DateParser:
+    """
+    Convertit des colonnes en dates en mémorisant le format détecté par colonne.
+
+    Un même analyseur est réutilisé pour tous les blocs d'une feuille : le format
+    n'est détecté qu'une fois, chaque bloc est ensuite converti en un appel vectorisé.
+    """
+
+    def __init__(self):
+        self.formats = {}  # colonne -> 'datetime', 'excel_serial', format strftime, 'mixed' ou None
+
+    def _detect_format(self, strings):
+        """Format reconnaissant le plus de valeurs d'un échantillon de textes."""
+        sample = pd.Series(strings.drop_duplicates().head(FORMAT_SAMPLE_SIZE).to_numpy())
+        best, best_ratio = None, 0.0
+        for date_format in DATE_FORMATS:
+            ratio = pd.to_datetime(sample, format=date_format, errors='coerce').notna().mean()
+            if ratio > best_ratio:
+                best, best_ratio = date_format, ratio
+            if ratio == 1.0:
+                break
+        if best_ratio >= MIN_PARSED_RATIO:
+            return best
+        # Formats hétérogènes : analyse valeur par valeur, jour en premier
+        ratio = pd.to_datetime(sample, format='mixed', dayfirst=True, errors='coerce').notna().mean()
+        return 'mixed' if ratio >= MIN_PARSED_RATIO else None
+
+    def _kind(self, values, column, keyword):
+        """Nature des dates d'une colonne (voir self.formats), détectée sur les valeurs non nulles."""
+        dtype = values.dtype
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'datetime'
+        if pd.api.types.is_bool_dtype(dtype):
+            return None
+        if pd.api.types.is_numeric_dtype(dtype):
+            low, high = EXCEL_SERIAL_RANGE
+            if keyword and len(values) and values.between(low, high).mean() >= MIN_PARSED_RATIO:
+                return 'excel_serial'
+            return None
+        if pd.api.types.infer_dtype(values, skipna=True) in ('datetime', 'datetime64', 'date'):
+            return 'datetime'
+        strings = values[values.map(type) == str] if pd.api.types.is_object_dtype(dtype) else values
+        if len(strings) < MIN_PARSED_RATIO * len(values) or len(strings) == 0:
+            return None
+        return self._detect_format(strings.str.strip())
+
+    def parse(self, series, column=None):
+        """
+        Convertit une colonne en dates.
+
+        Args:
+            series (Series): Valeurs de la colonne (bloc ou colonne entière)
+            column (str): Nom de la colonne (clé du cache de formats)
+
+        Returns:
+            Series: Dates (datetime64, NaT pour les valeurs non reconnues) ou None si la colonne n'est pas datée
+        """
+        column = str(column if column is not None else series.name)
+        if column not in self.formats:
+            values = series.dropna()
+            if len(values) == 0:
+                return None
+            keyword = any(keyword in column.lower() for keyword in DATE_KEYWORDS)
+            self.formats[column] = self._kind(values, column, keyword)
+
+        kind = self.formats[column]
+        if kind is None:
+            return None
+        if kind == 'excel_serial':
+            numbers = pd.to_numeric(series, errors='coerce')
+            return pd.to_datetime(numbers, unit='D', origin=EXCEL_EPOCH, errors='coerce')
+        if kind == 'datetime':
+            if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                dates = series
+            else:
+                dates = pd.to_datetime(series, errors='coerce')
+            if getattr(dates.dt, 'tz', None) is not None:
+                dates = dates.dt.tz_localize(None)
+            return dates
+        strings = series.astype(object).where(series.map(type) == str) if pd.api.types.is_object_dtype(series.dtype) \
+            else series
+        if kind == 'mixed':
+            return pd.to_datetime(strings.str.strip(), format='mixed', dayfirst=True, errors='coerce')
+        return pd.to_datetime(strings.str.strip(), format=kind, errors='coerce')
+
+
+def normalize_frequency(freq):
+    """Code de fréquence (D, W, M, Q) à partir d'un code ou d'un alias français."""
+    code = FREQUENCY_ALIASES.get(str(freq).lower(), str(freq).upper())
+    if code not in FREQUENCIES:
+        raise ValueError(f"Fréquence inconnue: {freq} (valeurs possibles: D, W, M, Q)")
+    return code
+
+
+def find_date_columns(df, parser=None):
+    """
+    Liste les colonnes datées d'un DataFrame, colonnes nommées comme des dates en premier.
+
+    Args:
+        df (DataFrame): Données
+        parser (DateParser): Analyseur de dates (son cache de formats est complété)
+
+    Returns:
+        list: Noms des colonnes datées
+    """
+    parser = parser or DateParser()
+    found = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series.dtype) and not any(kw in str(column).lower() for kw in DATE_KEYWORDS):
+            continue  # Les nombres ne sont des dates que si le nom de la colonne l'indique
+        if parser.parse(series.head(FORMAT_SAMPLE_SIZE), column) is not None:
+            found.append(column)
+    return sorted(found, key=lambda c: not any(kw in str(c).lower() for kw in DATE_KEYWORDS))
+
+
+def _value_columns(df, date_column, value_columns):
+    """Colonnes numériques agrégées (toutes, dans la limite de MAX_VALUE_COLUMNS, par défaut)."""
+    if value_columns:
+        missing = [column for column in value_columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Colonnes introuvables: {', '.join(map(str, missing))}")
+        return list(value_columns)
+    numeric = [column for column in df.columns
+               if column != date_column and pd.api.types.is_numeric_dtype(df[column].dtype)
+               and not pd.api.types.is_bool_dtype(df[column].dtype)]
+    return numeric[:MAX_VALUE_COLUMNS]
+
+
+def _partial_aggregates(chunk, dates, value_columns, freq):
+    """Agrégats fusionnables d'un bloc par période : effectif de lignes, sommes, effectifs, min et max."""
+    dated = dates.notna().to_numpy()
+    periods = pd.PeriodIndex(dates[dated], freq=FREQUENCIES[freq])
+    values = pd.DataFrame({str(column): pd.to_numeric(chunk[column][dated], errors='coerce').to_numpy(dtype=float)
+                           for column in value_columns}, index=periods)
+    grouped = values.groupby(level=0)
+    return {
+        "rows": grouped.size(),
+        "sum": grouped.sum(min_count=1),
+        "count": grouped.count(),
+        "min": grouped.min(),
+        "max": grouped.max(),
+    }, int((~dated).sum())
+
+
+def _merge_partials(partials):
+    """Fusionne les agrégats de plusieurs blocs."""
+    merged = {}
+    for name, method in (("rows", "sum"), ("sum", "sum"), ("count", "sum"), ("min", "min"), ("max", "max")):
+        frames = [partial[name] for partial in partials]
+        combined = pd.concat(frames).groupby(level=0)
+        merged[name] = combined.sum(min_count=1) if method == "sum" else getattr(combined, method)()
+    return merged
+
+
+def _round(value, digits=4):
+    """Arrondi JSON (None pour les valeurs manquantes ou infinies)."""
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _build_series(merged, freq, agg, window):
+    """Construit les périodes (y compris vides), la moyenne mobile et les évolutions."""
+    index = merged["rows"].index
+    full = pd.period_range(index.min(), index.max(), freq=FREQUENCIES[freq])
+    rows = merged["rows"].reindex(full, fill_value=0)
+    if agg == 'mean':
+        values = merged["sum"] / merged["count"].replace(0, np.nan)
+    else:
+        values = merged[agg]
+    values = values.reindex(full)
+    if agg in ('sum', 'count'):
+        values = values.fillna(0)
+
+    rolling = values.rolling(window, min_periods=1).mean()
+    growth = values.pct_change(fill_method=None).replace([np.inf, -np.inf], np.nan)
+    lag = YEAR_OVER_YEAR_PERIODS.get(freq)
+    yoy = values.pct_change(lag, fill_method=None).replace([np.inf, -np.inf], np.nan) if lag else None
+
+    periods = []
+    for position, period in enumerate(full):
+        entry = {
+            "period": str(period),
+            "start": period.start_time.date().isoformat(),
+            "rows": int(rows.iloc[position]),
+            "values": {column: _round(values[column].iloc[position]) for column in values.columns},
+            "rolling": {column: _round(rolling[column].iloc[position]) for column in values.columns},
+            "growth": {column: _round(growth[column].iloc[position]) for column in values.columns},
+        }
+        if yoy is not None:
+            entry["yoy"] = {column: _round(yoy[column].iloc[position]) for column in values.columns}
+        periods.append(entry)
+
+    summary = {}
+    for column in values.columns:
+        column_values = values[column].dropna()
+        if len(column_values) == 0:
+            continue
+        summary[column] = {
+            "total": _round(merged["sum"][column].sum()),
+            "last": _round(column_values.iloc[-1]),
+            "previous": _round(column_values.iloc[-2]) if len(column_values) > 1 else None,
+            "last_growth": _round(growth[column].iloc[-1]),
+            "best_period": str(column_values.idxmax()),
+            "worst_period": str(column_values.idxmin()),
+            # Pente d'une droite de tendance, en unités par période
+            "trend": _round(np.polyfit(np.arange(len(values))[values[column].notna().to_numpy()],
+                                       column_values.to_numpy(), 1)[0]) if len(column_values) > 1 else None,
+        }
+    return periods, summary
+
+
+def time_series_chunks(chunks, date_column=None, value_columns=None, freq='M', agg='sum', window=3, parser=None):
+    """
+    Calcule une série temporelle sur un flux de blocs (agrégats fusionnés bloc par bloc).
+
+    Args:
+        chunks (iterable): Blocs de lignes (DataFrames aux colonnes identiques)
+        date_column (str): Colonne de dates (détectée automatiquement si None)
+        value_columns (list): Colonnes numériques agrégées (toutes les colonnes numériques si None)
+        freq (str): Fréquence : D (jour), W (semaine), M (mois), Q (trimestre)
+        agg (str): Agrégation : sum, mean, count, min ou max
+        window (int): Nombre de périodes de la moyenne mobile
+        parser (DateParser): Analyseur de dates (formats mémorisés entre les appels)
+
+    Returns:
+        dict: Périodes, moyenne mobile, évolutions et synthèse par colonne
+    """
+    started = time.perf_counter()
+    freq = normalize_frequency(freq)
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Agrégation inconnue: {agg} (valeurs possibles: {', '.join(AGGREGATIONS)})")
+    window = max(1, int(window))
+    parser = parser or DateParser()
+    partials = []
+    rows_total = 0
+    undated = 0
+
+    for chunk in chunks:
+        if date_column is None:
+            candidates = find_date_columns(chunk, parser)
+            if not candidates:
+                raise ValueError("Aucune colonne de dates détectée")
+            date_column = candidates[0]
+        elif date_column not in chunk.columns:
+            raise ValueError(f"Colonne de dates introuvable: {date_column}")
+        if rows_total == 0:
+            value_columns = _value_columns(chunk, date_column, value_columns)
+
+        dates = parser.parse(chunk[date_column], date_column)
+        if dates is None:
+            if chunk[date_column].notna().any():
+                raise ValueError(f"La colonne '{date_column}' ne contient pas de dates reconnues")
+            dates = pd.Series(pd.NaT, index=chunk.index, dtype='datetime64[ns]')
+        partial, chunk_undated = _partial_aggregates(chunk, dates, value_columns, freq)
+        partials.append(partial)
+        rows_total += len(chunk)
+        undated += chunk_undated
+
+    result = {
+        "date_column": str(date_column) if date_column is not None else None,
+        "date_format": parser.formats.get(str(date_column)),
+        "freq": freq,
+        "agg": agg,
+        "window": window,
+        "value_columns": [str(column) for column in value_columns or []],
+        "rows": rows_total,
+        "undated_rows": undated,
+        "periods": [],
+        "summary": {},
+    }
+    merged = _merge_partials(partials) if partials else None
+    if merged is not None and len(merged["rows"]):
+        result["periods"], result["summary"] = _build_series(merged, freq, agg, window)
+        result["start"] = result["periods"][0]["start"]
+        result["end"] = result["periods"][-1]["start"]
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def time_series_frame(df, date_column=None, value_columns=None, freq='M', agg='sum', window=3, parser=None):
+    """
+    Calcule une série temporelle sur un DataFrame en mémoire (voir time_series_chunks).
+
+    Returns:
+        dict: Périodes, moyenne mobile, évolutions et synthèse par colonne
+    """
+    return time_series_chunks([df], date_column, value_columns, freq, agg, window, parser)
+
+
+def time_series_sheet(file_path, sheet=0, date_column=None, value_columns=None, freq='M', agg='sum', window=3,
+                      chunk_rows=DEFAULT_CHUNK_ROWS, engine=None):
+    """
+    Calcule une série temporelle sur une feuille entière lue par blocs.
+
+    Args:
+        file_path (str): Chemin du fichier Excel ou CSV
+        sheet (int|str): Index ou nom de la feuille
+        date_column (str): Colonne de dates (détectée automatiquement si None)
+        value_columns (list): Colonnes numériques agrégées (optionnel)
+        freq (str): Fréquence : D, W, M ou Q
+        agg (str): Agrégation : sum, mean, count, min ou max
+        window (int): Nombre de périodes de la moyenne mobile
+        chunk_rows (int): Taille des blocs lus
+        engine (str): Moteur de lecture imposé (optionnel)
+
+    Returns:
+        dict: Série temporelle (voir time_series_chunks)
+    """
+    chunks = iter_sheet_chunks(file_path, sheet, chunk_rows, engine)
+    return time_series_chunks(chunks, date_column, value_columns, freq, agg, window)
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print("Usage: python time_series.py <file_path> [sheet_index] [--date colonne] [--values a,b] "
+              "[--freq D|W|M|Q] [--agg sum|mean|count|min|max] [--window n] [--engine nom]", file=sys.stderr)
+        sys.exit(1)
+
+    options = {}
+    for flag in ("--date", "--values", "--freq", "--agg", "--window", "--engine"):
+        if flag in sys.argv:
+            position = sys.argv.index(flag)
+            options[flag[2:]] = sys.argv[position + 1] if position + 1 < len(sys.argv) else None
+            del sys.argv[position:position + 2]
+
+    try:
+        outcome = time_series_sheet(
+            sys.argv[1],
+            int(sys.argv[2]) if len(sys.argv) > 2 else 0,
+            date_column=options.get("date"),
+            value_columns=options["values"].split(",") if options.get("values") else None,
+            freq=options.get("freq", 'M'),
+            agg=options.get("agg", 'sum'),
+            window=int(options.get("window", 3)),
+            engine=options.get("engine"),
+        )
+        print(dumps(outcome))
+    except Exception as e:
+        print(dumps({"error": str(e)}))
+        sys.exit(1)
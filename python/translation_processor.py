@@ -14,6 +14,9 @@ import time
 import requests
 from pathlib import Path
 
+from json_output import dumps
+from ndjson_protocol import FrameWriter, pop_ndjson_flag
+
 def load_config():
     """Charge la configuration depuis le fichier config.json"""
     config_paths = [
@@ -51,7 +54,18 @@ def load_config():
         }
     }
 
-def translate_document(file_path, target_lang, source_lang='auto'):
+def _report_progress(writer, step, progress, message):
+    """
+    Envoie une mise à jour de progression sur stdout.
+    
+    Sans émetteur NDJSON, le format historique {"progress": {...}} est conservé.
+    """
+    if writer:
+        writer.progress(step, progress, message)
+    else:
+        print(dumps({"progress": {"step": step, "progress": progress, "message": message}}), flush=True)
+
+def translate_document(file_path, target_lang, source_lang='auto', writer=None):
     """
     Traduit un document en utilisant l'API DeepL
     
@@ -59,6 +73,7 @@ def translate_document(file_path, target_lang, source_lang='auto'):
         file_path (str): Chemin vers le fichier à traduire
         target_lang (str): Code de la langue cible (ex: 'FR', 'EN-US')
         source_lang (str, optional): Code de la langue source (ex: 'FR', 'EN'). Par défaut 'auto'.
+        writer (FrameWriter, optional): Émetteur NDJSON (voir ndjson_protocol.py)
         
     Returns:
         dict: Résultat de la traduction contenant le chemin du fichier traduit
@@ -84,24 +99,10 @@ def translate_document(file_path, target_lang, source_lang='auto'):
         
         # Étape 1: Uploader le document
         # Envoyer une mise à jour de progression au format JSON
-        progress_data = {
-            "progress": {
-                "step": "initialisation", 
-                "progress": 5, 
-                "message": "Initialisation du processus de traduction"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "initialisation", 5, "Initialisation du processus de traduction")
         
         # Mise à jour : Étape d'upload
-        progress_data = {
-            "progress": {
-                "step": "upload", 
-                "progress": 10, 
-                "message": f"Upload du document {file_path}"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "upload", 10, f"Upload du document {file_path}")
         
         with open(file_path, 'rb') as f:
             files = {'file': f}
@@ -127,24 +128,10 @@ def translate_document(file_path, target_lang, source_lang='auto'):
         
         # Étape 2: Polling pour vérifier si la traduction est terminée
         # Envoyer une mise à jour de progression au format JSON
-        progress_data = {
-            "progress": {
-                "step": "pretraitement", 
-                "progress": 20, 
-                "message": "Préparation du document pour la traduction"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "pretraitement", 20, "Préparation du document pour la traduction")
         
         # Mise à jour : Début de la traduction
-        progress_data = {
-            "progress": {
-                "step": "translation", 
-                "progress": 30, 
-                "message": "Traduction du document en cours"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "translation", 30, "Traduction du document en cours")
         
         status = ''
         progress_value = 10
@@ -177,35 +164,14 @@ def translate_document(file_path, target_lang, source_lang='auto'):
                 message = f"Statut de la traduction: {status}"
             
             # Envoyer une mise à jour de progression au format JSON
-            progress_data = {
-                "progress": {
-                    "step": "translation", 
-                    "progress": progress_value, 
-                    "message": message
-                }
-            }
-            print(json.dumps(progress_data))
+            _report_progress(writer, "translation", progress_value, message)
         
         # Étape 3: Récupération du fichier traduit
         # Envoyer une mise à jour de progression au format JSON
-        progress_data = {
-            "progress": {
-                "step": "post-traitement", 
-                "progress": 85, 
-                "message": "Préparation du téléchargement"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "post-traitement", 85, "Préparation du téléchargement")
         
         # Mise à jour : Téléchargement
-        progress_data = {
-            "progress": {
-                "step": "download", 
-                "progress": 90, 
-                "message": "Téléchargement du document traduit"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "download", 90, "Téléchargement du document traduit")
         
         download_response = requests.get(
             f"{api_url}/document/{document_id}/result",
@@ -235,27 +201,13 @@ def translate_document(file_path, target_lang, source_lang='auto'):
                 f.write(chunk)
         
         # Envoyer une mise à jour finale au format JSON
-        progress_data = {
-            "progress": {
-                "step": "finalisation", 
-                "progress": 95, 
-                "message": "Finalisation du processus"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "finalisation", 95, "Finalisation du processus")
         
         # Attendre un court instant pour permettre à l'interface de se mettre à jour
         time.sleep(0.5)
         
         # Envoyer la notification de complétion
-        progress_data = {
-            "progress": {
-                "step": "complete", 
-                "progress": 100, 
-                "message": "Document traduit avec succès!"
-            }
-        }
-        print(json.dumps(progress_data))
+        _report_progress(writer, "complete", 100, "Document traduit avec succès!")
         
         return {
             'success': True,
@@ -278,16 +230,28 @@ def translate_document(file_path, target_lang, source_lang='auto'):
 
 def main():
     """Fonction principale"""
+    # Mode NDJSON optionnel (voir ndjson_protocol.py)
+    writer = FrameWriter('translation_processor') if pop_ndjson_flag(sys.argv) else None
+    
     if len(sys.argv) < 3:
-        print("Usage: python translation_processor.py <file_path> <target_lang> [source_lang]", file=sys.stderr)
+        if writer:
+            writer.error("Usage: python translation_processor.py <file_path> <target_lang> [source_lang] [--ndjson]")
+        print("Usage: python translation_processor.py <file_path> <target_lang> [source_lang] [--ndjson]", file=sys.stderr)
         sys.exit(1)
     
     file_path = sys.argv[1]
     target_lang = sys.argv[2]
     source_lang = sys.argv[3] if len(sys.argv) > 3 else 'auto'
     
-    result = translate_document(file_path, target_lang, source_lang)
-    print(json.dumps(result))
+    result = translate_document(file_path, target_lang, source_lang, writer)
+    if writer:
+        if result.get('success'):
+            writer.result(result)
+        else:
+            writer.error(result.get('error', 'Erreur inconnue'), details={'original_file_path': file_path})
+        writer.metrics()
+    else:
+        print(dumps(result))
 
 if __name__ == "__main__":
     main()
@@ -2,7 +2,8 @@
 import sys
 import os
 import json
-import docx
+
+from docx_stream import extract_docx
 
 def extract_text_from_word(docx_path):
     """Extract text and metadata from a Word document."""
@@ -11,36 +12,21 @@ def extract_text_from_word(docx_path):
         sys.exit(1)
     
     try:
-        doc = docx.Document(docx_path)
-        
-        # Extract text
-        full_text = []
-        for para in doc.paragraphs:
-            full_text.append(para.text)
+        # Stream word/document.xml (python-docx is only used as a fallback)
+        extracted = extract_docx(docx_path)
         
         # Extract metadata
         metadata = {
             "fileName": os.path.basename(docx_path),
-            "paragraphCount": len(doc.paragraphs),
-            "sectionCount": len(doc.sections),
-            "tableCount": len(doc.tables)
+            "paragraphCount": extracted["paragraph_count"],
+            "sectionCount": extracted["section_count"],
+            "tableCount": extracted["table_count"]
         }
         
-        # Extract tables
-        tables = []
-        for i, table in enumerate(doc.tables):
-            table_data = []
-            for row in table.rows:
-                row_data = []
-                for cell in row.cells:
-                    row_data.append(cell.text)
-                table_data.append(row_data)
-            tables.append(table_data)
-        
         result = {
             "metadata": metadata,
-            "text": "\n".join(full_text),
-            "tables": tables
+            "text": "\n".join(extracted["paragraphs"]),
+            "tables": extracted["tables"]
         }
         
         return result
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Workbook Probe
+--------------
+Inspection rapide d'un classeur sans charger les cellules.
+Utilisé à chaque dépôt de fichier dans l'interface et par excel_processor.py.
+
+- .xlsx/.xlsm : lecture de xl/workbook.xml, de ses relations et de l'enregistrement
+  <dimension> en tête de chaque feuille, directement dans l'archive zip
+- .xls        : lecture du répertoire BIFF (BOUNDSHEET) puis de l'enregistrement
+  DIMENSIONS de chaque feuille
+- .csv        : estimation du nombre de lignes à partir d'un préfixe du fichier
+
+Le contenu d'un classeur est lu une seule fois ; la lecture pandas qui suit peut
+réutiliser ce tampon via WorkbookProbe.open() au lieu de rouvrir le fichier. Un
+CSV (souvent volumineux) n'est lu que sur son préfixe : open() le rouvre.
+"""
+
+import io
+import os
+import posixpath
+import re
+import struct
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+from csv_ingest import CSV_SHEET_NAME
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Taille du début de feuille lu pour trouver <dimension> (il précède <sheetData>)
+_DIMENSION_PREFIX_BYTES = 4096
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Za-z]*\d*)(?::([A-Za-z]*\d*))?"')
+
+# Identifiants d'enregistrements BIFF8
+_BIFF_DIMENSIONS = 0x0200
+_BIFF_EOF = 0x000A
+
+# Préfixe analysé pour estimer le nombre de lignes d'un CSV
+_CSV_SAMPLE_BYTES = 64 * 1024
+
+
+def _cell_to_row_col(reference):
+    """Convertit une référence 'AB12' en (ligne, colonne) 1-indexées."""
+    match = re.match(r'([A-Za-z]*)(\d*)', reference)
+    letters, digits = match.group(1).upper(), match.group(2)
+    col = 0
+    for letter in letters:
+        col = col * 26 + (ord(letter) - 64)
+    return (int(digits) if digits else None), (col or None)
+
+
+def _dimension_size(first, last):
+    """Nombre de lignes et de colonnes d'une plage 'A1:D100'."""
+    first_row, first_col = _cell_to_row_col(first)
+    last_row, last_col = _cell_to_row_col(last or first)
+    rows = last_row - first_row + 1 if first_row and last_row else None
+    cols = last_col - first_col + 1 if first_col and last_col else None
+    return rows, cols
+
+
+class WorkbookProbe:
+    """
+    Métadonnées d'un classeur et tampon de son contenu.
+    """
+
+    def __init__(self, file_path, file_format, content, sheets, file_size=None):
+        self.file_path = file_path
+        self.file_format = file_format
+        self.content = content  # None si le contenu n'a pas été chargé (CSV)
+        self.sheets = sheets
+        self.file_size = len(content) if file_size is None else file_size
+
+    @property
+    def sheet_names(self):
+        """Noms des feuilles, dans l'ordre du classeur."""
+        return [sheet["name"] for sheet in self.sheets]
+
+    def open(self):
+        """
+        Retourne un flux sur le contenu, utilisable par pandas.
+
+        Returns:
+            BytesIO|file: Contenu déjà lu, ou fichier rouvert s'il n'a pas été chargé
+        """
+        if self.content is None:
+            return open(self.file_path, 'rb')
+        return io.BytesIO(self.content)
+
+    def to_dict(self):
+        """Représentation JSON du résultat de l'inspection."""
+        return {
+            "fileName": os.path.basename(self.file_path),
+            "format": self.file_format,
+            "file_size": self.file_size,
+            "sheet_count": len(self.sheets),
+            "sheet_names": self.sheet_names,
+            "sheets": self.sheets,
+        }
+
+
+def _probe_xlsx(content):
+    """Inspecte un classeur OOXML à partir de son contenu."""
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        targets = {}
+        try:
+            rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+            for rel in rels.iter(f"{{{_PKG_REL_NS}}}Relationship"):
+                target = rel.get("Target", "")
+                target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+                targets[rel.get("Id")] = target
+        except KeyError:
+            pass
+
+        names = set(archive.namelist())
+        sheets = []
+        for index, sheet in enumerate(workbook.iter(f"{{{_MAIN_NS}}}sheet")):
+            info = {
+                "index": index,
+                "name": sheet.get("name"),
+                "state": sheet.get("state", "visible"),
+                "dimension": None,
+                "rows": None,
+                "columns": None,
+                "estimated_data_rows": None,
+            }
+            part = targets.get(sheet.get(f"{{{_REL_NS}}}id"))
+            if part in names:
+                info["uncompressed_bytes"] = archive.getinfo(part).file_size
+                with archive.open(part) as stream:
+                    head = stream.read(_DIMENSION_PREFIX_BYTES)
+                match = _DIMENSION_RE.search(head)
+                if match:
+                    first = match.group(1).decode("ascii")
+                    last = match.group(2).decode("ascii") if match.group(2) else None
+                    rows, cols = _dimension_size(first, last)
+                    info["dimension"] = f"{first}:{last}" if last else first
+                    info["rows"] = rows
+                    info["columns"] = cols
+                    info["estimated_data_rows"] = max(0, rows - 1) if rows else None
+            sheets.append(info)
+    return sheets
+
+
+def _biff_dimensions(stream, offset):
+    """Lit l'enregistrement DIMENSIONS d'une feuille BIFF8 à partir de sa position BOF."""
+    position = offset
+    end = len(stream)
+    while position + 4 <= end:
+        record_type, length = struct.unpack_from("<HH", stream, position)
+        if record_type == _BIFF_DIMENSIONS and length >= 14:
+            first_row, last_row, first_col, last_col = struct.unpack_from("<IIHH", stream, position + 4)
+            return max(0, last_row - first_row), max(0, last_col - first_col)
+        if record_type == _BIFF_EOF:
+            break
+        position += 4 + length
+    return None, None
+
+
+def _probe_xls(content):
+    """Inspecte un classeur BIFF (.xls) via le répertoire de feuilles chargé par xlrd."""
+    import xlrd
+
+    # on_demand : seul le flux global (BOUNDSHEET...) est analysé, pas les cellules
+    book = xlrd.open_workbook(file_contents=content, on_demand=True, formatting_info=False)
+    try:
+        positions = getattr(book, "_sh_abs_posn", None)
+        stream = getattr(book, "mem", None)
+        sheets = []
+        for index, name in enumerate(book.sheet_names()):
+            rows, cols = (None, None)
+            if positions and stream is not None and index < len(positions):
+                rows, cols = _biff_dimensions(stream, positions[index])
+            sheets.append({
+                "index": index,
+                "name": name,
+                "state": "visible",
+                "dimension": None,
+                "rows": rows,
+                "columns": cols,
+                "estimated_data_rows": max(0, rows - 1) if rows else None,
+            })
+        return sheets
+    finally:
+        book.release_resources()
+
+
+def _probe_csv(sample, size):
+    """Estime la taille d'un CSV à partir de son préfixe (sample) et de sa taille en octets."""
+    line_count = sample.count(b"\n")
+    if size <= _CSV_SAMPLE_BYTES:
+        rows = line_count + (0 if sample.endswith(b"\n") or not sample else 1)
+    else:
+        average = len(sample) / max(1, line_count)
+        rows = int(size / average)
+    first_line = sample.split(b"\n", 1)[0]
+    separator = max((b",", b";", b"\t", b"|"), key=first_line.count)
+    columns = first_line.count(separator) + 1 if first_line else 0
+    return [{
+        "index": 0,
+        "name": CSV_SHEET_NAME,
+        "state": "visible",
+        "dimension": None,
+        "rows": rows,
+        "columns": columns,
+        "estimated_data_rows": max(0, rows - 1),
+    }]
+
+
+def probe_workbook(file_path):
+    """
+    Inspecte un classeur : noms des feuilles, dimensions et nombre de lignes estimé.
+
+    Args:
+        file_path (str): Chemin du fichier (.xlsx, .xlsm, .xls ou .csv)
+
+    Returns:
+        WorkbookProbe: Métadonnées et contenu du fichier (préfixe seulement pour un CSV)
+
+    Raises:
+        ValueError: Format non pris en charge
+        zipfile.BadZipFile, xlrd.XLRDError: Fichier corrompu
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext not in ('.xlsx', '.xlsm', '.xls', '.csv'):
+        raise ValueError(f"Le format de fichier {file_ext} n'est pas pris en charge")
+
+    if file_ext == '.csv':
+        # Seul le préfixe est lu : le fichier est rouvert par WorkbookProbe.open()
+        size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            sample = f.read(_CSV_SAMPLE_BYTES)
+        return WorkbookProbe(file_path, 'csv', None, _probe_csv(sample, size), size)
+
+    with open(file_path, "rb") as f:
+        content = f.read()
+
+    if file_ext == '.xls':
+        sheets = _probe_xls(content)
+    else:
+        sheets = _probe_xlsx(content)
+    return WorkbookProbe(file_path, file_ext.lstrip('.'), content, sheets)
+
+
+if __name__ == "__main__":
+    from json_output import dumps
+
+    if len(sys.argv) < 2:
+        print(dumps({"error": "Aucun chemin de fichier fourni."}))
+        sys.exit(1)
+
+    started = time.perf_counter()
+    try:
+        probe = probe_workbook(sys.argv[1])
+        result = probe.to_dict()
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    except Exception as e:
+        result = {"error": f"Impossible d'inspecter le fichier: {str(e)}"}
+    print(dumps(result))